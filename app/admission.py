@@ -0,0 +1,204 @@
+"""Admission control: shed expensive work before it piles up in the process.
+
+Requests are sorted into route classes by method and path:
+
+- ``generation``: POSTs that queue LLM jobs (titles, scripts, feedback);
+- ``synthesis``: POSTs that hold a provider call for the whole request (TTS,
+  refinement, host-audio upload);
+- ``read`` / ``write``: everything else, which is tracked but never held back.
+
+``/health``, ``/ready`` and ``/metrics`` bypass the middleware entirely.
+
+Each expensive class admits ``admission_max_in_flight`` requests at a time.
+Further ones wait, in arrival order, for at most
+``admission_queue_timeout_seconds``; beyond ``admission_max_queue`` waiting,
+or past the timeout, they get 503 with a Retry-After estimated from recent
+service times. Generation is also refused while ``admission_max_queued_jobs``
+jobs are waiting for a worker, since its HTTP requests return at once and the
+pile-up happens in the job queue instead. Reads and cheap writes never wait,
+so the UI stays usable while providers are slow.
+
+Implemented as plain ASGI middleware so that a streamed response (SSE batch
+refinement) holds its slot until the last byte is sent.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import re
+import time
+from collections import deque
+
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.metrics import ADMISSION_QUEUE_SECONDS, ADMISSION_REJECTED
+
+EXEMPT_PATHS = {"/health", "/ready", "/metrics"}
+
+_ROUTE_CLASSES: list[tuple[str, re.Pattern]] = [
+    ("generation", re.compile(r"/api/v1/projects/[^/]+/(titles/generate|scripts/generate|feedback)")),
+    (
+        "synthesis",
+        re.compile(
+            r"/api/v1/(scripts/segments/[^/]+/(tts|refine)|scripts/[^/]+/(tts-multi|refine)"
+            r"|voice-samples/[^/]+/host-audio)"
+        ),
+    ),
+]
+
+_MAX_RETRY_AFTER_SECONDS = 60
+_JOB_BACKLOG_RETRY_SECONDS = 10  # job run times vary too much to estimate from the backlog
+
+
+def route_class(method: str, path: str) -> str | None:
+    """The class a request is admitted under; None for exempt paths."""
+    if path in EXEMPT_PATHS:
+        return None
+    if method == "POST":
+        for name, pattern in _ROUTE_CLASSES:
+            if pattern.fullmatch(path):
+                return name
+    return "read" if method in ("GET", "HEAD", "OPTIONS") else "write"
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RouteClassGate:
+    """In-flight limit with a bounded FIFO wait (``max_in_flight=0``: track only)."""
+
+    def __init__(self, name: str, max_in_flight: int = 0, max_queue: int = 0, queue_timeout: float = 0.0):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._service_ewma: float | None = None
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> float:
+        """Seconds until a new request would likely get in."""
+        per_slot = self._service_ewma if self._service_ewma is not None else 1.0
+        slots = max(self.max_in_flight, 1)
+        return min(max(per_slot * (self.waiting + 1) / slots, 1.0), _MAX_RETRY_AFTER_SECONDS)
+
+    async def enter(self) -> None:
+        start = time.monotonic()
+        if not self.max_in_flight or (self.in_flight < self.max_in_flight and not self._waiters):
+            self.in_flight += 1
+            ADMISSION_QUEUE_SECONDS.observe(0.0, self.name)
+            return
+        if self.waiting >= self.max_queue:
+            raise Overloaded("queue_full", self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                self.leave(None)  # admitted just as the timeout fired; pass the slot on
+            else:
+                waiter.cancel()
+            raise Overloaded("queue_timeout", self.retry_after()) from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.leave(None)
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        ADMISSION_QUEUE_SECONDS.observe(time.monotonic() - start, self.name)
+
+    def leave(self, service_seconds: float | None) -> None:
+        self.in_flight -= 1
+        if service_seconds is not None:
+            self._service_ewma = (
+                service_seconds if self._service_ewma is None else 0.8 * self._service_ewma + 0.2 * service_seconds
+            )
+        while self._waiters and (not self.max_in_flight or self.in_flight < self.max_in_flight):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def snapshot(self) -> dict:
+        return {"in_flight": self.in_flight, "waiting": self.waiting, "max_in_flight": self.max_in_flight}
+
+
+_gates: dict[str, RouteClassGate] = {}
+
+
+def gate(name: str) -> RouteClassGate:
+    existing = _gates.get(name)
+    if existing is None:
+        if name in ("generation", "synthesis"):
+            existing = RouteClassGate(
+                name,
+                max_in_flight=settings.admission_max_in_flight,
+                max_queue=settings.admission_max_queue,
+                queue_timeout=settings.admission_queue_timeout_seconds,
+            )
+        else:
+            existing = RouteClassGate(name)
+        _gates[name] = existing
+    return existing
+
+
+def admission_stats() -> dict[str, dict]:
+    return {name: g.snapshot() for name, g in sorted(_gates.items())}
+
+
+def reset_admission() -> None:
+    _gates.clear()
+
+
+def _check_job_backlog() -> None:
+    from app.jobs import queued_jobs
+
+    limit = settings.admission_max_queued_jobs
+    if limit and queued_jobs() >= limit:
+        raise Overloaded("job_backlog", _JOB_BACKLOG_RETRY_SECONDS)
+
+
+class AdmissionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        name = route_class(scope["method"], scope["path"])
+        if name is None:
+            return await self.app(scope, receive, send)
+
+        route_gate = gate(name)
+        try:
+            if name == "generation":
+                _check_job_backlog()
+            await route_gate.enter()
+        except Overloaded as e:
+            ADMISSION_REJECTED.inc(name, e.reason)
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is busy, please retry shortly"},
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            )
+            return await response(scope, receive, send)
+
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_gate.leave(time.monotonic() - start)
@@ -2,7 +2,9 @@ from __future__ import annotations
 
 from fastapi import Header, HTTPException
 
-from app.db import get_db, get_user_or_create
+from app.config import settings
+from app.db import get_db, get_user, get_user_or_create
+from app.profiling import admin_token_valid
 
 
 async def get_user_id(x_user_id: str = Header(...)) -> str:
@@ -10,5 +12,18 @@ async def get_user_id(x_user_id: str = Header(...)) -> str:
     if not x_user_id:
         raise HTTPException(status_code=401, detail="X-User-Id header required")
     async with get_db() as db:
-        await get_user_or_create(db, x_user_id)
+        user = await get_user(db, x_user_id)
+    if user is None:
+        # A deferred read-then-insert can't wait for the write lock (SQLITE_BUSY
+        # under concurrent first requests); take it up front instead
+        async with get_db(immediate=True) as db:
+            await get_user_or_create(db, x_user_id)
     return x_user_id
+
+
+async def require_admin(x_admin_token: str | None = Header(None)) -> None:
+    """Gate admin endpoints on X-Admin-Token; they don't exist unless ADMIN_TOKEN is set."""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not admin_token_valid(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
@@ -1,44 +1,104 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import re
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 
 from app.api.deps import get_user_id
-from app.api.rate_limit import _limiter
+from app.api.rate_limit import rate_limit
+from app.config import settings
 from app.db import (
+    copy_segments,
     create_feedback,
     create_script,
-    create_segments,
     get_current_script,
     get_db,
+    get_feedback,
     get_project,
     get_segments_by_script,
-    get_titles_by_project,
+    set_current_script,
 )
-from app.api.scripts import STYLE_TO_VARIANT
+from app.api.scripts import generate_script_version, refine_content
+from app.jobs import JobContext, JobError, enqueue_job, job_handler
 from app.llm.factory import get_provider_for_user
-from app.llm.prompt_builder import load_prompt
 from app.models import FeedbackRequest
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["feedback"])
 
-
-@router.post("/projects/{project_id}/feedback")
+# Words in feedback text that point at a 三層十段 segment type; each alias
+# names exactly one type
+SEGMENT_ALIASES: dict[str, tuple[str, ...]] = {
+    "cold_open": ("冷開場", "開場", "hook", "精彩片段"),
+    "jingle": ("jingle", "開場音樂", "片頭"),
+    "host_intro": ("主持人介紹", "自我介紹", "價值承諾"),
+    "topic_intro": ("主題引入", "引言"),
+    "core_1": ("核心一", "核心內容一", "第一個核心", "核心段落一"),
+    "core_2": ("核心二", "核心內容二", "第二個核心", "核心段落二", "轉場"),
+    "ad_break": ("廣告", "中插"),
+    "summary": ("摘要", "總結", "重點回顧", "收尾", "結尾"),
+    "cta": ("cta", "行動呼籲"),
+    "preview": ("預告", "下集", "片尾"),
+}
+
+
+def match_feedback_segments(text: str, segments: list[dict]) -> list[dict]:
+    """Segments the feedback text refers to, by alias or label.
+
+    Where matches overlap only the longest counts, so "冷開場太長" picks the
+    cold open and not every segment whose alias or label is "開場".
+    """
+    text = text.lower()
+    # Every alias takes part, even without a segment of its type, so that
+    # "開場音樂" shadows "開場" in scripts without a jingle
+    keys: dict[str, set[int]] = {
+        alias.lower(): set() for aliases in SEGMENT_ALIASES.values() for alias in aliases
+    }
+    for i, seg in enumerate(segments):
+        names = set(SEGMENT_ALIASES.get(seg.get("segment_type") or "", ()))
+        # Labels look like "冷開場：驚人數據"; match the whole label or either half
+        label = seg.get("label") or ""
+        names.update(part.strip() for part in re.split(r"[：:]", label))
+        names.add(label)
+        for name in names:
+            if len(name) >= 2:
+                keys.setdefault(name.lower(), set()).add(i)
+
+    spans = [
+        (m.start(), m.start() + len(key), key) for key in keys for m in re.finditer(re.escape(key), text)
+    ]
+    chosen: set[int] = set()
+    for start, end, key in spans:
+        if not any(s <= start and end <= e and e - s > end - start for s, e, _ in spans):
+            chosen |= keys[key]
+    return [seg for i, seg in enumerate(segments) if i in chosen]
+
+
+def _scores_text(feedback: dict) -> str:
+    parts = [
+        f"{name}:{feedback[field]}"
+        for name, field in (("內容", "score_content"), ("吸引力", "score_engagement"), ("結構", "score_structure"))
+        if feedback.get(field) is not None
+    ]
+    return ", ".join(parts) or "N/A"
+
+
+@router.post("/projects/{project_id}/feedback", dependencies=[Depends(rate_limit("feedback"))])
 async def submit_feedback(
     project_id: str,
     body: FeedbackRequest,
+    response: Response,
     user_id: str = Depends(get_user_id),
 ):
     """Submit feedback scores + text, optionally trigger script regeneration.
 
     If text_feedback is provided and the average score is below 4,
-    a new script version is automatically generated.
+    a regeneration job is queued (202, ``"regeneration": "queued"``) and
+    returned for polling; otherwise the response says ``"regenerated": false``.
     """
-    _limiter.check(f"{user_id}:feedback", max_calls=5, window_seconds=60)
-
     async with get_db() as db:
         project = await get_project(db, project_id)
         if not project:
@@ -60,61 +120,88 @@ async def submit_feedback(
             text_feedback=body.text_feedback,
         )
 
-        # Determine if we should regenerate the script
-        regenerated = False
-        new_script = None
-        new_segments = None
-
-        scores = [s for s in [body.score_content, body.score_engagement, body.score_structure] if s is not None]
-        avg_score = sum(scores) / len(scores) if scores else 5.0
-
-        if body.text_feedback and avg_score < 4:
-            # Trigger script regeneration
-            llm_provider = project.get("llm_provider") or "gemini"
-
-            titles = await get_titles_by_project(db, project_id)
-            selected = next((t for t in titles if t["is_selected"]), None)
-            selected_title = selected["title_zh"] if selected else project["topic"]
-
-            try:
-                provider = await get_provider_for_user(user_id, llm_provider)
-                style_value = project["style"] or "輕鬆閒聊"
-                structure_variant = STYLE_TO_VARIANT.get(style_value, "獨白型")
-                system = load_prompt("system")
-                user_msg = load_prompt(
-                    "script_generation",
-                    selected_title=selected_title,
-                    topic=project["topic"],
-                    audience=project["audience"],
-                    style=style_value,
-                    duration_min=str(project["duration_min"] or 30),
-                    host_count=str(project["host_count"] or 1),
-                    structure_variant=structure_variant,
-                )
-                result = await provider.complete(system, user_msg, task="script_generation")
-                segments_data = result.get("segments", [])
-            except Exception:
-                logger.exception(
-                    "Script regeneration from feedback failed: project=%s user=%s",
-                    project_id,
-                    user_id,
-                )
-                raise HTTPException(status_code=502, detail="Script regeneration failed")
+    scores = [s for s in [body.score_content, body.score_engagement, body.score_structure] if s is not None]
+    avg_score = sum(scores) / len(scores) if scores else 5.0
+
+    if not (body.text_feedback and avg_score < 4):
+        return {"feedback_id": feedback_id, "regenerated": False}
 
-            version = script["version"] + 1
-            new_script_id = await create_script(db, project_id, version=version)
-            await create_segments(db, new_script_id, segments_data)
+    job = await enqueue_job(
+        "script_regeneration",
+        user_id,
+        project_id,
+        payload={"feedback_id": feedback_id, "script_id": script["script_id"]},
+    )
+    response.status_code = 202
+    return {"feedback_id": feedback_id, "regeneration": "queued", "job": job}
 
-            new_script = await get_current_script(db, project_id)
-            new_segments = await get_segments_by_script(db, new_script_id)
-            regenerated = True
 
-    response = {
-        "feedback_id": feedback_id,
-        "regenerated": regenerated,
+@job_handler("script_regeneration")
+async def run_script_regeneration(ctx: JobContext) -> dict:
+    """Create a new script version that addresses low-scoring feedback.
+
+    If the feedback text names specific segments, only those are rewritten
+    with the refinement prompt (concurrently) and the rest are copied over;
+    otherwise the whole script is regenerated.
+    """
+    async with get_db() as db:
+        feedback = await get_feedback(db, ctx.payload.get("feedback_id", ""))
+        segments = await get_segments_by_script(db, ctx.payload.get("script_id", ""))
+    targets = match_feedback_segments(feedback["text_feedback"] or "", segments) if feedback else []
+
+    if targets:
+        saved = await regenerate_segments(ctx, feedback, targets)
+        mode = "partial"
+    else:
+        # Same prompt as the original generation, so a cached answer would be identical
+        saved = await generate_script_version(ctx, task="script_regeneration", bypass_cache=True)
+        mode = "full"
+    return {
+        "feedback_id": ctx.payload.get("feedback_id"),
+        "regenerated": True,
+        "mode": mode,
+        **saved,
     }
-    if regenerated:
-        response["script"] = new_script
-        response["segments"] = new_segments
 
-    return response
+
+async def regenerate_segments(ctx: JobContext, feedback: dict, targets: list[dict]) -> dict:
+    """Refine ``targets`` and save them with the untouched segments as a new version."""
+    based_on_id = feedback["script_id"]
+    async with get_db() as db:
+        project = await get_project(db, ctx.project_id)
+    if not project:
+        raise JobError("Project not found")
+
+    await ctx.progress(10, f"Refining {len(targets)} segments")
+    semaphore = asyncio.Semaphore(settings.refine_concurrency)
+    scores = _scores_text(feedback)
+
+    try:
+        provider = await get_provider_for_user(ctx.user_id, project.get("llm_provider") or "gemini")
+
+        async def refine(seg: dict) -> tuple[int, str]:
+            async with semaphore:
+                return seg["segment_order"], await refine_content(
+                    provider, seg, feedback["text_feedback"], scores
+                )
+
+        replacements = dict(await asyncio.gather(*(refine(seg) for seg in targets)))
+    except Exception:
+        logger.exception("Segment regeneration failed: project=%s user=%s", ctx.project_id, ctx.user_id)
+        raise JobError("Script regeneration failed")
+
+    async with get_db(immediate=True) as db:
+        current = await get_current_script(db, ctx.project_id)
+        if not current or current["script_id"] != based_on_id:
+            raise JobError("Script changed during regeneration, please retry")
+        script_id = await create_script(db, ctx.project_id, version=current["version"] + 1, current=False)
+        await copy_segments(db, based_on_id, script_id, replacements)
+        await set_current_script(db, ctx.project_id, script_id)
+        script = await get_current_script(db, ctx.project_id)
+        db_segments = await get_segments_by_script(db, script_id)
+
+    return {
+        "script": script,
+        "segments": db_segments,
+        "refined_segments": [seg["segment_id"] for seg in db_segments if seg["segment_order"] in replacements],
+    }
@@ -0,0 +1,102 @@
+"""Idempotency-Key support for POST endpoints.
+
+A client that sends ``Idempotency-Key`` gets the stored response replayed on
+retries of the same request, instead of triggering another generation.
+Keys are scoped per user and forgotten after ``idempotency_ttl_seconds``.
+
+Only successful (2xx) responses are stored. Anything else (a 429 the
+client should retry after Retry-After, a 409 conflict, a server error)
+releases the key so the retry actually runs. Streamed (SSE) responses are
+passed through unbuffered: the key stays claimed while the stream runs, so
+a concurrent retry gets 409, and is released when it ends.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections.abc import AsyncIterator
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from app.config import settings
+from app.db import (
+    claim_idempotency_key,
+    get_db,
+    release_idempotency_key,
+    save_idempotent_response,
+)
+
+HEADER = "Idempotency-Key"
+
+
+async def idempotent_requests(request: Request, call_next):
+    key = request.headers.get(HEADER)
+    user_id = request.headers.get("X-User-Id")
+    if request.method != "POST" or not key or not user_id or not request.url.path.startswith("/api/"):
+        return await call_next(request)
+
+    body = await request.body()
+    request_hash = hashlib.sha256(f"{request.url.path}?{request.url.query}\n".encode() + body).hexdigest()
+
+    async with get_db() as db:
+        existing = await claim_idempotency_key(
+            db, user_id, key, request_hash, settings.idempotency_ttl_seconds
+        )
+    if existing is not None:
+        if existing["request_hash"] != request_hash:
+            return JSONResponse(
+                status_code=422,
+                content={"detail": "Idempotency-Key was already used for a different request"},
+            )
+        if existing["status_code"] is None:
+            return JSONResponse(
+                status_code=409,
+                content={"detail": "A request with this Idempotency-Key is still in progress"},
+            )
+        return Response(
+            content=existing["response"],
+            status_code=existing["status_code"],
+            media_type=existing["content_type"] or "application/json",
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    try:
+        response = await call_next(request)
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            response.body_iterator = _release_after(response.body_iterator, user_id, key)
+            return response
+        content = b"".join([chunk async for chunk in response.body_iterator])
+    except BaseException:
+        async with get_db() as db:
+            await release_idempotency_key(db, user_id, key)
+        raise
+
+    async with get_db() as db:
+        if 200 <= response.status_code < 300:
+            await save_idempotent_response(
+                db,
+                user_id,
+                key,
+                response.status_code,
+                content.decode("utf-8"),
+                response.headers.get("content-type"),
+            )
+        else:
+            # Rate limits, conflicts and failures are retryable; don't pin them to the key
+            await release_idempotency_key(db, user_id, key)
+
+    return Response(
+        content=content,
+        status_code=response.status_code,
+        headers=dict(response.headers),
+    )
+
+
+async def _release_after(body: AsyncIterator[bytes], user_id: str, key: str) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        async with get_db() as db:
+            await release_idempotency_key(db, user_id, key)
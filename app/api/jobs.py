@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import json
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import get_user_id
+from app.db import get_db, get_job
+from app.jobs import job_to_dict, subscribe
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["jobs"])
+
+
+async def _get_owned_job(job_id: str, user_id: str) -> dict:
+    async with get_db() as db:
+        job = await get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["user_id"] != user_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_endpoint(
+    job_id: str,
+    user_id: str = Depends(get_user_id),
+):
+    """Poll a background job's status, progress and result."""
+    job = await _get_owned_job(job_id, user_id)
+    return {"job": job_to_dict(job)}
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    user_id: str = Depends(get_user_id),
+):
+    """Stream job progress as Server-Sent Events until the job finishes."""
+    await _get_owned_job(job_id, user_id)
+
+    async def event_stream():
+        async for event, data in subscribe(job_id):
+            if event == "ping":
+                yield ": ping\n\n"
+                continue
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
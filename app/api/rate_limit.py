@@ -1,25 +1,202 @@
-"""In-memory per-user rate limiter (single-instance friendly)."""
+"""Per-user rate limits: in-memory token buckets, or shared across workers.
+
+Token buckets: each key holds up to ``max_calls`` tokens and regains them at
+``max_calls / window_seconds`` per second, so a user can burst the whole
+allowance and then continues at the average rate. A check is O(1) whatever
+the call rate; buckets that have refilled completely carry no information
+and are evicted by a periodic sweep, so memory follows active users rather
+than every user ever seen.
+
+With ``SHARED_STATE_URL`` set, all workers and instances count against the
+same limits through ``SharedRateLimiter`` instead: a sliding-window counter
+built on the backend's atomic ``incr``, since a bucket's read-modify-write
+would need server-side scripting to be atomic on Redis. The limits keep their
+meaning (``max_calls`` per ``window_seconds``) either way; if the backend is
+unreachable, each process falls back to its own buckets.
+
+Routes declare their limit by name (``Depends(rate_limit("tts"))``);
+defaults live in ``ROUTE_LIMITS`` and ``RATE_LIMITS`` overrides them, e.g.
+``RATE_LIMITS="tts=40/60,titles=20/60"`` (calls/seconds).
+"""
 
 from __future__ import annotations
 
+import logging
+import math
 import time
-from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+
+from fastapi import Depends, HTTPException, Response
+
+from app.api.deps import get_user_id
+from app.config import settings
+from app.shared_state import SharedState, SharedStateError, shared_state
+
+logger = logging.getLogger(__name__)
+
+ROUTE_LIMITS: dict[str, tuple[int, float]] = {
+    "titles": (10, 60),
+    "scripts": (5, 60),
+    "refine": (10, 60),
+    "refine_batch": (5, 60),
+    "tts": (20, 60),
+    "tts-multi": (5, 60),
+    "feedback": (5, 60),
+}
+
+SWEEP_INTERVAL_SECONDS = 60.0
 
-from fastapi import HTTPException
+
+@dataclass(frozen=True, slots=True)
+class RateLimitState:
+    limit: int
+    remaining: int
+    reset_seconds: float  # until the bucket is full again
+    retry_after: float = 0.0  # until the next call is allowed; 0 if it was
+
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_seconds)),
+        }
+        if self.retry_after:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
 
 
 class RateLimiter:
-    def __init__(self):
-        self._windows: dict[str, list[float]] = defaultdict(list)
-
-    def check(self, key: str, max_calls: int, window_seconds: int):
-        now = time.time()
-        entries = self._windows[key]
-        # Prune expired
-        self._windows[key] = [t for t in entries if now - t < window_seconds]
-        if len(self._windows[key]) >= max_calls:
-            raise HTTPException(status_code=429, detail="Rate limit exceeded, please try later")
-        self._windows[key].append(now)
+    def __init__(self, clock=time.monotonic, sweep_interval: float = SWEEP_INTERVAL_SECONDS):
+        self._clock = clock
+        self._sweep_interval = sweep_interval
+        # key -> [tokens, updated_at, full_at]; ordered by last use
+        self._buckets: dict[str, list[float]] = {}
+        self._next_sweep = clock() + sweep_interval
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def check(self, key: str, max_calls: int, window_seconds: float) -> RateLimitState:
+        """Take one token for ``key`` or raise 429 with ``Retry-After``."""
+        now = self._clock()
+        if now >= self._next_sweep:
+            self._sweep(now)
+        rate = max_calls / window_seconds
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            tokens = float(max_calls)
+        else:
+            tokens = min(float(max_calls), bucket[0] + (now - bucket[1]) * rate)
+
+        if tokens < 1:
+            self._buckets[key] = [tokens, now, now + (max_calls - tokens) / rate]
+            state = RateLimitState(max_calls, 0, (max_calls - tokens) / rate, retry_after=(1 - tokens) / rate)
+            raise HTTPException(
+                status_code=429, detail="Rate limit exceeded, please try later", headers=state.headers()
+            )
+        tokens -= 1
+        full_in = (max_calls - tokens) / rate
+        # Re-inserting keeps the dict in least-recently-used order for _sweep
+        self._buckets[key] = [tokens, now, now + full_in]
+        return RateLimitState(max_calls, int(tokens), full_in)
+
+    def _sweep(self, now: float) -> None:
+        # Oldest first; stop at the first bucket still refilling. Buckets with
+        # a longer window can shield shorter ones until a later sweep, which
+        # only delays their eviction.
+        stale = []
+        for key, bucket in self._buckets.items():
+            if bucket[2] > now:
+                break
+            stale.append(key)
+        for key in stale:
+            del self._buckets[key]
+        self._next_sweep = now + self._sweep_interval
+
+
+class SharedRateLimiter:
+    """Sliding-window counter over a ``SharedState`` backend.
+
+    Calls are counted per fixed window; the previous window's count is
+    weighted by how much of it still overlaps the sliding window ending now.
+    A check is one ``incr`` and one ``get`` (plus an ``incr`` undoing a
+    rejected call), and counters expire on their own after two windows.
+    """
+
+    def __init__(self, state: SharedState, clock=time.time):
+        self._state = state
+        self._clock = clock
+
+    async def check(self, key: str, max_calls: int, window_seconds: float) -> RateLimitState:
+        """Count one call for ``key`` or raise 429 with ``Retry-After``."""
+        now = self._clock()
+        index, elapsed = divmod(now, window_seconds)
+        current_key = f"ratelimit:{key}:{int(index)}"
+        count = await self._state.incr(current_key, 1, ttl=2 * window_seconds)
+        previous = int(await self._state.get(f"ratelimit:{key}:{int(index) - 1}") or 0)
+        used = previous * (1 - elapsed / window_seconds) + count
+        # Once this window's calls stop, they still weigh in until the next one ends
+        reset_seconds = window_seconds - elapsed + (window_seconds if count else 0)
+
+        if used > max_calls:
+            await self._state.incr(current_key, -1, ttl=2 * window_seconds)
+            count -= 1
+            if count + 1 > max_calls:
+                # Wait for the next window, then for this one's weight to fall
+                retry_after = window_seconds - elapsed + window_seconds * max(0.0, 1 - (max_calls - 1) / count)
+            else:
+                retry_after = window_seconds * (1 - (max_calls - count - 1) / previous) - elapsed
+            state = RateLimitState(max_calls, 0, reset_seconds, retry_after=max(retry_after, 1e-3))
+            raise HTTPException(
+                status_code=429, detail="Rate limit exceeded, please try later", headers=state.headers()
+            )
+        return RateLimitState(max_calls, int(max_calls - used), reset_seconds)
+
+
+@lru_cache(maxsize=8)
+def _overrides(spec: str) -> dict[str, tuple[int, float]]:
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        route, _, value = item.partition("=")
+        calls, _, seconds = value.partition("/")
+        limits[route.strip()] = (int(calls), float(seconds))
+    return limits
+
+
+def route_limit(route: str) -> tuple[int, float]:
+    """(max_calls, window_seconds) for ``route``, after ``RATE_LIMITS`` overrides."""
+    return _overrides(settings.rate_limits).get(route) or ROUTE_LIMITS[route]
+
+
+def rate_limit(route: str):
+    """Dependency: charge the caller one call against ``route``'s limit.
+
+    The X-RateLimit-* headers land on the route's response unless it returns
+    a ``Response`` of its own; such routes take the returned state and pass
+    ``state.headers()`` along themselves.
+    """
+    if route not in ROUTE_LIMITS:
+        raise KeyError(f"No rate limit configured for route {route!r}")
+
+    async def dependency(response: Response, user_id: str = Depends(get_user_id)) -> RateLimitState:
+        max_calls, window_seconds = route_limit(route)
+        key = f"{user_id}:{route}"
+        state = None
+        if (shared := shared_state()) is not None:
+            try:
+                state = await SharedRateLimiter(shared).check(key, max_calls, window_seconds)
+            except SharedStateError as e:
+                logger.warning("Shared rate limit unavailable, limiting per process: %s", e)
+        if state is None:
+            state = _limiter.check(key, max_calls, window_seconds)
+        response.headers.update(state.headers())
+        return state
+
+    return dependency
 
 
 _limiter = RateLimiter()
@@ -1,25 +1,43 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
+from collections.abc import AsyncIterator
 
-from fastapi import APIRouter, Depends, HTTPException
+import aiosqlite
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
 from app.api.deps import get_user_id
-from app.api.rate_limit import _limiter
+from app.api.rate_limit import RateLimitState, rate_limit
+from app.config import settings
 from app.db import (
     create_script,
     create_segments,
+    delete_script,
     get_current_script,
     get_db,
     get_project,
+    get_script_by_version,
+    get_script_diff,
     get_segment,
     get_segments_by_script,
     get_titles_by_project,
+    save_script_diff,
+    script_fingerprint,
+    set_current_script,
     update_segment,
+    update_segment_if_unchanged,
 )
+from app.jobs import JobContext, JobError, enqueue_job, job_handler
+from app.llm.base import LLMProvider
 from app.llm.factory import get_provider_for_user
+from app.llm.json_stream import JsonArrayStreamer
 from app.llm.prompt_builder import load_prompt
-from app.models import SegmentEditRequest
+from app.metrics import CACHE_REQUESTS
+from app.models import BatchRefineRequest, SegmentEditRequest
+from app.script_diff import diff_segments
 
 logger = logging.getLogger(__name__)
 
@@ -36,14 +54,18 @@ STYLE_TO_VARIANT = {
 }
 
 
-@router.post("/projects/{project_id}/scripts/generate")
+@router.post(
+    "/projects/{project_id}/scripts/generate", status_code=202, dependencies=[Depends(rate_limit("scripts"))]
+)
 async def generate_script(
     project_id: str,
+    regenerate: bool = False,
     user_id: str = Depends(get_user_id),
 ):
-    """Generate a script via LLM, save script + segments, return them."""
-    _limiter.check(f"{user_id}:scripts", max_calls=5, window_seconds=60)
+    """Queue script generation; poll or stream the returned job for the result.
 
+    ``regenerate=true`` skips the LLM response cache to get a fresh script.
+    """
     async with get_db() as db:
         project = await get_project(db, project_id)
         if not project:
@@ -51,43 +73,133 @@ async def generate_script(
         if project["user_id"] != user_id:
             raise HTTPException(status_code=403, detail="Forbidden")
 
-        llm_provider = project.get("llm_provider") or "gemini"
+    job = await enqueue_job(
+        "script_generation", user_id, project_id, payload={"regenerate": regenerate}, single_flight=True
+    )
+    return {"job": job}
 
-        # Find selected title
-        titles = await get_titles_by_project(db, project_id)
-        selected = next((t for t in titles if t["is_selected"]), None)
-        selected_title = selected["title_zh"] if selected else project["topic"]
 
-        try:
-            provider = await get_provider_for_user(user_id, llm_provider)
-            style_value = project["style"] or "輕鬆閒聊"
-            structure_variant = STYLE_TO_VARIANT.get(style_value, "獨白型")
-            system = load_prompt("system")
-            user_msg = load_prompt(
-                "script_generation",
-                selected_title=selected_title,
-                topic=project["topic"],
-                audience=project["audience"],
-                style=style_value,
-                duration_min=str(project["duration_min"] or 30),
-                host_count=str(project["host_count"] or 1),
-                structure_variant=structure_variant,
-            )
-            result = await provider.complete(system, user_msg, task="script_generation")
-            segments_data = result.get("segments", [])
-        except Exception:
-            logger.exception("Script generation failed: project=%s user=%s", project_id, user_id)
-            raise HTTPException(status_code=502, detail="Script generation failed")
-
-        # Determine version
+@job_handler("script_generation")
+async def run_script_generation(ctx: JobContext) -> dict:
+    """Generate a script via LLM, save script + segments, return them."""
+    return await generate_script_version(
+        ctx, task="script_generation", bypass_cache=ctx.payload.get("regenerate", False)
+    )
+
+
+def _script_inputs(project: dict, selected_title: str) -> tuple:
+    """Everything that feeds the script prompt (compared before publishing)."""
+    return (
+        project["topic"],
+        project["audience"],
+        project["style"],
+        project["duration_min"],
+        project["host_count"],
+        project["llm_provider"],
+        selected_title,
+    )
+
+
+async def _selected_title(db: aiosqlite.Connection, project: dict) -> str:
+    titles = await get_titles_by_project(db, project["project_id"])
+    selected = next((t for t in titles if t["is_selected"]), None)
+    return selected["title_zh"] if selected else project["topic"]
+
+
+async def load_generation_inputs(project_id: str) -> tuple[dict, str, dict | None]:
+    """Read phase: snapshot (project, selected title, current script)."""
+    async with get_db() as db:
+        project = await get_project(db, project_id)
+        if not project:
+            raise JobError("Project not found")
+        selected_title = await _selected_title(db, project)
         current = await get_current_script(db, project_id)
-        version = (current["version"] + 1) if current else 1
+    return project, selected_title, current
+
+
+async def stream_segments(
+    user_id: str, project: dict, selected_title: str, task: str, bypass_cache: bool = False
+) -> AsyncIterator[dict]:
+    """Run the script_generation prompt, yielding each segment as it completes."""
+    llm_provider = project.get("llm_provider") or "gemini"
+
+    try:
+        provider = await get_provider_for_user(user_id, llm_provider)
+        style_value = project["style"] or "輕鬆閒聊"
+        structure_variant = STYLE_TO_VARIANT.get(style_value, "獨白型")
+        system = load_prompt("system")
+        user_msg = load_prompt(
+            "script_generation",
+            selected_title=selected_title,
+            topic=project["topic"],
+            audience=project["audience"],
+            style=style_value,
+            duration_min=str(project["duration_min"] or 30),
+            host_count=str(project["host_count"] or 1),
+            structure_variant=structure_variant,
+        )
+        streamer = JsonArrayStreamer("segments")
+        async for chunk in provider.stream(
+            system, user_msg, task="script_generation", bypass_cache=bypass_cache
+        ):
+            for seg in streamer.feed(chunk):
+                if isinstance(seg.get("content"), str):
+                    yield seg
+                else:
+                    logger.warning("Skipping streamed segment without content: %s", seg)
+        streamer.close()
+    except Exception:
+        logger.exception(
+            "Script generation failed: task=%s project=%s user=%s",
+            task,
+            project["project_id"],
+            user_id,
+        )
+        raise JobError("Script generation failed")
 
-        script_id = await create_script(db, project_id, version=version)
-        await create_segments(db, script_id, segments_data)
-        db_segments = await get_segments_by_script(db, script_id)
 
-        script = await get_current_script(db, project_id)
+async def generate_script_version(ctx: JobContext, task: str, bypass_cache: bool = False) -> dict:
+    """Stream a new script version for ``ctx.project_id`` and make it current.
+
+    Segments are persisted into a draft version and pushed to job listeners
+    (``segment`` events) as soon as each one closes in the LLM output. The
+    draft is published only if the project inputs and current script are
+    unchanged since the read phase; otherwise it is discarded.
+    """
+    project, selected_title, based_on = await load_generation_inputs(ctx.project_id)
+    async with get_db() as db:
+        version = (based_on["version"] + 1) if based_on else 1
+        script_id = await create_script(db, ctx.project_id, version=version, current=False)
+
+    try:
+        await ctx.progress(10, "Generating script")
+        count = 0
+        async for seg in stream_segments(ctx.user_id, project, selected_title, task, bypass_cache):
+            async with get_db() as db:
+                [segment_id] = await create_segments(db, script_id, [seg], start_order=count)
+                row = await get_segment(db, segment_id)
+            count += 1
+            ctx.emit("segment", {"script_id": script_id, "segment": row})
+            await ctx.progress(min(10 + count * 8, 90), f"{count} segments written")
+
+        async with get_db(immediate=True) as db:
+            latest = await get_project(db, ctx.project_id)
+            if not latest:
+                raise JobError("Project not found")
+            current = await get_current_script(db, ctx.project_id)
+            if (
+                _script_inputs(latest, await _selected_title(db, latest)) != _script_inputs(project, selected_title)
+                or (current and current["script_id"]) != (based_on and based_on["script_id"])
+            ):
+                raise JobError("Project changed during script generation, please retry")
+
+            await set_current_script(db, ctx.project_id, script_id)
+            db_segments = await get_segments_by_script(db, script_id)
+            script = await get_current_script(db, ctx.project_id)
+    except BaseException:
+        async with get_db() as db:
+            await delete_script(db, script_id)
+        raise
 
     return {
         "script": script,
@@ -120,6 +232,63 @@ async def get_current_script_endpoint(
     }
 
 
+@router.get("/projects/{project_id}/scripts/diff")
+async def diff_script_versions(
+    project_id: str,
+    from_version: int = Query(alias="from", ge=1),
+    to_version: int = Query(alias="to", ge=1),
+    user_id: str = Depends(get_user_id),
+):
+    """Segment-by-segment diff between two script versions.
+
+    Segments are aligned by type and label. Modified, added and removed
+    segments carry ``ops``: ``["=" | "-" | "+", text]`` runs at character
+    level; unchanged segments carry no text. Results are cached per version
+    pair until either version is edited.
+    """
+    async with get_db() as db:
+        project = await get_project(db, project_id)
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+        if project["user_id"] != user_id:
+            raise HTTPException(status_code=403, detail="Forbidden")
+
+        scripts = {}
+        for version in (from_version, to_version):
+            script = await get_script_by_version(db, project_id, version)
+            if not script:
+                raise HTTPException(status_code=404, detail=f"Script version {version} not found")
+            scripts[version] = script
+        before, after = scripts[from_version], scripts[to_version]
+
+        fingerprint = "|".join([
+            await script_fingerprint(db, before["script_id"]),
+            await script_fingerprint(db, after["script_id"]),
+        ])
+        delta = await get_script_diff(db, before["script_id"], after["script_id"], fingerprint)
+        cached = delta is not None
+        CACHE_REQUESTS.inc("script_diff", "hit" if cached else "miss")
+        if not cached:
+            old_segments = await get_segments_by_script(db, before["script_id"])
+            new_segments = await get_segments_by_script(db, after["script_id"])
+
+    if not cached:
+        delta = await asyncio.to_thread(diff_segments, old_segments, new_segments)
+        async with get_db() as db:
+            await save_script_diff(db, before["script_id"], after["script_id"], fingerprint, delta)
+
+    summary = dict.fromkeys(("unchanged", "modified", "added", "removed"), 0)
+    for entry in delta:
+        summary[entry["status"]] += 1
+    return {
+        "from": {"script_id": before["script_id"], "version": before["version"]},
+        "to": {"script_id": after["script_id"], "version": after["version"]},
+        "summary": summary,
+        "segments": delta,
+        "cached": cached,
+    }
+
+
 @router.patch("/scripts/segments/{segment_id}")
 async def edit_segment(
     segment_id: str,
@@ -149,15 +318,28 @@ async def edit_segment(
     return {"segment": updated}
 
 
-@router.post("/scripts/segments/{segment_id}/refine")
+async def refine_content(provider: LLMProvider, segment: dict, feedback: str, scores: str = "N/A") -> str:
+    """Run the script_refinement prompt for one segment and return the new content."""
+    system = load_prompt("system")
+    user_msg = load_prompt(
+        "script_refinement",
+        original_content=segment["content"],
+        feedback=feedback,
+        scores=scores,
+        segment_type=segment.get("segment_type") or "main",
+        label=segment.get("label") or "",
+    )
+    result = await provider.complete(system, user_msg, task="script_refinement")
+    return result.get("content", segment["content"])
+
+
+@router.post("/scripts/segments/{segment_id}/refine", dependencies=[Depends(rate_limit("refine"))])
 async def refine_segment(
     segment_id: str,
     body: SegmentEditRequest,
     user_id: str = Depends(get_user_id),
 ):
     """LLM-powered refinement of a segment based on feedback text."""
-    _limiter.check(f"{user_id}:refine", max_calls=10, window_seconds=60)
-
     async with get_db() as db:
         segment = await get_segment(db, segment_id)
         if not segment:
@@ -171,29 +353,111 @@ async def refine_segment(
             (segment["script_id"],),
         )
         row = await cursor.fetchone()
-        if not row or row[0] != user_id:
-            raise HTTPException(status_code=403, detail="Forbidden")
+    if not row or row[0] != user_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
 
-        llm_provider = row[1] or "gemini"
+    llm_provider = row[1] or "gemini"
 
-        try:
-            provider = await get_provider_for_user(user_id, llm_provider)
-            system = load_prompt("system")
-            user_msg = load_prompt(
-                "script_refinement",
-                original_content=segment["content"],
-                feedback=body.content,
-                scores="N/A",
-                segment_type=segment.get("segment_type") or "main",
-                label=segment.get("label") or "",
-            )
-            result = await provider.complete(system, user_msg, task="script_refinement")
-            new_content = result.get("content", segment["content"])
-        except Exception:
-            logger.exception("Segment refinement failed: segment=%s user=%s", segment_id, user_id)
-            raise HTTPException(status_code=502, detail="Segment refinement failed")
-
-        await update_segment(db, segment_id, new_content)
+    try:
+        provider = await get_provider_for_user(user_id, llm_provider)
+        new_content = await refine_content(provider, segment, body.content)
+    except Exception:
+        logger.exception("Segment refinement failed: segment=%s user=%s", segment_id, user_id)
+        raise HTTPException(status_code=502, detail="Segment refinement failed")
+
+    async with get_db() as db:
+        if not await update_segment_if_unchanged(db, segment_id, segment["content"], new_content):
+            raise HTTPException(status_code=409, detail="Segment was modified during refinement, please retry")
         updated = await get_segment(db, segment_id)
 
     return {"segment": updated}
+
+
+@router.post("/scripts/{script_id}/refine")
+async def refine_segments(
+    script_id: str,
+    body: BatchRefineRequest,
+    user_id: str = Depends(get_user_id),
+    limit: RateLimitState = Depends(rate_limit("refine_batch")),
+):
+    """Apply one instruction to many segments, streaming results as Server-Sent Events.
+
+    Refinements run concurrently (``refine_concurrency`` at a time). Each
+    finished one is sent as a ``segment`` event; all updates are then written
+    in one transaction and reported in a final ``done`` event. Segments edited
+    while being refined are left alone and listed as conflicts.
+    """
+    async with get_db() as db:
+        cursor = await db.execute(
+            """SELECT p.user_id, p.llm_provider FROM projects p
+               JOIN scripts s ON p.project_id = s.project_id
+               WHERE s.script_id = ?""",
+            (script_id,),
+        )
+        row = await cursor.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Script not found")
+        if row[0] != user_id:
+            raise HTTPException(status_code=403, detail="Forbidden")
+        segments = await get_segments_by_script(db, script_id)
+
+    if body.segment_ids is not None:
+        wanted = set(body.segment_ids)
+        segments = [s for s in segments if s["segment_id"] in wanted]
+    if body.segment_types is not None:
+        types = set(body.segment_types)
+        segments = [s for s in segments if s["segment_type"] in types]
+    if not segments:
+        raise HTTPException(status_code=422, detail="No segments selected")
+
+    try:
+        provider = await get_provider_for_user(user_id, row[1] or "gemini")
+    except Exception:
+        logger.exception("Batch refinement failed: script=%s user=%s", script_id, user_id)
+        raise HTTPException(status_code=502, detail="Segment refinement failed")
+
+    async def event_stream():
+        semaphore = asyncio.Semaphore(settings.refine_concurrency)
+
+        async def refine(seg: dict) -> tuple[dict, str | None]:
+            async with semaphore:
+                try:
+                    return seg, await refine_content(provider, seg, body.instruction)
+                except Exception:
+                    logger.exception("Batch refinement failed: segment=%s user=%s", seg["segment_id"], user_id)
+                    return seg, None
+
+        def sse(event: str, data: dict) -> str:
+            return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+        refined: list[tuple[dict, str]] = []
+        failed: list[str] = []
+        tasks = [asyncio.create_task(refine(seg)) for seg in segments]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                seg, content = await next_done
+                if content is None:
+                    failed.append(seg["segment_id"])
+                    yield sse("error", {"segment_id": seg["segment_id"], "detail": "Segment refinement failed"})
+                    continue
+                refined.append((seg, content))
+                yield sse("segment", {"segment_id": seg["segment_id"], "content": content})
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        updated: list[dict] = []
+        conflicts: list[str] = []
+        async with get_db() as db:
+            for seg, content in refined:
+                if await update_segment_if_unchanged(db, seg["segment_id"], seg["content"], content):
+                    updated.append(await get_segment(db, seg["segment_id"]))
+                else:
+                    conflicts.append(seg["segment_id"])
+        yield sse("done", {"segments": updated, "conflicts": conflicts, "failed": failed})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **limit.headers()},
+    )
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import html
+import re
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.api.deps import get_user_id
+from app.db import get_db, search_documents
+
+router = APIRouter(tags=["search"])
+
+SNIPPET_CHARS = 80
+
+
+def highlight(text: str, terms: list[str], width: int = SNIPPET_CHARS) -> str:
+    """HTML-escaped excerpt of ``text`` around the first match, matches wrapped in <mark>."""
+    pattern = re.compile("|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    first = pattern.search(text)
+    start = 0
+    if first and len(text) > width:
+        start = max(0, min(first.start() - width // 4, len(text) - width))
+    excerpt = text[start:start + width]
+
+    parts: list[str] = []
+    pos = 0
+    for match in pattern.finditer(excerpt):
+        parts.append(html.escape(excerpt[pos:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group())}</mark>")
+        pos = match.end()
+    parts.append(html.escape(excerpt[pos:]))
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if start + width < len(text) else ""
+    return prefix + "".join(parts) + suffix
+
+
+@router.get("/search")
+async def search(
+    q: str = Query(min_length=1, max_length=200),
+    kind: Literal["project", "title", "segment"] | None = None,
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0),
+    user_id: str = Depends(get_user_id),
+):
+    """Search the user's project topics, titles and current script segments.
+
+    Every whitespace-separated term must match (substring, case-insensitive).
+    ``snippet`` is HTML-escaped with matches wrapped in ``<mark>``.
+    """
+    terms = list(dict.fromkeys(q.split()))
+    if not terms:
+        raise HTTPException(status_code=422, detail="Empty search query")
+
+    async with get_db() as db:
+        total, rows = await search_documents(db, user_id, terms, kind=kind, limit=limit, offset=offset)
+
+    results = [
+        {
+            "kind": row["kind"],
+            "id": row["ref_id"],
+            "project_id": row["project_id"],
+            "project_topic": row["topic"],
+            "snippet": highlight(row["body"], terms),
+            "score": round(-row["score"], 4) if row["score"] is not None else None,
+        }
+        for row in rows
+    ]
+    return {"query": q, "total": total, "limit": limit, "offset": offset, "results": results}
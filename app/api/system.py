@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from app import profiling
+from app.api.deps import require_admin
+from app.db import get_db, get_llm_cache_stats
+from app.llm.latency import latency_snapshot
+from app.llm.resilience import resilience_snapshot
+from app.llm.usage import usage_totals
+
+router = APIRouter(tags=["system"])
+
+
+@router.get("/system/llm-cache", dependencies=[Depends(require_admin)])
+async def llm_cache_stats():
+    """Hit/miss counts plus tokens and latency saved by the LLM response cache."""
+    async with get_db() as db:
+        rows = await get_llm_cache_stats(db)
+
+    hits = sum(r["hits"] for r in rows)
+    misses = sum(r["misses"] for r in rows)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "tokens_saved": sum(r["tokens_saved"] for r in rows),
+        "latency_saved_ms": round(sum(r["latency_saved_ms"] for r in rows), 1),
+        "entries": sum(r["entries"] for r in rows),
+        "by_task": rows,
+    }
+
+
+@router.get("/system/llm-usage", dependencies=[Depends(require_admin)])
+async def llm_usage():
+    """Input tokens per task since startup, split by provider prompt-cache hits."""
+    return {"by_task": usage_totals()}
+
+
+@router.get("/system/llm-providers", dependencies=[Depends(require_admin)])
+async def llm_providers():
+    """Per-provider concurrency limit, breaker state, retries and latency percentiles."""
+    return {"providers": resilience_snapshot(), "latency": latency_snapshot()}
+
+
+@router.post("/system/profile", dependencies=[Depends(require_admin)])
+async def profile_process(
+    seconds: float = Query(10.0, gt=0, le=300),
+    interval_ms: float = Query(profiling.DEFAULT_INTERVAL * 1000, ge=1, le=1000),
+):
+    """Sample the whole process for ``seconds`` and save the collapsed stacks.
+
+    Responds when the profile is written. Render with e.g.
+    ``flamegraph.pl data/profiles/<name>`` or by dropping the file on speedscope.
+    """
+    profiler = profiling.acquire(interval_ms / 1000)
+    if profiler is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        name = await profiling.release(profiler, f"process-{seconds:g}s")
+    return {"profile": name, "samples": profiler.sample_count, "seconds": seconds}
+
+
+@router.get("/system/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Saved profiles, newest first."""
+    return {"profiles": profiling.list_profiles(), "running": profiling.is_running()}
+
+
+@router.get("/system/profiles/{name}", dependencies=[Depends(require_admin)])
+async def download_profile(name: str):
+    path = profiling.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=name)
@@ -5,7 +5,7 @@ import logging
 from fastapi import APIRouter, Depends, HTTPException
 
 from app.api.deps import get_user_id
-from app.api.rate_limit import _limiter
+from app.api.rate_limit import rate_limit
 from app.db import (
     create_titles,
     delete_titles_by_project,
@@ -15,6 +15,7 @@ from app.db import (
     get_titles_by_project,
     select_title,
 )
+from app.jobs import JobContext, JobError, enqueue_job, job_handler
 from app.llm.factory import get_provider_for_user
 from app.llm.prompt_builder import load_prompt
 
@@ -23,14 +24,18 @@ logger = logging.getLogger(__name__)
 router = APIRouter(tags=["titles"])
 
 
-@router.post("/projects/{project_id}/titles/generate")
+@router.post(
+    "/projects/{project_id}/titles/generate", status_code=202, dependencies=[Depends(rate_limit("titles"))]
+)
 async def generate_titles(
     project_id: str,
+    regenerate: bool = False,
     user_id: str = Depends(get_user_id),
 ):
-    """Generate 5 candidate titles via LLM, save to DB, and return them."""
-    _limiter.check(f"{user_id}:titles", max_calls=10, window_seconds=60)
+    """Queue generation of 5 candidate titles; poll the returned job for them.
 
+    ``regenerate=true`` skips the LLM response cache to get fresh titles.
+    """
     async with get_db() as db:
         project = await get_project(db, project_id)
         if not project:
@@ -38,27 +43,62 @@ async def generate_titles(
         if project["user_id"] != user_id:
             raise HTTPException(status_code=403, detail="Forbidden")
 
-        llm_provider = project.get("llm_provider") or "gemini"
-
-        try:
-            provider = await get_provider_for_user(user_id, llm_provider)
-            system = load_prompt("system")
-            user_msg = load_prompt(
-                "title_generation",
-                topic=project["topic"],
-                audience=project["audience"],
-                style=project["style"] or "輕鬆閒聊",
-            )
-            result = await provider.complete(system, user_msg, task="title_generation")
-            titles_data = result.get("titles", [])[:5]
-        except Exception:
-            logger.exception("Title generation failed: project=%s user=%s", project_id, user_id)
-            raise HTTPException(status_code=502, detail="Title generation failed")
+    job = await enqueue_job(
+        "title_generation", user_id, project_id, payload={"regenerate": regenerate}, single_flight=True
+    )
+    return {"job": job}
+
+
+def _title_inputs(project: dict) -> tuple:
+    """Project fields that feed the title prompt (compared before writing)."""
+    return (project["topic"], project["audience"], project["style"], project["llm_provider"])
+
+
+@job_handler("title_generation")
+async def run_title_generation(ctx: JobContext) -> dict:
+    """Generate titles via LLM, replace the project's titles, return them.
+
+    No connection is held during the LLM call; the write is skipped if the
+    project's inputs changed while it ran.
+    """
+    async with get_db() as db:
+        project = await get_project(db, ctx.project_id)
+    if not project:
+        raise JobError("Project not found")
+
+    llm_provider = project.get("llm_provider") or "gemini"
+
+    try:
+        provider = await get_provider_for_user(ctx.user_id, llm_provider)
+        system = load_prompt("system")
+        user_msg = load_prompt(
+            "title_generation",
+            topic=project["topic"],
+            audience=project["audience"],
+            style=project["style"] or "輕鬆閒聊",
+        )
+        result = await provider.complete(
+            system,
+            user_msg,
+            task="title_generation",
+            bypass_cache=ctx.payload.get("regenerate", False),
+        )
+        titles_data = result.get("titles", [])[:5]
+    except Exception:
+        logger.exception("Title generation failed: project=%s user=%s", ctx.project_id, ctx.user_id)
+        raise JobError("Title generation failed")
+
+    async with get_db(immediate=True) as db:
+        latest = await get_project(db, ctx.project_id)
+        if not latest:
+            raise JobError("Project not found")
+        if _title_inputs(latest) != _title_inputs(project):
+            raise JobError("Project changed during title generation, please retry")
 
         # Delete old titles and insert new ones
-        await delete_titles_by_project(db, project_id)
-        await create_titles(db, project_id, titles_data)
-        db_titles = await get_titles_by_project(db, project_id)
+        await delete_titles_by_project(db, ctx.project_id)
+        await create_titles(db, ctx.project_id, titles_data)
+        db_titles = await get_titles_by_project(db, ctx.project_id)
 
     return {"titles": db_titles}
 
@@ -2,15 +2,14 @@ from __future__ import annotations
 
 import logging
 from pathlib import PurePosixPath
-from uuid import uuid4
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 
 from app.api.deps import get_user_id
-from app.api.rate_limit import _limiter
-from app.db import get_db, get_current_script, get_segment, get_segments_by_script
+from app.api.rate_limit import rate_limit
+from app.db import create_voice_sample, get_db, get_segment, get_segments_by_script
 from app.models import TTSMultiSpeakerRequest, TTSRequest
-from app.tts.audio_storage import get_audio_url, save_audio
+from app.tts.audio_storage import delete_audio, get_audio_url, save_audio
 from app.tts.tts_service import synthesize, synthesize_multi_speaker
 
 logger = logging.getLogger(__name__)
@@ -21,15 +20,13 @@ MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # 50MB
 ALLOWED_EXTENSIONS = {".wav", ".mp3", ".m4a", ".ogg", ".webm"}
 
 
-@router.post("/scripts/segments/{segment_id}/tts")
+@router.post("/scripts/segments/{segment_id}/tts", dependencies=[Depends(rate_limit("tts"))])
 async def generate_tts(
     segment_id: str,
     body: TTSRequest,
     user_id: str = Depends(get_user_id),
 ):
     """Generate TTS audio for a segment."""
-    _limiter.check(f"{user_id}:tts", max_calls=20, window_seconds=60)
-
     logger.info("TTS request: provider=%s, voice=%s, style=%s", body.tts_provider, body.voice, body.style_prompt)
     async with get_db() as db:
         segment = await get_segment(db, segment_id)
@@ -44,33 +41,40 @@ async def generate_tts(
             (segment["script_id"],),
         )
         row = await cursor.fetchone()
-        if not row or row[0] != user_id:
-            raise HTTPException(status_code=403, detail="Forbidden")
-
-        try:
-            audio_bytes, ext = await synthesize(
-                text=segment["content"],
-                voice=body.voice,
-                speed=body.speed,
-                pitch=body.pitch,
-                style_prompt=body.style_prompt,
-                provider_name=body.tts_provider,
-                user_id=user_id,
-            )
-            filename = save_audio(audio_bytes, extension=ext)
-            audio_url = get_audio_url(filename)
-        except Exception:
-            logger.exception("TTS generation failed: segment=%s user=%s", segment_id, user_id)
-            raise HTTPException(status_code=502, detail="TTS generation failed")
+    if not row or row[0] != user_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    try:
+        audio_bytes, ext = await synthesize(
+            text=segment["content"],
+            voice=body.voice,
+            speed=body.speed,
+            pitch=body.pitch,
+            style_prompt=body.style_prompt,
+            provider_name=body.tts_provider,
+            user_id=user_id,
+        )
+        filename = save_audio(audio_bytes, extension=ext)
+        audio_url = get_audio_url(filename)
+    except Exception:
+        logger.exception("TTS generation failed: segment=%s user=%s", segment_id, user_id)
+        raise HTTPException(status_code=502, detail="TTS generation failed")
 
-        # Save to voice_samples table
-        sample_id = str(uuid4())
-        await db.execute(
-            """INSERT INTO voice_samples
-               (sample_id, segment_id, tts_url, tts_voice, tts_speed, tts_pitch, tts_provider)
-               VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (sample_id, segment_id, audio_url, body.voice, body.speed, body.pitch, body.tts_provider),
+    # Save to voice_samples table, unless the segment changed while synthesizing
+    async with get_db() as db:
+        sample_id = await create_voice_sample(
+            db,
+            segment_id,
+            expected_content=segment["content"],
+            tts_url=audio_url,
+            tts_voice=body.voice,
+            tts_speed=body.speed,
+            tts_pitch=body.pitch,
+            tts_provider=body.tts_provider,
         )
+    if sample_id is None:
+        delete_audio(filename)
+        raise HTTPException(status_code=409, detail="Segment was modified during TTS generation, please retry")
 
     return {
         "sample_id": sample_id,
@@ -83,15 +87,13 @@ async def generate_tts(
     }
 
 
-@router.post("/scripts/{script_id}/tts-multi")
+@router.post("/scripts/{script_id}/tts-multi", dependencies=[Depends(rate_limit("tts-multi"))])
 async def generate_multi_speaker_tts(
     script_id: str,
     body: TTSMultiSpeakerRequest,
     user_id: str = Depends(get_user_id),
 ):
     """Generate multi-speaker TTS audio for an entire script."""
-    _limiter.check(f"{user_id}:tts-multi", max_calls=5, window_seconds=60)
-
     async with get_db() as db:
         # Verify ownership via script -> project -> user
         cursor = await db.execute(
@@ -108,29 +110,29 @@ async def generate_multi_speaker_tts(
 
         # Collect all segment content with speaker labels
         segments = await get_segments_by_script(db, script_id)
-        if not segments:
-            raise HTTPException(status_code=404, detail="No segments found")
-
-        combined_text = "\n".join(seg["content"] for seg in segments)
-
-        try:
-            audio_bytes, ext = await synthesize_multi_speaker(
-                text=combined_text,
-                speakers=body.speakers,
-                style_prompt=body.style_prompt,
-                provider_name=body.tts_provider,
-                user_id=user_id,
-            )
-            filename = save_audio(audio_bytes, extension=ext)
-            audio_url = get_audio_url(filename)
-        except NotImplementedError:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Provider '{body.tts_provider}' does not support multi-speaker TTS",
-            )
-        except Exception:
-            logger.exception("Multi-speaker TTS failed: script=%s user=%s", script_id, user_id)
-            raise HTTPException(status_code=502, detail="Multi-speaker TTS generation failed")
+    if not segments:
+        raise HTTPException(status_code=404, detail="No segments found")
+
+    combined_text = "\n".join(seg["content"] for seg in segments)
+
+    try:
+        audio_bytes, ext = await synthesize_multi_speaker(
+            text=combined_text,
+            speakers=body.speakers,
+            style_prompt=body.style_prompt,
+            provider_name=body.tts_provider,
+            user_id=user_id,
+        )
+        filename = save_audio(audio_bytes, extension=ext)
+        audio_url = get_audio_url(filename)
+    except NotImplementedError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Provider '{body.tts_provider}' does not support multi-speaker TTS",
+        )
+    except Exception:
+        logger.exception("Multi-speaker TTS failed: script=%s user=%s", script_id, user_id)
+        raise HTTPException(status_code=502, detail="Multi-speaker TTS generation failed")
 
     return {
         "script_id": script_id,
@@ -3,11 +3,58 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     database_url: str = "data/podcast.db"
+    database_replica_path: str = ""  # write-behind: live db on local disk (e.g. /tmp/podcast.db), database_url is its snapshot
+    database_snapshot_seconds: float = 15.0  # ... full copy to the snapshot this often if changed: the most writes lost on a crash
     anthropic_api_key: str = ""
     gemini_api_key: str = ""
     gemini_tts_model: str = "gemini-2.5-flash-preview-tts"
+    gemini_context_cache_ttl_seconds: int = 3600  # explicit cache for static prompt prefixes
     cors_origins: str = "http://localhost:5173"
     encryption_key: str = ""  # Fernet key for encrypting user API keys
+    startup_warmup: bool = True  # import provider SDKs and build clients in the background after startup
+    job_workers: int = 2  # background workers for LLM generation jobs
+    refine_concurrency: int = 4  # parallel segment refinements within one request/job
+    llm_concurrency_initial: int = 8  # per-provider adaptive limit (AIMD) starts here
+    llm_concurrency_max: int = 32
+    llm_user_concurrency: int = 4  # in-flight LLM calls per user and provider; 0 = no cap
+    tts_concurrency: int = 8  # in-flight TTS calls per provider
+    tts_user_concurrency: int = 2  # ... of which one user may hold; 0 = no cap
+    fair_user_weights: str = ""  # weighted fair queuing shares, e.g. "user-a=2,user-b=0.5"
+    llm_retry_attempts: int = 3
+    llm_breaker_failure_threshold: int = 5
+    llm_breaker_reset_seconds: float = 30.0
+    llm_hedging_enabled: bool = False  # hedge/fail over to the other LLM provider
+    llm_hedge_default_delay_seconds: float = 30.0  # until enough latency samples exist
+    llm_hedge_min_delay_seconds: float = 2.0
+    llm_hedge_percentile: float = 0.95
+    llm_hedge_min_samples: int = 20
+    llm_cache_enabled: bool = True
+    llm_cache_ttl_seconds: int = 7 * 24 * 3600
+    llm_cache_max_entries: int = 2000
+    idempotency_ttl_seconds: int = 24 * 3600
+    admission_max_in_flight: int = 16  # per expensive route class (generation, synthesis); 0 = no limit
+    admission_max_queue: int = 32  # requests waiting beyond that are shed with 503
+    admission_queue_timeout_seconds: float = 10.0  # ... as are those waiting longer than this
+    admission_max_queued_jobs: int = 200  # generation is shed while this many jobs wait; 0 = no limit
+    shared_state_url: str = ""  # sqlite:///data/shared.db or redis://host:6379/0 to share limits/caches
+    rate_limits: str = ""  # per-route overrides as route=calls/seconds, e.g. "tts=40/60,titles=20/60"
+    prompt_hot_reload: bool = False  # dev: re-read prompts/*.txt when they change
+    trace_sample_rate: float = 0.0  # share of requests traced (Server-Timing + export); 1.0 traces all
+    trace_follow_traceparent: bool = False  # a sampled traceparent forces tracing; any client can send one
+    trace_export_path: str = ""  # append sampled traces as OTLP/JSON lines, e.g. data/traces.jsonl
+    trace_export_url: str = ""  # OTLP/HTTP collector, e.g. http://localhost:4318/v1/traces
+    trace_service_name: str = "podcast-creator"
+    admin_token: str = ""  # X-Admin-Token for admin endpoints (profiling); empty disables them
+    profile_dir: str = "data/profiles"  # collapsed-stack output of the sampling profiler
+    fake_providers: bool = False  # load testing: all LLM/TTS calls go to in-process fakes
+    fake_llm_latency_ms: float = 2000.0  # median per call (log-normal, see fake_latency_sigma)
+    fake_tts_latency_ms: float = 1500.0  # median per 100 characters
+    fake_latency_sigma: float = 0.5  # log-normal spread; 0 = constant latency
+    fake_error_rate: float = 0.0  # share of fake calls failing (LLM: retryable 503)
+    fake_llm_segments: int = 6
+    fake_llm_segment_chars: int = 300
+    fake_tts_bytes_per_char: int = 750  # ~24 kbps MP3 of Mandarin speech
+    fake_seed: int = 0
 
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8", "extra": "ignore"}
 
@@ -5,6 +5,7 @@ from __future__ import annotations
 from cryptography.fernet import Fernet
 
 from app.config import settings
+from app.tracing import span
 
 _fernet: Fernet | None = None
 
@@ -28,4 +29,5 @@ def encrypt_api_key(plaintext: str) -> str:
 
 def decrypt_api_key(ciphertext: str) -> str:
     """Decrypt an API key from base64-encoded ciphertext."""
-    return _get_fernet().decrypt(ciphertext.encode()).decode()
+    with span("crypto.decrypt"):
+        return _get_fernet().decrypt(ciphertext.encode()).decode()
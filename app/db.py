@@ -1,16 +1,24 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
 import os
+import zlib
 from contextlib import asynccontextmanager
 from pathlib import Path
 from uuid import uuid4
 
 import aiosqlite
 
+from app.metrics import instrument_module
+from app.tracing import span
+
 logger = logging.getLogger(__name__)
 
 _db_path: str = "data/podcast.db"
+# Cloud Run sets K_SERVICE; FUSE mount doesn't support WAL's shared memory
+_journal_mode: str = "DELETE" if os.environ.get("K_SERVICE") else "WAL"
 
 _TABLES: list[str] = [
     """
@@ -57,13 +65,20 @@ _TABLES: list[str] = [
     )
     """,
     """
+    CREATE TABLE IF NOT EXISTS segment_bodies (
+        body_hash TEXT PRIMARY KEY,
+        content TEXT NOT NULL,
+        cues TEXT,
+        refcount INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
     CREATE TABLE IF NOT EXISTS script_segments (
         segment_id TEXT PRIMARY KEY,
         script_id TEXT NOT NULL REFERENCES scripts(script_id),
         segment_order INTEGER NOT NULL,
         segment_type TEXT,
-        content TEXT NOT NULL,
-        cues TEXT,
+        body_hash TEXT NOT NULL REFERENCES segment_bodies(body_hash),
         created_at TEXT NOT NULL DEFAULT (datetime('now'))
     )
     """,
@@ -113,6 +128,86 @@ _TABLES: list[str] = [
         PRIMARY KEY (user_id, provider)
     )
     """,
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL REFERENCES users(user_id),
+        project_id TEXT,
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        progress INTEGER NOT NULL DEFAULT 0,
+        message TEXT,
+        payload TEXT DEFAULT '{}',
+        result TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        dedupe_key TEXT,
+        created_at TEXT NOT NULL DEFAULT (datetime('now')),
+        updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+    )
+    """,
+    """CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)""",
+    """
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        cache_key TEXT PRIMARY KEY,
+        provider TEXT NOT NULL,
+        model TEXT NOT NULL,
+        task TEXT NOT NULL,
+        response TEXT NOT NULL,
+        tokens INTEGER NOT NULL DEFAULT 0,
+        latency_ms REAL NOT NULL DEFAULT 0,
+        hits INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT NOT NULL DEFAULT (datetime('now')),
+        last_used_at TEXT NOT NULL DEFAULT (datetime('now')),
+        expires_at TEXT NOT NULL
+    )
+    """,
+    """CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used_at)""",
+    """
+    CREATE TABLE IF NOT EXISTS llm_cache_stats (
+        task TEXT PRIMARY KEY,
+        hits INTEGER NOT NULL DEFAULT 0,
+        misses INTEGER NOT NULL DEFAULT 0,
+        tokens_saved INTEGER NOT NULL DEFAULT 0,
+        latency_saved_ms REAL NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS script_diffs (
+        from_script_id TEXT NOT NULL,
+        to_script_id TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        delta TEXT NOT NULL,
+        created_at TEXT NOT NULL DEFAULT (datetime('now')),
+        PRIMARY KEY (from_script_id, to_script_id)
+    )
+    """,
+    # Full-text search: one document per project topic, title and current
+    # script segment. search_index rowids are search_docs.doc_id.
+    """
+    CREATE TABLE IF NOT EXISTS search_docs (
+        doc_id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        ref_id TEXT NOT NULL,
+        project_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        UNIQUE (kind, ref_id)
+    )
+    """,
+    """CREATE INDEX IF NOT EXISTS idx_search_docs_user ON search_docs(user_id)""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(body, tokenize='trigram')""",
+    """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        user_id TEXT NOT NULL,
+        idempotency_key TEXT NOT NULL,
+        request_hash TEXT NOT NULL,
+        status_code INTEGER,
+        response TEXT,
+        content_type TEXT,
+        created_at TEXT NOT NULL DEFAULT (datetime('now')),
+        PRIMARY KEY (user_id, idempotency_key)
+    )
+    """,
 ]
 
 
@@ -122,42 +217,197 @@ _MIGRATIONS: list[str] = [
     # 三層十段: add label and estimated_duration to script_segments
     """ALTER TABLE script_segments ADD COLUMN label TEXT""",
     """ALTER TABLE script_segments ADD COLUMN estimated_duration TEXT""",
+    # Single-flight jobs: at most one active job per dedupe key
+    """ALTER TABLE jobs ADD COLUMN dedupe_key TEXT""",
+    """CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_dedupe ON jobs(dedupe_key)
+       WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running')""",
+    # Replay streamed (SSE) responses with their original media type
+    """ALTER TABLE idempotency_keys ADD COLUMN content_type TEXT""",
+    # Content-addressed segment bodies, shared between script versions
+    """ALTER TABLE script_segments ADD COLUMN body_hash TEXT REFERENCES segment_bodies(body_hash)""",
+    """CREATE TRIGGER IF NOT EXISTS segment_body_ref AFTER INSERT ON script_segments
+       BEGIN
+           UPDATE segment_bodies SET refcount = refcount + 1 WHERE body_hash = NEW.body_hash;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS segment_body_unref AFTER DELETE ON script_segments
+       BEGIN
+           UPDATE segment_bodies SET refcount = refcount - 1 WHERE body_hash = OLD.body_hash;
+           DELETE FROM segment_bodies WHERE body_hash = OLD.body_hash AND refcount <= 0;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS segment_body_reref AFTER UPDATE OF body_hash ON script_segments
+       WHEN NEW.body_hash IS NOT OLD.body_hash
+       BEGIN
+           UPDATE segment_bodies SET refcount = refcount + 1 WHERE body_hash = NEW.body_hash;
+           UPDATE segment_bodies SET refcount = refcount - 1 WHERE body_hash = OLD.body_hash;
+           DELETE FROM segment_bodies WHERE body_hash = OLD.body_hash AND refcount <= 0;
+       END""",
+    # Keep the search index in sync with projects, titles and current segments
+    """CREATE TRIGGER IF NOT EXISTS search_project_ins AFTER INSERT ON projects
+       BEGIN
+           INSERT INTO search_docs (kind, ref_id, project_id, user_id)
+           VALUES ('project', NEW.project_id, NEW.project_id, NEW.user_id);
+           INSERT INTO search_index (rowid, body)
+           SELECT doc_id, COALESCE(NEW.topic, '') FROM search_docs
+           WHERE kind = 'project' AND ref_id = NEW.project_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS search_project_upd AFTER UPDATE OF topic ON projects
+       BEGIN
+           UPDATE search_index SET body = COALESCE(NEW.topic, '')
+           WHERE rowid = (SELECT doc_id FROM search_docs WHERE kind = 'project' AND ref_id = NEW.project_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS search_project_del AFTER DELETE ON projects
+       BEGIN
+           DELETE FROM search_index
+           WHERE rowid = (SELECT doc_id FROM search_docs WHERE kind = 'project' AND ref_id = OLD.project_id);
+           DELETE FROM search_docs WHERE kind = 'project' AND ref_id = OLD.project_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS search_title_ins AFTER INSERT ON titles
+       BEGIN
+           INSERT INTO search_docs (kind, ref_id, project_id, user_id)
+           SELECT 'title', NEW.title_id, NEW.project_id, user_id FROM projects WHERE project_id = NEW.project_id;
+           INSERT INTO search_index (rowid, body)
+           SELECT doc_id, NEW.title_zh || ' ' || COALESCE(NEW.title_en, '') FROM search_docs
+           WHERE kind = 'title' AND ref_id = NEW.title_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS search_title_upd AFTER UPDATE OF title_zh, title_en ON titles
+       BEGIN
+           UPDATE search_index SET body = NEW.title_zh || ' ' || COALESCE(NEW.title_en, '')
+           WHERE rowid = (SELECT doc_id FROM search_docs WHERE kind = 'title' AND ref_id = NEW.title_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS search_title_del AFTER DELETE ON titles
+       BEGIN
+           DELETE FROM search_index
+           WHERE rowid = (SELECT doc_id FROM search_docs WHERE kind = 'title' AND ref_id = OLD.title_id);
+           DELETE FROM search_docs WHERE kind = 'title' AND ref_id = OLD.title_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS search_segment_ins AFTER INSERT ON script_segments
+       WHEN (SELECT is_current FROM scripts WHERE script_id = NEW.script_id) = 1
+       BEGIN
+           INSERT INTO search_docs (kind, ref_id, project_id, user_id)
+           SELECT 'segment', NEW.segment_id, s.project_id, p.user_id
+           FROM scripts s JOIN projects p ON p.project_id = s.project_id WHERE s.script_id = NEW.script_id;
+           INSERT INTO search_index (rowid, body)
+           SELECT d.doc_id, b.content FROM search_docs d, segment_bodies b
+           WHERE d.kind = 'segment' AND d.ref_id = NEW.segment_id AND b.body_hash = NEW.body_hash;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS search_segment_upd AFTER UPDATE OF body_hash ON script_segments
+       BEGIN
+           UPDATE search_index SET body = (SELECT content FROM segment_bodies WHERE body_hash = NEW.body_hash)
+           WHERE rowid = (SELECT doc_id FROM search_docs WHERE kind = 'segment' AND ref_id = NEW.segment_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS search_segment_del AFTER DELETE ON script_segments
+       BEGIN
+           DELETE FROM search_index
+           WHERE rowid = (SELECT doc_id FROM search_docs WHERE kind = 'segment' AND ref_id = OLD.segment_id);
+           DELETE FROM search_docs WHERE kind = 'segment' AND ref_id = OLD.segment_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS search_script_current AFTER UPDATE OF is_current ON scripts
+       WHEN NEW.is_current = 1 AND OLD.is_current = 0
+       BEGIN
+           INSERT OR IGNORE INTO search_docs (kind, ref_id, project_id, user_id)
+           SELECT 'segment', ss.segment_id, NEW.project_id, p.user_id
+           FROM script_segments ss JOIN projects p ON p.project_id = NEW.project_id
+           WHERE ss.script_id = NEW.script_id;
+           INSERT INTO search_index (rowid, body)
+           SELECT d.doc_id, b.content
+           FROM script_segments ss
+           JOIN search_docs d ON d.kind = 'segment' AND d.ref_id = ss.segment_id
+           JOIN segment_bodies b ON b.body_hash = ss.body_hash
+           WHERE ss.script_id = NEW.script_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS search_script_not_current AFTER UPDATE OF is_current ON scripts
+       WHEN NEW.is_current = 0 AND OLD.is_current = 1
+       BEGIN
+           DELETE FROM search_index WHERE rowid IN
+               (SELECT d.doc_id FROM script_segments ss
+                JOIN search_docs d ON d.kind = 'segment' AND d.ref_id = ss.segment_id
+                WHERE ss.script_id = NEW.script_id);
+           DELETE FROM search_docs WHERE kind = 'segment' AND ref_id IN
+               (SELECT segment_id FROM script_segments WHERE script_id = NEW.script_id);
+       END""",
 ]
 
 
-async def init_db(db_path: str | None = None) -> None:
-    global _db_path
+async def _migrate_segment_bodies(db: aiosqlite.Connection) -> None:
+    """Move inline segment content/cues (pre content-addressing) into segment_bodies."""
+    cursor = await db.execute("PRAGMA table_info(script_segments)")
+    if "content" not in {row[1] for row in await cursor.fetchall()}:
+        return
+    cursor = await db.execute("SELECT segment_id, content, cues FROM script_segments WHERE body_hash IS NULL")
+    rows = await cursor.fetchall()
+    bodies = [(_body_hash(content, cues), content, cues) for _, content, cues in rows]
+    await db.executemany(
+        "INSERT OR IGNORE INTO segment_bodies (body_hash, content, cues) VALUES (?, ?, ?)", bodies
+    )
+    # The segment_body_reref trigger counts the references
+    await db.executemany(
+        "UPDATE script_segments SET body_hash = ? WHERE segment_id = ?",
+        [(body[0], row[0]) for body, row in zip(bodies, rows)],
+    )
+    await db.execute("ALTER TABLE script_segments DROP COLUMN content")
+    await db.execute("ALTER TABLE script_segments DROP COLUMN cues")
+    logger.info("Moved %d segments into %d shared segment bodies", len(rows), len({b[0] for b in bodies}))
+
+
+# Stored in PRAGMA user_version once the schema is in place, so a restart
+# against an up-to-date database skips the DDL (slow on Cloud Run's FUSE mount)
+_SCHEMA_VERSION = zlib.crc32("\n".join(_TABLES + _MIGRATIONS).encode("utf-8")) & 0x7FFFFFFF
+
+
+async def init_db(db_path: str | None = None, journal_mode: str | None = None) -> None:
+    """Create or migrate the schema; ``journal_mode`` overrides the FUSE-safe default (WAL off Cloud Run)."""
+    global _db_path, _journal_mode
     if db_path:
         _db_path = db_path
+    _journal_mode = journal_mode or ("DELETE" if os.environ.get("K_SERVICE") else "WAL")
     parent = Path(_db_path).parent
     if str(parent) not in ("", "."):
         parent.mkdir(parents=True, exist_ok=True)
     async with get_db() as db:
-        for ddl in _TABLES:
-            await db.execute(ddl)
-        for migration in _MIGRATIONS:
-            try:
-                await db.execute(migration)
-            except Exception as e:
-                if "duplicate column" not in str(e).lower() and "already exists" not in str(e).lower():
-                    logger.warning("Migration skipped: %s", e)
+        async with db.execute("PRAGMA user_version") as cursor:
+            schema_version = (await cursor.fetchone())[0]
+        if schema_version != _SCHEMA_VERSION:
+            for ddl in _TABLES:
+                await db.execute(ddl)
+            for migration in _MIGRATIONS:
+                try:
+                    await db.execute(migration)
+                except Exception as e:
+                    if "duplicate column" not in str(e).lower() and "already exists" not in str(e).lower():
+                        logger.warning("Migration skipped: %s", e)
+            await _migrate_segment_bodies(db)
+            await db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        cursor = await db.execute(
+            "SELECT NOT EXISTS (SELECT 1 FROM search_docs) AND EXISTS (SELECT 1 FROM projects)"
+        )
+        if (await cursor.fetchone())[0]:
+            await rebuild_search_index(db)
 
 
 @asynccontextmanager
-async def get_db():
-    db = await aiosqlite.connect(_db_path)
-    db.row_factory = aiosqlite.Row
-    await db.execute("PRAGMA foreign_keys=ON")
-    await db.execute("PRAGMA busy_timeout=5000")
-    await db.execute("PRAGMA synchronous=NORMAL")
-    # Cloud Run sets K_SERVICE; FUSE mount doesn't support WAL's shared memory
-    if os.environ.get("K_SERVICE"):
-        await db.execute("PRAGMA journal_mode=DELETE")
-    else:
-        await db.execute("PRAGMA journal_mode=WAL")
+async def get_db(immediate: bool = False):
+    """Open a connection; the block runs as one transaction committed on exit.
+
+    With ``immediate=True`` the write lock is taken up front (BEGIN IMMEDIATE)
+    so read-check-write sequences can't interleave with another writer.
+    """
+    with span("db.connect"):
+        db = await aiosqlite.connect(_db_path)
+        db.row_factory = aiosqlite.Row
+        await db.execute("PRAGMA foreign_keys=ON")
+        await db.execute("PRAGMA busy_timeout=5000")
+        await db.execute("PRAGMA synchronous=NORMAL")
+        # journal_mode returns a row: close the cursor, or the unfinished statement
+        # pins a read snapshot and the block's first write fails with SQLITE_BUSY
+        # instead of waiting out busy_timeout.
+        async with db.execute(f"PRAGMA journal_mode={_journal_mode}"):
+            pass
+        if immediate:
+            await db.execute("BEGIN IMMEDIATE")
     try:
         yield db
-        await db.commit()
+        with span("db.commit"):
+            await db.commit()
     except Exception:
         await db.rollback()
         raise
@@ -288,34 +538,23 @@ async def update_project(db: aiosqlite.Connection, project_id: str, **fields) ->
 
 async def delete_project_cascade(db: aiosqlite.Connection, project_id: str) -> None:
     """Delete a project and all related data (titles, scripts, segments, feedbacks, voice_samples)."""
-    # Get all script_ids for this project
-    cursor = await db.execute(
-        "SELECT script_id FROM scripts WHERE project_id = ?", (project_id,)
+    scripts = "SELECT script_id FROM scripts WHERE project_id = ?"
+    await db.execute(
+        f"""DELETE FROM voice_samples WHERE segment_id IN
+            (SELECT segment_id FROM script_segments WHERE script_id IN ({scripts}))""",
+        (project_id,),
     )
-    script_ids = [row[0] for row in await cursor.fetchall()]
-
-    for script_id in script_ids:
-        # Get segment_ids for this script
-        seg_cursor = await db.execute(
-            "SELECT segment_id FROM script_segments WHERE script_id = ?", (script_id,)
-        )
-        segment_ids = [row[0] for row in await seg_cursor.fetchall()]
-
-        # Delete voice_samples for each segment
-        for segment_id in segment_ids:
-            await db.execute("DELETE FROM voice_samples WHERE segment_id = ?", (segment_id,))
-
-        # Delete segments
-        await db.execute("DELETE FROM script_segments WHERE script_id = ?", (script_id,))
-        # Delete feedbacks
-        await db.execute("DELETE FROM feedbacks WHERE script_id = ?", (script_id,))
-
+    # Segment bodies no longer referenced are removed by the segment_body_unref trigger
+    await db.execute(f"DELETE FROM script_segments WHERE script_id IN ({scripts})", (project_id,))
+    await db.execute(f"DELETE FROM feedbacks WHERE script_id IN ({scripts})", (project_id,))
+    await db.execute(f"DELETE FROM script_diffs WHERE from_script_id IN ({scripts})", (project_id,))
     # Delete scripts
     await db.execute("DELETE FROM scripts WHERE project_id = ?", (project_id,))
     # Delete titles
     await db.execute("DELETE FROM titles WHERE project_id = ?", (project_id,))
-    # Delete sessions referencing this project
+    # Delete sessions and jobs referencing this project
     await db.execute("DELETE FROM sessions WHERE project_id = ?", (project_id,))
+    await db.execute("DELETE FROM jobs WHERE project_id = ?", (project_id,))
     # Delete the project itself
     await db.execute("DELETE FROM projects WHERE project_id = ?", (project_id,))
 
@@ -361,17 +600,73 @@ async def delete_titles_by_project(db: aiosqlite.Connection, project_id: str) ->
 # -- Script CRUD ------------------------------------------------------------
 
 
-async def create_script(db: aiosqlite.Connection, project_id: str, version: int = 1) -> str:
+async def create_script(
+    db: aiosqlite.Connection, project_id: str, version: int = 1, current: bool = True
+) -> str:
+    """Create a script version; ``current=False`` creates a draft to fill in first."""
     script_id = str(uuid4())
-    # Mark previous versions as not current
+    if current:
+        # Mark previous versions as not current
+        await db.execute(
+            "UPDATE scripts SET is_current = 0 WHERE project_id = ?", (project_id,)
+        )
+    await db.execute(
+        "INSERT INTO scripts (script_id, project_id, version, is_current) VALUES (?, ?, ?, ?)",
+        (script_id, project_id, version, int(current)),
+    )
+    return script_id
+
+
+async def set_current_script(db: aiosqlite.Connection, project_id: str, script_id: str) -> None:
+    """Promote a (draft) script to be the project's only current version."""
     await db.execute(
-        "UPDATE scripts SET is_current = 0 WHERE project_id = ?", (project_id,)
+        "UPDATE scripts SET is_current = (script_id = ?) WHERE project_id = ?",
+        (script_id, project_id),
     )
+
+
+async def delete_script(db: aiosqlite.Connection, script_id: str) -> None:
+    """Delete one script version with its segments, samples and feedback."""
     await db.execute(
-        "INSERT INTO scripts (script_id, project_id, version, is_current) VALUES (?, ?, ?, 1)",
-        (script_id, project_id, version),
+        """DELETE FROM voice_samples WHERE segment_id IN
+           (SELECT segment_id FROM script_segments WHERE script_id = ?)""",
+        (script_id,),
     )
-    return script_id
+    await db.execute("DELETE FROM script_segments WHERE script_id = ?", (script_id,))
+    await db.execute("DELETE FROM feedbacks WHERE script_id = ?", (script_id,))
+    await db.execute(
+        "DELETE FROM script_diffs WHERE from_script_id = ? OR to_script_id = ?", (script_id, script_id)
+    )
+    await db.execute("DELETE FROM scripts WHERE script_id = ?", (script_id,))
+
+
+async def get_script_by_version(db: aiosqlite.Connection, project_id: str, version: int) -> dict | None:
+    """A published version: the current one or an earlier one, never an in-progress draft.
+
+    Drafts are the non-current rows newer than the current version (all of
+    them while a project has no current script yet).
+    """
+    cursor = await db.execute(
+        """SELECT * FROM scripts WHERE project_id = ? AND version = ?
+             AND (is_current = 1 OR version <= (SELECT version FROM scripts
+                                                WHERE project_id = ? AND is_current = 1))
+           ORDER BY is_current DESC, created_at DESC, rowid DESC LIMIT 1""",
+        (project_id, version, project_id),
+    )
+    row = await cursor.fetchone()
+    return dict(row) if row else None
+
+
+async def script_fingerprint(db: aiosqlite.Connection, script_id: str) -> str:
+    """Hash of a version's segment layout and bodies; changes whenever any segment does."""
+    cursor = await db.execute(
+        """SELECT group_concat(segment_id || ':' || body_hash || ':' || IFNULL(segment_type, '')
+                               || ':' || IFNULL(label, ''), ',')
+           FROM (SELECT * FROM script_segments WHERE script_id = ? ORDER BY segment_order)""",
+        (script_id,),
+    )
+    layout = (await cursor.fetchone())[0] or ""
+    return hashlib.sha256(layout.encode()).hexdigest()
 
 
 async def get_current_script(db: aiosqlite.Connection, project_id: str) -> dict | None:
@@ -382,25 +677,52 @@ async def get_current_script(db: aiosqlite.Connection, project_id: str) -> dict
     return dict(row) if row else None
 
 
+def _body_hash(content: str, cues: str | None) -> str:
+    return hashlib.sha256(json.dumps([content, cues], ensure_ascii=False).encode()).hexdigest()
+
+
+async def _put_body(db: aiosqlite.Connection, content: str, cues: str | None) -> str:
+    """Store a segment body (if new) and return its hash.
+
+    A new body starts with refcount 0; the script_segments triggers count
+    references as rows point at it and delete it once none are left.
+    """
+    body_hash = _body_hash(content, cues)
+    await db.execute(
+        "INSERT OR IGNORE INTO segment_bodies (body_hash, content, cues) VALUES (?, ?, ?)",
+        (body_hash, content, cues),
+    )
+    return body_hash
+
+
+async def _drop_unreferenced_body(db: aiosqlite.Connection, body_hash: str) -> None:
+    await db.execute("DELETE FROM segment_bodies WHERE body_hash = ? AND refcount = 0", (body_hash,))
+
+
+_SEGMENT_SELECT = """
+    SELECT ss.segment_id, ss.script_id, ss.segment_order, ss.segment_type, b.content, b.cues,
+           ss.label, ss.estimated_duration, ss.created_at, ss.body_hash
+    FROM script_segments ss JOIN segment_bodies b ON b.body_hash = ss.body_hash
+"""
+
+
 async def create_segments(
-    db: aiosqlite.Connection, script_id: str, segments: list[dict]
+    db: aiosqlite.Connection, script_id: str, segments: list[dict], start_order: int = 0
 ) -> list[str]:
-    import json as _json
-
     segment_ids: list[str] = []
-    for i, seg in enumerate(segments):
+    for i, seg in enumerate(segments, start_order):
         segment_id = str(uuid4())
+        body_hash = await _put_body(db, seg["content"], json.dumps(seg.get("cues", []), ensure_ascii=False))
         await db.execute(
             """INSERT INTO script_segments
-               (segment_id, script_id, segment_order, segment_type, content, cues, label, estimated_duration)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+               (segment_id, script_id, segment_order, segment_type, body_hash, label, estimated_duration)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
             (
                 segment_id,
                 script_id,
                 i,
                 seg.get("segment_type", "main"),
-                seg["content"],
-                _json.dumps(seg.get("cues", []), ensure_ascii=False),
+                body_hash,
                 seg.get("label"),
                 seg.get("estimated_duration"),
             ),
@@ -411,26 +733,130 @@ async def create_segments(
 
 async def get_segments_by_script(db: aiosqlite.Connection, script_id: str) -> list[dict]:
     cursor = await db.execute(
-        "SELECT * FROM script_segments WHERE script_id = ? ORDER BY segment_order",
+        f"{_SEGMENT_SELECT} WHERE ss.script_id = ? ORDER BY ss.segment_order",
         (script_id,),
     )
     return [dict(row) for row in await cursor.fetchall()]
 
 
 async def get_segment(db: aiosqlite.Connection, segment_id: str) -> dict | None:
-    cursor = await db.execute(
-        "SELECT * FROM script_segments WHERE segment_id = ?", (segment_id,)
-    )
+    cursor = await db.execute(f"{_SEGMENT_SELECT} WHERE ss.segment_id = ?", (segment_id,))
     row = await cursor.fetchone()
     return dict(row) if row else None
 
 
+async def copy_segments(
+    db: aiosqlite.Connection,
+    source_script_id: str,
+    target_script_id: str,
+    replacements: dict[int, str] | None = None,
+) -> None:
+    """Copy every segment of one script version into another, in SQL.
+
+    Copies share the source's bodies (copy-on-write), so only the
+    ``replacements`` (segment_order -> new content) store new text.
+    """
+    await db.execute(
+        """INSERT INTO script_segments
+           (segment_id, script_id, segment_order, segment_type, body_hash, label, estimated_duration)
+           SELECT lower(substr(h, 1, 8) || '-' || substr(h, 9, 4) || '-' || substr(h, 13, 4) || '-'
+                        || substr(h, 17, 4) || '-' || substr(h, 21)),
+                  ?, segment_order, segment_type, body_hash, label, estimated_duration
+           FROM (SELECT hex(randomblob(16)) AS h, * FROM script_segments WHERE script_id = ?)""",
+        (target_script_id, source_script_id),
+    )
+    for order, content in (replacements or {}).items():
+        cursor = await db.execute(
+            f"{_SEGMENT_SELECT} WHERE ss.script_id = ? AND ss.segment_order = ?",
+            (target_script_id, order),
+        )
+        row = await cursor.fetchone()
+        if row is None:
+            continue
+        body_hash = await _put_body(db, content, row["cues"])
+        await db.execute(
+            "UPDATE script_segments SET body_hash = ? WHERE segment_id = ?",
+            (body_hash, row["segment_id"]),
+        )
+
+
 async def update_segment(db: aiosqlite.Connection, segment_id: str, content: str) -> None:
     """Update segment content."""
+    segment = await get_segment(db, segment_id)
+    if segment is None:
+        return
+    body_hash = await _put_body(db, content, segment["cues"])
     await db.execute(
-        "UPDATE script_segments SET content = ? WHERE segment_id = ?",
-        (content, segment_id),
+        "UPDATE script_segments SET body_hash = ? WHERE segment_id = ?",
+        (body_hash, segment_id),
+    )
+
+
+async def update_segment_if_unchanged(
+    db: aiosqlite.Connection, segment_id: str, expected_content: str, content: str
+) -> bool:
+    """Update segment content only if it still equals ``expected_content``.
+
+    Returns False when the segment was edited or deleted in the meantime.
+    """
+    segment = await get_segment(db, segment_id)
+    if segment is None or segment["content"] != expected_content:
+        return False
+    body_hash = await _put_body(db, content, segment["cues"])
+    cursor = await db.execute(
+        "UPDATE script_segments SET body_hash = ? WHERE segment_id = ? AND body_hash = ?",
+        (body_hash, segment_id, segment["body_hash"]),
     )
+    if cursor.rowcount == 0:
+        await _drop_unreferenced_body(db, body_hash)
+        return False
+    return True
+
+
+async def segment_storage_stats(db: aiosqlite.Connection) -> dict:
+    """Segment rows vs the distinct bodies they share."""
+    cursor = await db.execute(
+        """SELECT (SELECT COUNT(*) FROM script_segments),
+                  COUNT(*), COALESCE(SUM(length(CAST(content AS BLOB))), 0),
+                  COALESCE(SUM(refcount * length(CAST(content AS BLOB))), 0)
+           FROM segment_bodies"""
+    )
+    segments, bodies, stored_bytes, logical_bytes = await cursor.fetchone()
+    return {
+        "segments": segments,
+        "bodies": bodies,
+        "stored_bytes": stored_bytes,
+        "logical_bytes": logical_bytes,
+    }
+
+
+# -- Voice sample CRUD ------------------------------------------------------
+
+
+async def create_voice_sample(
+    db: aiosqlite.Connection,
+    segment_id: str,
+    expected_content: str,
+    tts_url: str,
+    tts_voice: str,
+    tts_speed: float,
+    tts_pitch: float,
+    tts_provider: str,
+) -> str | None:
+    """Record a TTS sample if the segment still has the synthesized content.
+
+    Returns the new sample_id, or None if the segment changed or disappeared.
+    """
+    sample_id = str(uuid4())
+    cursor = await db.execute(
+        """INSERT INTO voice_samples
+           (sample_id, segment_id, tts_url, tts_voice, tts_speed, tts_pitch, tts_provider)
+           SELECT ?, ss.segment_id, ?, ?, ?, ?, ?
+           FROM script_segments ss JOIN segment_bodies b ON b.body_hash = ss.body_hash
+           WHERE ss.segment_id = ? AND b.content = ?""",
+        (sample_id, tts_url, tts_voice, tts_speed, tts_pitch, tts_provider, segment_id, expected_content),
+    )
+    return sample_id if cursor.rowcount > 0 else None
 
 
 # -- Feedback CRUD ----------------------------------------------------------
@@ -454,6 +880,12 @@ async def create_feedback(
     return feedback_id
 
 
+async def get_feedback(db: aiosqlite.Connection, feedback_id: str) -> dict | None:
+    cursor = await db.execute("SELECT * FROM feedbacks WHERE feedback_id = ?", (feedback_id,))
+    row = await cursor.fetchone()
+    return dict(row) if row else None
+
+
 async def get_feedbacks_by_script(db: aiosqlite.Connection, script_id: str) -> list[dict]:
     cursor = await db.execute(
         "SELECT * FROM feedbacks WHERE script_id = ? ORDER BY created_at", (script_id,)
@@ -533,3 +965,338 @@ async def delete_user_api_key(
         "DELETE FROM user_api_keys WHERE user_id = ? AND provider = ?",
         (user_id, provider),
     )
+
+
+# -- Job CRUD ----------------------------------------------------------------
+
+_JOB_FIELDS = {"status", "progress", "message", "result", "error", "attempts"}
+
+
+async def create_job(
+    db: aiosqlite.Connection,
+    user_id: str,
+    kind: str,
+    project_id: str | None = None,
+    payload: str = "{}",
+    dedupe_key: str | None = None,
+) -> tuple[str, bool]:
+    """Insert a job; returns ``(job_id, created)``.
+
+    If ``dedupe_key`` matches a job that is still queued or running, no row is
+    inserted and that job's id is returned with ``created=False``.
+    """
+    job_id = str(uuid4())
+    cursor = await db.execute(
+        """INSERT OR IGNORE INTO jobs (job_id, user_id, project_id, kind, payload, dedupe_key)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (job_id, user_id, project_id, kind, payload, dedupe_key),
+    )
+    if cursor.rowcount:
+        return job_id, True
+    cursor = await db.execute(
+        "SELECT job_id FROM jobs WHERE dedupe_key = ? AND status IN ('queued', 'running')",
+        (dedupe_key,),
+    )
+    row = await cursor.fetchone()
+    return row["job_id"], False
+
+
+async def get_job(db: aiosqlite.Connection, job_id: str) -> dict | None:
+    cursor = await db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+    row = await cursor.fetchone()
+    return dict(row) if row else None
+
+
+async def update_job(db: aiosqlite.Connection, job_id: str, **fields) -> None:
+    if not fields:
+        return
+    invalid = set(fields) - _JOB_FIELDS
+    if invalid:
+        raise ValueError(f"Invalid job fields: {invalid}")
+    set_clause = ", ".join(f"{k} = ?" for k in fields)
+    values = list(fields.values())
+    values.append(job_id)
+    await db.execute(
+        f"UPDATE jobs SET {set_clause}, updated_at = datetime('now') WHERE job_id = ?",
+        values,
+    )
+
+
+async def get_unfinished_jobs(db: aiosqlite.Connection) -> list[dict]:
+    """Jobs left queued or running, oldest first (used to resume after restart)."""
+    cursor = await db.execute(
+        "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+    )
+    return [dict(row) for row in await cursor.fetchall()]
+
+
+# -- Idempotency keys --------------------------------------------------------
+
+
+async def claim_idempotency_key(
+    db: aiosqlite.Connection,
+    user_id: str,
+    key: str,
+    request_hash: str,
+    ttl_seconds: int,
+) -> dict | None:
+    """Reserve ``key`` for a request. Returns None if newly claimed, else the existing row."""
+    await db.execute(
+        "DELETE FROM idempotency_keys WHERE created_at <= datetime('now', ?)",
+        (f"-{ttl_seconds} seconds",),
+    )
+    cursor = await db.execute(
+        """INSERT OR IGNORE INTO idempotency_keys (user_id, idempotency_key, request_hash)
+           VALUES (?, ?, ?)""",
+        (user_id, key, request_hash),
+    )
+    if cursor.rowcount:
+        return None
+    cursor = await db.execute(
+        "SELECT * FROM idempotency_keys WHERE user_id = ? AND idempotency_key = ?",
+        (user_id, key),
+    )
+    return dict(await cursor.fetchone())
+
+
+async def save_idempotent_response(
+    db: aiosqlite.Connection,
+    user_id: str,
+    key: str,
+    status_code: int,
+    response: str,
+    content_type: str | None = None,
+) -> None:
+    await db.execute(
+        """UPDATE idempotency_keys SET status_code = ?, response = ?, content_type = ?
+           WHERE user_id = ? AND idempotency_key = ?""",
+        (status_code, response, content_type, user_id, key),
+    )
+
+
+async def release_idempotency_key(db: aiosqlite.Connection, user_id: str, key: str) -> None:
+    """Forget a claimed key so the client can retry (used when the request failed)."""
+    await db.execute(
+        "DELETE FROM idempotency_keys WHERE user_id = ? AND idempotency_key = ?",
+        (user_id, key),
+    )
+
+
+# -- LLM response cache ------------------------------------------------------
+
+
+async def get_llm_cache_entry(db: aiosqlite.Connection, cache_key: str) -> dict | None:
+    """Return an unexpired cache entry, counting the hit."""
+    cursor = await db.execute(
+        "SELECT * FROM llm_cache WHERE cache_key = ? AND expires_at > datetime('now')",
+        (cache_key,),
+    )
+    row = await cursor.fetchone()
+    if not row:
+        return None
+    await db.execute(
+        "UPDATE llm_cache SET hits = hits + 1, last_used_at = datetime('now') WHERE cache_key = ?",
+        (cache_key,),
+    )
+    return dict(row)
+
+
+async def put_llm_cache_entry(
+    db: aiosqlite.Connection,
+    cache_key: str,
+    provider: str,
+    model: str,
+    task: str,
+    response: str,
+    tokens: int,
+    latency_ms: float,
+    ttl_seconds: int,
+) -> None:
+    await db.execute(
+        """INSERT INTO llm_cache
+           (cache_key, provider, model, task, response, tokens, latency_ms, expires_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now', ?))
+           ON CONFLICT(cache_key) DO UPDATE SET
+               provider = excluded.provider,
+               model = excluded.model,
+               response = excluded.response,
+               tokens = excluded.tokens,
+               latency_ms = excluded.latency_ms,
+               created_at = datetime('now'),
+               last_used_at = datetime('now'),
+               expires_at = excluded.expires_at""",
+        (cache_key, provider, model, task, response, tokens, latency_ms, f"+{ttl_seconds} seconds"),
+    )
+
+
+async def evict_llm_cache(db: aiosqlite.Connection, max_entries: int) -> None:
+    """Drop expired entries, then least recently used ones beyond ``max_entries``."""
+    await db.execute("DELETE FROM llm_cache WHERE expires_at <= datetime('now')")
+    await db.execute(
+        """DELETE FROM llm_cache WHERE cache_key IN (
+               SELECT cache_key FROM llm_cache
+               ORDER BY last_used_at DESC, created_at DESC
+               LIMIT -1 OFFSET ?
+           )""",
+        (max_entries,),
+    )
+
+
+async def record_llm_cache_lookup(
+    db: aiosqlite.Connection,
+    task: str,
+    hit: bool,
+    tokens_saved: int = 0,
+    latency_saved_ms: float = 0.0,
+) -> None:
+    await db.execute(
+        """INSERT INTO llm_cache_stats (task, hits, misses, tokens_saved, latency_saved_ms)
+           VALUES (?, ?, ?, ?, ?)
+           ON CONFLICT(task) DO UPDATE SET
+               hits = hits + excluded.hits,
+               misses = misses + excluded.misses,
+               tokens_saved = tokens_saved + excluded.tokens_saved,
+               latency_saved_ms = latency_saved_ms + excluded.latency_saved_ms""",
+        (task, int(hit), int(not hit), tokens_saved, latency_saved_ms),
+    )
+
+
+async def get_llm_cache_stats(db: aiosqlite.Connection) -> list[dict]:
+    cursor = await db.execute(
+        """SELECT s.*, (SELECT COUNT(*) FROM llm_cache c WHERE c.task = s.task) AS entries
+           FROM llm_cache_stats s ORDER BY s.task"""
+    )
+    return [dict(row) for row in await cursor.fetchall()]
+
+
+# -- Script diffs ------------------------------------------------------------
+
+
+async def get_script_diff(
+    db: aiosqlite.Connection, from_script_id: str, to_script_id: str, fingerprint: str
+) -> list[dict] | None:
+    """Cached delta between two versions, if neither has changed since it was computed."""
+    cursor = await db.execute(
+        "SELECT delta FROM script_diffs WHERE from_script_id = ? AND to_script_id = ? AND fingerprint = ?",
+        (from_script_id, to_script_id, fingerprint),
+    )
+    row = await cursor.fetchone()
+    return json.loads(row[0]) if row else None
+
+
+async def save_script_diff(
+    db: aiosqlite.Connection, from_script_id: str, to_script_id: str, fingerprint: str, delta: list[dict]
+) -> None:
+    await db.execute(
+        """INSERT OR REPLACE INTO script_diffs (from_script_id, to_script_id, fingerprint, delta)
+           VALUES (?, ?, ?, ?)""",
+        (from_script_id, to_script_id, fingerprint, json.dumps(delta, ensure_ascii=False)),
+    )
+
+
+# -- Search ------------------------------------------------------------------
+
+
+async def rebuild_search_index(db: aiosqlite.Connection) -> None:
+    """Re-index every project, title and current segment (triggers keep it in sync after)."""
+    await db.execute("DELETE FROM search_index")
+    await db.execute("DELETE FROM search_docs")
+    await db.execute(
+        """INSERT INTO search_docs (kind, ref_id, project_id, user_id)
+           SELECT 'project', project_id, project_id, user_id FROM projects
+           UNION ALL
+           SELECT 'title', t.title_id, t.project_id, p.user_id
+           FROM titles t JOIN projects p ON p.project_id = t.project_id
+           UNION ALL
+           SELECT 'segment', ss.segment_id, s.project_id, p.user_id
+           FROM script_segments ss
+           JOIN scripts s ON s.script_id = ss.script_id AND s.is_current = 1
+           JOIN projects p ON p.project_id = s.project_id"""
+    )
+    await db.execute(
+        """INSERT INTO search_index (rowid, body)
+           SELECT d.doc_id, COALESCE(p.topic, '') FROM search_docs d
+           JOIN projects p ON d.kind = 'project' AND p.project_id = d.ref_id
+           UNION ALL
+           SELECT d.doc_id, t.title_zh || ' ' || COALESCE(t.title_en, '') FROM search_docs d
+           JOIN titles t ON d.kind = 'title' AND t.title_id = d.ref_id
+           UNION ALL
+           SELECT d.doc_id, b.content FROM search_docs d
+           JOIN script_segments ss ON d.kind = 'segment' AND ss.segment_id = d.ref_id
+           JOIN segment_bodies b ON b.body_hash = ss.body_hash"""
+    )
+    logger.info("Search index rebuilt")
+
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+async def search_documents(
+    db: aiosqlite.Connection,
+    user_id: str,
+    terms: list[str],
+    kind: str | None = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> tuple[int, list[dict]]:
+    """Find the user's documents containing every term; returns (total, page).
+
+    Terms of three or more characters go through the trigram index and are
+    ranked by bm25. Trigrams can't match one- or two-character terms (common
+    for Chinese words), so those are applied as LIKE filters; a query made
+    only of short terms scans the user's documents, newest first.
+    """
+    long_terms = [t for t in terms if len(t) >= 3]
+    short_terms = [t for t in terms if len(t) < 3]
+
+    where = ["d.user_id = ?"]
+    params: list = [user_id]
+    if kind:
+        where.append("d.kind = ?")
+        params.append(kind)
+    if long_terms:
+        where.append("search_index MATCH ?")
+        params.append(" ".join(_fts_phrase(t) for t in long_terms))
+        # CROSS JOIN pins the FTS match as the outer loop; rank (bm25) is then
+        # only computed for the user's rows, not every match in the catalogue
+        source = "search_index CROSS JOIN search_docs d ON d.doc_id = search_index.rowid"
+        score = "search_index.rank"
+    else:
+        source = "search_docs d JOIN search_index ON search_index.rowid = d.doc_id"
+        score = "NULL"
+    # LIKE filters run on the user's hits only: MATERIALIZED stops SQLite from
+    # pushing them into the FTS scan, where they'd read every match's body
+    filters = " AND ".join(["body LIKE ? ESCAPE '\\'"] * len(short_terms)) or "1"
+    hits = f"""SELECT d.doc_id, d.kind, d.ref_id, d.project_id, search_index.body, {score} AS score
+               FROM {source} WHERE {' AND '.join(where)}"""
+
+    cursor = await db.execute(
+        f"""WITH hits AS MATERIALIZED ({hits})
+            SELECT h.kind, h.ref_id, h.project_id, p.topic, h.body, h.score, COUNT(*) OVER () AS total
+            FROM hits h JOIN projects p ON p.project_id = h.project_id
+            WHERE {filters} ORDER BY h.score, h.doc_id DESC LIMIT ? OFFSET ?""",
+        [*params, *map(_like_pattern, short_terms), limit, offset],
+    )
+    rows = [dict(row) for row in await cursor.fetchall()]
+    if rows:
+        total = rows[0]["total"]
+        for row in rows:
+            del row["total"]
+        return total, rows
+    if offset == 0:
+        return 0, []
+    cursor = await db.execute(
+        f"WITH hits AS MATERIALIZED ({hits}) SELECT COUNT(*) FROM hits WHERE {filters}",
+        [*params, *map(_like_pattern, short_terms)],
+    )
+    return (await cursor.fetchone())[0], []
+
+
+# Time every public function above for /metrics (db_call_duration_seconds)
+instrument_module(globals(), __name__)
@@ -0,0 +1,181 @@
+"""Write-behind replica: the live database on local disk, snapshots on the durable mount.
+
+On Cloud Run the database file lives on a Cloud Storage FUSE mount, where WAL
+can't work and every DELETE-journal commit creates, syncs and deletes
+objects in GCS. With ``database_replica_path`` set (e.g. ``/tmp/podcast.db``):
+
+- at startup the latest snapshot, ``database_url`` itself, is restored into
+  the replica with the SQLite backup API, unless the replica is already newer
+  (a restart that kept local disk);
+- requests run against the replica in WAL mode at local-disk latency;
+- every ``database_snapshot_seconds``, if the replica changed, a full copy
+  of it is made: one backup step into a local staging file (a single read
+  transaction, which in WAL mode doesn't block writers and can't be
+  restarted by them), then the whole file is copied to the mount, synced and
+  renamed over the snapshot. The mount only ever sees whole-file writes, and
+  a crash mid-copy leaves the previous snapshot intact. Nothing is
+  incremental: each snapshot costs a copy of the whole database;
+- a final snapshot is taken at shutdown.
+
+At most ``database_snapshot_seconds`` (plus one snapshot's duration) of
+writes are lost if the instance dies without a clean shutdown.
+``db_snapshot_age_seconds`` shows how far behind the mount currently is.
+Only one instance may run in this mode at a time (``--max-instances=1``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+
+from app.config import settings
+from app.metrics import DB_SNAPSHOT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_snapshotter: Snapshotter | None = None
+
+
+def _remove_database(path: Path) -> None:
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+
+def _backup(source: Path, target: Path) -> None:
+    """Consistent copy of ``source`` into a fresh ``target`` (rollback journal, so it opens anywhere)."""
+    _remove_database(target)
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        # One step: a stepwise backup starts over whenever another connection
+        # writes between steps, so under steady writes it might never finish
+        src.backup(dst, pages=-1)
+        dst.execute("PRAGMA journal_mode=DELETE").fetchall()
+    finally:
+        dst.close()
+        src.close()
+
+
+def restore(snapshot: Path, replica: Path) -> bool:
+    """Restore ``snapshot`` into ``replica`` unless the replica is at least as new."""
+    if not snapshot.exists():
+        logger.info("No database snapshot at %s; starting with the local replica", snapshot)
+        return False
+    replica_files = [path for path in (replica, Path(f"{replica}-wal")) if path.exists()]
+    if replica_files and max(path.stat().st_mtime for path in replica_files) >= snapshot.stat().st_mtime:
+        logger.info("Local replica %s is newer than snapshot %s; keeping it", replica, snapshot)
+        return False
+    replica.parent.mkdir(parents=True, exist_ok=True)
+    staging = replica.with_name(replica.name + ".restore")
+    start = time.perf_counter()
+    _backup(snapshot, staging)
+    _remove_database(replica)
+    os.replace(staging, replica)
+    logger.info("Restored %s from snapshot %s in %.2fs", replica, snapshot, time.perf_counter() - start)
+    return True
+
+
+class Snapshotter:
+    """Periodically copies the whole replica over the durable snapshot."""
+
+    def __init__(self, replica: Path, snapshot: Path, interval: float):
+        self.replica = replica
+        self.snapshot = snapshot
+        self.interval = interval
+        self.last_snapshot = time.monotonic()
+        self._last_state: tuple | None = None  # the first check always snapshots (e.g. after a migration)
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    def _state(self) -> tuple:
+        """Sizes and mtimes of the replica's files: unchanged means nothing to snapshot."""
+        state = []
+        for suffix in ("", "-wal"):
+            try:
+                stat = os.stat(f"{self.replica}{suffix}")
+                state.append((stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+
+    def _snapshot(self) -> None:
+        staging = self.replica.with_name(self.replica.name + ".snapshot")
+        _backup(self.replica, staging)
+        self.snapshot.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.snapshot.with_name(self.snapshot.name + ".partial")
+        shutil.copyfile(staging, partial)
+        with open(partial, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(partial, self.snapshot)
+        staging.unlink(missing_ok=True)
+
+    async def snapshot_now(self, force: bool = False) -> bool:
+        """Snapshot if the replica changed since the last one; True if one was written."""
+        async with self._lock:
+            state = self._state()
+            if not force and state == self._last_state:
+                self.last_snapshot = time.monotonic()  # the mount is as current as the replica
+                return False
+            start = time.perf_counter()
+            await asyncio.to_thread(self._snapshot)
+            DB_SNAPSHOT_SECONDS.observe(time.perf_counter() - start)
+            self._last_state = state
+            self.last_snapshot = time.monotonic()
+            return True
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.snapshot_now()
+            except Exception as e:
+                logger.warning("Database snapshot to %s failed: %s", self.snapshot, e)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.snapshot_now()
+
+    def age(self) -> float:
+        return time.monotonic() - self.last_snapshot
+
+
+def open_replica() -> str:
+    """Restore the replica from the snapshot; the path the app should use as its database."""
+    restore(Path(settings.database_url), Path(settings.database_replica_path))
+    return settings.database_replica_path
+
+
+def start_snapshots() -> None:
+    global _snapshotter
+    _snapshotter = Snapshotter(
+        Path(settings.database_replica_path),
+        Path(settings.database_url),
+        settings.database_snapshot_seconds,
+    )
+    _snapshotter.start()
+
+
+async def stop_snapshots() -> None:
+    """Stop the periodic task and take the final snapshot."""
+    global _snapshotter
+    if _snapshotter is not None:
+        await _snapshotter.stop()
+        _snapshotter = None
+
+
+def snapshot_age() -> float | None:
+    return _snapshotter.age() if _snapshotter is not None else None
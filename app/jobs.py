@@ -0,0 +1,262 @@
+"""Persistent background jobs for long-running LLM work.
+
+Each job is a row in the ``jobs`` table. An in-process worker pool runs the
+handler registered for the job's ``kind``; progress and results are written
+back to the row and broadcast to in-process listeners (used for SSE).
+Jobs left ``queued`` or ``running`` when the process stops are picked up
+again on the next start.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+from app.db import create_job, get_db, get_job, get_unfinished_jobs, update_job
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"succeeded", "failed"}
+MAX_ATTEMPTS = 3
+
+
+class JobError(Exception):
+    """Raised by a job handler to fail the job with a user-facing message."""
+
+
+class JobContext:
+    """Handed to job handlers: job fields plus progress/event reporting."""
+
+    def __init__(self, job: dict):
+        self.job_id: str = job["job_id"]
+        self.user_id: str = job["user_id"]
+        self.project_id: str | None = job["project_id"]
+        self.kind: str = job["kind"]
+        self.payload: dict = json.loads(job["payload"] or "{}")
+
+    async def progress(self, progress: int, message: str = "") -> None:
+        """Persist progress (0-100) and notify listeners."""
+        async with get_db() as db:
+            await update_job(db, self.job_id, progress=progress, message=message)
+        publish(self.job_id, "progress", {"progress": progress, "message": message})
+
+    def emit(self, event: str, data: dict) -> None:
+        """Push a transient event to listeners without touching the DB."""
+        publish(self.job_id, event, data)
+
+
+JobHandler = Callable[[JobContext], Awaitable[dict]]
+
+_handlers: dict[str, JobHandler] = {}
+_listeners: dict[str, set[asyncio.Queue]] = {}
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register the coroutine that runs jobs of ``kind``."""
+
+    def decorator(fn: JobHandler) -> JobHandler:
+        _handlers[kind] = fn
+        return fn
+
+    return decorator
+
+
+def job_to_dict(job: dict) -> dict:
+    """Public representation of a job row (payload/result decoded)."""
+    return {
+        "job_id": job["job_id"],
+        "kind": job["kind"],
+        "project_id": job["project_id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "message": job["message"],
+        "result": json.loads(job["result"]) if job["result"] else None,
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+# -- Event fan-out ------------------------------------------------------------
+
+
+def publish(job_id: str, event: str, data: dict) -> None:
+    for queue in _listeners.get(job_id, ()):
+        queue.put_nowait((event, data))
+
+
+async def subscribe(job_id: str, keepalive: float = 15.0) -> AsyncIterator[tuple[str, dict]]:
+    """Yield ``(event, data)`` for a job until it reaches a terminal status.
+
+    Starts with a ``status`` snapshot. While idle, the row is re-read every
+    ``keepalive`` seconds so a job finished by another process still ends the
+    stream; a ``ping`` event is yielded on each idle tick.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    _listeners.setdefault(job_id, set()).add(queue)
+    try:
+        async with get_db() as db:
+            job = await get_job(db, job_id)
+        if not job:
+            return
+        yield "status", job_to_dict(job)
+        if job["status"] in TERMINAL_STATUSES:
+            return
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                async with get_db() as db:
+                    job = await get_job(db, job_id)
+                if not job or job["status"] in TERMINAL_STATUSES:
+                    if job:
+                        yield "status", job_to_dict(job)
+                    return
+                yield "ping", {}
+                continue
+            yield event, data
+            if event == "status" and data.get("status") in TERMINAL_STATUSES:
+                return
+    finally:
+        listeners = _listeners.get(job_id)
+        if listeners is not None:
+            listeners.discard(queue)
+            if not listeners:
+                _listeners.pop(job_id, None)
+
+
+# -- Worker pool -------------------------------------------------------------
+
+
+class WorkerPool:
+    def __init__(self, size: int = 2):
+        self._size = size
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Requeue unfinished jobs from a previous run, then spawn workers."""
+        async with get_db() as db:
+            pending = await get_unfinished_jobs(db)
+            for job in pending:
+                if job["status"] == "running" and job["attempts"] >= MAX_ATTEMPTS:
+                    await update_job(db, job["job_id"], status="failed", error="Interrupted too many times")
+                    continue
+                if job["status"] == "running":
+                    await update_job(db, job["job_id"], status="queued")
+                self._queue.put_nowait(job["job_id"])
+        if pending:
+            logger.info("Resuming %d unfinished job(s)", len(pending))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._size)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job_id: str) -> None:
+        self._queue.put_nowait(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception("Job bookkeeping failed: job=%s", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        async with get_db() as db:
+            job = await get_job(db, job_id)
+            if not job or job["status"] != "queued":
+                return
+            await update_job(db, job_id, status="running", attempts=job["attempts"] + 1)
+            job = await get_job(db, job_id)
+        publish(job_id, "status", job_to_dict(job))
+
+        handler = _handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise JobError(f"Unknown job kind: {job['kind']}")
+            result = await handler(JobContext(job))
+        except asyncio.CancelledError:
+            # Shutdown mid-job: leave it running so the next start requeues it
+            raise
+        except JobError as e:
+            await self._finish(job_id, status="failed", error=str(e))
+        except Exception:
+            logger.exception("Job failed: job=%s kind=%s", job_id, job["kind"])
+            await self._finish(job_id, status="failed", error="Internal error")
+        else:
+            await self._finish(
+                job_id,
+                status="succeeded",
+                progress=100,
+                result=json.dumps(result, ensure_ascii=False),
+            )
+
+    async def _finish(self, job_id: str, **fields) -> None:
+        async with get_db() as db:
+            await update_job(db, job_id, **fields)
+            job = await get_job(db, job_id)
+        if job:
+            publish(job_id, "status", job_to_dict(job))
+
+
+_pool: WorkerPool | None = None
+
+
+async def start_workers(size: int) -> None:
+    global _pool
+    _pool = WorkerPool(size)
+    await _pool.start()
+
+
+async def stop_workers() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
+
+
+def queued_jobs() -> int:
+    """Jobs submitted to this process's pool and not yet picked up by a worker."""
+    return _pool._queue.qsize() if _pool is not None else 0
+
+
+async def enqueue_job(
+    kind: str,
+    user_id: str,
+    project_id: str | None = None,
+    payload: dict | None = None,
+    single_flight: bool = False,
+) -> dict:
+    """Persist a new job and hand it to the worker pool.
+
+    With ``single_flight=True`` an identical request (same kind, project and
+    payload) that is still queued or running is returned instead, so
+    double-submits share one provider call and one write.
+    """
+    payload_json = json.dumps(payload or {}, ensure_ascii=False, sort_keys=True)
+    dedupe_key = f"{kind}:{project_id}:{payload_json}" if single_flight else None
+    async with get_db() as db:
+        job_id, created = await create_job(
+            db,
+            user_id=user_id,
+            kind=kind,
+            project_id=project_id,
+            payload=payload_json,
+            dedupe_key=dedupe_key,
+        )
+        job = await get_job(db, job_id)
+    if not created:
+        logger.info("Coalesced %s request into active job %s", kind, job_id)
+    # Without a running pool the job stays queued until the next start()
+    elif _pool is not None:
+        _pool.submit(job_id)
+    return job_to_dict(job)
@@ -1,12 +1,101 @@
+import json
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# HTTP statuses worth retrying; 429/503/529 also mean the provider is overloaded
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504, 529}
+OVERLOAD_STATUS = {429, 503, 529}
 
 
 class LLMError(Exception):
-    """Base exception for LLM provider errors."""
+    """Base exception for LLM provider errors.
+
+    ``status_code`` and ``retry_after`` carry the provider's HTTP status and
+    Retry-After hint when known; ``retryable`` marks transient failures.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        status_code: int | None = None,
+        retry_after: float | None = None,
+        retryable: bool | None = None,
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.retryable = status_code in RETRYABLE_STATUS if retryable is None else retryable
+
+    @property
+    def overloaded(self) -> bool:
+        return self.status_code in OVERLOAD_STATUS
+
+
+def api_error(message: str, exc: Exception) -> LLMError:
+    """Wrap an SDK exception as LLMError, keeping its HTTP status and Retry-After."""
+    status = getattr(exc, "status_code", None)
+    if not isinstance(status, int):
+        status = getattr(exc, "code", None)
+    if not isinstance(status, int):
+        status = None
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    retry_after = parse_retry_after(headers.get("retry-after"))
+    # Connection resets and timeouts have no status but are transient
+    transport = status is None and (
+        isinstance(exc, (TimeoutError, ConnectionError))
+        or any(word in type(exc).__name__ for word in ("Timeout", "Connection"))
+    )
+    return LLMError(
+        f"{message}: {exc}",
+        status_code=status,
+        retry_after=retry_after,
+        retryable=True if transport else None,
+    )
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def split_static_prefix(text: str) -> tuple[str, str]:
+    """Split a rendered prompt into (cacheable static prefix, variable rest).
+
+    Plain strings have no known prefix and come back as ``("", text)``.
+    """
+    prefix = getattr(text, "static_prefix", "")
+    if prefix and text.startswith(prefix):
+        return prefix, text[len(prefix) :]
+    return "", str(text)
 
 
 class LLMProvider(ABC):
+    name: str = ""
+    model: str = ""
+
     @abstractmethod
     async def complete(self, system_prompt: str, user_message: str, task: str = "") -> dict:
         """Send a prompt and return parsed JSON dict."""
         ...
+
+    async def stream(self, system_prompt: str, user_message: str, task: str = "") -> AsyncIterator[str]:
+        """Send a prompt and yield the raw JSON response text as it arrives.
+
+        Providers without native streaming yield the whole response at once.
+        """
+        result = await self.complete(system_prompt, user_message, task=task)
+        yield json.dumps(result, ensure_ascii=False)
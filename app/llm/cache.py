@@ -0,0 +1,154 @@
+"""Persistent LLM response cache keyed on prompt hashes."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from collections.abc import AsyncIterator
+
+from app.db import (
+    evict_llm_cache,
+    get_db,
+    get_llm_cache_entry,
+    put_llm_cache_entry,
+    record_llm_cache_lookup,
+)
+from app.llm.base import LLMProvider
+from app.llm.json_stream import parse_json_text
+from app.llm.usage import track_usage
+from app.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+CACHEABLE_TASKS = {"title_generation", "script_generation"}
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(provider: str, model: str, system_prompt: str, user_message: str, task: str) -> str:
+    parts = [provider, model, _sha256(system_prompt), _sha256(user_message), task]
+    return _sha256("\0".join(parts))
+
+
+class CachedLLMProvider(LLMProvider):
+    """Serve repeated prompts for cacheable tasks from the ``llm_cache`` table.
+
+    Pass ``bypass_cache=True`` for an explicit "regenerate": the provider is
+    called and the fresh response replaces the cached one.
+
+    Entries are keyed on the requested provider, the only one known before
+    the call; the row's ``provider``/``model`` record the one that answered,
+    which differs when a hedged secondary won.
+    """
+
+    def __init__(
+        self,
+        inner: LLMProvider,
+        provider_name: str,
+        ttl_seconds: int,
+        max_entries: int,
+        tasks: set[str] = CACHEABLE_TASKS,
+    ):
+        self._inner = inner
+        self.name = provider_name
+        self.model = inner.model
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._tasks = tasks
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_message: str,
+        task: str = "",
+        *,
+        bypass_cache: bool = False,
+    ) -> dict:
+        if task not in self._tasks:
+            return await self._inner.complete(system_prompt, user_message, task=task)
+
+        key = cache_key(self.name, self.model, system_prompt, user_message, task)
+        if not bypass_cache:
+            cached = await self._lookup(key, task)
+            if cached is not None:
+                return json.loads(cached)
+
+        start = time.monotonic()
+        with track_usage() as usage:
+            result = await self._inner.complete(system_prompt, user_message, task=task)
+        await self._store(key, task, json.dumps(result, ensure_ascii=False), usage, start)
+        return result
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_message: str,
+        task: str = "",
+        *,
+        bypass_cache: bool = False,
+    ) -> AsyncIterator[str]:
+        if task not in self._tasks:
+            async for chunk in self._inner.stream(system_prompt, user_message, task=task):
+                yield chunk
+            return
+
+        key = cache_key(self.name, self.model, system_prompt, user_message, task)
+        if not bypass_cache:
+            cached = await self._lookup(key, task)
+            if cached is not None:
+                yield cached
+                return
+
+        start = time.monotonic()
+        parts: list[str] = []
+        with track_usage() as usage:
+            async for chunk in self._inner.stream(system_prompt, user_message, task=task):
+                parts.append(chunk)
+                yield chunk
+        text = "".join(parts)
+        try:
+            response = json.dumps(parse_json_text(text), ensure_ascii=False)
+        except json.JSONDecodeError:
+            return  # the caller reports the invalid response; don't cache it
+        await self._store(key, task, response, usage, start)
+
+    async def _lookup(self, key: str, task: str) -> str | None:
+        async with get_db() as db:
+            entry = await get_llm_cache_entry(db, key)
+            if entry:
+                await record_llm_cache_lookup(
+                    db, task, hit=True, tokens_saved=entry["tokens"], latency_saved_ms=entry["latency_ms"]
+                )
+            else:
+                await record_llm_cache_lookup(db, task, hit=False)
+        CACHE_REQUESTS.inc("llm", "hit" if entry else "miss")
+        if entry:
+            logger.info(
+                "LLM cache hit: provider=%s task=%s saved_tokens=%d saved_ms=%.0f",
+                entry["provider"],
+                task,
+                entry["tokens"],
+                entry["latency_ms"],
+            )
+            return entry["response"]
+        return None
+
+    async def _store(self, key: str, task: str, response: str, usage: dict, start: float) -> None:
+        latency_ms = (time.monotonic() - start) * 1000
+        async with get_db() as db:
+            await put_llm_cache_entry(
+                db,
+                key,
+                provider=usage["provider"] or self.name,
+                model=usage["model"] or self.model,
+                task=task,
+                response=response,
+                tokens=usage["input_tokens"] + usage["output_tokens"],
+                latency_ms=latency_ms,
+                ttl_seconds=self._ttl,
+            )
+            await evict_llm_cache(db, self._max_entries)
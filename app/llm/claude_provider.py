@@ -2,25 +2,52 @@ from __future__ import annotations
 
 import json
 import re
+from collections.abc import AsyncIterator
 
 from anthropic import AsyncAnthropic
 
-from app.llm.base import LLMError, LLMProvider
+from app.llm.base import LLMError, LLMProvider, api_error, split_static_prefix
+from app.llm.usage import record_usage
+
+_EPHEMERAL = {"type": "ephemeral"}
 
 
 class ClaudeProvider(LLMProvider):
-    def __init__(self, api_key: str, model: str = "claude-sonnet-4-6"):
-        self._client = AsyncAnthropic(api_key=api_key)
+    name = "claude"
+
+    def __init__(self, api_key: str, model: str = "claude-sonnet-4-6", base_url: str | None = None):
+        # Retries are handled by the shared resilience layer, not the SDK
+        self._client = AsyncAnthropic(api_key=api_key, base_url=base_url, max_retries=0)
         self._model = model
 
+    @property
+    def model(self) -> str:
+        return self._model
+
+    def _request(self, system_prompt: str, user_message: str) -> dict:
+        """Message arguments with cache breakpoints after the static prompt parts.
+
+        The system prompt and the template's static prefix are identical across
+        calls, so they are marked cacheable; the variable tail is sent after them.
+        """
+        prefix, rest = split_static_prefix(user_message)
+        if prefix:
+            content = [{"type": "text", "text": prefix, "cache_control": _EPHEMERAL}]
+            if rest:
+                content.append({"type": "text", "text": rest})
+        else:
+            content = str(user_message)
+        return {
+            "model": self._model,
+            "max_tokens": 4096,
+            "system": [{"type": "text", "text": str(system_prompt), "cache_control": _EPHEMERAL}],
+            "messages": [{"role": "user", "content": content}],
+        }
+
     async def complete(self, system_prompt: str, user_message: str, task: str = "") -> dict:
         try:
-            response = await self._client.messages.create(
-                model=self._model,
-                max_tokens=4096,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_message}],
-            )
+            response = await self._client.messages.create(**self._request(system_prompt, user_message))
+            _record_usage(self._model, task, response.usage)
             text = response.content[0].text
             return _parse_json(text)
         except json.JSONDecodeError as e:
@@ -28,7 +55,36 @@ class ClaudeProvider(LLMProvider):
         except LLMError:
             raise
         except Exception as e:
-            raise LLMError(f"Claude API error: {e}") from e
+            raise api_error("Claude API error", e) from e
+
+    async def stream(self, system_prompt: str, user_message: str, task: str = "") -> AsyncIterator[str]:
+        try:
+            async with self._client.messages.stream(**self._request(system_prompt, user_message)) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                message = await stream.get_final_message()
+            _record_usage(self._model, task, message.usage)
+        except Exception as e:
+            raise api_error("Claude API error", e) from e
+
+
+def _record_usage(model: str, task: str, usage) -> None:
+    # input_tokens excludes tokens read from or written to the prompt cache
+    cache_read = _tokens(usage, "cache_read_input_tokens")
+    cache_write = _tokens(usage, "cache_creation_input_tokens")
+    record_usage(
+        "claude",
+        model,
+        task,
+        _tokens(usage, "input_tokens") + cache_read + cache_write,
+        getattr(usage, "output_tokens", None),
+        cache_read,
+    )
+
+
+def _tokens(usage, field: str) -> int:
+    value = getattr(usage, field, None)
+    return value if isinstance(value, int) else 0
 
 
 def _parse_json(text: str) -> dict:
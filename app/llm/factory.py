@@ -12,7 +12,11 @@ def get_provider(name: str) -> LLMProvider:
 
     from app.config import settings
 
-    if name == "claude":
+    if settings.fake_providers and name in ("claude", "gemini"):
+        from app.llm.fake_provider import FakeLLMProvider
+
+        provider = FakeLLMProvider.from_settings(name)
+    elif name == "claude":
         from app.llm.claude_provider import ClaudeProvider
 
         provider = ClaudeProvider(api_key=settings.anthropic_api_key)
@@ -29,6 +33,10 @@ def get_provider(name: str) -> LLMProvider:
 
 def _create_provider(name: str, api_key: str, model: str | None = None) -> LLMProvider:
     """Create a fresh (non-cached) LLM provider with the given API key."""
+    from app.config import settings
+
+    if settings.fake_providers:
+        return get_provider(name)
     if name == "claude":
         from app.llm.claude_provider import ClaudeProvider
 
@@ -41,16 +49,82 @@ def _create_provider(name: str, api_key: str, model: str | None = None) -> LLMPr
         raise ValueError(f"Unknown LLM provider: {name}")
 
 
+# Fallback provider for hedged requests
+_SECONDARY = {"claude": "gemini", "gemini": "claude"}
+
+
 async def get_provider_for_user(user_id: str, name: str) -> LLMProvider:
-    """Get an LLM provider using the user's key if available, else server default."""
+    """Get an LLM provider using the user's key if available, else server default.
+
+    With ``llm_hedging_enabled`` the provider hedges to / fails over to the
+    other provider when that one has a key (the user's or the server's).
+    """
+    from app.config import settings
     from app.crypto import decrypt_api_key
     from app.db import get_db, get_user_api_key
 
+    secondary_name = _SECONDARY.get(name) if settings.llm_hedging_enabled else None
     async with get_db() as db:
         row = await get_user_api_key(db, user_id, name)
+        secondary_row = await get_user_api_key(db, user_id, secondary_name) if secondary_name else None
 
     if row and row.get("encrypted_key"):
         api_key = decrypt_api_key(row["encrypted_key"])
-        return _create_provider(name, api_key, row.get("model"))
+        provider = _create_provider(name, api_key, row.get("model"))
+    else:
+        provider = get_provider(name)
 
-    return get_provider(name)
+    secondary = None
+    if secondary_row and secondary_row.get("encrypted_key"):
+        api_key = decrypt_api_key(secondary_row["encrypted_key"])
+        secondary = _create_provider(secondary_name, api_key, secondary_row.get("model"))
+    elif secondary_name and _server_key(secondary_name):
+        secondary = get_provider(secondary_name)
+    return _wrap(name, provider, secondary_name, secondary, user_id=user_id)
+
+
+def _server_key(name: str) -> str:
+    from app.config import settings
+
+    return {"claude": settings.anthropic_api_key, "gemini": settings.gemini_api_key}.get(name, "")
+
+
+def _wrap(
+    name: str,
+    provider: LLMProvider,
+    secondary_name: str | None = None,
+    secondary: LLMProvider | None = None,
+    user_id: str = "",
+) -> LLMProvider:
+    """Apply the shared layers around a concrete provider.
+
+    Resilience (concurrency limit shared fairly between users, breaker,
+    retries) sits closest to each provider, hedging across the two above
+    that, and the response cache is outermost so hits skip everything. The
+    cache wrapper is always applied so callers can rely on its
+    ``bypass_cache`` keyword; when disabled it caches no tasks.
+    """
+    from app.config import settings
+    from app.llm.cache import CACHEABLE_TASKS, CachedLLMProvider
+    from app.llm.resilience import ResilientLLMProvider
+
+    routed: LLMProvider = ResilientLLMProvider(
+        provider, name, max_attempts=settings.llm_retry_attempts, user_id=user_id
+    )
+    if secondary is not None and secondary_name:
+        from app.llm.hedging import HedgedLLMProvider
+
+        routed = HedgedLLMProvider(
+            routed,
+            ResilientLLMProvider(
+                secondary, secondary_name, max_attempts=settings.llm_retry_attempts, user_id=user_id
+            ),
+        )
+
+    return CachedLLMProvider(
+        routed,
+        provider_name=name,
+        ttl_seconds=settings.llm_cache_ttl_seconds,
+        max_entries=settings.llm_cache_max_entries,
+        tasks=CACHEABLE_TASKS if settings.llm_cache_enabled else set(),
+    )
@@ -0,0 +1,146 @@
+"""Deterministic in-process LLM provider for load testing (``FAKE_PROVIDERS=true``).
+
+Answers every task the app uses with well-formed JSON after a simulated
+latency, fails a configurable share of calls with a retryable 503 and
+streams its output in chunks, so the resilience, cache and job layers run
+exactly as they do against a real API. Nothing leaves the process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+from collections.abc import AsyncIterator
+
+from app.llm.base import LLMError, LLMProvider
+from app.llm.usage import record_usage
+
+SEGMENT_PLAN = [
+    ("cold_open", "冷開場"),
+    ("host_intro", "主持人介紹"),
+    ("topic_intro", "主題引言"),
+    ("core_1", "核心討論一"),
+    ("core_2", "核心討論二"),
+    ("ad_break", "廣告時間"),
+    ("summary", "重點摘要"),
+    ("cta", "行動呼籲"),
+    ("preview", "下集預告"),
+]
+
+_FILLER = "今天我們要聊的主題非常有趣，讓我們一起來看看背後的故事與觀點。"
+
+STREAM_CHUNK_CHARS = 64
+
+
+def sample_latency(rng: random.Random, median_ms: float, sigma: float) -> float:
+    """Seconds drawn from a log-normal around ``median_ms``; ``sigma=0`` is constant."""
+    if median_ms <= 0:
+        return 0.0
+    if sigma <= 0:
+        return median_ms / 1000
+    return median_ms * math.exp(rng.gauss(0.0, sigma)) / 1000
+
+
+def filler_text(seed: str, chars: int) -> str:
+    """``chars`` characters of Mandarin-looking text, fixed for a given seed."""
+    digest = hashlib.sha256(seed.encode("utf-8")).hexdigest()[:8]
+    head = f"（{digest}）"
+    body = (_FILLER * (chars // len(_FILLER) + 1))[: max(chars - len(head), 0)]
+    return head + body
+
+
+class FakeLLMProvider(LLMProvider):
+    """LLM stand-in with a log-normal latency, an error rate and sized outputs.
+
+    Output depends only on the prompt, so the response cache behaves as it
+    would in production; latency and failures come from a seeded RNG.
+    """
+
+    model = "fake"
+
+    def __init__(
+        self,
+        name: str,
+        latency_ms: float = 2000.0,
+        sigma: float = 0.5,
+        error_rate: float = 0.0,
+        segments: int = 6,
+        segment_chars: int = 300,
+        seed: int = 0,
+    ):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.segments = segments
+        self.segment_chars = segment_chars
+        self._rng = random.Random(f"{name}:{seed}")
+
+    @classmethod
+    def from_settings(cls, name: str) -> FakeLLMProvider:
+        from app.config import settings
+
+        return cls(
+            name,
+            latency_ms=settings.fake_llm_latency_ms,
+            sigma=settings.fake_latency_sigma,
+            error_rate=settings.fake_error_rate,
+            segments=settings.fake_llm_segments,
+            segment_chars=settings.fake_llm_segment_chars,
+            seed=settings.fake_seed,
+        )
+
+    def respond(self, user_message: str, task: str) -> dict:
+        seed = f"{task}:{user_message}"
+        if task == "title_generation":
+            return {"titles": [
+                {"title_zh": filler_text(f"{seed}:{i}", 16), "title_en": f"Episode idea {i + 1}"} for i in range(5)
+            ]}
+        if task in ("script_generation", "script_regeneration"):
+            plan = [SEGMENT_PLAN[i % len(SEGMENT_PLAN)] for i in range(self.segments)]
+            return {"segments": [
+                {
+                    "segment_type": segment_type,
+                    "label": label,
+                    "content": filler_text(f"{seed}:{i}", self.segment_chars),
+                    "cues": [],
+                    "estimated_duration": f"{max(self.segment_chars // 4, 1)} 秒",
+                }
+                for i, (segment_type, label) in enumerate(plan)
+            ]}
+        if task == "script_refinement":
+            return {"content": filler_text(seed, self.segment_chars)}
+        return {}
+
+    def _attempt(self) -> float:
+        """Latency for this call; raises the simulated failure up front."""
+        latency = sample_latency(self._rng, self.latency_ms, self.sigma)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise LLMError("Fake provider overloaded", status_code=503)
+        return latency
+
+    def _record(self, system_prompt: str, user_message: str, task: str, text: str) -> None:
+        # Roughly 1.5 characters per token for mixed Mandarin prompts
+        record_usage(self.name, self.model, task, (len(system_prompt) + len(user_message)) * 2 // 3, len(text) * 2 // 3)
+
+    async def complete(self, system_prompt: str, user_message: str, task: str = "") -> dict:
+        latency = self._attempt()
+        await asyncio.sleep(latency)
+        result = self.respond(user_message, task)
+        self._record(system_prompt, user_message, task, json.dumps(result, ensure_ascii=False))
+        return result
+
+    async def stream(self, system_prompt: str, user_message: str, task: str = "") -> AsyncIterator[str]:
+        latency = self._attempt()
+        text = json.dumps(self.respond(user_message, task), ensure_ascii=False)
+        chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+        # A fifth of the latency before the first token, the rest spread over the chunks
+        await asyncio.sleep(latency * 0.2)
+        step = latency * 0.8 / len(chunks)
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(step)
+        self._record(system_prompt, user_message, task, text)
@@ -1,43 +1,138 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import json
 import logging
+import time
+from collections.abc import AsyncIterator
 
 from google import genai
 from google.genai import types
 
-from app.llm.base import LLMError, LLMProvider
+from app.llm.base import LLMError, LLMProvider, api_error, split_static_prefix
+from app.llm.usage import record_usage
+from app.shared_state import SharedState, SharedStateError, shared_state
 
 logger = logging.getLogger(__name__)
 
+# Below this many characters of static prompt, explicit caching isn't worth
+# the extra API call (and Gemini rejects contexts under its token minimum).
+_MIN_CACHE_CHARS = 1024
+
+# cache id -> (cached content name, or None if caching failed; refresh deadline)
+_context_caches: dict[str, tuple[str | None, float]] = {}
+
+
+async def _shared_cache_name(shared: SharedState, cache_id: str) -> str | None:
+    """A context cache another worker created, remembered locally until its refresh."""
+    try:
+        value = await shared.get(f"gemini-cache:{cache_id}")
+    except SharedStateError as e:
+        logger.warning("Shared state unavailable for Gemini context caches: %s", e)
+        return None
+    if value is None:
+        return None
+    entry = json.loads(value)
+    _context_caches[cache_id] = (entry["name"], time.monotonic() + entry["refresh_at"] - time.time())
+    return entry["name"]
+
 
 class GeminiProvider(LLMProvider):
-    def __init__(self, api_key: str, model: str = "gemini-2.5-flash"):
-        self._client = genai.Client(api_key=api_key)
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str = "gemini-2.5-flash", base_url: str | None = None):
+        http_options = types.HttpOptions(base_url=base_url) if base_url else None
+        self._client = genai.Client(api_key=api_key, http_options=http_options)
         self._model = model
+        # Cached contents belong to the API key's project
+        self._key_id = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+        self._cache_lock = asyncio.Lock()
 
-    async def complete(self, system_prompt: str, user_message: str, task: str = "") -> dict:
-        last_err = None
-        for attempt in range(3):
+    @property
+    def model(self) -> str:
+        return self._model
+
+    async def _context_cache(self, cache_id: str, system_prompt: str, prefix: str) -> str | None:
+        """Name of an explicit context cache holding the system prompt and prefix.
+
+        Created on first use and recreated shortly before its TTL runs out. If
+        creation fails the prompt is sent uncached until the next refresh.
+        With a shared-state backend, other workers reuse the same cache rather
+        than each creating (and paying storage for) their own.
+        """
+        entry = _context_caches.get(cache_id)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+
+        from app.config import settings
+
+        async with self._cache_lock:
+            entry = _context_caches.get(cache_id)
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+            shared = shared_state()
+            if shared is not None and (name := await _shared_cache_name(shared, cache_id)):
+                return name
+            ttl = settings.gemini_context_cache_ttl_seconds
             try:
-                response = await self._client.aio.models.generate_content(
+                cache = await self._client.aio.caches.create(
                     model=self._model,
-                    contents=user_message,
-                    config=types.GenerateContentConfig(
+                    config=types.CreateCachedContentConfig(
                         system_instruction=system_prompt,
-                        response_mime_type="application/json",
-                        max_output_tokens=16384,
+                        contents=[prefix],
+                        ttl=f"{ttl}s",
+                        display_name=f"prompt-{cache_id[:12]}",
                     ),
                 )
-                usage = getattr(response, "usage_metadata", None)
-                logger.info(
-                    "Gemini LLM: task=%s model=%s in_tokens=%s out_tokens=%s",
-                    task,
-                    self._model,
-                    getattr(usage, "prompt_token_count", "?"),
-                    getattr(usage, "candidates_token_count", "?"),
-                )
+                name = cache.name
+                logger.info("Gemini context cache created: %s", name)
+            except Exception as e:
+                logger.warning("Gemini context cache unavailable, sending full prompt: %s", e)
+                name = None
+            _context_caches[cache_id] = (name, time.monotonic() + max(ttl - 60, 0))
+            if shared is not None and name:
+                entry = json.dumps({"name": name, "refresh_at": time.time() + max(ttl - 60, 0)})
+                try:
+                    await shared.set(f"gemini-cache:{cache_id}", entry, ttl=max(ttl - 60, 1))
+                except SharedStateError as e:
+                    logger.warning("Could not share Gemini context cache %s: %s", name, e)
+        return name
+
+    async def _request(self, system_prompt: str, user_message: str) -> tuple[dict, str | None]:
+        """generate_content arguments, using a context cache for the static prompt parts.
+
+        Returns the arguments and the cache id in use (None when uncached).
+        """
+        config = {"response_mime_type": "application/json", "max_output_tokens": 16384}
+        prefix, rest = split_static_prefix(user_message)
+        if prefix and rest and len(system_prompt) + len(prefix) >= _MIN_CACHE_CHARS:
+            cache_id = hashlib.sha256(
+                f"{self._key_id}\0{self._model}\0{system_prompt}\0{prefix}".encode("utf-8")
+            ).hexdigest()
+            name = await self._context_cache(cache_id, str(system_prompt), prefix)
+            if name:
+                request = {
+                    "model": self._model,
+                    "contents": rest,
+                    "config": types.GenerateContentConfig(cached_content=name, **config),
+                }
+                return request, cache_id
+        request = {
+            "model": self._model,
+            "contents": str(user_message),
+            "config": types.GenerateContentConfig(system_instruction=str(system_prompt), **config),
+        }
+        return request, None
+
+    async def complete(self, system_prompt: str, user_message: str, task: str = "") -> dict:
+        last_err = None
+        for attempt in range(3):
+            cache_id = None
+            try:
+                request, cache_id = await self._request(system_prompt, user_message)
+                response = await self._client.aio.models.generate_content(**request)
+                _record_usage(self._model, task, getattr(response, "usage_metadata", None))
                 if not response.text:
                     raise LLMError("Gemini returned empty response")
                 return json.loads(response.text)
@@ -51,11 +146,36 @@ class GeminiProvider(LLMProvider):
             except LLMError:
                 raise
             except Exception as e:
-                last_err = e
-                if ("503" in str(e) or "500" in str(e)) and attempt < 2:
-                    wait = (attempt + 1) * 3
-                    logger.warning("Gemini %s, retrying in %ds (attempt %d/3)", e, wait, attempt + 1)
-                    await asyncio.sleep(wait)
-                    continue
-                raise LLMError(f"Gemini API error: {e}") from e
+                if cache_id is not None:
+                    # The cache may have been evicted server-side; recreate it next time
+                    _context_caches.pop(cache_id, None)
+                # Transport/HTTP failures are retried by the resilience layer
+                raise api_error("Gemini API error", e) from e
         raise LLMError(f"Gemini API error after retries: {last_err}") from last_err
+
+    async def stream(self, system_prompt: str, user_message: str, task: str = "") -> AsyncIterator[str]:
+        usage = None
+        cache_id = None
+        try:
+            request, cache_id = await self._request(system_prompt, user_message)
+            chunks = await self._client.aio.models.generate_content_stream(**request)
+            async for chunk in chunks:
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            if cache_id is not None:
+                _context_caches.pop(cache_id, None)
+            raise api_error("Gemini API error", e) from e
+        _record_usage(self._model, task, usage)
+
+
+def _record_usage(model: str, task: str, usage) -> None:
+    record_usage(
+        "gemini",
+        model,
+        task,
+        getattr(usage, "prompt_token_count", None),
+        getattr(usage, "candidates_token_count", None),
+        getattr(usage, "cached_content_token_count", None),
+    )
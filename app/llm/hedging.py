@@ -0,0 +1,155 @@
+"""Hedged requests across two providers (opt-in via ``llm_hedging_enabled``).
+
+The primary provider is called first. If it hasn't answered after the hedge
+delay, the same request goes to the secondary; whichever returns a valid
+response first wins and the other call is cancelled. If the primary fails,
+or its circuit breaker is open, the secondary is used straight away.
+
+The hedge delay is the primary's observed latency percentile for the task
+(``llm_hedge_percentile``). Until enough samples exist,
+``llm_hedge_default_delay_seconds`` is used instead.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from collections.abc import AsyncIterator
+
+from app.llm.base import LLMError, LLMProvider
+from app.llm.latency import get_histogram
+from app.llm.resilience import get_state
+from app.llm.usage import record_responder
+
+logger = logging.getLogger(__name__)
+
+
+def hedge_delay(provider: str, task: str) -> float:
+    """Seconds to wait on ``provider`` before sending a hedged request."""
+    from app.config import settings
+
+    histogram = get_histogram(provider, task)
+    if histogram is None or histogram.total < settings.llm_hedge_min_samples:
+        return settings.llm_hedge_default_delay_seconds
+    delay = histogram.percentile(settings.llm_hedge_percentile)
+    if delay is None or delay == float("inf"):
+        return settings.llm_hedge_default_delay_seconds
+    return max(delay, settings.llm_hedge_min_delay_seconds)
+
+
+class HedgedLLMProvider(LLMProvider):
+    """Primary provider with a hedged/failover secondary."""
+
+    def __init__(self, primary: LLMProvider, secondary: LLMProvider):
+        self._primary = primary
+        self._secondary = secondary
+        self.name = primary.name
+        self.model = primary.model
+        self.hedges = 0
+        self.secondary_wins = 0
+
+    def _primary_available(self) -> bool:
+        return not get_state(self._primary.name).is_open()
+
+    async def complete(self, system_prompt: str, user_message: str, task: str = "") -> dict:
+        def call(provider: LLMProvider) -> asyncio.Task:
+            return asyncio.create_task(provider.complete(system_prompt, user_message, task=task))
+
+        if not self._primary_available():
+            logger.info("%s circuit open, failing over to %s", self._primary.name, self._secondary.name)
+            result = await self._secondary.complete(system_prompt, user_message, task=task)
+            record_responder(self._secondary.name, self._secondary.model)
+            return result
+
+        primary = call(self._primary)
+        pending: dict[asyncio.Task, LLMProvider] = {primary: self._primary}
+        first_error: BaseException | None = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=hedge_delay(self._primary.name, task))
+            if not done:
+                self.hedges += 1
+                logger.info("Hedging %s request to %s", task or "LLM", self._secondary.name)
+            if done and primary.exception() is not None:
+                first_error = primary.exception()
+                del pending[primary]
+            if not done or first_error is not None:
+                pending[call(self._secondary)] = self._secondary
+
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task_ in done:
+                    provider = pending.pop(task_)
+                    error = task_.exception()
+                    if error is None:
+                        if provider is self._secondary:
+                            self.secondary_wins += 1
+                        record_responder(provider.name, provider.model)
+                        return task_.result()
+                    first_error = first_error or error
+                    if provider is self._primary and self._secondary not in pending.values():
+                        # Primary failed before the hedge fired: fail over now
+                        pending[call(self._secondary)] = self._secondary
+            raise first_error
+        finally:
+            for task_ in pending:
+                task_.cancel()
+            for task_ in pending:
+                with contextlib.suppress(BaseException):
+                    await task_
+
+    async def stream(self, system_prompt: str, user_message: str, task: str = "") -> AsyncIterator[str]:
+        """Hedge on time to first chunk; the first provider to produce text is streamed."""
+        streams: dict[asyncio.Task, tuple[LLMProvider, AsyncIterator[str]]] = {}
+
+        def start(provider: LLMProvider) -> None:
+            agen = provider.stream(system_prompt, user_message, task=task)
+            streams[asyncio.create_task(anext(agen))] = (provider, agen)
+
+        winner: AsyncIterator[str] | None = None
+        first_chunk = ""
+        first_error: BaseException | None = None
+        try:
+            if self._primary_available():
+                start(self._primary)
+                delay = hedge_delay(self._primary.name, f"{task}:first_chunk")
+                done, _ = await asyncio.wait(set(streams), timeout=delay)
+                if not done:
+                    self.hedges += 1
+                    logger.info("Hedging %s stream to %s", task or "LLM", self._secondary.name)
+                    start(self._secondary)
+            else:
+                start(self._secondary)
+
+            while streams and winner is None:
+                done, _ = await asyncio.wait(set(streams), return_when=asyncio.FIRST_COMPLETED)
+                for task_ in done:
+                    provider, agen = streams.pop(task_)
+                    error = task_.exception()
+                    if error is None:
+                        winner, first_chunk = agen, task_.result()
+                        if provider is self._secondary:
+                            self.secondary_wins += 1
+                        record_responder(provider.name, provider.model)
+                        break
+                    if isinstance(error, StopAsyncIteration):
+                        error = LLMError(f"{provider.name} returned an empty response")
+                    first_error = first_error or error
+                    if provider is self._primary and all(p is not self._secondary for p, _ in streams.values()):
+                        start(self._secondary)
+        finally:
+            for task_, (_, agen) in streams.items():
+                task_.cancel()
+                with contextlib.suppress(BaseException):
+                    await task_
+                with contextlib.suppress(BaseException):
+                    await agen.aclose()
+
+        if winner is None:
+            raise first_error or LLMError("No provider produced a response")
+        try:
+            yield first_chunk
+            async for chunk in winner:
+                yield chunk
+        finally:
+            await winner.aclose()
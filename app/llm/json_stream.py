@@ -0,0 +1,110 @@
+"""Incremental JSON parsing for streamed LLM responses."""
+
+from __future__ import annotations
+
+import json
+
+from app.llm.base import LLMError
+
+
+class JsonArrayStreamer:
+    """Emit each element of a top-level array field as soon as it closes.
+
+    Feed raw text chunks of a response shaped like ``{"<key>": [{...}, ...]}``;
+    ``feed`` returns the array elements completed by that chunk. Text before
+    the first ``{`` (e.g. a markdown fence) is ignored. Only object elements
+    are emitted.
+
+    Only the unscanned tail is kept for parsing (from the open element or
+    string, if any), so each chunk costs its own length plus at most one
+    element, not the whole response so far.
+    """
+
+    def __init__(self, key: str):
+        self._key = key
+        self._chunks: list[str] = []
+        self._buf = ""  # positions below are relative to this
+        self._pos = 0
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expecting_key = False
+        self._last_key: str | None = None
+        self._array_depth: int | None = None
+        self._item_start: int | None = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> list[dict]:
+        self._chunks.append(chunk)
+        items: list[dict] = []
+        text = self._buf + chunk
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1 and self._expecting_key:
+                        self._last_key = text[self._string_start + 1 : i]
+                continue
+            if not self._stack and c != "{":
+                continue
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c in "{[":
+                if self._array_depth is not None and len(self._stack) == self._array_depth and c == "{":
+                    self._item_start = i
+                self._stack.append(c)
+                if c == "[" and len(self._stack) == 2 and self._array_depth is None and self._last_key == self._key:
+                    self._array_depth = 2
+                if c == "{" and len(self._stack) == 1:
+                    self._expecting_key = True
+            elif c in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if c == "}" and self._item_start is not None and len(self._stack) == self._array_depth:
+                    items.append(json.loads(text[self._item_start : i + 1]))
+                    self._item_start = None
+                elif c == "]" and self._array_depth is not None and len(self._stack) == self._array_depth - 1:
+                    self._array_depth = -1  # array closed; ignore later arrays
+            elif len(self._stack) == 1:
+                if c == ":":
+                    self._expecting_key = False
+                elif c == ",":
+                    self._expecting_key = True
+        # Keep only what a later chunk can still need: the open element, or
+        # the open string (a key being read)
+        keep = len(text)
+        if self._item_start is not None:
+            keep = self._item_start
+            self._item_start = 0
+        elif self._in_string:
+            keep = self._string_start
+        if self._in_string:
+            self._string_start -= keep
+        self._buf = text[keep:]
+        self._pos = len(text) - keep
+        return items
+
+    def close(self) -> dict:
+        """Parse and return the complete document; raise LLMError if invalid."""
+        try:
+            return parse_json_text(self.text)
+        except json.JSONDecodeError as e:
+            raise LLMError(f"Streamed response is not valid JSON: {e}") from e
+
+
+def parse_json_text(text: str) -> dict:
+    """Parse the outermost JSON object in ``text``, ignoring fences around it."""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise json.JSONDecodeError("No JSON object found", text, 0)
+    return json.loads(text[start : end + 1])
@@ -0,0 +1,77 @@
+"""Per-provider, per-task latency histograms.
+
+Used to pick hedge delays from observed percentiles. Counts decay (halve)
+once a histogram holds ``_DECAY_AT`` samples so it tracks recent behaviour.
+"""
+
+from __future__ import annotations
+
+import bisect
+
+# Bucket upper bounds in seconds; the last bucket is open-ended
+BUCKETS: tuple[float, ...] = (
+    0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 45, 60, 90, 120, 180, 300, float("inf"),
+)
+_DECAY_AT = 1000
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += 1
+        if self.total >= _DECAY_AT:
+            self.counts = [c // 2 for c in self.counts]
+            self.total = sum(self.counts)
+
+    def percentile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the ``q`` quantile (0-1); None if empty."""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return BUCKETS[-1]
+
+    def snapshot(self) -> dict:
+        def fmt(value: float | None) -> float | None:
+            return None if value is None or value == float("inf") else value
+
+        return {
+            "count": self.total,
+            "p50_s": fmt(self.percentile(0.5)),
+            "p95_s": fmt(self.percentile(0.95)),
+            "p99_s": fmt(self.percentile(0.99)),
+        }
+
+
+_histograms: dict[tuple[str, str], LatencyHistogram] = {}
+
+
+def record_latency(provider: str, task: str, seconds: float) -> None:
+    key = (provider, task or "-")
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = LatencyHistogram()
+    histogram.observe(seconds)
+
+
+def get_histogram(provider: str, task: str) -> LatencyHistogram | None:
+    return _histograms.get((provider, task or "-"))
+
+
+def latency_snapshot() -> dict[str, dict[str, dict]]:
+    result: dict[str, dict[str, dict]] = {}
+    for (provider, task), histogram in sorted(_histograms.items()):
+        result.setdefault(provider, {})[task] = histogram.snapshot()
+    return result
+
+
+def reset_latency() -> None:
+    _histograms.clear()
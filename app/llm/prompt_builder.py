@@ -1,14 +1,159 @@
+"""Prompt templates from prompts/<name>.txt, compiled once and cached.
+
+Each template is parsed when first loaded (or up front by
+``validate_prompts`` at startup). Its placeholders are checked against
+``PROMPT_FIELDS``, the fields each call site supplies. With
+``prompt_hot_reload`` on, a template is re-read when its file changes.
+"""
+
 from __future__ import annotations
 
+import hashlib
+import logging
+import string
+from dataclasses import dataclass
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 _PROMPTS_DIR = Path(__file__).resolve().parent.parent.parent / "prompts"
 
+# Fields each prompt's call sites pass to load_prompt()
+PROMPT_FIELDS: dict[str, frozenset[str]] = {
+    "system": frozenset(),
+    "title_generation": frozenset({"topic", "audience", "style"}),
+    "script_generation": frozenset(
+        {"selected_title", "topic", "audience", "style", "duration_min", "host_count", "structure_variant"}
+    ),
+    "script_refinement": frozenset({"segment_type", "label", "original_content", "feedback", "scores"}),
+}
+
+
+class PromptError(Exception):
+    """A prompt template is missing, malformed or given the wrong fields."""
+
+
+class Prompt(str):
+    """Rendered prompt text that remembers its template's static prefix.
+
+    Providers use ``static_prefix`` to place prompt-caching breakpoints; the
+    rendered text always starts with it.
+    """
+
+    static_prefix: str
+    prefix_hash: str
+
+    def __new__(cls, text: str, static_prefix: str = "", prefix_hash: str = "") -> Prompt:
+        prompt = super().__new__(cls, text)
+        prompt.static_prefix = static_prefix
+        prompt.prefix_hash = prefix_hash
+        return prompt
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    text: str
+    placeholders: frozenset[str]
+    static_prefix: str  # literal text before the first placeholder
+    prefix_hash: str  # sha256 of static_prefix, stable across processes
+    mtime_ns: int
+
+    def render(self, **kwargs: str) -> Prompt:
+        missing = self.placeholders - kwargs.keys()
+        if missing:
+            raise PromptError(f"Prompt '{self.name}' is missing fields: {', '.join(sorted(missing))}")
+        text = self.text.format(**kwargs) if self.placeholders else self.text
+        return Prompt(text, self.static_prefix, self.prefix_hash)
+
 
-def load_prompt(name: str, **kwargs: str) -> str:
-    """Load a prompt template from prompts/<name>.txt and format it."""
+_templates: dict[str, PromptTemplate] = {}
+
+
+def _compile(name: str) -> PromptTemplate:
     path = _PROMPTS_DIR / f"{name}.txt"
-    template = path.read_text(encoding="utf-8")
-    if kwargs:
-        template = template.format(**kwargs)
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+        text = path.read_text(encoding="utf-8")
+    except OSError as e:
+        raise PromptError(f"Prompt '{name}' not found at {path}") from e
+
+    placeholders: set[str] = set()
+    prefix_parts: list[str] = []
+    in_prefix = True
+    try:
+        for literal, field, _spec, _conv in string.Formatter().parse(text):
+            if in_prefix:
+                prefix_parts.append(literal)
+            if field is not None:
+                if not field.isidentifier():
+                    raise PromptError(f"Prompt '{name}' has unsupported placeholder {{{field}}}")
+                placeholders.add(field)
+                in_prefix = False
+    except ValueError as e:
+        raise PromptError(f"Prompt '{name}' is not a valid template: {e}") from e
+
+    # With no placeholders the text is used verbatim, so the prefix is the whole file
+    static_prefix = "".join(prefix_parts) if placeholders else text
+    return PromptTemplate(
+        name=name,
+        text=text,
+        placeholders=frozenset(placeholders),
+        static_prefix=static_prefix,
+        prefix_hash=hashlib.sha256(static_prefix.encode("utf-8")).hexdigest(),
+        mtime_ns=mtime_ns,
+    )
+
+
+def get_template(name: str) -> PromptTemplate:
+    """Return the compiled template, re-reading it first if hot reload is on and it changed."""
+    template = _templates.get(name)
+    if template is not None:
+        from app.config import settings
+
+        if not settings.prompt_hot_reload:
+            return template
+        try:
+            changed = (_PROMPTS_DIR / f"{name}.txt").stat().st_mtime_ns != template.mtime_ns
+        except OSError:
+            changed = True
+        if not changed:
+            return template
+        logger.info("Reloading prompt template: %s", name)
+
+    template = _compile(name)
+    _templates[name] = template
     return template
+
+
+def load_prompt(name: str, **kwargs: str) -> Prompt:
+    """Render prompts/<name>.txt with the given fields."""
+    return get_template(name).render(**kwargs)
+
+
+def validate_prompts() -> dict[str, PromptTemplate]:
+    """Compile every known template and check it against its call-site fields.
+
+    Raises PromptError listing every problem, so startup fails fast instead of
+    the first request of each kind failing.
+    """
+    errors: list[str] = []
+    compiled: dict[str, PromptTemplate] = {}
+    for name, fields in PROMPT_FIELDS.items():
+        try:
+            template = _compile(name)
+        except PromptError as e:
+            errors.append(str(e))
+            continue
+        missing = template.placeholders - fields
+        if missing:
+            errors.append(f"Prompt '{name}' uses fields no caller provides: {', '.join(sorted(missing))}")
+        unused = fields - template.placeholders
+        if unused:
+            logger.warning("Prompt '%s' ignores fields: %s", name, ", ".join(sorted(unused)))
+        compiled[name] = template
+
+    if errors:
+        raise PromptError("; ".join(errors))
+    _templates.update(compiled)
+    return compiled
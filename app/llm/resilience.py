@@ -0,0 +1,314 @@
+"""Shared resilience layer for LLM providers.
+
+Each provider name ("claude", "gemini") gets one ``ProviderState``, shared by
+every instance (server-key and per-user clients alike), holding:
+
+- an AIMD concurrency limit: grows by ~1 per window of successful calls,
+  shrinks multiplicatively on 429/503 and on calls much slower than usual;
+  its slots are shared fairly between users, each capped at
+  ``llm_user_concurrency`` (see ``app.scheduling``);
+- a circuit breaker: opens after consecutive transient failures, then lets a
+  single half-open probe through once the reset timeout passes.
+
+``ResilientLLMProvider`` wraps a concrete provider with both, and retries
+transient failures with exponential backoff and full jitter, honouring the
+provider's Retry-After hint.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import AsyncIterator
+
+from app.llm.base import LLMError, LLMProvider
+from app.llm.latency import record_latency
+from app.metrics import LLM_FIRST_CHUNK_SECONDS, LLM_REQUEST_SECONDS, LLM_REQUESTS
+from app.scheduling import FairScheduler, parse_weights
+from app.tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(LLMError):
+    """The provider's circuit breaker is open; the call was not attempted."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(
+            f"{provider} is unavailable (circuit open), retry in {retry_after:.0f}s",
+            retry_after=retry_after,
+            retryable=False,
+        )
+
+
+class AdaptiveLimiter(FairScheduler):
+    """AIMD concurrency limit on in-flight calls, shared fairly between users."""
+
+    def __init__(
+        self,
+        initial: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        decrease: float = 0.5,
+        slow_decrease: float = 0.9,
+        slow_factor: float = 2.0,
+        name: str = "",
+        per_user_limit: int = 0,
+        weights: dict[str, float] | None = None,
+    ):
+        super().__init__(name, initial, per_user_limit=per_user_limit, weights=weights)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self._decrease = decrease
+        self._slow_decrease = slow_decrease
+        self._slow_factor = slow_factor
+        # Per task: a 60 s script stream isn't slow next to 5 s title calls
+        self._latency_ewma: dict[str, float] = {}
+
+    def release(
+        self, user: str = "", latency: float | None = None, overloaded: bool = False, task: str = ""
+    ) -> None:
+        """Return ``user``'s slot. ``latency`` is set for successful calls only,
+        and judged against earlier calls of the same ``task``."""
+        if overloaded:
+            self.limit = max(self.min_limit, self.limit * self._decrease)
+        elif latency is not None:
+            baseline = self._latency_ewma.get(task)
+            slow = baseline is not None and latency > baseline * self._slow_factor
+            self._latency_ewma[task] = latency if baseline is None else 0.8 * baseline + 0.2 * latency
+            if slow:
+                self.limit = max(self.min_limit, self.limit * self._slow_decrease)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        super().release(user)
+
+    def snapshot(self) -> dict:
+        return {
+            **super().snapshot(),
+            "latency_ewma_s": {task: round(ewma, 3) for task, ewma in sorted(self._latency_ewma.items())},
+        }
+
+
+class CircuitBreaker:
+    """closed → open after ``failure_threshold`` consecutive failures →
+    half_open after ``reset_seconds`` (one probe) → closed on success / open on failure."""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def retry_in(self) -> float:
+        return max(self._opened_at + self.reset_seconds - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the probe when half-open)."""
+        if self.state == "open":
+            if self.retry_in() > 0:
+                return False
+            self.state = "half_open"
+            self._probing = False
+        if self.state == "half_open":
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("Circuit closed after successful probe")
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """Give up a claimed half-open probe without judging health."""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_in_s": round(self.retry_in(), 1) if self.state == "open" else 0.0,
+        }
+
+
+class ProviderState:
+    def __init__(self, name: str):
+        from app.config import settings
+
+        self.name = name
+        self.limiter = AdaptiveLimiter(
+            initial=settings.llm_concurrency_initial,
+            max_limit=settings.llm_concurrency_max,
+            name=f"llm.{name}",
+            per_user_limit=settings.llm_user_concurrency,
+            weights=parse_weights(settings.fair_user_weights),
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.llm_breaker_failure_threshold,
+            reset_seconds=settings.llm_breaker_reset_seconds,
+        )
+        self.retries = 0
+        self.rejected = 0
+
+    def is_open(self) -> bool:
+        """Whether calls are currently being rejected without a probe."""
+        return self.breaker.state == "open" and self.breaker.retry_in() > 0
+
+    def snapshot(self) -> dict:
+        return {
+            "concurrency": self.limiter.snapshot(),
+            "breaker": self.breaker.snapshot(),
+            "retries": self.retries,
+            "rejected": self.rejected,
+        }
+
+
+_states: dict[str, ProviderState] = {}
+
+
+def get_state(name: str) -> ProviderState:
+    state = _states.get(name)
+    if state is None:
+        state = _states[name] = ProviderState(name)
+    return state
+
+
+def resilience_snapshot() -> dict[str, dict]:
+    return {name: state.snapshot() for name, state in sorted(_states.items())}
+
+
+def reset_resilience() -> None:
+    _states.clear()
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None, base: float = 1.0, cap: float = 30.0) -> float:
+    """Delay before retry number ``attempt`` (0-based): Retry-After if given, else full jitter."""
+    if retry_after is not None:
+        return min(retry_after, cap)
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class ResilientLLMProvider(LLMProvider):
+    """Concurrency limit, circuit breaker and retries around a concrete provider."""
+
+    def __init__(self, inner: LLMProvider, provider_name: str, max_attempts: int = 3, user_id: str = ""):
+        self._inner = inner
+        self.name = provider_name
+        self.user_id = user_id
+        self.model = inner.model
+        self._max_attempts = max_attempts
+        self.state = get_state(provider_name)
+
+    async def _enter(self) -> None:
+        if not self.state.breaker.allow():
+            self.state.rejected += 1
+            raise CircuitOpenError(self.name, self.state.breaker.retry_in())
+        try:
+            await self.state.limiter.acquire(self.user_id)
+        except BaseException:
+            # Cancelled while queued: _exit won't run, so free the probe here
+            self.state.breaker.release_probe()
+            raise
+
+    def _exit(
+        self, start: float, error: BaseException | None, task: str = "", first_chunk: float | None = None
+    ) -> None:
+        LLM_REQUESTS.inc(self.name, "ok" if error is None else type(error).__name__)
+        # Recorded here rather than with span(): stream attempts cross yields
+        record_span(f"llm.{self.name}", time.monotonic() - start, error, task=task)
+        if error is None:
+            # A stream's length follows its output; time to first chunk is the load signal
+            if first_chunk is not None:
+                self.state.limiter.release(self.user_id, latency=first_chunk, task=f"{task}:first_chunk")
+            else:
+                self.state.limiter.release(self.user_id, latency=time.monotonic() - start, task=task)
+            self.state.breaker.record_success()
+            return
+        overloaded = isinstance(error, LLMError) and error.overloaded
+        self.state.limiter.release(self.user_id, overloaded=overloaded)
+        if isinstance(error, LLMError) and error.retryable:
+            self.state.breaker.record_failure()
+        elif isinstance(error, LLMError):
+            # The provider answered (bad request, invalid JSON): it is healthy
+            self.state.breaker.record_success()
+        else:
+            # Cancelled or unexpected: free a half-open probe without judging health
+            self.state.breaker.release_probe()
+
+    async def _retry_wait(self, attempt: int, error: LLMError) -> bool:
+        """Sleep before the next attempt; False if the error isn't worth retrying."""
+        if not error.retryable or attempt + 1 >= self._max_attempts:
+            return False
+        delay = backoff_delay(attempt, error.retry_after)
+        self.state.retries += 1
+        logger.warning(
+            "%s call failed (%s), retry %d/%d in %.1fs",
+            self.name,
+            error.status_code or "transport",
+            attempt + 1,
+            self._max_attempts - 1,
+            delay,
+        )
+        await asyncio.sleep(delay)
+        return True
+
+    async def complete(self, system_prompt: str, user_message: str, task: str = "") -> dict:
+        attempt = 0
+        while True:
+            await self._enter()
+            start = time.monotonic()
+            try:
+                result = await self._inner.complete(system_prompt, user_message, task=task)
+            except BaseException as e:
+                self._exit(start, e, task)
+                if isinstance(e, LLMError) and await self._retry_wait(attempt, e):
+                    attempt += 1
+                    continue
+                raise
+            self._exit(start, None, task)
+            elapsed = time.monotonic() - start
+            record_latency(self.name, task, elapsed)
+            LLM_REQUEST_SECONDS.observe(elapsed, self.name, task)
+            return result
+
+    async def stream(self, system_prompt: str, user_message: str, task: str = "") -> AsyncIterator[str]:
+        attempt = 0
+        while True:
+            await self._enter()
+            start = time.monotonic()
+            started = False
+            first_chunk = None
+            try:
+                async for chunk in self._inner.stream(system_prompt, user_message, task=task):
+                    if not started:
+                        started = True
+                        first_chunk = time.monotonic() - start
+                        record_latency(self.name, f"{task}:first_chunk", first_chunk)
+                        LLM_FIRST_CHUNK_SECONDS.observe(first_chunk, self.name, task)
+                    yield chunk
+            except BaseException as e:
+                self._exit(start, e, task)
+                # Once text has reached the caller the stream can't be replayed
+                if not started and isinstance(e, LLMError) and await self._retry_wait(attempt, e):
+                    attempt += 1
+                    continue
+                raise
+            self._exit(start, None, task, first_chunk)
+            elapsed = time.monotonic() - start
+            record_latency(self.name, task, elapsed)
+            LLM_REQUEST_SECONDS.observe(elapsed, self.name, task)
+            return
@@ -0,0 +1,94 @@
+"""Per-call token usage reporting from providers to wrapping layers."""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.metrics import LLM_TOKENS
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[dict | None] = ContextVar("llm_usage", default=None)
+
+# Process-wide input token totals per task, to measure prompt-cache savings
+_totals: dict[str, dict[str, int]] = {}
+
+
+@contextmanager
+def track_usage() -> Iterator[dict]:
+    """Collect token counts recorded by provider calls made inside the block.
+
+    ``provider``/``model`` name whoever answered when a layer inside the block
+    chose between providers (``record_responder``), else stay None.
+    """
+    usage = {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cached_input_tokens": 0,
+        "provider": None,
+        "model": None,
+    }
+    token = _current.set(usage)
+    try:
+        yield usage
+    finally:
+        _current.reset(token)
+
+
+def record_usage(
+    provider: str,
+    model: str,
+    task: str,
+    input_tokens: int | None,
+    output_tokens: int | None,
+    cached_input_tokens: int | None = 0,
+) -> None:
+    """Called by providers once per request with the API's usage numbers.
+
+    ``input_tokens`` is the full prompt size; ``cached_input_tokens`` is the
+    part of it served from the provider's prompt cache.
+    """
+    cached = _count(cached_input_tokens)
+    uncached = max(_count(input_tokens) - cached, 0)
+    logger.info(
+        "LLM usage: provider=%s task=%s model=%s in_tokens=%s cached_in_tokens=%d uncached_in_tokens=%d out_tokens=%s",
+        provider,
+        task,
+        model,
+        input_tokens,
+        cached,
+        uncached,
+        output_tokens,
+    )
+    LLM_TOKENS.inc(provider, task or "-", "input_uncached", amount=uncached)
+    LLM_TOKENS.inc(provider, task or "-", "input_cached", amount=cached)
+    LLM_TOKENS.inc(provider, task or "-", "output", amount=_count(output_tokens))
+    totals = _totals.setdefault(task or "-", {"calls": 0, "cached_input_tokens": 0, "uncached_input_tokens": 0})
+    totals["calls"] += 1
+    totals["cached_input_tokens"] += cached
+    totals["uncached_input_tokens"] += uncached
+
+    usage = _current.get()
+    if usage is not None:
+        usage["input_tokens"] += _count(input_tokens)
+        usage["output_tokens"] += _count(output_tokens)
+        usage["cached_input_tokens"] += _count(cached_input_tokens)
+
+
+def record_responder(provider: str, model: str) -> None:
+    """Called by a layer that picks one of several providers with the one that answered."""
+    usage = _current.get()
+    if usage is not None:
+        usage["provider"], usage["model"] = provider, model
+
+
+def _count(value) -> int:
+    return value if isinstance(value, int) else 0
+
+
+def usage_totals() -> dict[str, dict[str, int]]:
+    """Cached vs uncached input tokens per task since the process started."""
+    return {task: dict(totals) for task, totals in sorted(_totals.items())}
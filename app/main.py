@@ -7,10 +7,18 @@ from pathlib import Path
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 
+from app import db_replica, profiling, startup, tracing
+from app.admission import AdmissionMiddleware
+from app.api.idempotency import idempotent_requests
 from app.config import settings
 from app.db import init_db
+from app.jobs import start_workers, stop_workers
+from app.llm.prompt_builder import validate_prompts
+from app.metrics import HTTP_REQUEST_SECONDS, render as render_metrics, route_label
+from app.shared_state import close_shared_state
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,43 +26,91 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
-    await init_db(settings.database_url)
+    # Everything up to the yield blocks the port bind (see app.startup); only
+    # the warm-up started at the end runs after it
+    validate_prompts()
+    if settings.database_replica_path:
+        await init_db(db_replica.open_replica(), journal_mode="WAL")
+        db_replica.start_snapshots()
+    else:
+        await init_db(settings.database_url)
     from app.tts.audio_storage import init_audio_dir
 
     init_audio_dir()
-    logger.info("App started, DB initialized, audio dir ready")
+    await start_workers(settings.job_workers)
+    logger.info("App started, DB initialized, audio dir ready, %d job workers", settings.job_workers)
+    startup.start_warmup()
     yield
+    await startup.stop_warmup()
+    await stop_workers()
+    await db_replica.stop_snapshots()
+    await tracing.close_exports()
+    await close_shared_state()
 
 
 app = FastAPI(title="Podcast 創作助手 API", lifespan=lifespan)
 
+# Innermost, so that shed requests still get CORS headers and request logs
+app.add_middleware(AdmissionMiddleware)
+
 # CORS from environment variable
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[o.strip() for o in settings.cors_origins.split(",")],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PATCH", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "X-User-Id"],
+    allow_headers=["Content-Type", "X-User-Id", "Idempotency-Key", "X-Admin-Token", "X-Profile"],
+    expose_headers=["Retry-After", "X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset"],
 )
 
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start = time.time()
+    start = time.perf_counter()
     user_id = request.headers.get("X-User-Id", "-")
-    response = await call_next(request)
-    ms = (time.time() - start) * 1000
+    trace = tracing.start_trace(request.headers.get("traceparent"))
+    token = tracing.activate(trace)
+    profiler = profiling.request_profiler(request.headers)
+    try:
+        response = await call_next(request)
+    except BaseException:
+        if trace is not None:
+            trace.finish()
+            tracing.export_trace(trace, f"{request.method} {route_label(request.scope)}", error=True)
+        raise
+    finally:
+        tracing.deactivate(token)
+        if profiler is not None:
+            profile_name = await profiling.release(profiler, f"{request.method} {request.url.path}")
+    elapsed = time.perf_counter() - start
+    route = route_label(request.scope)
+    HTTP_REQUEST_SECONDS.observe(elapsed, request.method, route, str(response.status_code))
+    if profiler is not None:
+        response.headers["X-Profile-File"] = profile_name
+    if trace is not None:
+        # Streamed bodies (SSE) are produced after this point; the header covers the setup
+        trace.finish()
+        response.headers["Server-Timing"] = trace.server_timing()
+        tracing.export_trace(
+            trace,
+            f"{request.method} {route}",
+            {"http.request.method": request.method, "http.route": route, "http.response.status_code": response.status_code},
+            error=response.status_code >= 500,
+        )
     logger.info(
         "%s %s user=%s status=%d %.0fms",
         request.method,
         request.url.path,
         user_id[:8],
         response.status_code,
-        ms,
+        elapsed * 1000,
     )
     return response
 
 
+app.middleware("http")(idempotent_requests)
+
+
 # Mount API routers
 from app.api.projects import router as projects_router
 from app.api.titles import router as titles_router
@@ -63,12 +119,29 @@ from app.api.tts import router as tts_router
 from app.api.feedback import router as feedback_router
 from app.api.export import router as export_router
 from app.api.settings import router as settings_router
+from app.api.jobs import router as jobs_router
+from app.api.search import router as search_router
+from app.api.system import router as system_router
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def ready():
+    state = startup.readiness()
+    return JSONResponse(
+        {"status": "ready" if state["ready"] else "warming", "steps": state["steps"]},
+        status_code=200 if state["ready"] else 503,
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 app.include_router(projects_router, prefix="/api/v1")
 app.include_router(titles_router, prefix="/api/v1")
 app.include_router(scripts_router, prefix="/api/v1")
@@ -76,11 +149,12 @@ app.include_router(tts_router, prefix="/api/v1")
 app.include_router(feedback_router, prefix="/api/v1")
 app.include_router(export_router, prefix="/api/v1")
 app.include_router(settings_router, prefix="/api/v1")
+app.include_router(jobs_router, prefix="/api/v1")
+app.include_router(search_router, prefix="/api/v1")
+app.include_router(system_router, prefix="/api/v1")
 
-# Serve TTS audio files
-_audio_dir = Path("data/audio")
-_audio_dir.mkdir(parents=True, exist_ok=True)
-app.mount("/audio", StaticFiles(directory=str(_audio_dir)), name="audio")
+# Serve TTS audio files (the lifespan creates the directory; nothing on disk at import)
+app.mount("/audio", StaticFiles(directory="data/audio", check_dir=False), name="audio")
 
 # Serve frontend in production (must be last — catch-all)
 _frontend_dist = Path("frontend/dist")
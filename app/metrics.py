@@ -0,0 +1,297 @@
+"""In-process metrics in the Prometheus text exposition format (served at /metrics).
+
+Counters and histograms are plain dicts keyed by label values, updated
+without locks (single event loop; the GIL covers the worker threads'
+increments). Observing is a bisect plus two additions, a few hundred
+nanoseconds. Values are process-local and reset on restart, which is what
+Prometheus expects from a counter.
+"""
+
+from __future__ import annotations
+
+import bisect
+import functools
+import inspect
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+
+from app.tracing import span
+
+# Request / DB / LLM latency buckets in seconds
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120,
+)
+
+_registry: list[Metric] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        _registry.append(self)
+
+    @abstractmethod
+    def samples(self) -> list[str]:
+        """Exposition lines for every series, without HELP/TYPE."""
+        ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Metric):
+    """Value read from ``collect()`` at scrape time: {label values: value}."""
+
+    kind = "gauge"
+
+    def __init__(
+        self, name: str, help: str, collect: Callable[[], dict[tuple[str, ...], float]], labels: tuple[str, ...] = ()
+    ):
+        super().__init__(name, help, labels)
+        self._collect = collect
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+            for key, value in sorted(self._collect().items())
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+def render() -> str:
+    """All registered metrics in text exposition format 0.0.4."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# -- Application metrics -----------------------------------------------------
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+DB_CALL_SECONDS = Histogram("db_call_duration_seconds", "Latency of app.db functions", ("function",))
+DB_CALL_ERRORS = Counter("db_call_errors_total", "app.db calls that raised", ("function",))
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds", "Successful LLM call latency (per attempt)", ("provider", "task")
+)
+LLM_FIRST_CHUNK_SECONDS = Histogram(
+    "llm_first_chunk_seconds", "Time to the first streamed chunk of an LLM call", ("provider", "task")
+)
+LLM_REQUESTS = Counter("llm_requests_total", "LLM call attempts by outcome", ("provider", "outcome"))
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Tokens reported by LLM providers", ("provider", "task", "type")
+)
+TTS_REQUEST_SECONDS = Histogram(
+    "tts_request_duration_seconds", "TTS synthesis latency", ("provider", "mode")
+)
+TTS_AUDIO_BYTES = Counter("tts_audio_bytes_total", "Audio bytes produced by TTS", ("provider",))
+TTS_ERRORS = Counter("tts_errors_total", "TTS synthesis failures", ("provider",))
+SCHEDULER_WAIT_SECONDS = Histogram(
+    "scheduler_wait_seconds", "Time calls waited for a provider slot", ("scheduler",)
+)
+DB_SNAPSHOT_SECONDS = Histogram(
+    "db_snapshot_duration_seconds", "Time to copy the write-behind replica to the durable snapshot"
+)
+ADMISSION_QUEUE_SECONDS = Histogram(
+    "admission_queue_seconds", "Time requests waited for admission, per route class", ("route_class",)
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Requests shed with 503 by admission control", ("route_class", "reason")
+)
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by result", ("cache", "result"))
+
+
+def _hit_ratios() -> dict[tuple[str, ...], float]:
+    totals: dict[str, list[float]] = {}
+    for (cache, result), value in CACHE_REQUESTS._values.items():
+        entry = totals.setdefault(cache, [0.0, 0.0])
+        entry[0 if result == "hit" else 1] += value
+    return {(cache,): hits / (hits + misses) for cache, (hits, misses) in totals.items() if hits + misses}
+
+
+CACHE_HIT_RATIO = Gauge("cache_hit_ratio", "Hits / lookups since start, per cache", _hit_ratios, ("cache",))
+
+
+def _scheduler_stat(field: str) -> Callable[[], dict[tuple[str, ...], float]]:
+    def collect() -> dict[tuple[str, ...], float]:
+        from app.scheduling import scheduler_stats
+
+        return {(name,): stats[field] for name, stats in scheduler_stats().items()}
+
+    return collect
+
+
+SCHEDULER_QUEUE_DEPTH = Gauge(
+    "scheduler_queue_depth", "Calls waiting for a provider slot", _scheduler_stat("waiting"), ("scheduler",)
+)
+SCHEDULER_IN_FLIGHT = Gauge(
+    "scheduler_in_flight", "Provider calls holding a slot", _scheduler_stat("in_flight"), ("scheduler",)
+)
+
+
+def _snapshot_age() -> dict[tuple[str, ...], float]:
+    from app.db_replica import snapshot_age
+
+    age = snapshot_age()
+    return {(): age} if age is not None else {}
+
+
+DB_SNAPSHOT_AGE = Gauge(
+    "db_snapshot_age_seconds", "Seconds since the write-behind snapshot last matched the replica", _snapshot_age
+)
+
+
+def _startup_step_seconds() -> dict[tuple[str, ...], float]:
+    from app.startup import step_seconds
+
+    return {(step,): seconds for step, seconds in step_seconds().items()}
+
+
+STARTUP_STEP_SECONDS = Gauge(
+    "startup_step_seconds", "Duration of each background warm-up step", _startup_step_seconds, ("step",)
+)
+
+
+def _admission_in_flight() -> dict[tuple[str, ...], float]:
+    from app.admission import admission_stats
+
+    return {(name,): stats["in_flight"] for name, stats in admission_stats().items()}
+
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight", "Requests in progress, per route class", _admission_in_flight, ("route_class",)
+)
+
+
+def route_label(scope: dict) -> str:
+    """Route template for a handled request ("/api/v1/projects/{project_id}").
+
+    Depending on the FastAPI version, ``scope["route"]`` of an included
+    router's endpoint carries the full or the router-relative template, so
+    the mount prefix is recovered from the concrete path.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path_format", None)
+    if template is None:
+        return "<unmatched>"
+    path = scope.get("path", "")
+    try:
+        filled = template.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return template
+    if filled and path.endswith(filled):
+        return path[: len(path) - len(filled)] + template
+    return template
+
+
+def timed_db_function(fn: Callable) -> Callable:
+    """Wrap an ``app.db`` coroutine function to record its latency, errors and a trace span."""
+    name = fn.__name__
+    span_name = f"db.{name}"
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with span(span_name):
+                return await fn(*args, **kwargs)
+        except BaseException:
+            DB_CALL_ERRORS.inc(name)
+            raise
+        finally:
+            DB_CALL_SECONDS.observe(time.perf_counter() - start, name)
+
+    return wrapper
+
+
+def instrument_module(namespace: dict, module_name: str) -> None:
+    """Replace the public coroutine functions defined in ``module_name`` with timed wrappers."""
+    for attr, value in list(namespace.items()):
+        if (
+            not attr.startswith("_")
+            and inspect.iscoroutinefunction(value)
+            and value.__module__ == module_name
+        ):
+            namespace[attr] = timed_db_function(value)
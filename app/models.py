@@ -52,6 +52,12 @@ class SegmentEditRequest(BaseModel):
     content: str = Field(max_length=10000)
 
 
+class BatchRefineRequest(BaseModel):
+    instruction: str = Field(min_length=1, max_length=2000)
+    segment_ids: list[str] | None = None  # None = every segment (after type filter)
+    segment_types: list[str] | None = None
+
+
 class AiKeyEntry(BaseModel):
     provider: str  # "gemini", "claude"
     api_key: str | None = None  # plaintext; None = don't change key
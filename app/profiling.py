@@ -0,0 +1,151 @@
+"""On-demand sampling profiler writing flamegraph-compatible collapsed stacks.
+
+A sampler thread wakes every ``interval`` seconds, reads every other
+thread's current frame (``sys._current_frames``) and counts the stack.
+Nothing runs unless a profile was requested: while disabled the only cost
+is one settings check per request.
+
+Output is the "folded" format read by flamegraph.pl, speedscope and
+inferno: one ``thread;outer;...;inner count`` line per distinct stack,
+written to ``settings.profile_dir``. The event loop thread is sampled as
+a whole, so a per-request profile also contains whatever else the loop
+ran meanwhile; time waiting in the selector shows up as idle frames.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hmac
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 0.005
+MAX_DEPTH = 128
+
+_active: SamplingProfiler | None = None
+_active_lock = threading.Lock()
+
+
+def _frame_label(code) -> str:
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Samples all threads' stacks from a daemon thread until stopped."""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.samples: Counter[tuple[str, ...]] = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._labels: dict = {}  # code object -> frame label, saves re-formatting hot frames
+        self.started_at = 0.0
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    code = frame.f_code
+                    label = self._labels.get(code)
+                    if label is None:
+                        label = self._labels[code] = _frame_label(code)
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                self.samples[tuple(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def start(self) -> None:
+        self.started_at = time.monotonic()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        """Stacks in folded format, most frequent first."""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.samples.most_common())
+
+
+def acquire(interval: float = DEFAULT_INTERVAL) -> SamplingProfiler | None:
+    """Start a profiler unless one is already running (one at a time per process)."""
+    global _active
+    with _active_lock:
+        if _active is not None:
+            return None
+        _active = SamplingProfiler(interval)
+    _active.start()
+    return _active
+
+
+def _save(profiler: SamplingProfiler, label: str) -> str:
+    profiler.stop()
+    global _active
+    with _active_lock:
+        _active = None
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    name = f"{stamp}-{re.sub(r'[^A-Za-z0-9_.-]+', '_', label).strip('_')[:80]}.folded"
+    directory = Path(settings.profile_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / name).write_text(profiler.collapsed(), encoding="utf-8")
+    logger.info("Saved profile %s (%d samples)", name, profiler.sample_count)
+    return name
+
+
+async def release(profiler: SamplingProfiler, label: str) -> str:
+    """Stop ``profiler``, write its collapsed stacks and return the file name."""
+    return await asyncio.to_thread(_save, profiler, label)
+
+
+def is_running() -> bool:
+    return _active is not None
+
+
+def admin_token_valid(token: str | None) -> bool:
+    return bool(settings.admin_token) and token is not None and hmac.compare_digest(
+        token.encode(), settings.admin_token.encode()
+    )
+
+
+def request_profiler(headers) -> SamplingProfiler | None:
+    """A started profiler if this request asked for one with a valid admin token."""
+    if not settings.admin_token or "x-profile" not in headers:
+        return None
+    if not admin_token_valid(headers.get("x-admin-token")):
+        return None
+    return acquire()
+
+
+def list_profiles() -> list[dict]:
+    directory = Path(settings.profile_dir)
+    if not directory.is_dir():
+        return []
+    files = sorted(directory.glob("*.folded"), reverse=True)
+    return [{"name": f.name, "bytes": f.stat().st_size} for f in files]
+
+
+def profile_path(name: str) -> Path | None:
+    """Path of a saved profile; None for unknown names or anything outside the directory."""
+    if "/" in name or "\\" in name or not name.endswith(".folded"):
+        return None
+    path = Path(settings.profile_dir) / name
+    return path if path.is_file() else None
@@ -0,0 +1,157 @@
+"""Fair sharing of provider concurrency between users.
+
+``FairScheduler`` hands out at most ``limit`` slots at a time, and at most
+``per_user_limit`` to any one user. When callers have to wait, slots go to
+users in start-time fair queuing order: each call is tagged with a virtual
+start time (its user's previous finish tag, or the scheduler's current
+virtual time if that is later) and finishes ``1 / weight`` later, so a user
+with a hundred queued calls gets one slot in turn with a user who has one,
+and a user with weight 2 gets two. Calls from the same user keep their order.
+
+The LLM resilience layer's adaptive limiter and the TTS service each keep one
+scheduler per provider. Queue depth and in-flight counts are exported as
+gauges and time spent waiting as a histogram, all labelled by scheduler name.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter, deque
+from functools import lru_cache
+
+from app.metrics import SCHEDULER_WAIT_SECONDS
+
+_schedulers: dict[str, FairScheduler] = {}
+
+
+class _Waiter:
+    __slots__ = ("future", "start_tag", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, start_tag: float):
+        self.future = future
+        self.start_tag = start_tag
+        self.enqueued_at = time.monotonic()
+
+
+class FairScheduler:
+    """Concurrency slots shared fairly between users (0 = no per-user cap)."""
+
+    def __init__(self, name: str, limit: float, per_user_limit: int = 0, weights: dict[str, float] | None = None):
+        self.name = name
+        self.limit = float(limit)
+        self.per_user_limit = per_user_limit
+        self.weights = weights or {}
+        self.in_flight = 0
+        self._user_in_flight: Counter[str] = Counter()
+        self._queues: dict[str, deque[_Waiter]] = {}
+        self._finish_tags: dict[str, float] = {}
+        self._virtual_time = 0.0
+        if name:
+            _schedulers[name] = self
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _user_has_room(self, user: str) -> bool:
+        return not self.per_user_limit or self._user_in_flight[user] < self.per_user_limit
+
+    def _tag(self, user: str) -> float:
+        start = max(self._virtual_time, self._finish_tags.get(user, 0.0))
+        self._finish_tags[user] = start + 1 / self.weights.get(user, 1.0)
+        return start
+
+    def _grant(self, user: str, start_tag: float) -> None:
+        self.in_flight += 1
+        self._user_in_flight[user] += 1
+        self._virtual_time = max(self._virtual_time, start_tag)
+
+    async def acquire(self, user: str = "") -> None:
+        # Anyone still queued while a global slot is free is held by their own
+        # per-user cap, so only this user's queue can be ahead of us
+        if self.in_flight < int(self.limit) and self._user_has_room(user) and user not in self._queues:
+            self._grant(user, self._tag(user))
+            SCHEDULER_WAIT_SECONDS.observe(0.0, self.name)
+            return
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), self._tag(user))
+        self._queues.setdefault(user, deque()).append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            queue = self._queues.get(user)
+            if queue is not None and waiter in queue:
+                queue.remove(waiter)
+                if not queue:
+                    del self._queues[user]
+            elif waiter.future.done() and not waiter.future.cancelled():
+                self.release(user)  # pass the slot we were given on
+            raise
+
+    def release(self, user: str = "") -> None:
+        self.in_flight -= 1
+        self._user_in_flight[user] -= 1
+        if self._user_in_flight[user] <= 0:
+            del self._user_in_flight[user]
+            if user not in self._queues:
+                self._finish_tags.pop(user, None)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self.in_flight < int(self.limit):
+            best_user = None
+            best_tag = 0.0
+            for user, queue in self._queues.items():
+                if self._user_has_room(user) and (best_user is None or queue[0].start_tag < best_tag):
+                    best_user, best_tag = user, queue[0].start_tag
+            if best_user is None:
+                return
+            queue = self._queues[best_user]
+            waiter = queue.popleft()
+            if not queue:
+                del self._queues[best_user]
+            if waiter.future.done():
+                continue
+            self._grant(best_user, waiter.start_tag)
+            waiter.future.set_result(None)
+            SCHEDULER_WAIT_SECONDS.observe(time.monotonic() - waiter.enqueued_at, self.name)
+
+    def slot(self, user: str = "") -> _Slot:
+        """``async with scheduler.slot(user):`` around one call."""
+        return _Slot(self, user)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "waiting_users": len(self._queues),
+        }
+
+
+class _Slot:
+    __slots__ = ("scheduler", "user")
+
+    def __init__(self, scheduler: FairScheduler, user: str):
+        self.scheduler = scheduler
+        self.user = user
+
+    async def __aenter__(self) -> None:
+        await self.scheduler.acquire(self.user)
+
+    async def __aexit__(self, *exc) -> None:
+        self.scheduler.release(self.user)
+
+
+@lru_cache(maxsize=8)
+def parse_weights(spec: str) -> dict[str, float]:
+    """``FAIR_USER_WEIGHTS`` ("user-a=2,user-b=0.5") as {user: weight}."""
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        user, _, weight = item.partition("=")
+        weights[user.strip()] = float(weight)
+    return weights
+
+
+def scheduler_stats() -> dict[str, dict]:
+    return {name: scheduler.snapshot() for name, scheduler in sorted(_schedulers.items())}
@@ -0,0 +1,110 @@
+"""Segment alignment and character-level diffs between two script versions.
+
+Diffing CJK text one character at a time with ``difflib`` is quadratic in
+practice (no word boundaries, and ``autojunk`` would throw away common
+characters), so ``char_diff`` diffs clause by clause first and only goes down
+to characters inside clauses that changed.
+"""
+
+from __future__ import annotations
+
+import re
+from difflib import SequenceMatcher
+
+# A clause: text up to and including the next punctuation mark or newline
+_CLAUSE = re.compile(r"[^，。！？；：、「」,.!?;:\n]*[，。！？；：、「」,.!?;:\n]?")
+# Changed clause runs longer than this are shown as a whole delete + insert
+MAX_CHAR_DIFF = 400
+
+Op = tuple[str, str]  # ("=" | "-" | "+", text)
+
+
+def _clauses(text: str) -> list[str]:
+    return [c for c in _CLAUSE.findall(text) if c]
+
+
+def _append(ops: list[Op], op: str, text: str) -> None:
+    if not text:
+        return
+    if ops and ops[-1][0] == op:
+        ops[-1] = (op, ops[-1][1] + text)
+    else:
+        ops.append((op, text))
+
+
+def _char_ops(ops: list[Op], a: str, b: str) -> None:
+    if len(a) > MAX_CHAR_DIFF or len(b) > MAX_CHAR_DIFF:
+        _append(ops, "-", a)
+        _append(ops, "+", b)
+        return
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            _append(ops, "=", a[i1:i2])
+        else:
+            _append(ops, "-", a[i1:i2])
+            _append(ops, "+", b[j1:j2])
+
+
+def char_diff(a: str, b: str) -> list[Op]:
+    """Edit script turning ``a`` into ``b`` as ("=", "-", "+") runs."""
+    ops: list[Op] = []
+    prefix = 0
+    limit = min(len(a), len(b))
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    _append(ops, "=", a[:prefix])
+
+    a_mid, b_mid = a[prefix:len(a) - suffix], b[prefix:len(b) - suffix]
+    ca, cb = _clauses(a_mid), _clauses(b_mid)
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, ca, cb, autojunk=False).get_opcodes():
+        old, new = "".join(ca[i1:i2]), "".join(cb[j1:j2])
+        if tag == "equal":
+            _append(ops, "=", old)
+        else:
+            _char_ops(ops, old, new)
+
+    _append(ops, "=", a[len(a) - suffix:])
+    return ops
+
+
+def _key(segment: dict) -> tuple:
+    return segment.get("segment_type"), segment.get("label")
+
+
+def diff_segments(old: list[dict], new: list[dict]) -> list[dict]:
+    """Align two ordered segment lists by (segment_type, label) and diff each pair.
+
+    Segments are dicts with ``segment_id``, ``segment_type``, ``label``,
+    ``content`` and ``body_hash``; equal bodies are reported unchanged without
+    looking at the text.
+    """
+    entries: list[dict] = []
+
+    def entry(status: str, before: dict | None, after: dict | None, ops: list[Op] | None = None) -> None:
+        seg = after or before
+        entries.append({
+            "status": status,
+            "segment_type": seg.get("segment_type"),
+            "label": seg.get("label"),
+            "from_segment_id": before["segment_id"] if before else None,
+            "to_segment_id": after["segment_id"] if after else None,
+            "ops": [list(op) for op in ops] if ops is not None else None,
+        })
+
+    matcher = SequenceMatcher(None, [_key(s) for s in old], [_key(s) for s in new], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            for before, after in zip(old[i1:i2], new[j1:j2]):
+                if before["body_hash"] == after["body_hash"]:
+                    entry("unchanged", before, after)
+                else:
+                    entry("modified", before, after, char_diff(before["content"], after["content"]))
+            continue
+        for before in old[i1:i2]:
+            entry("removed", before, None, [("-", before["content"])])
+        for after in new[j1:j2]:
+            entry("added", None, after, [("+", after["content"])])
+    return entries
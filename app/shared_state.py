@@ -0,0 +1,296 @@
+"""Counters and small cached values shared between worker processes and instances.
+
+``SHARED_STATE_URL`` picks the backend; empty (the default) keeps rate limits
+and caches in each process, as before:
+
+- ``sqlite:///data/shared.db``: every worker on one host (``SQLiteState``)
+- ``redis://[:password@]host[:port][/db]``: every instance that can reach the
+  Redis server (``RedisState``, a minimal RESP client)
+
+Both backends offer the same four operations on string values. ``incr`` is
+atomic across processes and creates missing (or expired) keys with the given
+TTL, which later increments keep; that is all a windowed rate limit needs.
+Errors surface as ``SharedStateError`` so callers can fall back to local state.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from urllib.parse import unquote, urlsplit
+
+import aiosqlite
+
+_SWEEP_INTERVAL_SECONDS = 60.0
+
+
+class SharedStateError(Exception):
+    """The shared-state backend is unreachable or rejected a command."""
+
+
+class SharedState(ABC):
+    @abstractmethod
+    async def incr(self, key: str, amount: int = 1, ttl: float = 60.0) -> int:
+        """Add ``amount`` to the integer at ``key`` and return the new value."""
+        ...
+
+    @abstractmethod
+    async def get(self, key: str) -> str | None:
+        """The value at ``key``, or None if missing or expired."""
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        """Store ``value`` at ``key`` for ``ttl`` seconds."""
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class SQLiteState(SharedState):
+    """A WAL-mode SQLite file in autocommit mode: each operation is one statement.
+
+    Separate from the application database so that rate-limit writes never
+    queue behind (or hold up) request transactions.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._db: aiosqlite.Connection | None = None
+        self._connect_lock = asyncio.Lock()
+        self._next_sweep = 0.0
+
+    async def _conn(self) -> aiosqlite.Connection:
+        if self._db is None:
+            async with self._connect_lock:
+                if self._db is None:
+                    try:
+                        db = await aiosqlite.connect(self._path, isolation_level=None)
+                        for pragma in ("journal_mode=WAL", "synchronous=NORMAL", "busy_timeout=5000"):
+                            async with db.execute(f"PRAGMA {pragma}"):
+                                pass
+                        await db.execute(
+                            """CREATE TABLE IF NOT EXISTS shared_state (
+                                   key TEXT PRIMARY KEY,
+                                   value NOT NULL,
+                                   expires_at REAL NOT NULL
+                               ) WITHOUT ROWID"""
+                        )
+                    except (OSError, aiosqlite.Error) as e:
+                        raise SharedStateError(f"Cannot open shared state {self._path}: {e}") from e
+                    self._db = db
+        return self._db
+
+    async def _fetchone(self, sql: str, params: tuple) -> tuple | None:
+        db = await self._conn()
+        now = time.time()
+        try:
+            if now >= self._next_sweep:
+                self._next_sweep = now + _SWEEP_INTERVAL_SECONDS
+                await db.execute("DELETE FROM shared_state WHERE expires_at <= ?", (now,))
+            async with db.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+        except aiosqlite.Error as e:
+            raise SharedStateError(f"Shared state query failed: {e}") from e
+
+    async def incr(self, key: str, amount: int = 1, ttl: float = 60.0) -> int:
+        now = time.time()
+        # Expired rows restart from ``amount`` with a fresh TTL, as if absent
+        row = await self._fetchone(
+            """INSERT INTO shared_state (key, value, expires_at) VALUES (?1, ?2, ?3)
+               ON CONFLICT(key) DO UPDATE SET
+                   value = CASE WHEN expires_at <= ?4 THEN ?2 ELSE CAST(value AS INTEGER) + ?2 END,
+                   expires_at = CASE WHEN expires_at <= ?4 THEN ?3 ELSE expires_at END
+               RETURNING value""",
+            (key, amount, now + ttl, now),
+        )
+        return int(row[0])
+
+    async def get(self, key: str) -> str | None:
+        row = await self._fetchone(
+            "SELECT value FROM shared_state WHERE key = ? AND expires_at > ?", (key, time.time())
+        )
+        return None if row is None else str(row[0])
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self._fetchone(
+            "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl),
+        )
+
+    async def delete(self, key: str) -> None:
+        await self._fetchone("DELETE FROM shared_state WHERE key = ?", (key,))
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+
+class RedisState(SharedState):
+    """Just enough RESP2 for the operations above, over one pipelined connection.
+
+    Commands are serialized on the connection; a dropped connection is
+    reopened by the next command.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        password: str | None = None,
+        timeout: float = 1.0,
+    ):
+        self._host = host
+        self._port = port
+        self._db = db
+        self._password = password
+        self._timeout = timeout
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_url(cls, url: str) -> RedisState:
+        parts = urlsplit(url)
+        db = parts.path.strip("/")
+        return cls(
+            host=parts.hostname or "localhost",
+            port=parts.port or 6379,
+            db=int(db) if db else 0,
+            password=unquote(parts.password) if parts.password else None,
+        )
+
+    @staticmethod
+    def _encode(*args: str | int) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = str(arg).encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(out)
+
+    async def _read_reply(self):
+        line = await self._reader.readuntil(b"\r\n")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise SharedStateError(f"Redis error: {body.decode()}")
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            if size < 0:
+                return None
+            return (await self._reader.readexactly(size + 2))[:-2].decode("utf-8")
+        if kind == b"*":
+            count = int(body)
+            return None if count < 0 else [await self._read_reply() for _ in range(count)]
+        raise SharedStateError(f"Unexpected Redis reply: {line!r}")
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self._host, self._port)
+        setup = []
+        if self._password:
+            setup.append(("AUTH", self._password))
+        if self._db:
+            setup.append(("SELECT", self._db))
+        if setup:
+            self._writer.write(b"".join(self._encode(*command) for command in setup))
+            for _ in setup:
+                await self._read_reply()
+
+    async def _pipeline(self, *commands: tuple) -> list:
+        """Send ``commands`` in one write and return their replies in order."""
+        async with self._lock:
+            error = None
+            try:
+                async with asyncio.timeout(self._timeout):
+                    if self._writer is None:
+                        await self._connect()
+                    self._writer.write(b"".join(self._encode(*command) for command in commands))
+                    await self._writer.drain()
+                    replies = []
+                    for _ in commands:
+                        # Read every reply even after an error to keep the stream in step
+                        try:
+                            replies.append(await self._read_reply())
+                        except SharedStateError as e:
+                            error = error or e
+                            replies.append(None)
+            except (OSError, EOFError, TimeoutError) as e:
+                self._drop()
+                raise SharedStateError(f"Redis at {self._host}:{self._port} unavailable: {e!r}") from e
+            except BaseException:
+                # Cancelled or failed mid-exchange: the stream is out of step
+                self._drop()
+                raise
+            if error is not None:
+                raise error
+            return replies
+
+    def _drop(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def incr(self, key: str, amount: int = 1, ttl: float = 60.0) -> int:
+        # SET NX gives a new key its TTL; INCRBY keeps it. MULTI makes the pair atomic.
+        replies = await self._pipeline(
+            ("MULTI",),
+            ("SET", key, 0, "PX", max(1, int(ttl * 1000)), "NX"),
+            ("INCRBY", key, amount),
+            ("EXEC",),
+        )
+        return int(replies[-1][1])
+
+    async def get(self, key: str) -> str | None:
+        return (await self._pipeline(("GET", key)))[0]
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self._pipeline(("SET", key, value, "PX", max(1, int(ttl * 1000))))
+
+    async def delete(self, key: str) -> None:
+        await self._pipeline(("DEL", key))
+
+    async def close(self) -> None:
+        async with self._lock:
+            self._drop()
+
+
+def open_shared_state(url: str) -> SharedState:
+    """Backend for a ``SHARED_STATE_URL``."""
+    if url.startswith("sqlite:///"):
+        return SQLiteState(url.removeprefix("sqlite:///"))
+    if url.startswith("redis://"):
+        return RedisState.from_url(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url!r} (expected sqlite:/// or redis://)")
+
+
+_shared: SharedState | None = None
+
+
+def shared_state() -> SharedState | None:
+    """The configured backend, or None when state is per-process."""
+    global _shared
+    from app.config import settings
+
+    if not settings.shared_state_url:
+        return None
+    if _shared is None:
+        _shared = open_shared_state(settings.shared_state_url)
+    return _shared
+
+
+async def close_shared_state() -> None:
+    global _shared
+    if _shared is not None:
+        await _shared.close()
+        _shared = None
@@ -0,0 +1,130 @@
+"""Background warm-up after the server starts listening.
+
+Uvicorn binds the port only after the lifespan's startup half returns, and
+that still runs, blocking, prompt validation, ``init_db`` (restoring the
+write-behind replica first if configured), creating the audio dir and
+starting the job workers. Every request needs the schema, so it stays in
+front of the bind. It is cheap when the schema is current (one PRAGMA
+read), but a replica restore or a migration delays the bind by its full
+duration. The rest of a cold start runs here, in the background, once the
+port is bound:
+
+- ``sdks``: importing the provider SDKs (anthropic, google-genai, Cloud TTS),
+  which the factories otherwise do inside the first request, ~2 s together;
+- ``providers``: constructing the server-key provider clients;
+- ``db``: a first read of the hot tables, so their pages are cached.
+
+``/health`` answers as soon as the process serves; ``/ready`` reports 503
+until warm-up has finished, with per-step status, so a load balancer or the
+Cloud Run startup probe can hold traffic until then. A failed step is logged
+and reported but does not keep the instance unready: requests then pay for it
+themselves, as they did before.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import time
+from collections.abc import Awaitable, Callable
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SDK_MODULES = (
+    "app.llm.claude_provider",
+    "app.llm.gemini_provider",
+    "app.tts.gemini_tts_provider",
+    "app.tts.cloud_tts_provider",
+)
+
+_steps: dict[str, dict] = {}
+_task: asyncio.Task | None = None
+
+
+def _import_sdks() -> None:
+    for module in SDK_MODULES:
+        importlib.import_module(module)
+
+
+def _warm_providers() -> None:
+    from app.llm.factory import get_provider
+    from app.tts.factory import get_tts_provider
+
+    if settings.fake_providers or settings.anthropic_api_key:
+        get_provider("claude")
+    if settings.fake_providers or settings.gemini_api_key:
+        get_provider("gemini")
+        get_tts_provider("gemini")
+    # Cloud TTS authenticates with ADC, whose lookup may go to the metadata
+    # server; its first request creates the client
+
+
+async def _warm_db() -> None:
+    from app.db import get_db
+
+    async with get_db() as db:
+        for table in ("projects", "scripts", "script_segments", "jobs"):
+            async with db.execute(f"SELECT count(*) FROM {table}"):
+                pass
+
+
+async def _run_step(name: str, work: Callable[[], Awaitable[None]]) -> None:
+    step = _steps[name]
+    step["status"] = "running"
+    start = time.perf_counter()
+    try:
+        await work()
+    except Exception as e:
+        step.update(status="failed", error=f"{type(e).__name__}: {e}")
+        logger.warning("Warm-up step %s failed: %s", name, e)
+    else:
+        step["status"] = "ok"
+    step["seconds"] = round(time.perf_counter() - start, 3)
+
+
+async def warm_up() -> None:
+    """Run every warm-up step in order; imports run in a thread, off the event loop."""
+    work: dict[str, Callable[[], Awaitable[None]]] = {
+        "sdks": lambda: asyncio.to_thread(_import_sdks),
+        "providers": lambda: asyncio.to_thread(_warm_providers),
+        "db": _warm_db,
+    }
+    for name in work:
+        _steps[name] = {"status": "pending"}
+    start = time.perf_counter()
+    for name, step in work.items():
+        await _run_step(name, step)
+    logger.info("Warm-up finished in %.2fs: %s", time.perf_counter() - start, readiness()["steps"])
+
+
+def start_warmup() -> asyncio.Task | None:
+    global _task
+    _steps.clear()
+    if not settings.startup_warmup:
+        return None
+    _task = asyncio.create_task(warm_up())
+    return _task
+
+
+async def stop_warmup() -> None:
+    global _task
+    if _task is not None and not _task.done():
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+    _task = None
+
+
+def readiness() -> dict:
+    """Whether warm-up has finished, and how each step went."""
+    ready = all(step["status"] in ("ok", "failed") for step in _steps.values())
+    return {"ready": ready, "steps": {name: dict(step) for name, step in _steps.items()}}
+
+
+def step_seconds() -> dict[str, float]:
+    return {name: step["seconds"] for name, step in _steps.items() if "seconds" in step}
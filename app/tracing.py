@@ -0,0 +1,284 @@
+"""Per-request trace spans, reported as a Server-Timing header and optionally exported.
+
+Sampling is off by default; ``trace_sample_rate`` opts a share of requests
+in. A caller's sampled ``traceparent`` forces tracing only with
+``trace_follow_traceparent``, since the Server-Timing header names internal
+stages and every trace costs an export. A sampled request gets a ``Trace`` in a context variable; ``span()`` blocks (DB connect
+and queries, key decryption, LLM/TTS calls, audio writes) append finished
+spans to it. Unsampled requests and background work outside a
+request pay one ContextVar lookup per span.
+
+Finished traces can be exported as OTLP/JSON (the OpenTelemetry protocol's
+JSON encoding): appended one request per line to ``trace_export_path`` and/or
+POSTed to an OTLP/HTTP collector at ``trace_export_url`` over one shared
+session. A sampled request with a valid W3C ``traceparent`` header joins the
+caller's trace.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import re
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_SPANS = 256  # per trace; further spans are counted but dropped
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[str | None] = ContextVar("current_span", default=None)
+
+_pending_exports: set[asyncio.Task] = set()
+_session = None  # aiohttp.ClientSession for trace_export_url, created on first export
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name, span_id, parent_id, start_ns, end_ns, attributes, error):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start_ns = start_ns
+        self.end_ns = end_ns
+        self.attributes = attributes
+        self.error = error
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+class Trace:
+    """Spans of one request. ``root_id`` is the server span the others hang off."""
+
+    def __init__(self, trace_id: str | None = None, parent_id: str | None = None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.parent_id = parent_id  # the caller's span, from traceparent
+        self.root_id = secrets.token_hex(8)
+        self.spans: list[Span] = []
+        self.dropped = 0
+        self._wall_ns = time.time_ns()
+        self._start_ns = time.perf_counter_ns()
+        self.end_ns: int | None = None
+
+    def add(self, span: Span) -> None:
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+    def finish(self) -> None:
+        self.end_ns = time.perf_counter_ns()
+
+    def server_timing(self) -> str:
+        """Header value: spans summed per name, in first-seen order, then the total."""
+        totals: dict[str, list] = {}
+        for span in self.spans:
+            entry = totals.setdefault(span.name, [0.0, 0])
+            entry[0] += span.duration_ms
+            entry[1] += 1
+        parts = []
+        for name, (ms, count) in totals.items():
+            part = f"{name};dur={ms:.1f}"
+            if count > 1:
+                part += f';desc="{count}x"'
+            parts.append(part)
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        parts.append(f"total;dur={(end - self._start_ns) / 1e6:.1f}")
+        return ", ".join(parts)
+
+    def to_otlp(self, name: str, attributes: dict | None = None, error: bool = False) -> dict:
+        """The trace as an OTLP/JSON ExportTraceServiceRequest with a server root span."""
+
+        def wall(ns: int) -> str:
+            return str(self._wall_ns + ns - self._start_ns)
+
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        root = {
+            "traceId": self.trace_id,
+            "spanId": self.root_id,
+            "name": name,
+            "kind": 2,  # SERVER
+            "startTimeUnixNano": wall(self._start_ns),
+            "endTimeUnixNano": wall(end),
+            "attributes": _attributes(attributes or {}),
+            "status": {"code": 2 if error else 0},
+        }
+        if self.parent_id:
+            root["parentSpanId"] = self.parent_id
+        spans = [root]
+        for span in self.spans:
+            spans.append({
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent_id or self.root_id,
+                "name": span.name,
+                "kind": 1,  # INTERNAL
+                "startTimeUnixNano": wall(span.start_ns),
+                "endTimeUnixNano": wall(span.end_ns),
+                "attributes": _attributes(span.attributes),
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+            })
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _attributes({"service.name": settings.trace_service_name})},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+            }]
+        }
+
+
+def _attributes(values: dict) -> list[dict]:
+    out = []
+    for key, value in values.items():
+        if isinstance(value, bool):
+            out.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            out.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            out.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            out.append({"key": key, "value": {"stringValue": str(value)}})
+    return out
+
+
+# -- Recording ---------------------------------------------------------------
+
+
+def start_trace(traceparent: str | None = None, sample_rate: float | None = None) -> Trace | None:
+    """A new trace for this request, or None if it isn't sampled.
+
+    ``sample_rate`` decides; with ``trace_follow_traceparent`` a valid
+    ``traceparent`` with the sampled flag forces sampling (the caller is
+    already recording this trace). Any client can send one, so it's off by
+    default.
+    """
+    rate = settings.trace_sample_rate if sample_rate is None else sample_rate
+    match = _TRACEPARENT.match(traceparent.strip().lower()) if traceparent else None
+    forced = match is not None and settings.trace_follow_traceparent and int(match.group(3), 16) & 1
+    if not forced and (rate <= 0 or (rate < 1 and random.random() >= rate)):
+        return None
+    return Trace(match.group(1), match.group(2)) if match else Trace()
+
+
+def activate(trace: Trace | None):
+    """Make ``trace`` current; returns a token for ``deactivate``."""
+    return _current_trace.set(trace)
+
+
+def deactivate(token) -> None:
+    _current_trace.reset(token)
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the block as a child of the current span; no-op outside a sampled trace.
+
+    Only use around code that starts and ends in the same task (not across
+    ``yield`` in an async generator); use ``record_span`` there instead.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    span_id = secrets.token_hex(8)
+    parent_id = _current_span.get()
+    token = _current_span.set(span_id)
+    error = None
+    start = time.perf_counter_ns()
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        end = time.perf_counter_ns()
+        _current_span.reset(token)
+        trace.add(Span(name, span_id, parent_id, start, end, attributes, error))
+
+
+def record_span(name: str, seconds: float, error: BaseException | None = None, **attributes) -> None:
+    """Record a span that ended now and lasted ``seconds`` (for work timed elsewhere)."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    end = time.perf_counter_ns()
+    trace.add(Span(
+        name,
+        secrets.token_hex(8),
+        _current_span.get(),
+        end - int(seconds * 1e9),
+        end,
+        attributes,
+        type(error).__name__ if error is not None else None,
+    ))
+
+
+# -- Export ------------------------------------------------------------------
+
+
+def _append(path: str, line: str) -> None:
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with target.open("a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+async def _post(url: str, payload: dict) -> None:
+    global _session
+    import aiohttp
+
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5))
+    async with _session.post(url, json=payload) as resp:
+        resp.raise_for_status()
+
+
+async def _export(payload: dict) -> None:
+    try:
+        if settings.trace_export_path:
+            line = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+            await asyncio.to_thread(_append, settings.trace_export_path, line)
+        if settings.trace_export_url:
+            await _post(settings.trace_export_url, payload)
+    except Exception as e:
+        logger.warning("Trace export failed: %s", e)
+
+
+def export_trace(trace: Trace, name: str, attributes: dict | None = None, error: bool = False) -> None:
+    """Export in the background if an exporter is configured; never blocks the response."""
+    if not (settings.trace_export_path or settings.trace_export_url):
+        return
+    task = asyncio.get_running_loop().create_task(_export(trace.to_otlp(name, attributes, error)))
+    _pending_exports.add(task)
+    task.add_done_callback(_pending_exports.discard)
+
+
+async def flush_exports() -> None:
+    """Wait for in-flight exports (shutdown, tests)."""
+    if _pending_exports:
+        await asyncio.gather(*list(_pending_exports), return_exceptions=True)
+
+
+async def close_exports() -> None:
+    """Flush in-flight exports and close the collector session (shutdown)."""
+    global _session
+    await flush_exports()
+    if _session is not None:
+        await _session.close()
+        _session = None
@@ -5,6 +5,8 @@ from __future__ import annotations
 from pathlib import Path
 from uuid import uuid4
 
+from app.tracing import span
+
 _AUDIO_DIR = Path("data/audio")
 
 
@@ -17,13 +19,19 @@ def init_audio_dir(base: Path | None = None) -> None:
 
 def save_audio(audio_bytes: bytes, extension: str = ".mp3") -> str:
     """Save audio bytes to local storage and return the filename."""
-    _AUDIO_DIR.mkdir(parents=True, exist_ok=True)
-    filename = f"{uuid4()}{extension}"
-    path = _AUDIO_DIR / filename
-    path.write_bytes(audio_bytes)
+    with span("audio.save", bytes=len(audio_bytes)):
+        _AUDIO_DIR.mkdir(parents=True, exist_ok=True)
+        filename = f"{uuid4()}{extension}"
+        path = _AUDIO_DIR / filename
+        path.write_bytes(audio_bytes)
     return filename
 
 
+def delete_audio(filename: str) -> None:
+    """Remove a stored audio file if it exists."""
+    (_AUDIO_DIR / filename).unlink(missing_ok=True)
+
+
 def get_audio_path(filename: str) -> Path:
     return _AUDIO_DIR / filename
 
@@ -12,8 +12,13 @@ def get_tts_provider(name: str) -> TTSProvider:
     if name in _instances:
         return _instances[name]
 
-    if name == "gemini":
-        from app.config import settings
+    from app.config import settings
+
+    if settings.fake_providers and name in ("gemini", "google"):
+        from app.tts.fake_tts_provider import FakeTTSProvider
+
+        provider = FakeTTSProvider.from_settings(name)
+    elif name == "gemini":
         from app.tts.gemini_tts_provider import GeminiTTSProvider
 
         provider = GeminiTTSProvider(
@@ -33,8 +38,11 @@ def get_tts_provider(name: str) -> TTSProvider:
 
 def _create_tts_provider(name: str, api_key: str) -> TTSProvider:
     """Create a fresh (non-cached) TTS provider with the given API key."""
+    from app.config import settings
+
+    if settings.fake_providers:
+        return get_tts_provider(name)
     if name == "gemini":
-        from app.config import settings
         from app.tts.gemini_tts_provider import GeminiTTSProvider
 
         return GeminiTTSProvider(api_key=api_key, model=settings.gemini_tts_model)
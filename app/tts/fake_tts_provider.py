@@ -0,0 +1,72 @@
+"""Deterministic in-process TTS provider for load testing (``FAKE_PROVIDERS=true``)."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import random
+
+from app.llm.fake_provider import sample_latency
+from app.tts.base import TTSError, TTSProvider
+
+
+class FakeTTSProvider(TTSProvider):
+    """Returns ``bytes_per_char`` bytes of filler "audio" per input character.
+
+    Latency grows with the text (``latency_ms`` is the median for 100
+    characters) and a share of calls fails with ``TTSError``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        latency_ms: float = 1500.0,
+        sigma: float = 0.5,
+        error_rate: float = 0.0,
+        bytes_per_char: int = 750,
+        seed: int = 0,
+    ):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.bytes_per_char = bytes_per_char
+        self._rng = random.Random(f"tts:{name}:{seed}")
+
+    @classmethod
+    def from_settings(cls, name: str) -> FakeTTSProvider:
+        from app.config import settings
+
+        return cls(
+            name,
+            latency_ms=settings.fake_tts_latency_ms,
+            sigma=settings.fake_latency_sigma,
+            error_rate=settings.fake_error_rate,
+            bytes_per_char=settings.fake_tts_bytes_per_char,
+            seed=settings.fake_seed,
+        )
+
+    def _audio(self, text: str) -> bytes:
+        block = hashlib.sha256(text.encode("utf-8")).digest()
+        size = max(len(text), 1) * self.bytes_per_char
+        return (block * (size // len(block) + 1))[:size]
+
+    async def synthesize(
+        self,
+        text: str,
+        voice: str = "",
+        speed: float = 1.0,
+        pitch: float = 0.0,
+        style_prompt: str = "",
+    ) -> bytes:
+        latency = sample_latency(self._rng, self.latency_ms * max(len(text), 1) / 100, self.sigma)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise TTSError("Fake TTS provider failed")
+        await asyncio.sleep(latency)
+        return self._audio(text)
+
+    async def synthesize_multi_speaker(self, text: str, speakers: list[dict], style_prompt: str = "") -> bytes:
+        return await self.synthesize(text, style_prompt=style_prompt)
+
+    def audio_format(self) -> str:
+        return ".mp3"
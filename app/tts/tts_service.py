@@ -3,12 +3,56 @@
 from __future__ import annotations
 
 import logging
+import time
+from collections.abc import Awaitable, Callable
 
+from app.metrics import TTS_AUDIO_BYTES, TTS_ERRORS, TTS_REQUEST_SECONDS
+from app.scheduling import FairScheduler, parse_weights
+from app.tracing import span
 from app.tts.factory import get_tts_provider, get_tts_provider_for_user
 
 logger = logging.getLogger(__name__)
 
 
+_schedulers: dict[str, FairScheduler] = {}
+
+
+def tts_scheduler(provider_name: str) -> FairScheduler:
+    """Per-provider slots (``tts_concurrency``), shared fairly between users."""
+    scheduler = _schedulers.get(provider_name)
+    if scheduler is None:
+        from app.config import settings
+
+        scheduler = _schedulers[provider_name] = FairScheduler(
+            f"tts.{provider_name}",
+            settings.tts_concurrency,
+            per_user_limit=settings.tts_user_concurrency,
+            weights=parse_weights(settings.fair_user_weights),
+        )
+    return scheduler
+
+
+def reset_tts_schedulers() -> None:
+    _schedulers.clear()
+
+
+async def _measured(
+    provider_name: str, mode: str, call: Callable[[], Awaitable[bytes]], user_id: str | None
+) -> bytes:
+    """Run a provider call in a fair slot, recording latency, audio size and failures for /metrics."""
+    async with tts_scheduler(provider_name).slot(user_id or ""):
+        start = time.perf_counter()
+        try:
+            with span(f"tts.{provider_name}", mode=mode):
+                audio = await call()
+        except Exception:
+            TTS_ERRORS.inc(provider_name)
+            raise
+    TTS_REQUEST_SECONDS.observe(time.perf_counter() - start, provider_name, mode)
+    TTS_AUDIO_BYTES.inc(provider_name, amount=len(audio))
+    return audio
+
+
 async def synthesize(
     text: str,
     voice: str = "female",
@@ -23,7 +67,9 @@ async def synthesize(
         provider = await get_tts_provider_for_user(user_id, provider_name)
     else:
         provider = get_tts_provider(provider_name)
-    audio = await provider.synthesize(text, voice, speed, pitch, style_prompt)
+    audio = await _measured(
+        provider_name, "single", lambda: provider.synthesize(text, voice, speed, pitch, style_prompt), user_id
+    )
     return audio, provider.audio_format()
 
 
@@ -39,5 +85,10 @@ async def synthesize_multi_speaker(
         provider = await get_tts_provider_for_user(user_id, provider_name)
     else:
         provider = get_tts_provider(provider_name)
-    audio = await provider.synthesize_multi_speaker(text, speakers, style_prompt)
+    audio = await _measured(
+        provider_name,
+        "multi_speaker",
+        lambda: provider.synthesize_multi_speaker(text, speakers, style_prompt),
+        user_id,
+    )
     return audio, provider.audio_format()
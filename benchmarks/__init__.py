@@ -0,0 +1 @@
+"""Ad-hoc performance benchmarks; run each module with ``python -m benchmarks.<name>``."""
@@ -0,0 +1,94 @@
+"""Wall-clock of refining a whole script: one-by-one vs the batch endpoint.
+
+    python -m benchmarks.batch_refine [--segments 10] [--latency 0.5]
+
+Uses a temporary database and a fake LLM provider that sleeps for
+``--latency`` seconds per call, so the numbers reflect request fan-out only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+
+import app.db as db_module  # noqa: E402
+from app.api.rate_limit import _limiter  # noqa: E402
+from app.llm import factory  # noqa: E402
+from app.llm.base import LLMProvider  # noqa: E402
+
+USER = {"X-User-Id": "bench-user"}
+
+
+class SleepingProvider(LLMProvider):
+    name = "gemini"
+    model = "fake"
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def complete(self, system_prompt: str, user_message: str, task: str = "") -> dict:
+        await asyncio.sleep(self.latency)
+        return {"content": f"refined at {time.monotonic():.6f}"}
+
+
+async def _seed(segment_count: int) -> tuple[str, list[str]]:
+    async with db_module.get_db() as db:
+        await db_module.get_user_or_create(db, USER["X-User-Id"])
+        project_id = await db_module.create_project(db, USER["X-User-Id"], "效能測試", "工程師", 10, "輕鬆", 2, "gemini")
+        script_id = await db_module.create_script(db, project_id)
+        segment_ids = await db_module.create_segments(
+            db, script_id, [{"segment_type": "main", "content": f"段落 {i}"} for i in range(segment_count)]
+        )
+    return script_id, segment_ids
+
+
+async def run(segment_count: int, latency: float) -> None:
+    from app.config import settings
+    from app.main import app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        await db_module.init_db(os.path.join(tmp, "bench.db"))
+        settings.llm_cache_enabled = False
+        factory._instances["gemini"] = SleepingProvider(latency)
+        script_id, segment_ids = await _seed(segment_count)
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            start = time.perf_counter()
+            for segment_id in segment_ids:
+                _limiter._windows.clear()
+                resp = await client.post(
+                    f"/api/v1/scripts/segments/{segment_id}/refine", json={"content": "更幽默"}, headers=USER
+                )
+                resp.raise_for_status()
+            sequential = time.perf_counter() - start
+
+            _limiter._windows.clear()
+            start = time.perf_counter()
+            resp = await client.post(f"/api/v1/scripts/{script_id}/refine", json={"instruction": "更幽默"}, headers=USER)
+            resp.raise_for_status()
+            batch = time.perf_counter() - start
+
+    print(f"segments={segment_count} latency={latency:.2f}s refine_concurrency={settings.refine_concurrency}")
+    print(f"  sequential single-segment calls: {sequential:6.2f}s")
+    print(f"  batch endpoint:                  {batch:6.2f}s  ({sequential / batch:.1f}x faster)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segments", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    asyncio.run(run(args.segments, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Commit latency on a slow, FUSE-like mount: DELETE journal in place vs the write-behind replica.
+
+    python -m benchmarks.db_replica [--commits 200] [--sync-ms 20] [--snapshot-seconds 1]
+
+Cloud Storage FUSE turns every sync, delete and rename on the mount into a
+GCS request. The stand-in here is a tiny LD_PRELOAD shim (compiled with the
+system C compiler into a temporary directory) that sleeps ``--sync-ms``
+in ``fsync``/``fdatasync``/``unlink``/``rename`` for files under the "mount"
+directory and passes everything else straight through, so SQLite's real
+syscall pattern decides what each mode pays.
+
+Each mode runs in a fresh interpreter with the shim preloaded and performs
+``--commits`` single-segment edits through ``app.db``, as the editor's
+autosave does:
+
+- ``mount``: the database on the mount with ``journal_mode=DELETE``, as
+  ``get_db`` does on Cloud Run today;
+- ``write-behind``: the database on local disk in WAL mode, snapshotted to
+  the mount every ``--snapshot-seconds`` while the edits run.
+
+Reported are commit latency percentiles, and for write-behind the number
+and duration of snapshots (the mount traffic that replaced per-commit syncs).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_SHIM = r"""
+#define _GNU_SOURCE
+#include <dlfcn.h>
+#include <limits.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+
+static int slow_path(const char *path) {
+    const char *dir = getenv("SLOW_FS_DIR");
+    return dir && path && strncmp(path, dir, strlen(dir)) == 0;
+}
+
+static int slow_fd(int fd) {
+    char link[64], path[PATH_MAX];
+    snprintf(link, sizeof link, "/proc/self/fd/%d", fd);
+    ssize_t n = readlink(link, path, sizeof path - 1);
+    if (n < 0) return 0;
+    path[n] = 0;
+    return slow_path(path);
+}
+
+static void slow_down(void) {
+    const char *us = getenv("SLOW_FS_DELAY_US");
+    usleep(us ? atoi(us) : 20000);
+}
+
+#define WRAP(ret, name, params, args, slow) \
+    ret name params { \
+        static ret (*real) params; \
+        if (!real) real = dlsym(RTLD_NEXT, #name); \
+        if (slow) slow_down(); \
+        return real args; \
+    }
+
+WRAP(int, fsync, (int fd), (fd), slow_fd(fd))
+WRAP(int, fdatasync, (int fd), (fd), slow_fd(fd))
+WRAP(int, unlink, (const char *path), (path), slow_path(path))
+WRAP(int, rename, (const char *old, const char *new), (old, new), slow_path(new))
+"""
+
+
+def build_shim(directory: Path) -> Path:
+    compiler = shutil.which(os.environ.get("CC", "cc"))
+    if compiler is None:
+        sys.exit("benchmarks.db_replica needs a C compiler (cc) for its slow-filesystem shim")
+    source = directory / "slowfs.c"
+    source.write_text(_SHIM)
+    library = directory / "slowfs.so"
+    subprocess.run([compiler, "-shared", "-fPIC", "-O2", "-o", str(library), str(source), "-ldl"], check=True)
+    return library
+
+
+async def _edits(mode: str, mount: Path, local: Path, commits: int, snapshot_seconds: float) -> dict:
+    import app.db as db_module
+    from app.db_replica import Snapshotter
+
+    snapshot = mount / "podcast.db"
+    if mode == "mount":
+        await db_module.init_db(str(snapshot), journal_mode="DELETE")
+    else:
+        await db_module.init_db(str(local / "podcast.db"), journal_mode="WAL")
+    async with db_module.get_db() as db:
+        await db_module.upsert_user(db, "user-1", "user-1")
+        pid = await db_module.create_project(db, "user-1", "AI", "devs", 30, "輕鬆閒聊", 1, "gemini")
+        sid = await db_module.create_script(db, pid)
+        segments = [{"content": f"第 {i} 段" * 40, "segment_type": "body"} for i in range(12)]
+        segment_ids = await db_module.create_segments(db, sid, segments)
+
+    snapshotter = None
+    snapshot_times: list[float] = []
+    if mode == "write-behind":
+        snapshotter = Snapshotter(local / "podcast.db", snapshot, snapshot_seconds)
+
+        async def snapshots():
+            while True:
+                await asyncio.sleep(snapshot_seconds)
+                start = time.perf_counter()
+                if await snapshotter.snapshot_now():
+                    snapshot_times.append(time.perf_counter() - start)
+
+        task = asyncio.create_task(snapshots())
+
+    latencies = []
+    for i in range(commits):
+        start = time.perf_counter()
+        async with db_module.get_db() as db:
+            await db_module.update_segment(db, segment_ids[i % len(segment_ids)], f"修改 {i} " * 40)
+        latencies.append(time.perf_counter() - start)
+
+    if snapshotter is not None:
+        task.cancel()
+        start = time.perf_counter()
+        await snapshotter.snapshot_now()
+        snapshot_times.append(time.perf_counter() - start)
+    return {"latencies": latencies, "snapshots": snapshot_times}
+
+
+def _run_mode(mode: str, shim: Path, args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        mount, local = Path(tmp) / "mount", Path(tmp) / "local"
+        mount.mkdir()
+        local.mkdir()
+        env = {
+            **os.environ,
+            "PYTHONPATH": str(ROOT),
+            "LD_PRELOAD": str(shim),
+            "SLOW_FS_DIR": str(mount.resolve()),
+            "SLOW_FS_DELAY_US": str(int(args.sync_ms * 1000)),
+        }
+        command = [sys.executable, "-m", "benchmarks.db_replica", "--child", mode, "--mount", str(mount)]
+        command += ["--local", str(local), "--commits", str(args.commits)]
+        command += ["--snapshot-seconds", str(args.snapshot_seconds)]
+        proc = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:>8.1f}ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commits", type=int, default=200)
+    parser.add_argument("--sync-ms", type=float, default=20.0, help="delay per sync/delete/rename on the mount")
+    parser.add_argument("--snapshot-seconds", type=float, default=1.0)
+    parser.add_argument("--child", choices=["mount", "write-behind"], help=argparse.SUPPRESS)
+    parser.add_argument("--mount", help=argparse.SUPPRESS)
+    parser.add_argument("--local", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = asyncio.run(
+            _edits(args.child, Path(args.mount), Path(args.local), args.commits, args.snapshot_seconds)
+        )
+        print(json.dumps(result))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shim = build_shim(Path(tmp))
+        print(f"{args.commits} commits, {args.sync_ms:.0f}ms per sync/delete/rename on the mount\n")
+        print(f"{'mode':<14} {'p50':>10} {'p95':>10} {'p99':>10} {'total':>9}  snapshots")
+        for mode in ("mount", "write-behind"):
+            result = _run_mode(mode, shim, args)
+            latencies = sorted(result["latencies"])
+            p95, p99 = (latencies[min(len(latencies) - 1, int(len(latencies) * q))] for q in (0.95, 0.99))
+            snapshots = result["snapshots"]
+            detail = f"{len(snapshots)}, median {statistics.median(snapshots) * 1000:.0f}ms" if snapshots else "-"
+            print(
+                f"{mode:<14} {_ms(statistics.median(latencies))} {_ms(p95)} {_ms(p99)} "
+                f"{sum(latencies):>8.2f}s  {detail}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Replay the real user flow against the API at a target concurrency.
+
+    python -m benchmarks.load_test [--users 20] [--duration 60] [--base-url URL]
+        [--llm-latency-ms 2000] [--tts-latency-ms 1500] [--error-rate 0.0] [--job-workers N]
+
+Each virtual user loops over create project → generate titles → select one
+→ generate script → TTS per segment → feedback → export, as a fresh user
+every round (the per-user rate limits are sized for one person, not a
+load test). Jobs are followed by polling ``GET /jobs/{job_id}``.
+
+Without ``--base-url`` the app runs in-process on a temporary database with
+``FAKE_PROVIDERS`` on and the latency/error options applied; client and
+server then share one event loop. Against a running server, start it with
+``FAKE_PROVIDERS=true`` (plus any ``FAKE_*`` settings) instead.
+
+Prints request count, errors, throughput and latency percentiles per
+endpoint, and completed flows per second.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import httpx  # noqa: E402
+
+
+class FlowError(Exception):
+    def __init__(self, step: str, detail: str):
+        super().__init__(f"{step}: {detail}")
+        self.step = step
+
+
+class Recorder:
+    """Latencies and errors per endpoint label ("POST /projects/{id}/titles/generate")."""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter[str] = Counter()
+        self.flows = 0
+        self.flow_seconds: list[float] = []
+        self.failed_flows: Counter[str] = Counter()
+
+    async def call(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.latencies[label].append(time.perf_counter() - start)
+            self.errors[label] += 1
+            raise FlowError(label, type(e).__name__) from e
+        self.latencies[label].append(time.perf_counter() - start)
+        if resp.status_code >= 400:
+            self.errors[label] += 1
+            raise FlowError(label, str(resp.status_code))
+        return resp
+
+
+async def _wait_for_job(rec: Recorder, client: httpx.AsyncClient, job: dict, headers: dict, poll: float) -> dict:
+    while job["status"] not in ("succeeded", "failed"):
+        await asyncio.sleep(poll)
+        resp = await rec.call(client, "GET /jobs/{id}", "GET", f"/api/v1/jobs/{job['job_id']}", headers=headers)
+        job = resp.json()["job"]
+    if job["status"] == "failed":
+        raise FlowError(f"job {job['kind']}", job.get("error") or "failed")
+    return job["result"]
+
+
+async def user_flow(rec: Recorder, client: httpx.AsyncClient, user_id: str, poll: float) -> None:
+    """One pass through the create → export flow as ``user_id``."""
+    headers = {"X-User-Id": user_id}
+    resp = await rec.call(client, "POST /projects", "POST", "/api/v1/projects", headers=headers, json={
+        "topic": "人工智慧會取代我們的工作嗎", "audience": "上班族", "duration_min": 20, "style": "輕鬆閒聊", "host_count": 2,
+    })
+    pid = resp.json()["project"]["project_id"]
+
+    resp = await rec.call(
+        client, "POST /projects/{id}/titles/generate", "POST", f"/api/v1/projects/{pid}/titles/generate", headers=headers
+    )
+    titles = (await _wait_for_job(rec, client, resp.json()["job"], headers, poll))["titles"]
+    await rec.call(
+        client, "POST /projects/{id}/titles/{id}/select", "POST",
+        f"/api/v1/projects/{pid}/titles/{titles[0]['title_id']}/select", headers=headers,
+    )
+
+    resp = await rec.call(
+        client, "POST /projects/{id}/scripts/generate", "POST", f"/api/v1/projects/{pid}/scripts/generate", headers=headers
+    )
+    segments = (await _wait_for_job(rec, client, resp.json()["job"], headers, poll))["segments"]
+
+    for segment in segments:
+        await rec.call(
+            client, "POST /scripts/segments/{id}/tts", "POST",
+            f"/api/v1/scripts/segments/{segment['segment_id']}/tts", headers=headers, json={"voice": "female"},
+        )
+
+    await rec.call(client, "POST /projects/{id}/feedback", "POST", f"/api/v1/projects/{pid}/feedback", headers=headers, json={
+        "score_content": 5, "score_engagement": 4, "score_structure": 5, "text_feedback": "很好聽",
+    })
+    await rec.call(client, "GET /projects/{id}/export/script", "GET", f"/api/v1/projects/{pid}/export/script", headers=headers)
+    await rec.call(client, "GET /projects/{id}/export/audio", "GET", f"/api/v1/projects/{pid}/export/audio", headers=headers)
+
+
+async def virtual_user(rec: Recorder, client: httpx.AsyncClient, index: int, deadline: float, poll: float) -> None:
+    round_no = 0
+    while time.monotonic() < deadline:
+        start = time.monotonic()
+        try:
+            await user_flow(rec, client, f"load-{index}-{round_no}", poll)
+        except FlowError as e:
+            rec.failed_flows[e.step] += 1
+        else:
+            rec.flows += 1
+            rec.flow_seconds.append(time.monotonic() - start)
+        round_no += 1
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def report(rec: Recorder, elapsed: float) -> str:
+    lines = [f"{'endpoint':<42} {'count':>6} {'err':>5} {'req/s':>7} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}  (ms)"]
+    for label in sorted(rec.latencies):
+        ordered = sorted(rec.latencies[label])
+        lines.append(
+            f"{label:<42} {len(ordered):>6} {rec.errors[label]:>5} {len(ordered) / elapsed:>7.2f} "
+            + " ".join(f"{_percentile(ordered, q) * 1000:>8.1f}" for q in (0.5, 0.9, 0.99))
+            + f" {ordered[-1] * 1000:>8.1f}"
+        )
+    flows = sorted(rec.flow_seconds)
+    lines.append("")
+    lines.append(
+        f"flows: {rec.flows} completed ({rec.flows / elapsed:.2f}/s), p50 {_percentile(flows, 0.5):.1f}s, "
+        f"p90 {_percentile(flows, 0.9):.1f}s; failed: {sum(rec.failed_flows.values())}"
+    )
+    for step, count in rec.failed_flows.most_common():
+        lines.append(f"  failed at {step}: {count}")
+    return "\n".join(lines)
+
+
+async def drive(client: httpx.AsyncClient, users: int, duration: float, poll: float) -> tuple[Recorder, float]:
+    rec = Recorder()
+    start = time.monotonic()
+    deadline = start + duration
+    # No new flows start after the deadline; those in flight run to completion
+    await asyncio.gather(*(virtual_user(rec, client, i, deadline, poll) for i in range(users)))
+    return rec, time.monotonic() - start
+
+
+async def run(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits) as client:
+            rec, elapsed = await drive(client, args.users, args.duration, args.poll_interval)
+        print(report(rec, elapsed))
+        return
+
+    import app.db as db_module
+    from app.config import settings
+    from app.jobs import start_workers, stop_workers
+    from app.llm import factory as llm_factory
+    from app.main import app
+    from app.tts import factory as tts_factory
+    from app.tts.audio_storage import init_audio_dir
+
+    settings.fake_providers = True
+    settings.fake_llm_latency_ms = args.llm_latency_ms
+    settings.fake_tts_latency_ms = args.tts_latency_ms
+    settings.fake_error_rate = args.error_rate
+    llm_factory._instances.clear()
+    tts_factory._instances.clear()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        await db_module.init_db(os.path.join(tmp, "load.db"))
+        init_audio_dir(Path(tmp) / "audio")
+        await start_workers(args.job_workers)
+        try:
+            # Server errors show up as 500s in the report rather than aborting the run
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=120) as client:
+                rec, elapsed = await drive(client, args.users, args.duration, args.poll_interval)
+        finally:
+            await stop_workers()
+    print(
+        f"in-process, {args.users} users, {args.duration:g}s, {args.job_workers} job workers, "
+        f"LLM {args.llm_latency_ms:g}ms, TTS {args.tts_latency_ms:g}ms/100 chars, errors {args.error_rate:.0%}\n"
+    )
+    print(report(rec, elapsed))
+
+
+def main() -> None:
+    from app.config import settings
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--base-url", help="running server (started with FAKE_PROVIDERS=true)")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="job polling interval, seconds")
+    parser.add_argument("--llm-latency-ms", type=float, default=settings.fake_llm_latency_ms)
+    parser.add_argument("--tts-latency-ms", type=float, default=settings.fake_tts_latency_ms)
+    parser.add_argument("--error-rate", type=float, default=settings.fake_error_rate)
+    parser.add_argument("--job-workers", type=int, default=settings.job_workers)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("app").setLevel(logging.CRITICAL)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+"""Microbenchmarks for the db layer and the TTS text/audio pipeline, with stored baselines.
+
+    python -m benchmarks.micro run [-k FILTER] [--json results.json]
+    python -m benchmarks.micro compare [--baseline PATH] [--threshold 0.3] [--results results.json]
+    python -m benchmarks.micro save-baseline [--baseline PATH] [--runs N]
+
+Fixtures are built once in a temporary database through the real schema:
+a user with 500 projects, a project with 200 script versions of 12
+segments, long Chinese scripts full of cues and a 30-minute 24 kHz PCM
+buffer. Each benchmark is auto-ranged (timeit-style) and timed over
+several rounds; the best round's per-call time is what gets compared
+(as timeit recommends, it is the least noisy statistic), both raw and
+relative to a fixed pure-Python calibration loop timed just before it;
+only a slowdown on both counts is a regression, so a host that is
+uniformly slower today (or a noisy neighbour) doesn't fail the build.
+Flagged benchmarks are re-run (twice by default) before ``compare`` fails.
+
+``compare`` runs the suite (or loads ``--results``) and exits 1 if any
+benchmark is slower than its baseline by more than ``--threshold``
+(0.3 = 30%). Baselines are machine-specific: regenerate them with
+``save-baseline`` on the machine that runs the comparison. The whole
+suite takes well under a minute offline.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import inspect
+import json
+import logging
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import app.db as db_module  # noqa: E402
+from app.script_diff import char_diff  # noqa: E402
+from app.tts.gemini_tts_provider import _ensure_wav  # noqa: E402
+from app.tts.ssml_builder import text_to_ssml  # noqa: E402
+from app.tts.text_preprocessor import extract_tone_cues, preprocess_for_gemini  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).with_name("baselines") / "micro.json"
+
+ROUNDS = 5  # at least; more for slow ops until MIN_TOTAL_SECONDS
+MAX_ROUNDS = 20
+MIN_ROUND_SECONDS = 0.05
+MIN_TOTAL_SECONDS = 0.5
+
+USER = "bench-user"
+PROJECTS = 500
+VERSIONS = 200
+SEGMENTS_PER_VERSION = 12
+PCM_SECONDS = 30 * 60
+PCM_RATE = 24000
+
+_CUES = ["(停頓)", "(長停頓)", "(輕鬆語氣)", "（活潑輕快）", "[BGM: 輕快音樂淡入]", "[SFX: 掌聲]"]
+
+
+def long_script(rng: random.Random, chars: int) -> str:
+    """Mandarin-looking text with cues, emphasis and paragraph breaks every so often."""
+    parts: list[str] = []
+    size = 0
+    while size < chars:
+        sentence = "".join(chr(rng.randint(0x4E00, 0x9FA5)) for _ in range(rng.randint(8, 30))) + "。"
+        roll = rng.random()
+        if roll < 0.15:
+            sentence = rng.choice(_CUES) + sentence
+        elif roll < 0.2:
+            sentence = f"(強調){sentence}(/強調)"
+        elif roll < 0.25:
+            sentence += "\n\n\n"
+        parts.append(sentence)
+        size += len(sentence)
+    return "".join(parts)
+
+
+class Fixtures:
+    """Data shared by all benchmarks; built once per run."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        rng = random.Random(44)
+        self.script_20k = long_script(rng, 20_000)
+        self.script_2k = long_script(rng, 2_000)
+        self.edited_2k = self.script_2k[:700] + "這裡加了一句新的話。" + self.script_2k[760:]
+        # Silence-free pseudo-random 16-bit mono PCM
+        self.pcm_30min = random.Random(1).randbytes(PCM_SECONDS * PCM_RATE * 2)
+        self.project_ids: list[str] = []
+        self.deep_project_id = ""
+        self.deep_script_id = ""
+        self.segment_id = ""
+
+    async def build(self) -> None:
+        await db_module.init_db(self.db_path)
+        rng = random.Random(7)
+        async with db_module.get_db() as db:
+            await db_module.get_user_or_create(db, USER)
+            for i in range(PROJECTS):
+                self.project_ids.append(
+                    await db_module.create_project(db, USER, f"第{i}集：人工智慧", "上班族", 30, "輕鬆閒聊", 2, "gemini")
+                )
+            pid = self.deep_project_id = self.project_ids[0]
+            script_id = await db_module.create_script(db, pid, version=1)
+            await db_module.create_segments(db, script_id, [
+                {"segment_type": f"core_{i}", "label": f"段落{i}", "content": long_script(rng, 600)}
+                for i in range(SEGMENTS_PER_VERSION)
+            ])
+            for version in range(2, VERSIONS + 1):
+                new_id = await db_module.create_script(db, pid, version=version, current=False)
+                edited = rng.randrange(SEGMENTS_PER_VERSION)
+                await db_module.copy_segments(db, script_id, new_id, replacements={edited: long_script(rng, 600)})
+                await db_module.set_current_script(db, pid, new_id)
+                script_id = new_id
+            self.deep_script_id = script_id
+            self.segment_id = (await db_module.get_segments_by_script(db, script_id))[0]["segment_id"]
+
+
+Benchmark = Callable[[Fixtures], Callable]
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def bench(name: str):
+    """Register ``factory(fixtures) -> op``; ``op`` is a sync function or a coroutine function."""
+
+    def register(factory: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = factory
+        return factory
+
+    return register
+
+
+# -- db layer ----------------------------------------------------------------
+# Ops taking ``db`` share one connection (and transaction) per benchmark and
+# call the public, instrumented functions, i.e. what request handlers call.
+
+
+@bench("db.get_db_roundtrip")
+def _get_db(fx: Fixtures):
+    async def op():
+        async with db_module.get_db() as db:
+            await db_module.get_user(db, USER)
+
+    return op
+
+
+@bench("db.get_user_or_create")
+def _user(fx: Fixtures):
+    return lambda db: db_module.get_user_or_create(db, USER)
+
+
+@bench("db.get_projects_by_user[500]")
+def _projects(fx: Fixtures):
+    return lambda db: db_module.get_projects_by_user(db, USER)
+
+
+@bench("db.get_project")
+def _project(fx: Fixtures):
+    return lambda db: db_module.get_project(db, fx.project_ids[250])
+
+
+@bench("db.get_current_script[200 versions]")
+def _current(fx: Fixtures):
+    return lambda db: db_module.get_current_script(db, fx.deep_project_id)
+
+
+@bench("db.get_script_version_count[200 versions]")
+def _versions(fx: Fixtures):
+    return lambda db: db_module.get_script_version_count(db, fx.deep_project_id)
+
+
+@bench("db.get_segments_by_script[12]")
+def _segments(fx: Fixtures):
+    return lambda db: db_module.get_segments_by_script(db, fx.deep_script_id)
+
+
+@bench("db.script_fingerprint")
+def _fingerprint(fx: Fixtures):
+    return lambda db: db_module.script_fingerprint(db, fx.deep_script_id)
+
+
+@bench("db.update_segment")
+def _update(fx: Fixtures):
+    counter = iter(range(10**9))
+    return lambda db: db_module.update_segment(db, fx.segment_id, f"{fx.script_2k[:300]}{next(counter)}")
+
+
+@bench("db.copy_segments[12]")
+def _copy(fx: Fixtures):
+    versions = iter(range(VERSIONS + 1, 10**9))
+
+    async def op(db):
+        new_id = await db_module.create_script(db, fx.deep_project_id, version=next(versions), current=False)
+        await db_module.copy_segments(db, fx.deep_script_id, new_id, replacements={0: "新的開場。"})
+
+    return op
+
+
+@bench("db.search_documents")
+def _search(fx: Fixtures):
+    return lambda db: db_module.search_documents(db, USER, ["人工智慧"], limit=20)
+
+
+# -- text and audio pipeline --------------------------------------------------
+
+
+@bench("text.text_to_ssml[20k chars]")
+def _ssml(fx: Fixtures):
+    return lambda: text_to_ssml(fx.script_20k)
+
+
+@bench("text.preprocess_for_gemini[20k chars]")
+def _preprocess(fx: Fixtures):
+    return lambda: preprocess_for_gemini(fx.script_20k)
+
+
+@bench("text.extract_tone_cues[20k chars]")
+def _cues(fx: Fixtures):
+    return lambda: extract_tone_cues(fx.script_20k)
+
+
+@bench("text.char_diff[2k chars, one edit]")
+def _diff(fx: Fixtures):
+    return lambda: char_diff(fx.script_2k, fx.edited_2k)
+
+
+@bench("audio._ensure_wav[30 min PCM]")
+def _wav(fx: Fixtures):
+    return lambda: _ensure_wav(fx.pcm_30min, "audio/L16;rate=24000")
+
+
+# -- runner ------------------------------------------------------------------
+
+
+async def _time(op: Callable, args: tuple, number: int, is_async: bool) -> float:
+    # Like timeit: keep collector pauses out of the measurement
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        if is_async:
+            for _ in range(number):
+                await op(*args)
+        else:
+            for _ in range(number):
+                op(*args)
+        return time.perf_counter() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+async def measure(op: Callable, args: tuple = ()) -> dict:
+    """Per-call seconds: auto-range the loop count, then time several rounds."""
+    first = op(*args)  # warm-up, and tells sync from async ops
+    is_async = inspect.isawaitable(first)
+    if is_async:
+        await first
+    number = 1
+    while True:
+        elapsed = await _time(op, args, number, is_async)
+        if elapsed >= MIN_ROUND_SECONDS or number >= 100_000:
+            break
+        number *= 2 if elapsed * 2 >= MIN_ROUND_SECONDS else 10
+    rounds = min(max(ROUNDS, math.ceil(MIN_TOTAL_SECONDS / elapsed)), MAX_ROUNDS)
+    samples = [elapsed / number] + [await _time(op, args, number, is_async) / number for _ in range(rounds - 1)]
+    return {"median": statistics.median(samples), "min": min(samples), "loops": number}
+
+
+def _calibration_op() -> None:
+    # Fixed pure-Python work (~1 ms): loops, dict and string operations
+    table = {}
+    for i in range(3000):
+        table[str(i)] = i * i
+    sum(v for k, v in table.items() if k.endswith("7"))
+
+
+async def run_suite(pattern: str = "", names: set[str] | None = None) -> dict[str, dict]:
+    selected = {
+        name: factory
+        for name, factory in BENCHMARKS.items()
+        if pattern in name and (names is None or name in names)
+    }
+    results: dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = Fixtures(os.path.join(tmp, "micro.db"))
+        await fixtures.build()
+        for name, factory in selected.items():
+            op = factory(fixtures)
+            # Timed right before each benchmark so host speed drift cancels out
+            calibration = (await measure(_calibration_op))["min"]
+            if inspect.signature(op).parameters:
+                async with db_module.get_db() as db:
+                    results[name] = await measure(op, (db,))
+            else:
+                results[name] = await measure(op)
+            results[name]["calibration"] = calibration
+            print(f"  {name:<44} {_fmt(results[name]['min'])}", file=sys.stderr)
+    return results
+
+
+def _fmt(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:9.2f} ms"
+    return f"{seconds * 1e6:9.1f} µs"
+
+
+def _relative(result: dict) -> float:
+    return result["min"] / result["calibration"] if "calibration" in result else result["min"]
+
+
+def _change(base: dict, result: dict) -> float:
+    change = result["min"] / base["min"] - 1
+    if "calibration" in result and "calibration" in base:
+        # A code regression shows both raw and calibrated; host noise rarely does
+        change = min(change, _relative(result) / _relative(base) - 1)
+    return change
+
+
+def compare(baseline: dict[str, dict], results: dict[str, dict], threshold: float) -> tuple[list[str], list[str]]:
+    """Report lines and the benchmarks that regressed beyond ``threshold``."""
+    lines = [f"{'benchmark':<44} {'baseline':>12} {'current':>12} {'change':>8}"]
+    regressed: list[str] = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            lines.append(f"{name:<44} {'-':>12} {_fmt(result['min']):>12} {'new':>8}")
+            continue
+        change = _change(base, result)
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressed.append(name)
+        elif change < -threshold:
+            flag = "  faster"
+        lines.append(f"{name:<44} {_fmt(base['min']):>12} {_fmt(result['min']):>12} {change:>+8.0%}{flag}")
+    for name in baseline.keys() - results.keys():
+        lines.append(f"{name:<44} {_fmt(baseline[name]['min']):>12} {'-':>12} {'missing':>8}")
+    return lines, regressed
+
+
+def _environment() -> dict:
+    return {"python": platform.python_version(), "machine": platform.machine(), "platform": platform.platform()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_p = sub.add_parser("run", help="run and print the suite")
+    run_p.add_argument("-k", "--filter", default="", help="only benchmarks whose name contains this")
+    run_p.add_argument("--json", help="also write results here")
+    cmp_p = sub.add_parser("compare", help="run (or load) results and flag regressions")
+    cmp_p.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    cmp_p.add_argument("--threshold", type=float, default=0.3)
+    cmp_p.add_argument("--retries", type=int, default=2, help="re-runs of flagged benchmarks before failing")
+    cmp_p.add_argument("--results", type=Path, help="results JSON from 'run --json' instead of running")
+    cmp_p.add_argument("-k", "--filter", default="")
+    save_p = sub.add_parser("save-baseline", help="run the suite and store it as the baseline")
+    save_p.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    save_p.add_argument("--runs", type=int, default=1, help="keep each benchmark's best of this many runs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.command == "compare" and args.results:
+        results = json.loads(args.results.read_text())["results"]
+    else:
+        results = asyncio.run(run_suite(getattr(args, "filter", "")))
+    payload = {"environment": _environment(), "results": results}
+
+    if args.command == "run":
+        for name, result in results.items():
+            print(f"{name:<44} {_fmt(result['min'])}  (median {_fmt(result['median']).strip()}, {result['loops']} loops)")
+        if args.json:
+            Path(args.json).write_text(json.dumps(payload, indent=2) + "\n")
+    elif args.command == "save-baseline":
+        for _ in range(args.runs - 1):
+            for name, result in asyncio.run(run_suite()).items():
+                if _relative(result) < _relative(results[name]):
+                    results[name] = result
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(payload, indent=2) + "\n")
+        print(f"Saved {len(results)} benchmarks to {args.baseline}")
+    else:
+        stored = json.loads(args.baseline.read_text())
+        if stored.get("environment") != payload["environment"]:
+            print(f"note: baseline recorded on {stored.get('environment')}, this is {payload['environment']}")
+        lines, regressed = compare(stored["results"], results, args.threshold)
+        for _ in range(0 if args.results else args.retries):
+            if not regressed:
+                break
+            # Confirm before failing: one noisy moment shouldn't fail the build
+            print(f"re-running {len(regressed)} flagged benchmark(s)", file=sys.stderr)
+            for name, result in asyncio.run(run_suite(names=set(regressed))).items():
+                if _change(stored["results"][name], result) < _change(stored["results"][name], results[name]):
+                    results[name] = result
+            lines, regressed = compare(stored["results"], results, args.threshold)
+        print("\n".join(lines))
+        sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
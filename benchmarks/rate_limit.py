@@ -0,0 +1,79 @@
+"""Per-check cost of the rate limiter as the call rate grows, and idle-key eviction.
+
+    python -m benchmarks.rate_limit [--rates 10,100,1000,10000] [--keys 100000]
+
+For each rate, one key receives that many calls inside its 60 s window
+(the limit is set just above it, so every call is admitted) and the mean
+time per check is reported for the token-bucket ``RateLimiter`` and for the
+timestamp-list limiter it replaced, whose checks rebuild the list each time.
+Then ``--keys`` users make one call each and the clock moves past their
+window, showing how many buckets are left after the next sweep.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from collections import defaultdict
+
+from app.api.rate_limit import RateLimiter
+
+
+class ListWindowLimiter:
+    """The previous implementation: a list of call timestamps per key."""
+
+    def __init__(self, clock):
+        self._clock = clock
+        self._windows: dict[str, list[float]] = defaultdict(list)
+
+    def check(self, key: str, max_calls: int, window_seconds: float) -> None:
+        now = self._clock()
+        self._windows[key] = [t for t in self._windows[key] if now - t < window_seconds]
+        if len(self._windows[key]) >= max_calls:
+            raise RuntimeError("rate limited")
+        self._windows[key].append(now)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def per_check_seconds(limiter, clock: Clock, calls: int) -> float:
+    step = 60.0 / calls / 2  # all calls land inside one window
+    start = time.perf_counter()
+    for _ in range(calls):
+        clock.now += step
+        limiter.check("user:tts", calls + 1, 60)
+    return (time.perf_counter() - start) / calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rates", default="10,100,1000,10000", help="calls per window, comma separated")
+    parser.add_argument("--keys", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{'calls/window':>12} {'token bucket':>14} {'timestamp list':>16}")
+    for calls in (int(r) for r in args.rates.split(",")):
+        clock = Clock()
+        bucket = per_check_seconds(RateLimiter(clock=clock), clock, calls)
+        clock = Clock()
+        window = per_check_seconds(ListWindowLimiter(clock), clock, calls)
+        print(f"{calls:>12} {bucket * 1e6:>12.2f}µs {window * 1e6:>14.2f}µs")
+
+    clock = Clock()
+    limiter = RateLimiter(clock=clock, sweep_interval=60)
+    for i in range(args.keys):
+        limiter.check(f"user-{i}:tts", 20, 60)
+    before = len(limiter)
+    clock.now += 120
+    limiter.check("active:tts", 20, 60)
+    print(f"\n{args.keys} idle users: {before} buckets, {len(limiter)} after the next sweep")
+
+
+if __name__ == "__main__":
+    main()
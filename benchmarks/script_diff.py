@@ -0,0 +1,71 @@
+"""Server-side diff time and payload size for large script versions.
+
+    python -m benchmarks.script_diff [--segments 30] [--chars 2000]
+
+Builds two versions where a third of the segments had about a fifth of their
+clauses rewritten, then times ``diff_segments`` and compares the diff payload
+with shipping both versions to the browser.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+from app.script_diff import diff_segments
+
+
+def _text(rng: random.Random, words: list[str], chars: int) -> str:
+    out = ""
+    while len(out) < chars:
+        out += rng.choice(words) + rng.choice("，，，。！？")
+    return out
+
+
+def versions(segments: int, chars: int) -> tuple[list[dict], list[dict]]:
+    rng = random.Random(0)
+    words = ["".join(chr(rng.randint(0x4E00, 0x4E00 + 3000)) for _ in range(rng.randint(1, 3))) for _ in range(800)]
+    old, new = [], []
+    for i in range(segments):
+        content = _text(rng, words, chars)
+        if i % 3 == 0:
+            clauses = content.split("，")
+            edited = "，".join(c if rng.random() > 0.2 else _text(rng, words, len(c)) for c in clauses)
+        else:
+            edited = content
+        for side, text in ((old, content), (new, edited)):
+            side.append({
+                "segment_id": f"{len(side)}-{i}",
+                "segment_type": "main",
+                "label": f"段落{i}",
+                "content": text,
+                "body_hash": str(hash(text)),
+            })
+    return old, new
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segments", type=int, default=30)
+    parser.add_argument("--chars", type=int, default=2000)
+    args = parser.parse_args()
+
+    old, new = versions(args.segments, args.chars)
+    timings = []
+    for _ in range(10):
+        start = time.perf_counter()
+        delta = diff_segments(old, new)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    both = len(json.dumps([old, new], ensure_ascii=False).encode())
+    diff = len(json.dumps(delta, ensure_ascii=False).encode())
+    print(f"segments={args.segments} chars/segment={args.chars} modified={sum(e['status'] == 'modified' for e in delta)}")
+    print(f"  diff_segments: median {statistics.median(timings):.1f}ms, max {max(timings):.1f}ms")
+    print(f"  payload: both versions {both / 1024:.0f} KiB, diff {diff / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
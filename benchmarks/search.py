@@ -0,0 +1,106 @@
+"""Search latency on a large catalogue.
+
+    python -m benchmarks.search [--users 50] [--segments 100000]
+
+Seeds a temporary database (through the real schema and triggers) with
+``--segments`` current script segments spread over ``--users`` users, then
+times ``search_documents`` for one user with long, short and mixed queries.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import app.db as db_module
+
+SEGMENTS_PER_SCRIPT = 100
+
+
+def _vocabulary(rng: random.Random, size: int = 5000) -> list[str]:
+    return ["".join(chr(rng.randint(0x4E00, 0x9FA5)) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def _sentence(rng: random.Random, words: list[str], weights: list[float], length: int = 120) -> str:
+    return "，".join(rng.choices(words, weights, k=length // 3))
+
+
+def seed(path: str, users: int, segments: int) -> list[str]:
+    rng = random.Random(0)
+    words = _vocabulary(rng)
+    weights = [1 / (rank + 1) for rank in range(len(words))]  # Zipf-like word frequencies
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys=ON")
+    for script_no in range(segments // SEGMENTS_PER_SCRIPT):
+        user_id = f"user-{script_no % users}"
+        project_id, script_id = f"p{script_no}", f"s{script_no}"
+        conn.execute("INSERT OR IGNORE INTO users (user_id, display_name) VALUES (?, ?)", (user_id, user_id))
+        conn.execute(
+            "INSERT INTO projects (project_id, user_id, topic) VALUES (?, ?, ?)",
+            (project_id, user_id, _sentence(rng, words, weights, 12)),
+        )
+        conn.execute("INSERT INTO scripts (script_id, project_id) VALUES (?, ?)", (script_id, project_id))
+        bodies, rows = [], []
+        for order in range(SEGMENTS_PER_SCRIPT):
+            content = _sentence(rng, words, weights)
+            body_hash = hashlib.sha256(json.dumps([content, "[]"], ensure_ascii=False).encode()).hexdigest()
+            bodies.append((body_hash, content, "[]"))
+            rows.append((f"{script_id}-{order}", script_id, order, body_hash))
+        conn.executemany("INSERT OR IGNORE INTO segment_bodies (body_hash, content, cues) VALUES (?, ?, ?)", bodies)
+        conn.executemany(
+            "INSERT INTO script_segments (segment_id, script_id, segment_order, body_hash) VALUES (?, ?, ?, ?)", rows
+        )
+    conn.commit()
+    conn.close()
+    return words
+
+
+async def run(users: int, segments: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "search.db")
+        await db_module.init_db(path)
+        start = time.perf_counter()
+        words = seed(path, users, segments)
+        print(f"seeded {segments} segments for {users} users in {time.perf_counter() - start:.1f}s")
+
+        # Words are Zipf-distributed: rank 0 is in nearly every segment
+        three_char = [w for w in words if len(w) >= 3]
+        two_char = [w for w in words if len(w) == 2]
+        queries = {
+            "stop-word-like term": [three_char[0]],
+            "common term": [three_char[30]],
+            "rare term": [three_char[-1]],
+            "2-char term": [two_char[30]],
+            "3-char + 2-char terms": [three_char[30], two_char[0]],
+        }
+        async with db_module.get_db() as db:
+            for label, terms in queries.items():
+                timings = []
+                for _ in range(20):
+                    start = time.perf_counter()
+                    total, _ = await db_module.search_documents(db, "user-0", terms, limit=20)
+                    timings.append((time.perf_counter() - start) * 1000)
+                print(
+                    f"  {label:<22} matches={total:<6}"
+                    f" median={statistics.median(timings):6.2f}ms  p95={sorted(timings)[18]:6.2f}ms"
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--segments", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.segments))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Database size of script history: inline segment copies vs shared segment bodies.
+
+    python -m benchmarks.segment_storage [--projects 20] [--versions 20] [--segments 10]
+
+Each project gets ``--versions`` script versions. Most are partial
+regenerations or refinements that change one or two segments; every fifth is
+a full regeneration. The same history is written once in the old layout
+(content copied into every version) and once through ``app.db``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+
+import app.db as db_module
+
+_LEGACY_SCHEMA = """
+CREATE TABLE script_segments (
+    segment_id TEXT PRIMARY KEY,
+    script_id TEXT NOT NULL,
+    segment_order INTEGER NOT NULL,
+    segment_type TEXT,
+    content TEXT NOT NULL,
+    cues TEXT,
+    label TEXT,
+    estimated_duration TEXT,
+    created_at TEXT NOT NULL DEFAULT (datetime('now'))
+)
+"""
+
+
+def _text(rng: random.Random, chars: int = 450) -> str:
+    return "".join(chr(rng.randint(0x4E00, 0x9FA5)) for _ in range(chars))
+
+
+def history(rng: random.Random, versions: int, segments: int) -> list[list[str]]:
+    """Segment contents of every version of one project's script."""
+    current = [_text(rng) for _ in range(segments)]
+    result = [list(current)]
+    for version in range(1, versions):
+        if version % 5 == 0:
+            current = [_text(rng) for _ in range(segments)]
+        else:
+            for order in rng.sample(range(segments), rng.randint(1, 2)):
+                current[order] = _text(rng)
+        result.append(list(current))
+    return result
+
+
+def file_size(path: str) -> int:
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(path)
+
+
+def write_legacy(path: str, projects: list[list[list[str]]]) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute(_LEGACY_SCHEMA)
+    for p, versions in enumerate(projects):
+        for v, contents in enumerate(versions):
+            conn.executemany(
+                """INSERT INTO script_segments (segment_id, script_id, segment_order, segment_type, content, cues)
+                   VALUES (?, ?, ?, 'main', ?, '[]')""",
+                [(f"{p}-{v}-{i}", f"{p}-{v}", i, content) for i, content in enumerate(contents)],
+            )
+    conn.commit()
+    conn.close()
+
+
+async def write_shared(path: str, projects: list[list[list[str]]]) -> dict:
+    await db_module.init_db(path)
+    async with db_module.get_db() as db:
+        await db_module.upsert_user(db, "bench", "Bench")
+        for versions in projects:
+            pid = await db_module.create_project(db, "bench", "topic", "audience", 30, "style", 2, "gemini")
+            previous = None
+            for v, contents in enumerate(versions, 1):
+                sid = await db_module.create_script(db, pid, version=v)
+                if previous is None or v % 5 == 1:
+                    # First version and full regenerations write every segment
+                    await db_module.create_segments(db, sid, [{"content": c} for c in contents])
+                else:
+                    changed = {i: c for i, (c, old) in enumerate(zip(contents, versions[v - 2])) if c != old}
+                    await db_module.copy_segments(db, previous, sid, changed)
+                previous = sid
+        return await db_module.segment_storage_stats(db)
+
+
+async def run(project_count: int, versions: int, segments: int) -> None:
+    rng = random.Random(0)
+    projects = [history(rng, versions, segments) for _ in range(project_count)]
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path, shared_path = os.path.join(tmp, "legacy.db"), os.path.join(tmp, "shared.db")
+        write_legacy(legacy_path, projects)
+        stats = await write_shared(shared_path, projects)
+        legacy_size, shared_size = file_size(legacy_path), file_size(shared_path)
+
+    print(f"projects={project_count} versions={versions} segments/version={segments}")
+    print(f"  segment rows: {stats['segments']}, distinct bodies: {stats['bodies']}")
+    print(f"  inline copies:  {legacy_size / 1e6:7.2f} MB")
+    print(f"  shared bodies:  {shared_size / 1e6:7.2f} MB  ({1 - shared_size / legacy_size:.0%} smaller)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--versions", type=int, default=20)
+    parser.add_argument("--segments", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.projects, args.versions, args.segments))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Latency of the shared-state backends behind rate limits and caches.
+
+    python -m benchmarks.shared_state [--ops 2000] [--concurrency 1,8] [--redis-url redis://localhost:6379/0]
+
+Times ``incr`` and ``get`` on a temporary ``SQLiteState`` (the single-host
+backend) and, with ``--redis-url``, on ``RedisState``, at each concurrency
+level. Reports p50/p99 per operation against the 1 ms budget for a local
+backend; a rate-limited request costs one ``incr`` and one ``get``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from app.shared_state import RedisState, SharedState, SQLiteState
+
+BUDGET_SECONDS = 1e-3
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def timed(state: SharedState, op: str, ops: int, concurrency: int) -> list[float]:
+    samples: list[float] = []
+
+    async def worker(index: int) -> None:
+        for i in range(ops // concurrency):
+            key = f"bench:{index}:{i % 50}"
+            start = time.perf_counter()
+            if op == "incr":
+                await state.incr(key, ttl=60)
+            else:
+                await state.get(key)
+            samples.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return sorted(samples)
+
+
+async def run(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        backends: list[tuple[str, SharedState]] = [("sqlite", SQLiteState(os.path.join(tmp, "shared.db")))]
+        if args.redis_url:
+            backends.append(("redis", RedisState.from_url(args.redis_url)))
+        print(f"{'backend':<8} {'op':<5} {'tasks':>5} {'p50':>9} {'p99':>9}  (budget {BUDGET_SECONDS * 1e3:g} ms)")
+        for name, state in backends:
+            await state.incr("bench:warm-up", ttl=60)
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                for op in ("incr", "get"):
+                    samples = await timed(state, op, args.ops, concurrency)
+                    p50, p99 = _percentile(samples, 0.5), _percentile(samples, 0.99)
+                    verdict = "ok" if p50 <= BUDGET_SECONDS else "OVER"
+                    print(f"{name:<8} {op:<5} {concurrency:>5} {p50 * 1e6:>7.0f}µs {p99 * 1e6:>7.0f}µs  {verdict}")
+            await state.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--concurrency", default="1,8", help="concurrent tasks, comma separated")
+    parser.add_argument("--redis-url", help="also time RedisState against this server")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
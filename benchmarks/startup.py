@@ -0,0 +1,158 @@
+"""Cold-start cost: import profile of ``app.main`` and time to the first generation.
+
+    python -m benchmarks.startup imports [--top 15] [--budget-ms 1500]
+    python -m benchmarks.startup cold-start [--runs 3] [--arrivals 0,3]
+
+``imports`` runs ``python -X importtime -c "import app.main"`` in a fresh
+interpreter, lists the slowest modules by cumulative time and exits 1 if
+the import takes longer than ``--budget-ms`` or pulls in a provider SDK
+(those belong to the background warm-up, see ``app.startup``).
+
+``cold-start`` starts fresh interpreters, each with a temporary database,
+that import the app, run its lifespan (the point where uvicorn binds the
+port) and, an arrival delay later, get the title generation job's LLM
+provider the way the first request would: SDK import and client
+construction included, the API call itself excluded since it needs the
+network. "first call" is when that request could reach the provider,
+counted from interpreter start. Each arrival delay is run with
+``STARTUP_WARMUP`` off and on; a request arriving during warm-up waits for
+the imports already under way rather than starting its own.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+IMPORT_BUDGET_MS = 1500.0
+# Imported by the factories on first use; importing any of them at module
+# level puts seconds back on every cold start
+HEAVY_MODULES = ("anthropic", "google.genai", "google.cloud.texttospeech_v1")
+
+
+def import_profile() -> list[tuple[str, float, float]]:
+    """(module, self ms, cumulative ms) for every module ``import app.main`` loads."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=tempfile.gettempdir(),  # keep the app's data/ dirs out of the tree
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        modules.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return modules
+
+
+def import_report(top: int, budget_ms: float) -> tuple[list[str], bool]:
+    modules = import_profile()
+    total = next(cumulative for name, _, cumulative in modules if name == "app.main")
+    heavy = sorted(name for name, _, _ in modules if name in HEAVY_MODULES)
+    lines = [f"{'module':<48} {'self':>9} {'cumulative':>11}"]
+    for name, self_ms, cumulative in sorted(modules, key=lambda m: -m[2])[:top]:
+        lines.append(f"{name:<48} {self_ms:>7.1f}ms {cumulative:>9.1f}ms")
+    lines.append(f"\nimport app.main: {total:.0f}ms (budget {budget_ms:.0f}ms)")
+    if heavy:
+        lines.append(f"provider SDKs imported at startup: {', '.join(heavy)}")
+    return lines, total <= budget_ms and not heavy
+
+
+async def _cold_start(arrival: float) -> dict:
+    started = time.perf_counter()
+    from app.main import app
+
+    imported = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        bound = time.perf_counter()
+        await asyncio.sleep(arrival)
+        request = time.perf_counter()
+        from app.llm.factory import get_provider
+
+        get_provider("claude")
+        first_provider = time.perf_counter() - request
+        from app import startup
+
+        while not startup.readiness()["ready"]:
+            await asyncio.sleep(0.01)
+        ready = time.perf_counter()
+    return {
+        "import": imported - started,
+        "bind": bound - started,
+        "ready": ready - started,
+        "first_provider": first_provider,
+    }
+
+
+def _run_cold_start(warmup: bool, arrival: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "PYTHONPATH": str(ROOT),
+            "DATABASE_URL": str(Path(tmp) / "podcast.db"),
+            "ANTHROPIC_API_KEY": os.environ.get("ANTHROPIC_API_KEY", "benchmark"),
+            "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "benchmark"),
+            "FAKE_PROVIDERS": "false",
+            "JOB_WORKERS": "0",
+            "STARTUP_WARMUP": str(warmup).lower(),
+        }
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "_child", "--arrival", str(arrival)],
+            cwd=tmp,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    imports = sub.add_parser("imports")
+    imports.add_argument("--top", type=int, default=15)
+    imports.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    cold = sub.add_parser("cold-start")
+    cold.add_argument("--runs", type=int, default=3)
+    cold.add_argument("--arrivals", default="0,3", help="seconds between bind and the first request, comma separated")
+    child = sub.add_parser("_child")
+    child.add_argument("--arrival", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.command == "imports":
+        lines, ok = import_report(args.top, args.budget_ms)
+        print("\n".join(lines))
+        sys.exit(0 if ok else 1)
+    if args.command == "_child":
+        print(json.dumps(asyncio.run(_cold_start(args.arrival))))
+        return
+
+    print(f"{'arrival':>7} {'warm-up':>8} {'bind':>7} {'ready':>7} {'request setup':>14} {'first call':>11}")
+    for arrival in (float(a) for a in args.arrivals.split(",")):
+        for warmup in (False, True):
+            runs = [_run_cold_start(warmup, arrival) for _ in range(args.runs)]
+            median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+            first_call = median["bind"] + arrival + median["first_provider"]
+            ready = f"{median['ready']:>6.2f}s" if warmup else f"{'-':>7}"
+            print(
+                f"{arrival:>6.1f}s {'on' if warmup else 'off':>8} {median['bind']:>6.2f}s {ready} "
+                f"{median['first_provider']:>13.2f}s {first_call:>10.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
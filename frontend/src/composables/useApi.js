@@ -71,6 +71,45 @@ export function useApi() {
     }
   }
 
+  /**
+   * Follow a job's Server-Sent Events (fetch-based so X-User-Id is sent).
+   * Calls onEvent(event, data) for each event and resolves with the job result.
+   */
+  async function streamJob(job, onEvent = () => {}) {
+    const response = await fetch(`${BASE_URL}/api/v1/jobs/${job.job_id}/events`, {
+      headers: { 'X-User-Id': getUserId() },
+    })
+    if (!response.ok || !response.body) {
+      return waitForJob(job)
+    }
+
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    let last = job
+    for (;;) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+      let sep
+      while ((sep = buffer.indexOf('\n\n')) >= 0) {
+        const block = buffer.slice(0, sep)
+        buffer = buffer.slice(sep + 2)
+        let event = 'message'
+        let data = ''
+        for (const line of block.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7)
+          else if (line.startsWith('data: ')) data += line.slice(6)
+        }
+        if (!data) continue
+        const parsed = JSON.parse(data)
+        if (event === 'status') last = parsed
+        onEvent(event, parsed)
+      }
+    }
+    return waitForJob(last)
+  }
+
   // Convenience methods
   async function get(endpoint) {
     return request(endpoint, { method: 'GET' })
@@ -96,6 +135,23 @@ export function useApi() {
     return request(endpoint, { method: 'POST', body: formData })
   }
 
+  /**
+   * Poll a background job until it finishes and return its result.
+   * Throws if the job fails.
+   */
+  async function waitForJob(job, { interval = 1000 } = {}) {
+    let current = job
+    while (current.status !== 'succeeded' && current.status !== 'failed') {
+      await new Promise((resolve) => setTimeout(resolve, interval))
+      const data = await request(`/api/v1/jobs/${current.job_id}`, { method: 'GET' })
+      current = data.job
+    }
+    if (current.status === 'failed') {
+      throw new Error(current.error || 'Job failed')
+    }
+    return current.result
+  }
+
   return {
     loading,
     error,
@@ -105,6 +161,8 @@ export function useApi() {
     patch,
     del,
     upload,
+    waitForJob,
+    streamJob,
     getUserId,
   }
 }
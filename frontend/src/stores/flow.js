@@ -208,7 +208,8 @@ export const useFlowStore = defineStore('flow', () => {
         host_count: parseHostCount(hostCount.value),
       })
 
-      const data = await api.post(`/api/v1/projects/${projectId.value}/titles/generate`, {})
+      const { job } = await api.post(`/api/v1/projects/${projectId.value}/titles/generate`, {})
+      const data = await api.waitForJob(job)
       titles.value = (data.titles || []).map(mapTitle)
       selectedTitleIndex.value = -1
       lastGeneratedTopic.value = topic.value
@@ -233,7 +234,8 @@ export const useFlowStore = defineStore('flow', () => {
     loadingSub.value = '換一批全新的角度'
 
     try {
-      const data = await api.post(`/api/v1/projects/${projectId.value}/titles/generate`, {})
+      const { job } = await api.post(`/api/v1/projects/${projectId.value}/titles/generate?regenerate=true`, {})
+      const data = await api.waitForJob(job)
       titles.value = (data.titles || []).map(mapTitle)
       selectedTitleIndex.value = -1
     } catch {
@@ -261,7 +263,17 @@ export const useFlowStore = defineStore('flow', () => {
     loadingSub.value = '依照你的主題生成完整腳本，請稍候'
 
     try {
-      const data = await api.post(`/api/v1/projects/${projectId.value}/scripts/generate`, {})
+      const { job } = await api.post(`/api/v1/projects/${projectId.value}/scripts/generate`, {})
+      // Show each segment as soon as the backend has written it
+      const streamed = []
+      const data = await api.streamJob(job, (event, payload) => {
+        if (event === 'segment') {
+          streamed.push(mapSegment(payload.segment))
+          segments.value = [...streamed]
+          currentStep.value = 3
+          isLoading.value = false
+        }
+      })
       scriptId.value = data.script?.script_id || null
       segments.value = (data.segments || []).map(mapSegment)
       lastGeneratedTitleId.value = titles.value[selectedTitleIndex.value]?.id || null
@@ -411,8 +423,12 @@ export const useFlowStore = defineStore('flow', () => {
         text_feedback: feedbackText.value,
       })
 
-      if (data.regenerated && data.segments) {
-        segments.value = (data.segments).map(mapSegment)
+      if (data.job) {
+        const result = await api.waitForJob(data.job)
+        if (result.regenerated && result.segments) {
+          scriptId.value = result.script?.script_id || scriptId.value
+          segments.value = (result.segments).map(mapSegment)
+        }
       }
 
       // Go back to script step for review
@@ -1,12 +1,15 @@
+import asyncio
 import os
 
 os.environ.setdefault("ANTHROPIC_API_KEY", "test_key")
 os.environ.setdefault("GEMINI_API_KEY", "test_key")
 
+import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
 
 import app.db as db_module
+from app.llm.base import LLMProvider
 
 
 @pytest_asyncio.fixture
@@ -29,3 +32,74 @@ async def client(test_db):
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
+
+
+class FakeLLMProvider(LLMProvider):
+    """Deterministic stand-in for an LLMProvider; records every call."""
+
+    def __init__(self, responses: dict | None = None, delay: float = 0.0):
+        self.responses = responses or {
+            "title_generation": {"titles": [{"title_zh": f"標題{i}", "title_en": f"Title {i}"} for i in range(5)]},
+            "script_generation": {"segments": [
+                {"segment_type": "cold_open", "label": "冷開場", "content": "你知道嗎？", "cues": []},
+                {"segment_type": "summary", "label": "重點摘要", "content": "今天聊了很多。", "cues": []},
+            ]},
+            "script_refinement": {"content": "優化後的內容"},
+        }
+        self.delay = delay
+        self.gate: asyncio.Event | None = None  # when set, calls block until the event fires
+        self.calls: list[tuple[str, str, str]] = []
+
+    async def complete(self, system_prompt: str, user_message: str, task: str = "") -> dict:
+        self.calls.append((system_prompt, user_message, task))
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.responses[task]
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Route the server-default "gemini" and "claude" providers to a fake."""
+    from app.llm import factory
+
+    provider = FakeLLMProvider()
+    monkeypatch.setitem(factory._instances, "gemini", provider)
+    monkeypatch.setitem(factory._instances, "claude", provider)
+    return provider
+
+
+@pytest_asyncio.fixture
+async def job_workers(test_db):
+    from app.jobs import start_workers, stop_workers
+
+    await start_workers(2)
+    yield
+    await stop_workers()
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """The limiter is a process-wide singleton; keep tests independent."""
+    from app.api.rate_limit import _limiter
+
+    _limiter.clear()
+    yield
+    _limiter.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_provider_resilience():
+    """Concurrency limits, breakers and latency stats are per-process; start each test fresh."""
+    from app.llm.latency import reset_latency
+    from app.llm.resilience import reset_resilience
+    from app.tts.tts_service import reset_tts_schedulers
+
+    reset_resilience()
+    reset_latency()
+    reset_tts_schedulers()
+    yield
+    reset_resilience()
+    reset_latency()
+    reset_tts_schedulers()
@@ -0,0 +1,87 @@
+"""Admission control: expensive routes are shed with 503 while reads stay fast."""
+
+import asyncio
+import time
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app import admission
+from app.admission import AdmissionMiddleware, Overloaded, RouteClassGate, route_class
+from app.config import settings
+from tests.test_jobs import HEADERS, _create_project
+
+
+@pytest.fixture(autouse=True)
+def fresh_gates():
+    admission.reset_admission()
+    yield
+    admission.reset_admission()
+
+
+def test_route_classes():
+    assert route_class("POST", "/api/v1/projects/p1/titles/generate") == "generation"
+    assert route_class("POST", "/api/v1/projects/p1/feedback") == "generation"
+    assert route_class("POST", "/api/v1/scripts/segments/s1/tts") == "synthesis"
+    assert route_class("POST", "/api/v1/scripts/sc1/refine") == "synthesis"
+    assert route_class("GET", "/api/v1/projects/p1/titles") == "read"
+    assert route_class("PATCH", "/api/v1/scripts/segments/s1") == "write"
+    assert route_class("GET", "/health") is None
+
+
+async def test_gate_queues_then_sheds():
+    gate = RouteClassGate("test", max_in_flight=1, max_queue=1, queue_timeout=0.05)
+    await gate.enter()
+    queued = asyncio.create_task(gate.enter())
+    await asyncio.sleep(0)
+    with pytest.raises(Overloaded) as exc:
+        await gate.enter()
+    assert exc.value.reason == "queue_full" and exc.value.retry_after >= 1
+
+    gate.leave(0.01)
+    await queued  # admitted in order once the slot frees
+    with pytest.raises(Overloaded) as exc:
+        await gate.enter()
+    assert exc.value.reason == "queue_timeout"
+    gate.leave(0.01)
+    assert gate.in_flight == 0 and gate.waiting == 0
+
+
+async def test_streamed_synthesis_holds_its_slot(monkeypatch):
+    monkeypatch.setattr(settings, "admission_max_in_flight", 1)
+    monkeypatch.setattr(settings, "admission_max_queue", 0)
+
+    async def slow_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await asyncio.sleep(0.1)
+        await send({"type": "http.response.body", "body": b"done"})
+
+    async with AsyncClient(transport=ASGITransport(app=AdmissionMiddleware(slow_app)), base_url="http://t") as client:
+        first, second = await asyncio.gather(
+            client.post("/api/v1/scripts/s1/refine"),
+            client.post("/api/v1/scripts/s2/refine"),
+        )
+        assert sorted([first.status_code, second.status_code]) == [200, 503]
+        shed = first if first.status_code == 503 else second
+        assert shed.headers["Retry-After"] == "1"
+        assert (await client.post("/api/v1/scripts/s1/refine")).status_code == 200
+
+
+async def test_overloaded_generation_keeps_reads_fast(client, fake_llm, job_workers, monkeypatch):
+    monkeypatch.setattr(settings, "admission_max_queued_jobs", 2)
+    fake_llm.delay = 0.5  # slow provider: two workers, jobs back up
+    pids = [await _create_project(client) for _ in range(8)]
+
+    responses = [await client.post(f"/api/v1/projects/{pid}/titles/generate", headers=HEADERS) for pid in pids]
+    statuses = [r.status_code for r in responses]
+    assert statuses.count(202) >= 2 and statuses.count(503) >= 1
+    shed = next(r for r in responses if r.status_code == 503)
+    assert int(shed.headers["Retry-After"]) >= 1
+
+    read_latencies = []
+    for path in ["/health", "/api/v1/projects", f"/api/v1/projects/{pids[0]}/titles"] * 5:
+        start = time.perf_counter()
+        resp = await client.get(path, headers=HEADERS)
+        read_latencies.append(time.perf_counter() - start)
+        assert resp.status_code == 200
+    assert max(read_latencies) < 0.25
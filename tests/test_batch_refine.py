@@ -0,0 +1,102 @@
+"""POST /scripts/{script_id}/refine: many segments, one instruction."""
+
+import json
+import time
+
+from tests.test_jobs import HEADERS, _create_project, _wait_for_job
+
+
+def _events(text: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def _script(client) -> tuple[str, str, list[dict]]:
+    pid = await _create_project(client)
+    resp = await client.post(f"/api/v1/projects/{pid}/scripts/generate", headers=HEADERS)
+    result = (await _wait_for_job(client, resp.json()["job"]["job_id"]))["result"]
+    return pid, result["script"]["script_id"], result["segments"]
+
+
+async def test_refine_all_segments(client, fake_llm, job_workers):
+    pid, script_id, segments = await _script(client)
+
+    resp = await client.post(
+        f"/api/v1/scripts/{script_id}/refine", json={"instruction": "更幽默一點"}, headers=HEADERS
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+
+    events = _events(resp.text)
+    assert [e for e, _ in events] == ["segment", "segment", "done"]
+    assert {d["segment_id"] for _, d in events[:2]} == {s["segment_id"] for s in segments}
+    done = events[-1][1]
+    assert [s["content"] for s in done["segments"]] == ["優化後的內容"] * 2
+    assert done["conflicts"] == [] and done["failed"] == []
+
+    refinement_prompts = [msg for _, msg, task in fake_llm.calls if task == "script_refinement"]
+    assert len(refinement_prompts) == 2
+    assert all("更幽默一點" in msg for msg in refinement_prompts)
+
+    resp = await client.get(f"/api/v1/projects/{pid}/scripts/current", headers=HEADERS)
+    assert [s["content"] for s in resp.json()["segments"]] == ["優化後的內容"] * 2
+
+
+async def test_refine_selected_types_only(client, fake_llm, job_workers):
+    _, script_id, segments = await _script(client)
+
+    resp = await client.post(
+        f"/api/v1/scripts/{script_id}/refine",
+        json={"instruction": "更短", "segment_types": ["summary"]},
+        headers=HEADERS,
+    )
+    done = _events(resp.text)[-1][1]
+    assert [s["segment_type"] for s in done["segments"]] == ["summary"]
+
+
+async def test_refine_runs_concurrently(client, fake_llm, job_workers):
+    _, script_id, _ = await _script(client)
+    fake_llm.delay = 0.2
+
+    start = time.monotonic()
+    resp = await client.post(
+        f"/api/v1/scripts/{script_id}/refine", json={"instruction": "更生動"}, headers=HEADERS
+    )
+    elapsed = time.monotonic() - start
+    assert len(_events(resp.text)[-1][1]["segments"]) == 2
+    assert elapsed < 0.35  # two 0.2s calls, not one after the other
+
+
+async def test_refine_validation(client, fake_llm, job_workers):
+    _, script_id, _ = await _script(client)
+
+    resp = await client.post(
+        f"/api/v1/scripts/{script_id}/refine", json={"instruction": "x"}, headers={"X-User-Id": "user-2"}
+    )
+    assert resp.status_code == 403
+
+    resp = await client.post(
+        f"/api/v1/scripts/{script_id}/refine",
+        json={"instruction": "x", "segment_ids": ["nope"]},
+        headers=HEADERS,
+    )
+    assert resp.status_code == 422
+
+    resp = await client.post("/api/v1/scripts/missing/refine", json={"instruction": "x"}, headers=HEADERS)
+    assert resp.status_code == 404
+
+
+async def test_refine_provider_failure_is_bad_gateway(client, fake_llm, job_workers, monkeypatch):
+    from app.api import scripts
+
+    _, script_id, _ = await _script(client)
+
+    async def broken(user_id, name):
+        raise ValueError("Stored API key could not be decrypted")
+
+    monkeypatch.setattr(scripts, "get_provider_for_user", broken)
+    resp = await client.post(f"/api/v1/scripts/{script_id}/refine", json={"instruction": "x"}, headers=HEADERS)
+    assert resp.status_code == 502
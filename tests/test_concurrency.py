@@ -0,0 +1,106 @@
+"""Handlers must not hold a DB connection/transaction across provider calls."""
+
+import asyncio
+import time
+
+from tests.test_jobs import HEADERS, _create_project, _wait_for_job
+
+OTHER = {"X-User-Id": "user-2"}
+
+
+async def _wait_for_calls(fake_llm, n: int = 1) -> None:
+    for _ in range(200):
+        if len(fake_llm.calls) >= n:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("provider was never called")
+
+
+async def _timed_other_user_writes(client) -> float:
+    start = time.monotonic()
+    pid = await _create_project(client, headers=OTHER)
+    resp = await client.patch(f"/api/v1/projects/{pid}", json={"topic": "別的主題"}, headers=OTHER)
+    assert resp.status_code == 200
+    return time.monotonic() - start
+
+
+async def test_writes_not_blocked_during_slow_generation(client, fake_llm, job_workers):
+    """Another user's writes complete while script regeneration waits on the LLM."""
+    pid = await _create_project(client)
+    resp = await client.post(f"/api/v1/projects/{pid}/scripts/generate", headers=HEADERS)
+    await _wait_for_job(client, resp.json()["job"]["job_id"])
+
+    fake_llm.gate = asyncio.Event()
+    calls_before = len(fake_llm.calls)
+    resp = await client.post(
+        f"/api/v1/projects/{pid}/feedback",
+        json={"score_content": 1, "score_engagement": 1, "score_structure": 1, "text_feedback": "重寫"},
+        headers=HEADERS,
+    )
+    job_id = resp.json()["job"]["job_id"]
+    await _wait_for_calls(fake_llm, calls_before + 1)
+
+    # busy_timeout is 5s, so a held write lock would show up as a multi-second stall
+    assert await _timed_other_user_writes(client) < 1.0
+
+    fake_llm.gate.set()
+    job = await _wait_for_job(client, job_id)
+    assert job["status"] == "succeeded"
+
+
+async def test_writes_not_blocked_during_slow_refine(client, fake_llm, job_workers):
+    pid = await _create_project(client)
+    resp = await client.post(f"/api/v1/projects/{pid}/scripts/generate", headers=HEADERS)
+    job = await _wait_for_job(client, resp.json()["job"]["job_id"])
+    seg_id = job["result"]["segments"][0]["segment_id"]
+
+    fake_llm.gate = asyncio.Event()
+    calls_before = len(fake_llm.calls)
+    refine = asyncio.create_task(
+        client.post(f"/api/v1/scripts/segments/{seg_id}/refine", json={"content": "更幽默"}, headers=HEADERS)
+    )
+    await _wait_for_calls(fake_llm, calls_before + 1)
+
+    assert await _timed_other_user_writes(client) < 1.0
+
+    fake_llm.gate.set()
+    resp = await refine
+    assert resp.status_code == 200
+    assert resp.json()["segment"]["content"] == "優化後的內容"
+
+
+async def test_refine_conflict_when_segment_edited_meanwhile(client, fake_llm, job_workers):
+    pid = await _create_project(client)
+    resp = await client.post(f"/api/v1/projects/{pid}/scripts/generate", headers=HEADERS)
+    job = await _wait_for_job(client, resp.json()["job"]["job_id"])
+    seg_id = job["result"]["segments"][0]["segment_id"]
+
+    fake_llm.gate = asyncio.Event()
+    calls_before = len(fake_llm.calls)
+    refine = asyncio.create_task(
+        client.post(f"/api/v1/scripts/segments/{seg_id}/refine", json={"content": "更幽默"}, headers=HEADERS)
+    )
+    await _wait_for_calls(fake_llm, calls_before + 1)
+    await client.patch(f"/api/v1/scripts/segments/{seg_id}", json={"content": "手動修改"}, headers=HEADERS)
+    fake_llm.gate.set()
+
+    resp = await refine
+    assert resp.status_code == 409
+    seg = (await client.get(f"/api/v1/projects/{pid}/scripts/current", headers=HEADERS)).json()["segments"][0]
+    assert seg["content"] == "手動修改"
+
+
+async def test_title_job_conflict_when_project_edited_meanwhile(client, fake_llm, job_workers):
+    pid = await _create_project(client)
+    fake_llm.gate = asyncio.Event()
+    resp = await client.post(f"/api/v1/projects/{pid}/titles/generate", headers=HEADERS)
+    await _wait_for_calls(fake_llm)
+
+    await client.patch(f"/api/v1/projects/{pid}", json={"topic": "新主題"}, headers=HEADERS)
+    fake_llm.gate.set()
+
+    job = await _wait_for_job(client, resp.json()["job"]["job_id"])
+    assert job["status"] == "failed"
+    assert "changed" in job["error"]
+    titles = (await client.get(f"/api/v1/projects/{pid}/titles", headers=HEADERS)).json()["titles"]
+    assert titles == []
@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 
 import app.db as db_module
@@ -160,3 +162,112 @@ async def test_update_segment(db):
     await db_module.update_segment(db, seg_id, "Updated content")
     segment = await db_module.get_segment(db, seg_id)
     assert segment["content"] == "Updated content"
+
+
+async def _project_with_script(db, contents: list[str]) -> tuple[str, str]:
+    await db_module.upsert_user(db, "U001", "Alice")
+    pid = await db_module.create_project(
+        db, "U001", topic="AI", audience="devs",
+        duration_min=30, style="輕鬆閒聊", host_count=1, llm_provider="gemini",
+    )
+    sid = await db_module.create_script(db, pid, version=1)
+    await db_module.create_segments(db, sid, [{"content": c, "cues": ["笑"]} for c in contents])
+    return pid, sid
+
+
+async def test_script_versions_share_segment_bodies(db):
+    """Copied versions reference the same bodies; only replaced segments add new ones."""
+    pid, v1 = await _project_with_script(db, ["開場", "主題", "結尾"])
+    v2 = await db_module.create_script(db, pid, version=2)
+    await db_module.copy_segments(db, v1, v2, replacements={1: "新主題"})
+
+    stats = await db_module.segment_storage_stats(db)
+    assert stats["segments"] == 6
+    assert stats["bodies"] == 4
+
+    v1_segments = await db_module.get_segments_by_script(db, v1)
+    v2_segments = await db_module.get_segments_by_script(db, v2)
+    assert [s["content"] for s in v1_segments] == ["開場", "主題", "結尾"]
+    assert [s["content"] for s in v2_segments] == ["開場", "新主題", "結尾"]
+    assert v2_segments[1]["cues"] == '["笑"]'
+
+    # Editing one version never leaks into the other
+    await db_module.update_segment(db, v2_segments[0]["segment_id"], "改過的開場")
+    assert (await db_module.get_segment(db, v1_segments[0]["segment_id"]))["content"] == "開場"
+
+
+async def test_segment_bodies_reference_counted(db):
+    pid, v1 = await _project_with_script(db, ["開場", "主題"])
+    v2 = await db_module.create_script(db, pid, version=2)
+    await db_module.copy_segments(db, v1, v2, replacements={0: "新開場"})
+
+    await db_module.delete_script(db, v1)
+    cursor = await db.execute("SELECT content, refcount FROM segment_bodies ORDER BY content")
+    assert [tuple(r) for r in await cursor.fetchall()] == [("主題", 1), ("新開場", 1)]
+
+    segment = (await db_module.get_segments_by_script(db, v2))[0]
+    assert not await db_module.update_segment_if_unchanged(db, segment["segment_id"], "stale", "x")
+    assert await db_module.update_segment_if_unchanged(db, segment["segment_id"], "新開場", "主題")
+    assert (await db_module.segment_storage_stats(db))["bodies"] == 1
+
+    await db_module.delete_project_cascade(db, pid)
+    assert await db_module.segment_storage_stats(db) == {
+        "segments": 0, "bodies": 0, "stored_bytes": 0, "logical_bytes": 0,
+    }
+
+
+async def test_inline_segments_migrated_to_bodies(tmp_path):
+    """Databases from before content-addressing keep their segments on upgrade."""
+    import sqlite3
+
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE users (user_id TEXT PRIMARY KEY, display_name TEXT NOT NULL,
+                            created_at TEXT NOT NULL DEFAULT (datetime('now')));
+        CREATE TABLE projects (project_id TEXT PRIMARY KEY, user_id TEXT NOT NULL REFERENCES users(user_id),
+                               topic TEXT);
+        CREATE TABLE scripts (script_id TEXT PRIMARY KEY, project_id TEXT NOT NULL REFERENCES projects(project_id),
+                              version INTEGER NOT NULL DEFAULT 1, is_current INTEGER NOT NULL DEFAULT 1,
+                              created_at TEXT NOT NULL DEFAULT (datetime('now')));
+        CREATE TABLE script_segments (segment_id TEXT PRIMARY KEY,
+                                      script_id TEXT NOT NULL REFERENCES scripts(script_id),
+                                      segment_order INTEGER NOT NULL, segment_type TEXT,
+                                      content TEXT NOT NULL, cues TEXT,
+                                      created_at TEXT NOT NULL DEFAULT (datetime('now')));
+        INSERT INTO users (user_id, display_name) VALUES ('U001', 'Alice');
+        INSERT INTO projects VALUES ('P1', 'U001', '老歌');
+        INSERT INTO scripts (script_id, project_id, version) VALUES ('S1', 'P1', 1), ('S2', 'P1', 2);
+        INSERT INTO script_segments (segment_id, script_id, segment_order, content, cues) VALUES
+            ('a1', 'S1', 0, '開場', '[]'), ('a2', 'S1', 1, '主題', '[]'),
+            ('b1', 'S2', 0, '開場', '[]'), ('b2', 'S2', 1, '新主題', '[]');
+        """
+    )
+    conn.close()
+
+    await db_module.init_db(path)
+    await db_module.init_db(path)  # idempotent
+
+    async with db_module.get_db() as db:
+        assert [s["content"] for s in await db_module.get_segments_by_script(db, "S2")] == ["開場", "新主題"]
+        stats = await db_module.segment_storage_stats(db)
+        cursor = await db.execute("PRAGMA table_info(script_segments)")
+        columns = {row[1] for row in await cursor.fetchall()}
+    assert stats["segments"] == 4 and stats["bodies"] == 3
+    assert "content" not in columns
+
+
+async def test_concurrent_writers_wait_for_the_lock(test_db):
+    """Each block's first write waits on busy_timeout rather than failing with "database is locked"."""
+
+    async def create(i: int) -> None:
+        async with db_module.get_db() as db:
+            await db_module.upsert_user(db, f"user-{i}", f"User {i}")
+        async with db_module.get_db() as db:
+            await db_module.create_project(db, f"user-{i}", "AI", "devs", 30, "輕鬆閒聊", 1, "gemini")
+
+    await asyncio.gather(*(create(i) for i in range(40)))
+    async with db_module.get_db() as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM projects")
+        assert (await cursor.fetchone())[0] == 40
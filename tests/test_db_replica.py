@@ -0,0 +1,116 @@
+"""Write-behind replica: restore on start, periodic and final snapshots."""
+
+import asyncio
+import sqlite3
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+import app.db as db_module
+from app import db_replica
+from app.config import settings
+from app.db_replica import Snapshotter, restore
+from tests.test_jobs import HEADERS
+
+
+def _topics(path) -> list[str]:
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(row[0] for row in conn.execute("SELECT topic FROM projects"))
+    finally:
+        conn.close()
+
+
+async def _add_project(topic: str) -> None:
+    async with db_module.get_db() as db:
+        await db_module.upsert_user(db, "user-1", "user-1")
+        await db_module.create_project(db, "user-1", topic, "devs", 30, "輕鬆閒聊", 1, "gemini")
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_module, "_db_path", db_module._db_path)
+    return tmp_path / "mount" / "podcast.db", tmp_path / "local" / "podcast.db"
+
+
+async def test_restore_then_snapshot_round_trip(paths):
+    snapshot, replica = paths
+    await db_module.init_db(str(snapshot), journal_mode="DELETE")
+    await _add_project("before")
+
+    assert restore(snapshot, replica)
+    await db_module.init_db(str(replica), journal_mode="WAL")
+    await _add_project("after")
+    assert _topics(snapshot) == ["before"]
+
+    snapshotter = Snapshotter(replica, snapshot, interval=3600)
+    assert await snapshotter.snapshot_now()
+    assert not await snapshotter.snapshot_now()  # nothing changed since
+    assert _topics(snapshot) == ["after", "before"]
+    assert not snapshot.with_name("podcast.db.partial").exists()
+    conn = sqlite3.connect(snapshot)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    conn.close()
+
+    # The replica has writes the snapshot lacks: a restart keeps it
+    await _add_project("unsaved")
+    assert not restore(snapshot, replica)
+    assert not restore(snapshot.with_name("missing.db"), replica)
+
+
+async def test_snapshot_finishes_under_steady_writes(paths):
+    snapshot, replica = paths
+    await db_module.init_db(str(replica), journal_mode="WAL")
+    for i in range(200):
+        await _add_project(f"seed{i}")  # enough pages that a stepwise backup would keep restarting
+    snapshotter = Snapshotter(replica, snapshot, interval=3600)
+    snapshots_done = asyncio.Event()
+    written = 0
+
+    async def writer():
+        nonlocal written
+        while not snapshots_done.is_set():
+            await _add_project(f"p{written}")
+            written += 1
+
+    async def snapshots():
+        for _ in range(3):
+            await asyncio.wait_for(snapshotter.snapshot_now(force=True), 5)
+        snapshots_done.set()
+
+    await asyncio.gather(writer(), snapshots())
+    conn = sqlite3.connect(snapshot)
+    assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    conn.close()
+    await snapshotter.snapshot_now()
+    assert len(_topics(snapshot)) == 200 + written
+
+
+async def test_app_runs_on_replica_and_snapshots_in_background(paths, monkeypatch):
+    from app.main import app
+
+    snapshot, replica = paths
+    await db_module.init_db(str(snapshot), journal_mode="DELETE")
+    await _add_project("existing")
+    monkeypatch.setattr(settings, "database_url", str(snapshot))
+    monkeypatch.setattr(settings, "database_replica_path", str(replica))
+    monkeypatch.setattr(settings, "database_snapshot_seconds", 0.05)
+    monkeypatch.setattr(settings, "job_workers", 0)
+    monkeypatch.setattr(settings, "startup_warmup", False)
+
+    project = {"audience": "上班族", "style": "知識分享"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        async with app.router.lifespan_context(app):
+            assert db_module._db_path == str(replica)
+            resp = await client.post("/api/v1/projects", json={"topic": "live", **project}, headers=HEADERS)
+            assert resp.status_code == 201
+            for _ in range(50):
+                if "live" in _topics(snapshot):
+                    break
+                await asyncio.sleep(0.02)
+            assert "live" in _topics(snapshot)
+            assert "db_snapshot_age_seconds " in (await client.get("/metrics")).text
+
+            await client.post("/api/v1/projects", json={"topic": "at shutdown", **project}, headers=HEADERS)
+    assert _topics(snapshot) == ["at shutdown", "existing", "live"]
+    assert db_replica.snapshot_age() is None
@@ -0,0 +1,79 @@
+"""Fake LLM/TTS providers for load testing and the load generator's user flow."""
+
+import json
+
+import pytest
+
+from app.config import settings
+from app.llm import factory as llm_factory
+from app.llm.base import LLMError
+from app.llm.fake_provider import FakeLLMProvider
+from app.tts import factory as tts_factory
+from app.tts.base import TTSError
+from app.tts.fake_tts_provider import FakeTTSProvider
+from benchmarks.load_test import Recorder, user_flow
+
+
+@pytest.fixture
+def fake_mode(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "fake_providers", True)
+    monkeypatch.setattr(settings, "fake_llm_latency_ms", 0.0)
+    monkeypatch.setattr(settings, "fake_tts_latency_ms", 0.0)
+    monkeypatch.setattr(llm_factory, "_instances", {})
+    monkeypatch.setattr(tts_factory, "_instances", {})
+    from app.tts import audio_storage
+
+    monkeypatch.setattr(audio_storage, "_AUDIO_DIR", tmp_path)
+
+
+async def test_llm_output_is_deterministic_and_sized():
+    provider = FakeLLMProvider("gemini", latency_ms=0, segments=4, segment_chars=120)
+    first = await provider.complete("sys", "prompt A", task="script_generation")
+    again = await provider.complete("sys", "prompt A", task="script_generation")
+    other = await provider.complete("sys", "prompt B", task="script_generation")
+
+    assert first == again != other
+    assert [s["segment_type"] for s in first["segments"]] == ["cold_open", "host_intro", "topic_intro", "core_1"]
+    assert all(len(s["content"]) == 120 for s in first["segments"])
+    assert len((await provider.complete("sys", "x", task="title_generation"))["titles"]) == 5
+
+
+async def test_llm_stream_matches_complete():
+    provider = FakeLLMProvider("claude", latency_ms=0, segments=9, segment_chars=200)
+    chunks = [chunk async for chunk in provider.stream("sys", "msg", task="script_generation")]
+    assert len(chunks) > 1
+    assert json.loads("".join(chunks)) == await provider.complete("sys", "msg", task="script_generation")
+
+
+async def test_error_rate():
+    provider = FakeLLMProvider("gemini", latency_ms=0, error_rate=1.0)
+    with pytest.raises(LLMError) as exc:
+        await provider.complete("sys", "msg", task="title_generation")
+    assert exc.value.retryable and exc.value.overloaded
+
+    tts = FakeTTSProvider("gemini", latency_ms=0, error_rate=1.0)
+    with pytest.raises(TTSError):
+        await tts.synthesize("你好")
+
+
+async def test_tts_audio_scales_with_text():
+    tts = FakeTTSProvider("gemini", latency_ms=0, bytes_per_char=100)
+    audio = await tts.synthesize("今天天氣很好")
+    assert len(audio) == 600
+    assert audio == await tts.synthesize("今天天氣很好")
+
+
+def test_factories_select_fakes(fake_mode):
+    assert isinstance(llm_factory.get_provider("claude"), FakeLLMProvider)
+    assert isinstance(llm_factory._create_provider("gemini", "user-key"), FakeLLMProvider)
+    assert isinstance(tts_factory.get_tts_provider("google"), FakeTTSProvider)
+    assert isinstance(tts_factory._create_tts_provider("gemini", "user-key"), FakeTTSProvider)
+
+
+async def test_load_flow_end_to_end(client, fake_mode, job_workers):
+    rec = Recorder()
+    await user_flow(rec, client, "load-user", poll=0.01)
+
+    assert not rec.errors
+    assert len(rec.latencies["POST /scripts/segments/{id}/tts"]) == settings.fake_llm_segments
+    assert "GET /projects/{id}/export/audio" in rec.latencies
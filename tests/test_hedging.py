@@ -0,0 +1,192 @@
+"""Hedged and failover requests across LLM providers."""
+
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.llm.base import LLMError, LLMProvider
+from app.llm.hedging import HedgedLLMProvider, hedge_delay
+from app.llm.latency import LatencyHistogram, record_latency
+from app.llm.resilience import get_state
+
+
+class TimedProvider(LLMProvider):
+    def __init__(self, name: str, delay: float = 0.0, error: Exception | None = None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    async def complete(self, system_prompt, user_message, task=""):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return {"from": self.name}
+
+    async def stream(self, system_prompt, user_message, task=""):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            for part in ['{"from": ', f'"{self.name}"}}']:
+                yield part
+        except (asyncio.CancelledError, GeneratorExit):
+            self.cancelled = True
+            raise
+
+
+@pytest.fixture(autouse=True)
+def short_hedge_delay(monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedge_default_delay_seconds", 0.05)
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for seconds in [0.8] * 90 + [25] * 10:
+        histogram.observe(seconds)
+    assert histogram.percentile(0.5) == 1
+    assert histogram.percentile(0.95) == 30
+    assert histogram.snapshot()["count"] == 100
+
+
+def test_hedge_delay_uses_observed_percentile(monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedge_min_samples", 5)
+    assert hedge_delay("gemini", "title_generation") == 0.05
+
+    for _ in range(10):
+        record_latency("gemini", "title_generation", 4.0)
+    assert hedge_delay("gemini", "title_generation") == 5
+
+    monkeypatch.setattr(settings, "llm_hedge_min_delay_seconds", 10)
+    assert hedge_delay("gemini", "title_generation") == 10
+
+
+async def test_fast_primary_is_not_hedged():
+    primary, secondary = TimedProvider("gemini"), TimedProvider("claude")
+    provider = HedgedLLMProvider(primary, secondary)
+
+    assert await provider.complete("s", "u") == {"from": "gemini"}
+    assert secondary.calls == 0
+
+
+async def test_slow_primary_hedged_and_cancelled():
+    primary, secondary = TimedProvider("gemini", delay=5), TimedProvider("claude")
+    provider = HedgedLLMProvider(primary, secondary)
+
+    assert await asyncio.wait_for(provider.complete("s", "u"), 1) == {"from": "claude"}
+    assert primary.cancelled
+    assert provider.hedges == 1
+    assert provider.secondary_wins == 1
+
+
+async def test_primary_still_wins_after_hedge():
+    primary, secondary = TimedProvider("gemini", delay=0.1), TimedProvider("claude", delay=5)
+    provider = HedgedLLMProvider(primary, secondary)
+
+    assert await asyncio.wait_for(provider.complete("s", "u"), 1) == {"from": "gemini"}
+    assert secondary.calls == 1
+    assert secondary.cancelled
+
+
+async def test_primary_failure_fails_over_immediately():
+    primary = TimedProvider("gemini", error=LLMError("invalid JSON"))
+    secondary = TimedProvider("claude")
+    provider = HedgedLLMProvider(primary, secondary)
+
+    assert await provider.complete("s", "u") == {"from": "claude"}
+    assert provider.hedges == 0
+
+
+async def test_open_breaker_goes_straight_to_secondary():
+    state = get_state("gemini")
+    state.breaker.failures = state.breaker.failure_threshold - 1
+    state.breaker.record_failure()
+
+    primary, secondary = TimedProvider("gemini"), TimedProvider("claude")
+    provider = HedgedLLMProvider(primary, secondary)
+
+    assert await provider.complete("s", "u") == {"from": "claude"}
+    assert primary.calls == 0
+
+
+async def test_both_failing_raises_first_error():
+    primary = TimedProvider("gemini", error=LLMError("primary down"))
+    secondary = TimedProvider("claude", error=LLMError("secondary down"))
+    provider = HedgedLLMProvider(primary, secondary)
+
+    with pytest.raises(LLMError, match="primary down"):
+        await provider.complete("s", "u")
+
+
+async def test_stream_hedged_on_first_chunk():
+    primary, secondary = TimedProvider("gemini", delay=5), TimedProvider("claude")
+    provider = HedgedLLMProvider(primary, secondary)
+
+    chunks = await asyncio.wait_for(_collect(provider.stream("s", "u")), 1)
+    assert "".join(chunks) == '{"from": "claude"}'
+    assert primary.cancelled
+
+
+async def test_stream_primary_failure_fails_over():
+    primary = TimedProvider("gemini", error=LLMError("503"))
+    secondary = TimedProvider("claude")
+    provider = HedgedLLMProvider(primary, secondary)
+
+    chunks = await _collect(provider.stream("s", "u"))
+    assert "".join(chunks) == '{"from": "claude"}'
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+async def test_factory_hedges_only_when_enabled(test_db, monkeypatch):
+    from app.llm import factory
+    from app.llm.cache import CachedLLMProvider
+
+    monkeypatch.setitem(factory._instances, "gemini", TimedProvider("gemini"))
+    monkeypatch.setitem(factory._instances, "claude", TimedProvider("claude"))
+    monkeypatch.setattr(settings, "anthropic_api_key", "server-key")
+
+    provider = await factory.get_provider_for_user("user-1", "gemini")
+    assert isinstance(provider, CachedLLMProvider)
+    assert not isinstance(provider._inner, HedgedLLMProvider)
+
+    monkeypatch.setattr(settings, "llm_hedging_enabled", True)
+    provider = await factory.get_provider_for_user("user-1", "gemini")
+    assert isinstance(provider._inner, HedgedLLMProvider)
+
+    monkeypatch.setattr(settings, "anthropic_api_key", "")
+    provider = await factory.get_provider_for_user("user-1", "gemini")
+    assert not isinstance(provider._inner, HedgedLLMProvider)
+
+
+async def test_cached_hedge_records_the_provider_that_answered(test_db):
+    from app.db import get_db
+    from app.llm.cache import CachedLLMProvider
+
+    primary = TimedProvider("gemini", delay=1.0)
+    secondary = TimedProvider("claude")
+    secondary.model = "claude-x"
+    provider = CachedLLMProvider(
+        HedgedLLMProvider(primary, secondary), provider_name="gemini", ttl_seconds=3600, max_entries=100
+    )
+
+    assert await provider.complete("s", "u", task="title_generation") == {"from": "claude"}
+    await _collect(provider.stream("s", "u", task="script_generation"))
+    async with get_db() as db:
+        cursor = await db.execute("SELECT task, provider, model FROM llm_cache ORDER BY task")
+        rows = [tuple(row) for row in await cursor.fetchall()]
+    assert rows == [("script_generation", "claude", "claude-x"), ("title_generation", "claude", "claude-x")]
+
+    # Looked up under the requested provider: the hit needs no provider call
+    assert await provider.complete("s", "u", task="title_generation") == {"from": "claude"}
+    assert secondary.calls == 2
@@ -0,0 +1,133 @@
+"""Single-flight generation jobs and Idempotency-Key replay."""
+
+import asyncio
+
+from app.db import get_db
+from tests.test_concurrency import _wait_for_calls
+from tests.test_jobs import HEADERS, _create_project, _wait_for_job
+
+
+async def test_double_submit_shares_one_job(client, fake_llm, job_workers):
+    pid = await _create_project(client)
+    fake_llm.gate = asyncio.Event()
+
+    first = await client.post(f"/api/v1/projects/{pid}/titles/generate", headers=HEADERS)
+    await _wait_for_calls(fake_llm)
+    second = await client.post(f"/api/v1/projects/{pid}/titles/generate", headers=HEADERS)
+    job_id = first.json()["job"]["job_id"]
+    assert second.json()["job"]["job_id"] == job_id
+
+    fake_llm.gate.set()
+    await _wait_for_job(client, job_id)
+    assert len(fake_llm.calls) == 1
+
+
+async def test_concurrent_script_generation_creates_one_version(client, fake_llm, job_workers):
+    pid = await _create_project(client)
+    fake_llm.gate = asyncio.Event()
+
+    responses = await asyncio.gather(
+        *[client.post(f"/api/v1/projects/{pid}/scripts/generate", headers=HEADERS) for _ in range(3)]
+    )
+    job_ids = {r.json()["job"]["job_id"] for r in responses}
+    assert len(job_ids) == 1
+
+    fake_llm.gate.set()
+    await _wait_for_job(client, job_ids.pop())
+
+    async with get_db() as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM scripts WHERE project_id = ?", (pid,))
+        assert (await cursor.fetchone())[0] == 1
+
+
+async def test_new_job_after_previous_finished(client, fake_llm, job_workers):
+    pid = await _create_project(client)
+    first = await client.post(f"/api/v1/projects/{pid}/titles/generate", headers=HEADERS)
+    await _wait_for_job(client, first.json()["job"]["job_id"])
+
+    second = await client.post(f"/api/v1/projects/{pid}/titles/generate?regenerate=true", headers=HEADERS)
+    assert second.json()["job"]["job_id"] != first.json()["job"]["job_id"]
+
+
+async def test_idempotency_key_replays_response(client):
+    headers = {**HEADERS, "Idempotency-Key": "create-1"}
+    first = await client.post("/api/v1/projects", json={}, headers=headers)
+    second = await client.post("/api/v1/projects", json={}, headers=headers)
+
+    assert first.status_code == second.status_code
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+
+    resp = await client.get("/api/v1/projects", headers=HEADERS)
+    assert len(resp.json()["projects"]) == 1
+
+
+async def test_idempotency_key_reused_for_other_request(client):
+    headers = {**HEADERS, "Idempotency-Key": "key-1"}
+    pid = await _create_project(client)
+    await client.post(f"/api/v1/projects/{pid}/titles/generate", headers=headers)
+
+    resp = await client.post(f"/api/v1/projects/{pid}/scripts/generate", headers=headers)
+    assert resp.status_code == 422
+
+
+async def test_idempotency_keys_are_per_user(client):
+    first = await client.post("/api/v1/projects", json={}, headers={**HEADERS, "Idempotency-Key": "k"})
+    other = {"X-User-Id": "user-2", "Idempotency-Key": "k"}
+    second = await client.post("/api/v1/projects", json={}, headers=other)
+
+    assert second.json()["project"]["project_id"] != first.json()["project"]["project_id"]
+
+
+async def test_rate_limited_request_can_be_retried_with_its_key(client, monkeypatch):
+    from app.api import rate_limit
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "rate_limits", "titles=1/60")
+    pid = await _create_project(client)
+    url = f"/api/v1/projects/{pid}/titles/generate"
+    await client.post(url, headers=HEADERS)
+    headers = {**HEADERS, "Idempotency-Key": "after-429"}
+    assert (await client.post(url, headers=headers)).status_code == 429
+
+    rate_limit._limiter.clear()  # the client waited out Retry-After
+    retry = await client.post(url, headers=headers)
+    assert retry.status_code == 202 and "Idempotent-Replayed" not in retry.headers
+
+
+async def test_keyed_event_stream_is_passed_through_and_not_stored(client, test_db):
+    from fastapi.responses import StreamingResponse
+    from starlette.requests import Request
+
+    from app.api.idempotency import idempotent_requests
+
+    async def events():
+        yield b"event: segment\ndata: {}\n\n"
+        yield b"event: done\ndata: {}\n\n"
+
+    async def call_next(request):
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def receive():
+        return {"type": "http.request", "body": b"{}", "more_body": False}
+
+    headers = [(b"x-user-id", b"user-1"), (b"idempotency-key", b"refine-1")]
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/v1/scripts/s1/refine",
+        "query_string": b"",
+        "headers": headers,
+    }
+
+    async def claimed() -> bool:
+        async with get_db() as db:
+            cursor = await db.execute("SELECT COUNT(*) FROM idempotency_keys WHERE idempotency_key = 'refine-1'")
+            return (await cursor.fetchone())[0] == 1
+
+    response = await idempotent_requests(Request(scope, receive), call_next)
+    assert isinstance(response, StreamingResponse)
+    first = await anext(response.body_iterator)
+    assert first.startswith(b"event: segment") and await claimed()  # a concurrent retry gets 409
+    assert [chunk async for chunk in response.body_iterator] == [b"event: done\ndata: {}\n\n"]
+    assert not await claimed()
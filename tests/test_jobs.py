@@ -0,0 +1,244 @@
+import asyncio
+import json
+
+import app.db as db_module
+from app.jobs import enqueue_job, start_workers, stop_workers, subscribe
+
+HEADERS = {"X-User-Id": "user-1"}
+
+
+async def _create_project(client, headers=HEADERS) -> str:
+    resp = await client.post(
+        "/api/v1/projects",
+        json={"topic": "AI 工具", "audience": "上班族", "style": "知識分享"},
+        headers=headers,
+    )
+    return resp.json()["project"]["project_id"]
+
+
+async def _wait_for_job(client, job_id: str, headers=HEADERS) -> dict:
+    for _ in range(200):
+        resp = await client.get(f"/api/v1/jobs/{job_id}", headers=headers)
+        job = resp.json()["job"]
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+async def test_generate_titles_returns_job(client, fake_llm, job_workers):
+    """Title generation should return 202 + job immediately, titles via the job result."""
+    pid = await _create_project(client)
+    resp = await client.post(f"/api/v1/projects/{pid}/titles/generate", headers=HEADERS)
+    assert resp.status_code == 202
+    job = resp.json()["job"]
+    assert job["kind"] == "title_generation"
+
+    job = await _wait_for_job(client, job["job_id"])
+    assert job["status"] == "succeeded"
+    assert len(job["result"]["titles"]) == 5
+
+    titles = (await client.get(f"/api/v1/projects/{pid}/titles", headers=HEADERS)).json()["titles"]
+    assert len(titles) == 5
+
+
+async def test_generate_script_job_creates_version(client, fake_llm, job_workers):
+    pid = await _create_project(client)
+    resp = await client.post(f"/api/v1/projects/{pid}/scripts/generate", headers=HEADERS)
+    job = await _wait_for_job(client, resp.json()["job"]["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["result"]["script"]["version"] == 1
+    assert [s["segment_type"] for s in job["result"]["segments"]] == ["cold_open", "summary"]
+
+
+async def test_job_failure_is_recorded(client, fake_llm, job_workers):
+    fake_llm.responses = {}  # every task raises KeyError inside the provider
+    pid = await _create_project(client)
+    resp = await client.post(f"/api/v1/projects/{pid}/titles/generate", headers=HEADERS)
+    job = await _wait_for_job(client, resp.json()["job"]["job_id"])
+    assert job["status"] == "failed"
+    assert job["error"] == "Title generation failed"
+
+
+async def test_job_forbidden_for_other_user(client, fake_llm, job_workers):
+    pid = await _create_project(client)
+    resp = await client.post(f"/api/v1/projects/{pid}/titles/generate", headers=HEADERS)
+    job_id = resp.json()["job"]["job_id"]
+    resp = await client.get(f"/api/v1/jobs/{job_id}", headers={"X-User-Id": "someone-else"})
+    assert resp.status_code == 403
+
+
+async def test_low_feedback_queues_regeneration(client, fake_llm, job_workers):
+    pid = await _create_project(client)
+    resp = await client.post(f"/api/v1/projects/{pid}/scripts/generate", headers=HEADERS)
+    await _wait_for_job(client, resp.json()["job"]["job_id"])
+
+    resp = await client.post(
+        f"/api/v1/projects/{pid}/feedback",
+        json={"score_content": 2, "score_engagement": 2, "score_structure": 2, "text_feedback": "太平淡"},
+        headers=HEADERS,
+    )
+    assert resp.status_code == 202
+    assert resp.json()["regeneration"] == "queued" and "regenerated" not in resp.json()
+    job = await _wait_for_job(client, resp.json()["job"]["job_id"])
+    assert job["result"]["regenerated"] is True
+    assert job["result"]["mode"] == "full"
+    assert job["result"]["script"]["version"] == 2
+
+
+async def test_feedback_on_named_segment_refines_only_that_segment(client, fake_llm, job_workers):
+    pid = await _create_project(client)
+    resp = await client.post(f"/api/v1/projects/{pid}/scripts/generate", headers=HEADERS)
+    original = (await _wait_for_job(client, resp.json()["job"]["job_id"]))["result"]["segments"]
+    calls_before = len(fake_llm.calls)
+
+    resp = await client.post(
+        f"/api/v1/projects/{pid}/feedback",
+        json={"score_content": 2, "score_engagement": 2, "score_structure": 3, "text_feedback": "冷開場不夠吸引人"},
+        headers=HEADERS,
+    )
+    result = (await _wait_for_job(client, resp.json()["job"]["job_id"]))["result"]
+
+    assert result["mode"] == "partial"
+    assert result["script"]["version"] == 2
+    new_calls = fake_llm.calls[calls_before:]
+    assert [task for _, _, task in new_calls] == ["script_refinement"]
+    assert "冷開場不夠吸引人" in new_calls[0][1]
+    assert "內容:2" in new_calls[0][1]
+
+    cold_open, summary = result["segments"]
+    assert cold_open["content"] == "優化後的內容"
+    assert result["refined_segments"] == [cold_open["segment_id"]]
+    assert summary["content"] == original[1]["content"]
+    assert summary["label"] == original[1]["label"]
+    assert {s["segment_id"] for s in result["segments"]}.isdisjoint(s["segment_id"] for s in original)
+
+    resp = await client.get(f"/api/v1/projects/{pid}/scripts/current", headers=HEADERS)
+    assert [s["content"] for s in resp.json()["segments"]] == ["優化後的內容", original[1]["content"]]
+
+
+def test_match_feedback_segments():
+    from app.api.feedback import match_feedback_segments
+
+    segments = [
+        {"segment_type": "cold_open", "label": "冷開場：驚人數據"},
+        {"segment_type": "host_intro", "label": "主持人介紹"},
+        {"segment_type": "core_1", "label": "核心一：AI 工具實測"},
+        {"segment_type": "summary", "label": "重點摘要"},
+        {"segment_type": "cta", "label": "行動呼籲"},
+        {"segment_type": "preview", "label": "下集預告"},
+    ]
+
+    def types(text):
+        return [s["segment_type"] for s in match_feedback_segments(text, segments)]
+
+    assert types("AI 工具實測那段太長") == ["core_1"]
+    assert types("冷開場太長") == ["cold_open"]
+    assert types("開場音樂太吵") == []  # no jingle in this script
+    assert types("結尾太拖") == ["summary"]
+    assert types("The CTA is weak") == ["cta"]
+    assert types("In summary, the main problem is pacing") == []
+    assert types("太平淡") == []
+
+
+def test_segment_aliases_name_one_type():
+    from app.api.feedback import SEGMENT_ALIASES
+
+    aliases = [alias for names in SEGMENT_ALIASES.values() for alias in names]
+    assert len(aliases) == len(set(aliases))
+
+
+async def test_high_feedback_does_not_queue(client, fake_llm, job_workers):
+    pid = await _create_project(client)
+    resp = await client.post(f"/api/v1/projects/{pid}/scripts/generate", headers=HEADERS)
+    await _wait_for_job(client, resp.json()["job"]["job_id"])
+
+    resp = await client.post(
+        f"/api/v1/projects/{pid}/feedback",
+        json={"score_content": 5, "score_engagement": 5, "score_structure": 5, "text_feedback": "很好"},
+        headers=HEADERS,
+    )
+    assert resp.status_code == 200
+    assert "job" not in resp.json() and resp.json()["regenerated"] is False
+
+
+async def test_job_events_stream(client, fake_llm, job_workers):
+    """The SSE stream should end with a terminal status event."""
+    pid = await _create_project(client)
+    resp = await client.post(f"/api/v1/projects/{pid}/scripts/generate", headers=HEADERS)
+    job_id = resp.json()["job"]["job_id"]
+
+    events = []
+    async with client.stream("GET", f"/api/v1/jobs/{job_id}/events", headers=HEADERS) as stream:
+        assert stream.headers["content-type"].startswith("text/event-stream")
+        event = None
+        async for line in stream.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((event, json.loads(line[len("data: "):])))
+    assert events[-1][0] == "status"
+    assert events[-1][1]["status"] == "succeeded"
+
+
+async def test_queued_jobs_resume_after_restart(client, fake_llm):
+    """Jobs persisted while no workers run (or left running) are picked up on start."""
+    pid = await _create_project(client)
+    queued = await enqueue_job("title_generation", "user-1", pid)
+    interrupted = await enqueue_job("title_generation", "user-1", pid)
+    async with db_module.get_db() as db:
+        await db_module.update_job(db, interrupted["job_id"], status="running", attempts=1)
+
+    await start_workers(1)
+    try:
+        for job_id in (queued["job_id"], interrupted["job_id"]):
+            job = await _wait_for_job(client, job_id)
+            assert job["status"] == "succeeded"
+    finally:
+        await stop_workers()
+
+
+async def test_script_segments_stream_before_job_finishes(client, fake_llm, job_workers):
+    """Each segment is persisted and pushed as soon as it closes in the LLM output."""
+    release = asyncio.Event()
+
+    async def slow_stream(system_prompt, user_message, task=""):
+        yield '{"segments": [{"segment_type": "cold_open", "content": "開場"},'
+        await release.wait()
+        yield ' {"segment_type": "summary", "content": "摘要"}]}'
+
+    fake_llm.stream = slow_stream
+    pid = await _create_project(client)
+    resp = await client.post(f"/api/v1/projects/{pid}/scripts/generate", headers=HEADERS)
+    job_id = resp.json()["job"]["job_id"]
+
+    # The ASGI test transport buffers whole responses, so listen in-process
+    events = []
+    async for event, data in subscribe(job_id):
+        events.append((event, data))
+        if event == "segment" and data["segment"]["content"] == "開場":
+            # First segment arrived while the LLM is still generating
+            async with db_module.get_db() as db:
+                job = await db_module.get_job(db, job_id)
+                assert job["status"] == "running"
+                assert await db_module.get_segment(db, data["segment"]["segment_id"])
+                # Draft versions are not visible until published
+                assert await db_module.get_current_script(db, pid) is None
+            release.set()
+
+    segments = [d["segment"]["content"] for e, d in events if e == "segment"]
+    assert segments == ["開場", "摘要"]
+    assert events[-1][1]["status"] == "succeeded"
+
+
+async def test_failed_stream_discards_draft(client, fake_llm, job_workers):
+    async def broken_stream(system_prompt, user_message, task=""):
+        yield '{"segments": [{"content": "開場"}, {"content": '
+
+    fake_llm.stream = broken_stream
+    pid = await _create_project(client)
+    resp = await client.post(f"/api/v1/projects/{pid}/scripts/generate", headers=HEADERS)
+    job = await _wait_for_job(client, resp.json()["job"]["job_id"])
+    assert job["status"] == "failed"
+    async with db_module.get_db() as db:
+        assert await db_module.get_script_version_count(db, pid) == 0
@@ -0,0 +1,126 @@
+"""LLM response cache: hits, bypass, TTL/size eviction and reporting."""
+
+from app.config import settings
+from app.db import get_db
+from app.llm.cache import CachedLLMProvider, cache_key
+from app.llm.usage import record_usage
+from tests.conftest import FakeLLMProvider
+from tests.test_jobs import HEADERS, _create_project, _wait_for_job
+
+
+class CountingProvider(FakeLLMProvider):
+    model = "fake-1"
+
+    async def complete(self, system_prompt: str, user_message: str, task: str = "") -> dict:
+        record_usage("fake", self.model, task, input_tokens=100, output_tokens=50)
+        return await super().complete(system_prompt, user_message, task)
+
+
+def _cached(inner, **kwargs) -> CachedLLMProvider:
+    kwargs.setdefault("ttl_seconds", 3600)
+    kwargs.setdefault("max_entries", 100)
+    return CachedLLMProvider(inner, provider_name="fake", **kwargs)
+
+
+def test_cache_key_depends_on_every_part():
+    base = cache_key("gemini", "m", "sys", "user", "title_generation")
+    assert base == cache_key("gemini", "m", "sys", "user", "title_generation")
+    assert base != cache_key("claude", "m", "sys", "user", "title_generation")
+    assert base != cache_key("gemini", "m2", "sys", "user", "title_generation")
+    assert base != cache_key("gemini", "m", "sys2", "user", "title_generation")
+    assert base != cache_key("gemini", "m", "sys", "user2", "title_generation")
+    assert base != cache_key("gemini", "m", "sys", "user", "script_generation")
+
+
+async def test_repeated_prompt_served_from_cache(test_db):
+    inner = CountingProvider()
+    provider = _cached(inner)
+
+    first = await provider.complete("sys", "user", task="title_generation")
+    second = await provider.complete("sys", "user", task="title_generation")
+
+    assert first == second
+    assert len(inner.calls) == 1
+
+    await provider.complete("sys", "other user msg", task="title_generation")
+    assert len(inner.calls) == 2
+
+
+async def test_bypass_refreshes_entry(test_db):
+    inner = CountingProvider()
+    provider = _cached(inner)
+
+    await provider.complete("sys", "user", task="title_generation")
+    inner.responses = {"title_generation": {"titles": [{"title_zh": "新", "title_en": "New"}]}}
+    fresh = await provider.complete("sys", "user", task="title_generation", bypass_cache=True)
+    assert fresh["titles"][0]["title_en"] == "New"
+    assert len(inner.calls) == 2
+
+    # The fresh response replaced the cached one
+    again = await provider.complete("sys", "user", task="title_generation")
+    assert again["titles"][0]["title_en"] == "New"
+    assert len(inner.calls) == 2
+
+
+async def test_uncacheable_task_always_calls_provider(test_db):
+    inner = CountingProvider()
+    provider = _cached(inner)
+
+    await provider.complete("sys", "user", task="script_refinement")
+    await provider.complete("sys", "user", task="script_refinement")
+    assert len(inner.calls) == 2
+
+
+async def test_stream_cached_after_first_run(test_db):
+    inner = CountingProvider()
+    provider = _cached(inner)
+
+    first = "".join([c async for c in provider.stream("sys", "user", task="script_generation")])
+    second = "".join([c async for c in provider.stream("sys", "user", task="script_generation")])
+
+    assert len(inner.calls) == 1
+    assert first == second
+
+
+async def test_expired_entries_are_ignored(test_db):
+    inner = CountingProvider()
+    provider = _cached(inner, ttl_seconds=0)
+
+    await provider.complete("sys", "user", task="title_generation")
+    await provider.complete("sys", "user", task="title_generation")
+    assert len(inner.calls) == 2
+
+
+async def test_size_bounded_eviction(test_db):
+    inner = CountingProvider()
+    provider = _cached(inner, max_entries=2)
+
+    for i in range(4):
+        await provider.complete("sys", f"user {i}", task="title_generation")
+
+    async with get_db() as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM llm_cache")
+        assert (await cursor.fetchone())[0] == 2
+
+
+async def test_stats_endpoint_reports_savings(client, fake_llm, job_workers, monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "s3cret")
+    pid = await _create_project(client)
+    for _ in range(2):
+        resp = await client.post(f"/api/v1/projects/{pid}/titles/generate", headers=HEADERS)
+        await _wait_for_job(client, resp.json()["job"]["job_id"])
+    assert len(fake_llm.calls) == 1
+
+    resp = await client.post(f"/api/v1/projects/{pid}/titles/generate?regenerate=true", headers=HEADERS)
+    await _wait_for_job(client, resp.json()["job"]["job_id"])
+    assert len(fake_llm.calls) == 2
+
+    assert (await client.get("/api/v1/system/llm-cache")).status_code == 403
+    resp = await client.get("/api/v1/system/llm-cache", headers={"X-Admin-Token": "s3cret"})
+    stats = resp.json()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["entries"] == 1
+    assert stats["latency_saved_ms"] >= 0
+    assert stats["by_task"][0]["task"] == "title_generation"
@@ -3,10 +3,11 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from app.llm.base import LLMError
+from app.llm.base import LLMError, LLMProvider
 from app.llm.claude_provider import ClaudeProvider, _parse_json
 from app.llm.gemini_provider import GeminiProvider
 from app.llm.factory import get_provider, _instances
+from app.llm.json_stream import JsonArrayStreamer
 
 
 # ── JSON parser ────────────────────────────────────────────
@@ -110,3 +111,248 @@ def test_factory_caches_instance():
         p2 = get_provider("gemini")
     assert p1 is p2
     _instances.clear()
+
+
+# ── Streaming ──────────────────────────────────────────────
+
+
+def _feed_in_chunks(streamer, text: str, size: int) -> list[dict]:
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(streamer.feed(text[i : i + size]))
+    return items
+
+
+def test_json_array_streamer_emits_items_as_they_close():
+    streamer = JsonArrayStreamer("segments")
+    assert streamer.feed('{"segments": [{"content": "第一段"}, {"con') == [{"content": "第一段"}]
+    assert streamer.feed('tent": "第二段"}') == [{"content": "第二段"}]
+    assert streamer.feed("]}") == []
+    assert streamer.close() == {"segments": [{"content": "第一段"}, {"content": "第二段"}]}
+
+
+def test_json_array_streamer_handles_strings_and_nesting():
+    doc = {
+        "note": "segments [not this]",
+        "segments": [{"content": 'brace } and "quote" \\ {', "cues": ["(停頓)", {"x": [1]}]}],
+        "other": [{"content": "ignored"}],
+    }
+    text = "```json\n" + json.dumps(doc, ensure_ascii=False) + "\n```"
+    streamer = JsonArrayStreamer("segments")
+    assert _feed_in_chunks(streamer, text, 1) == doc["segments"]
+    assert streamer.close() == doc
+
+
+def test_json_array_streamer_keeps_only_the_open_element():
+    doc = {"segments": [{"content": f"第 {i} 段" * 20, "cues": []} for i in range(300)]}
+    text = json.dumps(doc, ensure_ascii=False)
+    streamer = JsonArrayStreamer("segments")
+    items, longest = [], 0
+    for i in range(0, len(text), 7):
+        items += streamer.feed(text[i : i + 7])
+        longest = max(longest, len(streamer._buf))
+    assert items == doc["segments"]
+    assert longest < 2 * len(json.dumps(doc["segments"][-1], ensure_ascii=False))
+    assert streamer.close() == doc
+
+
+def test_json_array_streamer_invalid_document():
+    streamer = JsonArrayStreamer("segments")
+    streamer.feed('{"segments": [{"content": "a"}')
+    with pytest.raises(LLMError, match="not valid JSON"):
+        streamer.close()
+
+
+async def test_base_stream_falls_back_to_complete():
+    class OneShot(LLMProvider):
+        async def complete(self, system_prompt, user_message, task=""):
+            return {"segments": []}
+
+    chunks = [c async for c in OneShot().stream("s", "u")]
+    assert json.loads("".join(chunks)) == {"segments": []}
+
+
+async def test_claude_stream_yields_text():
+    provider = ClaudeProvider(api_key="fake")
+
+    async def text_stream():
+        for part in ['{"segments": ', "[]}"]:
+            yield part
+
+    stream_ctx = MagicMock()
+    final = MagicMock(usage=MagicMock(input_tokens=10, output_tokens=5, cache_read_input_tokens=0))
+    stream_ctx.__aenter__ = AsyncMock(
+        return_value=MagicMock(text_stream=text_stream(), get_final_message=AsyncMock(return_value=final))
+    )
+    stream_ctx.__aexit__ = AsyncMock(return_value=False)
+
+    with patch.object(provider._client.messages, "stream", return_value=stream_ctx):
+        chunks = [c async for c in provider.stream("system", "user msg")]
+
+    assert "".join(chunks) == '{"segments": []}'
+
+
+async def test_gemini_stream_yields_text():
+    provider = GeminiProvider(api_key="fake")
+
+    async def chunks():
+        for part in ['{"segments": ', "[]}"]:
+            yield MagicMock(text=part)
+
+    with patch.object(
+        provider._client.aio.models, "generate_content_stream",
+        new_callable=AsyncMock, return_value=chunks(),
+    ):
+        result = [c async for c in provider.stream("system", "user msg")]
+
+    assert "".join(result) == '{"segments": []}'
+
+
+# ── Prompt prefix caching ──────────────────────────────────
+
+
+def _script_prompt():
+    from app.llm.prompt_builder import load_prompt
+
+    return load_prompt(
+        "script_generation",
+        selected_title="AI 新時代",
+        topic="人工智慧",
+        audience="學生",
+        style="知識型",
+        duration_min="30",
+        host_count="2",
+        structure_variant="訪談型",
+    )
+
+
+def test_script_prompt_keeps_project_fields_after_static_prefix():
+    prompt = _script_prompt()
+    assert "三層十段框架" in prompt.static_prefix
+    assert "人工智慧" not in prompt.static_prefix
+    assert prompt.startswith(prompt.static_prefix)
+    assert len(prompt.static_prefix) > len(prompt) * 0.8
+
+
+async def test_claude_marks_static_prefix_cacheable():
+    from app.llm.usage import usage_totals
+
+    provider = ClaudeProvider(api_key="fake")
+    prompt = _script_prompt()
+
+    mock_response = MagicMock()
+    mock_response.content = [MagicMock(text='{"segments": []}')]
+    mock_response.usage = MagicMock(
+        input_tokens=50, output_tokens=10, cache_read_input_tokens=1500, cache_creation_input_tokens=0
+    )
+
+    with patch.object(
+        provider._client.messages, "create", new_callable=AsyncMock, return_value=mock_response
+    ) as create:
+        await provider.complete("system", prompt, task="prefix_test_claude")
+
+    kwargs = create.call_args.kwargs
+    assert kwargs["system"][0]["cache_control"] == {"type": "ephemeral"}
+    static, variable = kwargs["messages"][0]["content"]
+    assert static == {"type": "text", "text": prompt.static_prefix, "cache_control": {"type": "ephemeral"}}
+    assert "人工智慧" in variable["text"]
+    assert "cache_control" not in variable
+
+    totals = usage_totals()["prefix_test_claude"]
+    assert totals["cached_input_tokens"] == 1500
+    assert totals["uncached_input_tokens"] == 50
+
+
+async def test_claude_plain_message_sent_as_string():
+    provider = ClaudeProvider(api_key="fake")
+    mock_response = MagicMock()
+    mock_response.content = [MagicMock(text='{"a": 1}')]
+
+    with patch.object(
+        provider._client.messages, "create", new_callable=AsyncMock, return_value=mock_response
+    ) as create:
+        await provider.complete("system", "user msg")
+
+    assert create.call_args.kwargs["messages"][0]["content"] == "user msg"
+
+
+@pytest.fixture
+def gemini_caches(monkeypatch):
+    from app.llm import gemini_provider
+
+    caches: dict = {}
+    monkeypatch.setattr(gemini_provider, "_context_caches", caches)
+    return caches
+
+
+async def test_gemini_uses_explicit_context_cache(gemini_caches):
+    provider = GeminiProvider(api_key="fake")
+    prompt = _script_prompt()
+    system = "系統提示" * 100
+    cache = MagicMock()
+    cache.name = "cachedContents/abc"
+
+    mock_response = MagicMock(text='{"segments": []}')
+    with (
+        patch.object(
+            provider._client.aio.caches, "create",
+            new_callable=AsyncMock, return_value=cache,
+        ) as create_cache,
+        patch.object(
+            provider._client.aio.models, "generate_content",
+            new_callable=AsyncMock, return_value=mock_response,
+        ) as generate,
+    ):
+        await provider.complete(system, prompt, task="script_generation")
+        await provider.complete(system, prompt, task="script_generation")
+
+    assert create_cache.await_count == 1
+    cache_config = create_cache.call_args.kwargs["config"]
+    assert cache_config.system_instruction == system
+    assert cache_config.contents == [prompt.static_prefix]
+
+    kwargs = generate.call_args.kwargs
+    assert kwargs["config"].cached_content == "cachedContents/abc"
+    assert kwargs["config"].system_instruction is None
+    assert kwargs["contents"] == prompt[len(prompt.static_prefix):]
+
+
+async def test_gemini_falls_back_when_cache_creation_fails(gemini_caches):
+    provider = GeminiProvider(api_key="fake")
+    prompt = _script_prompt()
+    system = "系統提示" * 100
+
+    mock_response = MagicMock(text='{"segments": []}')
+    with (
+        patch.object(
+            provider._client.aio.caches, "create",
+            new_callable=AsyncMock, side_effect=RuntimeError("too small"),
+        ) as create_cache,
+        patch.object(
+            provider._client.aio.models, "generate_content",
+            new_callable=AsyncMock, return_value=mock_response,
+        ) as generate,
+    ):
+        assert await provider.complete(system, prompt) == {"segments": []}
+        await provider.complete(system, prompt)
+
+    assert create_cache.await_count == 1  # failure is remembered until the refresh deadline
+    kwargs = generate.call_args.kwargs
+    assert kwargs["config"].system_instruction == system
+    assert kwargs["contents"] == str(prompt)
+
+
+async def test_gemini_short_prompts_skip_context_cache(gemini_caches):
+    provider = GeminiProvider(api_key="fake")
+    mock_response = MagicMock(text='{"a": 1}')
+
+    with (
+        patch.object(provider._client.aio.caches, "create", new_callable=AsyncMock) as create_cache,
+        patch.object(
+            provider._client.aio.models, "generate_content",
+            new_callable=AsyncMock, return_value=mock_response,
+        ),
+    ):
+        await provider.complete("system", "user msg")
+
+    create_cache.assert_not_awaited()
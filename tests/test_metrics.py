@@ -0,0 +1,106 @@
+"""/metrics: exposition format and the request, DB, LLM, TTS and cache instrumentation."""
+
+import time
+
+import pytest
+
+from app import metrics
+from app.llm.usage import record_usage
+from app.tts.tts_service import _measured
+
+HEADERS = {"X-User-Id": "user-1"}
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """An empty registry so format tests don't see the application metrics."""
+    monkeypatch.setattr(metrics, "_registry", [])
+    return metrics
+
+
+def test_exposition_format(registry):
+    counter = registry.Counter("things_total", "Things", ("kind",))
+    counter.inc('say "hi"\n')
+    counter.inc("plain", amount=2.5)
+    histogram = registry.Histogram("op_seconds", "Op latency", ("op",), buckets=(0.1, 1))
+    histogram.observe(0.05, "read")
+    histogram.observe(0.5, "read")
+    histogram.observe(7, "read")
+
+    text = registry.render()
+    assert "# TYPE things_total counter" in text
+    assert 'things_total{kind="say \\"hi\\"\\n"} 1' in text
+    assert 'things_total{kind="plain"} 2.5' in text
+    assert 'op_seconds_bucket{op="read",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{op="read",le="1"} 2' in text
+    assert 'op_seconds_bucket{op="read",le="+Inf"} 3' in text
+    assert 'op_seconds_sum{op="read"} 7.55' in text
+    assert 'op_seconds_count{op="read"} 3' in text
+    assert text.endswith("\n")
+
+
+def test_observe_overhead_is_microseconds(registry):
+    histogram = registry.Histogram("fast_seconds", "Fast", ("route",))
+    start = time.perf_counter()
+    for _ in range(100_000):
+        histogram.observe(0.003, "/api/v1/projects")
+    per_call = (time.perf_counter() - start) / 100_000
+    assert per_call < 5e-6
+
+
+async def test_request_and_db_metrics(client):
+    route = ("GET", "/api/v1/projects/{project_id}", "404")
+    before = metrics.HTTP_REQUEST_SECONDS.count(*route)
+    db_before = metrics.DB_CALL_SECONDS.count("get_project")
+
+    await client.get("/api/v1/projects/missing", headers=HEADERS)
+
+    assert metrics.HTTP_REQUEST_SECONDS.count(*route) == before + 1
+    assert metrics.DB_CALL_SECONDS.count("get_project") == db_before + 1
+
+    resp = await client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/v1/projects/{project_id}",status="404"}' in resp.text
+    assert 'db_call_duration_seconds_bucket{function="get_project",le="+Inf"}' in resp.text
+
+
+async def test_unmatched_routes_share_a_label(client):
+    before = metrics.HTTP_REQUEST_SECONDS.count("GET", "<unmatched>", "404")
+    await client.get("/api/v1/no-such-thing/123")
+    await client.get("/api/v1/no-such-thing/456")
+    assert metrics.HTTP_REQUEST_SECONDS.count("GET", "<unmatched>", "404") == before + 2
+
+
+def test_llm_tokens_by_type():
+    before = metrics.LLM_TOKENS.value("claude", "title_generation", "input_cached")
+    record_usage("claude", "m", "title_generation", input_tokens=1200, output_tokens=80, cached_input_tokens=1000)
+    assert metrics.LLM_TOKENS.value("claude", "title_generation", "input_cached") == before + 1000
+    assert "llm_tokens_total" in metrics.render()
+
+
+async def test_tts_latency_bytes_and_errors():
+    async def ok():
+        return b"x" * 1234
+
+    async def fail():
+        raise RuntimeError("quota")
+
+    bytes_before = metrics.TTS_AUDIO_BYTES.value("gemini")
+    count_before = metrics.TTS_REQUEST_SECONDS.count("gemini", "single")
+    errors_before = metrics.TTS_ERRORS.value("gemini")
+
+    assert await _measured("gemini", "single", ok, "user-1") == b"x" * 1234
+    with pytest.raises(RuntimeError):
+        await _measured("gemini", "single", fail, "user-1")
+
+    assert metrics.TTS_AUDIO_BYTES.value("gemini") == bytes_before + 1234
+    assert metrics.TTS_REQUEST_SECONDS.count("gemini", "single") == count_before + 1
+    assert metrics.TTS_ERRORS.value("gemini") == errors_before + 1
+
+
+def test_cache_hit_ratio_gauge(monkeypatch):
+    monkeypatch.setattr(metrics.CACHE_REQUESTS, "_values", {})
+    metrics.CACHE_REQUESTS.inc("llm", "hit", amount=3)
+    metrics.CACHE_REQUESTS.inc("llm", "miss")
+    assert 'cache_hit_ratio{cache="llm"} 0.75' in metrics.render()
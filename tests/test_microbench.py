@@ -0,0 +1,38 @@
+"""Microbenchmark runner and baseline comparison."""
+
+from benchmarks import micro
+
+
+def _result(seconds: float, calibration: float = 1e-3) -> dict:
+    return {"median": seconds, "min": seconds, "loops": 1, "calibration": calibration}
+
+
+def test_compare_flags_regressions_only_beyond_threshold():
+    baseline = {"fast": _result(1e-4), "slow": _result(1e-4), "gone": _result(1e-4)}
+    results = {"fast": _result(1.1e-4), "slow": _result(2e-4), "new": _result(1e-4)}
+
+    lines, regressed = micro.compare(baseline, results, threshold=0.3)
+
+    assert regressed == ["slow"]
+    text = "\n".join(lines)
+    assert "REGRESSION" in text and "new" in text and "missing" in text
+
+
+def test_compare_ignores_uniform_host_slowdown():
+    # Everything, calibration included, is twice as slow: not a code regression
+    baseline = {"op": _result(1e-4, calibration=1e-3)}
+    results = {"op": _result(2e-4, calibration=2e-3)}
+    assert micro.compare(baseline, results, threshold=0.3)[1] == []
+
+
+async def test_measure_sync_and_async(monkeypatch):
+    monkeypatch.setattr(micro, "MIN_ROUND_SECONDS", 0.001)
+    monkeypatch.setattr(micro, "MIN_TOTAL_SECONDS", 0.005)
+
+    async def noop():
+        pass
+
+    for op in (micro._calibration_op, noop):
+        result = await micro.measure(op)
+        assert 0 < result["min"] <= result["median"]
+        assert result["loops"] >= 1
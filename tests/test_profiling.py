@@ -0,0 +1,105 @@
+"""Sampling profiler: admin gating, process and per-request profiles, collapsed output."""
+
+import threading
+import time
+
+import pytest
+
+from app import profiling
+from app.config import settings
+
+ADMIN = {"X-Admin-Token": "s3cret"}
+
+
+@pytest.fixture
+def admin(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "admin_token", "s3cret")
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path / "profiles"))
+    return tmp_path / "profiles"
+
+
+def _spin_until(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+async def test_disabled_without_admin_token(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path / "profiles"))
+    resp = await client.post("/api/v1/system/profile", params={"seconds": 0.1}, headers=ADMIN)
+    assert resp.status_code == 404
+    resp = await client.get("/health", headers={**ADMIN, "X-Profile": "1"})
+    assert "X-Profile-File" not in resp.headers
+    assert not (tmp_path / "profiles").exists()
+
+
+async def test_wrong_token_forbidden(client, admin):
+    resp = await client.get("/api/v1/system/profiles", headers={"X-Admin-Token": "nope"})
+    assert resp.status_code == 403
+    resp = await client.get("/health", headers={"X-Admin-Token": "nope", "X-Profile": "1"})
+    assert "X-Profile-File" not in resp.headers
+
+
+async def test_process_profile_collapsed_stacks(client, admin):
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin_until, args=(stop,), name="spinner")
+    worker.start()
+    try:
+        resp = await client.post(
+            "/api/v1/system/profile", params={"seconds": 0.3, "interval_ms": 2}, headers=ADMIN
+        )
+    finally:
+        stop.set()
+        worker.join()
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["samples"] > 10
+
+    lines = (admin / body["profile"]).read_text().splitlines()
+    stacks = {line.rsplit(" ", 1)[0]: int(line.rsplit(" ", 1)[1]) for line in lines}
+    spinning = [stack for stack in stacks if stack.startswith("spinner;") and "_spin_until" in stack]
+    assert spinning
+    assert all(";" in stack and count > 0 for stack, count in stacks.items())
+
+    listing = (await client.get("/api/v1/system/profiles", headers=ADMIN)).json()
+    assert [p["name"] for p in listing["profiles"]] == [body["profile"]]
+    assert listing["running"] is False
+    download = await client.get(f"/api/v1/system/profiles/{body['profile']}", headers=ADMIN)
+    assert download.text == (admin / body["profile"]).read_text()
+
+
+async def test_request_profile_header(client, admin):
+    resp = await client.get("/health", headers={**ADMIN, "X-Profile": "1"})
+    assert resp.status_code == 200
+    name = resp.headers["X-Profile-File"]
+    assert name.endswith("-GET_health.folded")
+    assert (admin / name).is_file()
+    assert not profiling.is_running()
+
+
+async def test_one_profile_at_a_time(client, admin):
+    profiler = profiling.acquire()
+    try:
+        resp = await client.post("/api/v1/system/profile", params={"seconds": 0.1}, headers=ADMIN)
+        assert resp.status_code == 409
+        resp = await client.get("/health", headers={**ADMIN, "X-Profile": "1"})
+        assert "X-Profile-File" not in resp.headers
+    finally:
+        await profiling.release(profiler, "manual")
+    assert not profiling.is_running()
+
+
+async def test_download_rejects_unknown_and_traversal(client, admin):
+    for name in ["missing.folded", "..%2F..%2Fpyproject.toml", "x.txt"]:
+        resp = await client.get(f"/api/v1/system/profiles/{name}", headers=ADMIN)
+        assert resp.status_code == 404
+
+
+def test_sampler_stops_cleanly():
+    profiler = profiling.SamplingProfiler(interval=0.001)
+    profiler.start()
+    time.sleep(0.05)
+    profiler.stop()
+    count = profiler.sample_count
+    time.sleep(0.01)
+    assert profiler.sample_count == count > 0
+    assert "MainThread;" in profiler.collapsed()
@@ -1,4 +1,10 @@
-from app.llm.prompt_builder import load_prompt
+import os
+
+import pytest
+
+from app.config import settings
+from app.llm import prompt_builder
+from app.llm.prompt_builder import PromptError, get_template, load_prompt, validate_prompts
 
 
 def test_load_system_prompt():
@@ -28,17 +34,82 @@ def test_load_script_generation_with_vars():
         style="知識型",
         duration_min="30",
         host_count="2",
+        structure_variant="訪談型",
     )
     assert "AI 新時代" in text
     assert "30" in text
+    assert "訪談型" in text
 
 
 def test_load_script_refinement_with_vars():
     text = load_prompt(
         "script_refinement",
+        segment_type="hook",
+        label="開場",
         original_content="原始內容",
         feedback="需要更生動",
         scores="內容:4, 結構:3",
     )
     assert "原始內容" in text
     assert "需要更生動" in text
+
+
+def test_missing_field_raises_prompt_error():
+    with pytest.raises(PromptError, match="structure_variant"):
+        load_prompt("script_generation", selected_title="t", topic="t", audience="a", style="s",
+                    duration_min="30", host_count="1")
+
+
+def test_validate_prompts_matches_call_sites():
+    compiled = validate_prompts()
+    assert set(compiled) == set(prompt_builder.PROMPT_FIELDS)
+    for name, template in compiled.items():
+        assert template.placeholders <= prompt_builder.PROMPT_FIELDS[name]
+
+
+def test_static_prefix_hash_is_stable():
+    template = get_template("title_generation")
+    rendered = load_prompt("title_generation", topic="科技趨勢", audience="上班族", style="輕鬆")
+    assert rendered.startswith(template.static_prefix)
+    assert "科技趨勢" not in template.static_prefix
+    assert rendered.prefix_hash == template.prefix_hash
+    assert template.prefix_hash == prompt_builder._compile("title_generation").prefix_hash
+
+    system = get_template("system")
+    assert system.static_prefix == system.text
+
+
+@pytest.fixture
+def prompts_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(prompt_builder, "_PROMPTS_DIR", tmp_path)
+    monkeypatch.setattr(prompt_builder, "_templates", {})
+    return tmp_path
+
+
+def test_validate_prompts_fails_fast_on_unknown_placeholder(prompts_dir, monkeypatch):
+    monkeypatch.setattr(prompt_builder, "PROMPT_FIELDS", {"greeting": frozenset({"who"})})
+    (prompts_dir / "greeting.txt").write_text("Hi {who}, from {company}", encoding="utf-8")
+
+    with pytest.raises(PromptError, match="company"):
+        validate_prompts()
+
+
+def test_validate_prompts_fails_on_missing_file(prompts_dir, monkeypatch):
+    monkeypatch.setattr(prompt_builder, "PROMPT_FIELDS", {"absent": frozenset()})
+    with pytest.raises(PromptError, match="not found"):
+        validate_prompts()
+
+
+def test_hot_reload_picks_up_changes(prompts_dir, monkeypatch):
+    path = prompts_dir / "greeting.txt"
+    path.write_text("Hi {who}", encoding="utf-8")
+    assert load_prompt("greeting", who="A") == "Hi A"
+
+    path.write_text("Hello {who}", encoding="utf-8")
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 1_000_000))
+
+    monkeypatch.setattr(settings, "prompt_hot_reload", False)
+    assert load_prompt("greeting", who="A") == "Hi A"
+
+    monkeypatch.setattr(settings, "prompt_hot_reload", True)
+    assert load_prompt("greeting", who="A") == "Hello A"
@@ -0,0 +1,75 @@
+"""Token-bucket rate limiter: refill, Retry-After, idle eviction and per-route config."""
+
+import pytest
+from fastapi import HTTPException
+
+from app.api import rate_limit
+from app.api.rate_limit import RateLimiter
+from app.config import settings
+from tests.test_jobs import HEADERS, _create_project
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_then_refill():
+    clock = Clock()
+    limiter = RateLimiter(clock=clock)
+    states = [limiter.check("u:tts", 3, 60) for _ in range(3)]
+    assert [s.remaining for s in states] == [2, 1, 0]
+
+    with pytest.raises(HTTPException) as exc:
+        limiter.check("u:tts", 3, 60)
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "20"
+    assert exc.value.headers["X-RateLimit-Remaining"] == "0"
+
+    clock.now += 20  # one token back
+    assert limiter.check("u:tts", 3, 60).remaining == 0
+    with pytest.raises(HTTPException):
+        limiter.check("u:tts", 3, 60)
+    assert limiter.check("u:other", 3, 60).remaining == 2
+
+
+def test_idle_keys_are_evicted():
+    clock = Clock()
+    limiter = RateLimiter(clock=clock, sweep_interval=10)
+    for i in range(100):
+        limiter.check(f"user-{i}:tts", 1, 60)  # full again in 60 s
+    clock.now += 30
+    limiter.check("busy:tts", 1, 60)
+    assert len(limiter) == 101  # still refilling
+
+    clock.now += 40
+    limiter.check("late:tts", 1, 60)
+    assert len(limiter) == 2  # "busy" is still refilling
+
+
+def test_route_limit_overrides(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limits", "tts=40/30, titles=2/10")
+    assert rate_limit.route_limit("tts") == (40, 30.0)
+    assert rate_limit.route_limit("titles") == (2, 10.0)
+    assert rate_limit.route_limit("feedback") == rate_limit.ROUTE_LIMITS["feedback"]
+    with pytest.raises(KeyError):
+        rate_limit.rate_limit("no-such-route")
+
+
+async def test_route_headers_and_429(client, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limits", "titles=2/60")
+    pid = await _create_project(client)
+    url = f"/api/v1/projects/{pid}/titles/generate"
+
+    resp = await client.post(url, headers=HEADERS)
+    assert resp.status_code == 202
+    assert resp.headers["X-RateLimit-Limit"] == "2"
+    assert resp.headers["X-RateLimit-Remaining"] == "1"
+
+    await client.post(url, headers=HEADERS)
+    resp = await client.post(url, headers=HEADERS)
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) == 30
@@ -0,0 +1,310 @@
+"""Adaptive concurrency, retries and circuit breaking for LLM providers."""
+
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+from app.config import settings
+from app.llm.base import LLMError, api_error, parse_retry_after
+from app.llm.claude_provider import ClaudeProvider
+from app.llm.gemini_provider import GeminiProvider
+from app.llm.resilience import (
+    AdaptiveLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientLLMProvider,
+    backoff_delay,
+    get_state,
+)
+from tests.conftest import FakeLLMProvider
+
+
+# ── Building blocks ────────────────────────────────────────
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_backoff_honours_retry_after_and_caps_jitter():
+    assert backoff_delay(0, retry_after=2.5) == 2.5
+    assert backoff_delay(0, retry_after=120, cap=30) == 30
+    for attempt in range(6):
+        assert 0 <= backoff_delay(attempt, base=1.0, cap=10) <= min(10, 2**attempt)
+
+
+def test_limiter_aimd():
+    limiter = AdaptiveLimiter(initial=8, max_limit=10)
+    limiter.in_flight = 1
+    limiter.release(overloaded=True)
+    assert limiter.limit == 4
+
+    for _ in range(8):
+        limiter.in_flight = 1
+        limiter.release(latency=1.0)
+    assert 5 < limiter.limit <= 6
+
+    limiter.in_flight = 1
+    limiter.release(latency=10.0)  # far slower than usual
+    assert limiter.limit < 5.5
+
+
+async def test_limiter_caps_in_flight_calls():
+    limiter = AdaptiveLimiter(initial=2)
+    await limiter.acquire()
+    await limiter.acquire()
+
+    third = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0.01)
+    assert not third.done()
+
+    limiter.release(latency=0.1)
+    await asyncio.wait_for(third, 1)
+    assert limiter.in_flight == 2
+
+
+async def test_breaker_half_open_probe():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    await asyncio.sleep(0.06)
+    assert breaker.allow()  # the single probe
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    await asyncio.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+async def test_half_open_probe_cancelled_while_queued_is_released():
+    state = get_state("fake")
+    state.limiter.limit = 1
+    await state.limiter.acquire()
+    state.breaker.record_failure()
+    state.breaker.state, state.breaker._opened_at = "open", 0.0
+    provider = ResilientLLMProvider(FakeLLMProvider(), "fake")
+
+    queued = asyncio.create_task(provider.complete("system", "user", task="title_generation"))
+    await asyncio.sleep(0.01)
+    assert state.breaker.state == "half_open" and not state.breaker.allow()
+    queued.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+
+    state.limiter.release()
+    assert await provider.complete("system", "user", task="title_generation")
+    assert state.breaker.state == "closed"
+
+
+def test_api_error_keeps_status_and_retry_after():
+    class FakeStatusError(Exception):
+        status_code = 429
+        response = type("R", (), {"headers": {"retry-after": "7"}})()
+
+    err = api_error("Claude API error", FakeStatusError("slow down"))
+    assert err.status_code == 429
+    assert err.retry_after == 7.0
+    assert err.retryable and err.overloaded
+
+    assert not api_error("x", ValueError("bad")).retryable
+    assert api_error("x", type("APITimeoutError", (Exception,), {})()).retryable
+
+
+# ── Against a local fake server ────────────────────────────
+
+
+CLAUDE_OK = {
+    "id": "msg_1",
+    "type": "message",
+    "role": "assistant",
+    "model": "claude-test",
+    "content": [{"type": "text", "text": '{"result": "ok"}'}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 10, "output_tokens": 5},
+}
+
+GEMINI_OK = {
+    "candidates": [{"content": {"role": "model", "parts": [{"text": '{"result": "ok"}'}]}}],
+    "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 5},
+}
+
+
+class FaultServer:
+    """Serves queued failure statuses, then the success body."""
+
+    def __init__(self, ok_body: dict):
+        self.ok_body = ok_body
+        self.faults: list[int] = []
+        self.requests = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        body = await request.json()
+        if self.faults:
+            status = self.faults.pop(0)
+            return web.json_response(
+                {"error": {"type": "overloaded_error", "message": "busy", "code": status, "status": "UNAVAILABLE"}},
+                status=status,
+                headers={"Retry-After": "0"},
+            )
+        if body.get("stream"):
+            return web.Response(text=_claude_sse('{"result": "ok"}'), content_type="text/event-stream")
+        return web.json_response(self.ok_body)
+
+
+def _claude_sse(text: str) -> str:
+    message = {**CLAUDE_OK, "content": [], "usage": {"input_tokens": 10, "output_tokens": 0}}
+    events = [
+        ("message_start", {"type": "message_start", "message": message}),
+        ("content_block_start", {"type": "content_block_start", "index": 0,
+                                 "content_block": {"type": "text", "text": ""}}),
+        ("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                 "delta": {"type": "text_delta", "text": text}}),
+        ("content_block_stop", {"type": "content_block_stop", "index": 0}),
+        ("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                           "usage": {"output_tokens": 5}}),
+        ("message_stop", {"type": "message_stop"}),
+    ]
+    return "".join(f"event: {name}\ndata: {json.dumps(data)}\n\n" for name, data in events)
+
+
+async def _serve(ok_body: dict):
+    server = FaultServer(ok_body)
+    app = web.Application()
+    app.router.add_route("POST", "/{tail:.*}", server.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return server, runner, f"http://127.0.0.1:{port}"
+
+
+@pytest.fixture
+async def claude_server():
+    server, runner, url = await _serve(CLAUDE_OK)
+    yield server, ClaudeProvider(api_key="fake", model="claude-test", base_url=url)
+    await runner.cleanup()
+
+
+@pytest.fixture
+async def gemini_server():
+    server, runner, url = await _serve(GEMINI_OK)
+    yield server, GeminiProvider(api_key="fake", model="gemini-test", base_url=url)
+    await runner.cleanup()
+
+
+async def test_claude_retries_429_then_succeeds(claude_server):
+    server, inner = claude_server
+    server.faults = [429, 503]
+    provider = ResilientLLMProvider(inner, "claude", max_attempts=3)
+
+    assert await provider.complete("system", "user") == {"result": "ok"}
+    assert server.requests == 3
+    state = get_state("claude")
+    assert state.retries == 2
+    assert state.limiter.limit < settings.llm_concurrency_initial
+    assert state.breaker.state == "closed"
+
+
+async def test_gemini_retries_503_then_succeeds(gemini_server):
+    server, inner = gemini_server
+    server.faults = [503]
+    provider = ResilientLLMProvider(inner, "gemini", max_attempts=3)
+
+    assert await provider.complete("system", "user") == {"result": "ok"}
+    assert server.requests == 2
+    assert get_state("gemini").retries == 1
+
+
+async def test_breaker_opens_and_stops_calls(claude_server, monkeypatch):
+    monkeypatch.setattr(settings, "llm_breaker_failure_threshold", 2)
+    monkeypatch.setattr(settings, "llm_breaker_reset_seconds", 0.1)
+    server, inner = claude_server
+    server.faults = [503] * 10
+    provider = ResilientLLMProvider(inner, "claude", max_attempts=2)
+
+    with pytest.raises(LLMError) as exc:
+        await provider.complete("system", "user")
+    assert exc.value.status_code == 503
+    assert server.requests == 2
+
+    with pytest.raises(CircuitOpenError):
+        await provider.complete("system", "user")
+    assert server.requests == 2
+    assert get_state("claude").rejected == 1
+
+    # After the reset timeout one probe goes out; it succeeds and closes the circuit
+    server.faults = []
+    await asyncio.sleep(0.12)
+    assert await provider.complete("system", "user") == {"result": "ok"}
+    assert get_state("claude").breaker.state == "closed"
+
+
+async def test_non_retryable_error_not_retried(claude_server):
+    server, inner = claude_server
+    server.faults = [400]
+    provider = ResilientLLMProvider(inner, "claude", max_attempts=3)
+
+    with pytest.raises(LLMError) as exc:
+        await provider.complete("system", "user")
+    assert exc.value.status_code == 400
+    assert server.requests == 1
+    assert get_state("claude").breaker.failures == 0
+
+
+async def test_stream_retried_before_first_chunk(claude_server):
+    server, inner = claude_server
+    server.faults = [429]
+    provider = ResilientLLMProvider(inner, "claude", max_attempts=3)
+
+    chunks = [c async for c in provider.stream("system", "user")]
+    assert "".join(chunks) == '{"result": "ok"}'
+    assert server.requests == 2
+
+
+async def test_provider_state_endpoint(client, claude_server, monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "s3cret")
+    server, inner = claude_server
+    server.faults = [429]
+    await ResilientLLMProvider(inner, "claude").complete("system", "user")
+
+    assert (await client.get("/api/v1/system/llm-providers")).status_code == 403
+    resp = await client.get("/api/v1/system/llm-providers", headers={"X-Admin-Token": "s3cret"})
+    claude = resp.json()["providers"]["claude"]
+    assert claude["breaker"]["state"] == "closed"
+    assert claude["retries"] == 1
+    assert claude["concurrency"]["in_flight"] == 0
+
+
+def test_limiter_judges_latency_per_task():
+    limiter = AdaptiveLimiter(initial=8, max_limit=16)
+    for _ in range(5):
+        limiter.in_flight = 1
+        limiter.release(latency=5.0, task="title_generation")
+    before = limiter.limit
+    for _ in range(3):
+        limiter.in_flight = 1
+        limiter.release(latency=60.0, task="script_generation")  # long, but usual for its task
+    assert limiter.limit > before
+
+    limiter.in_flight = 1
+    limiter.release(latency=30.0, task="title_generation")
+    assert limiter.limit < before + 1
+    assert set(limiter.snapshot()["latency_ewma_s"]) == {"title_generation", "script_generation"}
@@ -0,0 +1,122 @@
+"""Fair scheduling of provider slots between users, with latency-injecting stub providers."""
+
+import asyncio
+
+import pytest
+
+from app import metrics
+from app.config import settings
+from app.llm import factory as llm_factory
+from app.llm.fake_provider import FakeLLMProvider
+from app.llm.resilience import ResilientLLMProvider
+from app.scheduling import FairScheduler, parse_weights
+from app.tts import factory as tts_factory
+from app.tts import tts_service
+
+
+async def _run(scheduler: FairScheduler, user: str, order: list[str], seconds: float = 0.01) -> None:
+    async with scheduler.slot(user):
+        order.append(user)
+        await asyncio.sleep(seconds)
+
+
+async def test_light_user_is_not_starved_by_a_backlog():
+    scheduler = FairScheduler("test.fair", limit=2)
+    order: list[str] = []
+    heavy = [asyncio.create_task(_run(scheduler, "heavy", order)) for _ in range(20)]
+    await asyncio.sleep(0)
+    light = [asyncio.create_task(_run(scheduler, "light", order)) for _ in range(2)]
+    await asyncio.gather(*heavy, *light)
+
+    # FIFO would run all 20 heavy calls first; fair queuing interleaves
+    assert max(i for i, user in enumerate(order) if user == "light") < 6
+    assert scheduler.in_flight == 0 and scheduler.waiting == 0
+
+
+async def test_per_user_cap_and_weights():
+    scheduler = FairScheduler("test.capped", limit=4, per_user_limit=1)
+    peak = {"a": 0, "b": 0}
+    running = {"a": 0, "b": 0}
+
+    async def call(user):
+        async with scheduler.slot(user):
+            running[user] += 1
+            peak[user] = max(peak[user], running[user])
+            await asyncio.sleep(0.005)
+            running[user] -= 1
+
+    await asyncio.gather(*(call(u) for u in "ab" * 5))
+    assert peak == {"a": 1, "b": 1}
+
+    weighted = FairScheduler("test.weighted", limit=1, weights={"gold": 2.0})
+    order: list[str] = []
+    tasks = [asyncio.create_task(_run(weighted, u, order, 0.001)) for _ in range(12) for u in ("gold", "basic")]
+    await asyncio.gather(*tasks)
+    assert order[:12].count("gold") == 8
+
+
+async def test_cancelled_waiters_release_their_place():
+    scheduler = FairScheduler("test.cancel", limit=1)
+    await scheduler.acquire("a")
+    waiter = asyncio.create_task(scheduler.acquire("b"))
+    await asyncio.sleep(0)
+    assert scheduler.waiting == 1
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    scheduler.release("a")
+    assert scheduler.in_flight == 0 and scheduler.waiting == 0
+    await asyncio.wait_for(scheduler.acquire("c"), 1)
+
+
+def test_parse_weights():
+    assert parse_weights("gold=2, trial=0.5") == {"gold": 2.0, "trial": 0.5}
+    assert parse_weights("") == {}
+
+
+async def test_llm_calls_fair_under_contention(monkeypatch):
+    monkeypatch.setattr(settings, "llm_concurrency_initial", 2)
+    monkeypatch.setattr(settings, "llm_user_concurrency", 2)
+    stub = FakeLLMProvider("gemini", latency_ms=20, sigma=0)
+    heavy = ResilientLLMProvider(stub, "gemini", user_id="heavy")
+    light = ResilientLLMProvider(stub, "gemini", user_id="light")
+    waits_before = metrics.SCHEDULER_WAIT_SECONDS.count("llm.gemini")
+
+    done: list[str] = []
+
+    async def call(provider, user):
+        await provider.complete("sys", "msg", task="title_generation")
+        done.append(user)
+
+    tasks = [asyncio.create_task(call(heavy, "heavy")) for _ in range(8)]
+    await asyncio.sleep(0)
+    assert heavy.state.limiter.waiting == 6
+    assert "scheduler_queue_depth{scheduler=\"llm.gemini\"} 6" in metrics.render()
+    tasks.append(asyncio.create_task(call(light, "light")))
+    await asyncio.gather(*tasks)
+
+    assert done.index("light") <= 3
+    assert metrics.SCHEDULER_WAIT_SECONDS.count("llm.gemini") == waits_before + 9
+
+
+async def test_tts_scheduler_caps_each_user(monkeypatch):
+    monkeypatch.setattr(settings, "fake_providers", True)
+    monkeypatch.setattr(settings, "fake_tts_latency_ms", 10.0)
+    monkeypatch.setattr(settings, "fake_latency_sigma", 0.0)
+    monkeypatch.setattr(settings, "tts_user_concurrency", 1)
+    monkeypatch.setattr(tts_factory, "_instances", {})
+    monkeypatch.setattr(llm_factory, "_instances", {})
+
+    scheduler = tts_service.tts_scheduler("gemini")
+    peak = 0
+    synthesize = tts_factory.get_tts_provider("gemini").synthesize
+
+    async def observed(*args, **kwargs):
+        nonlocal peak
+        peak = max(peak, scheduler.in_flight)
+        return await synthesize(*args, **kwargs)
+
+    monkeypatch.setattr(tts_factory.get_tts_provider("gemini"), "synthesize", observed)
+    results = await asyncio.gather(*(tts_service.synthesize("你好" * 20) for _ in range(4)))
+    assert all(audio for audio, _ in results)
+    assert peak == 1
@@ -0,0 +1,125 @@
+"""Script version diffs: character-level CJK diffs, segment alignment and the diff endpoint."""
+
+import app.db as db_module
+from app.script_diff import char_diff, diff_segments
+
+HEADERS = {"X-User-Id": "user-1"}
+
+
+def _apply(ops, side):
+    skip = "+" if side == "old" else "-"
+    return "".join(text for op, text in ops if op != skip)
+
+
+def test_char_diff_cjk():
+    old = "今天我們來聊聊人工智慧，它會改變工作嗎？"
+    new = "今天我們來輕鬆聊聊人工智慧，它真的會改變工作嗎？"
+    ops = char_diff(old, new)
+    assert _apply(ops, "old") == old
+    assert _apply(ops, "new") == new
+    assert ("+", "輕鬆") in ops
+    assert ("+", "真的") in ops
+
+
+def test_char_diff_long_rewrite_round_trips():
+    old = "。".join(f"第{i}句話的內容" for i in range(300))
+    new = "。".join(f"第{i}句話的{'新' if i % 7 == 0 else ''}內容" for i in range(300))
+    ops = char_diff(old, new)
+    assert _apply(ops, "old") == old
+    assert _apply(ops, "new") == new
+    assert sum(1 for op, text in ops if op == "+" and text == "新") == 43
+
+
+def _seg(segment_id, segment_type, content, label=None):
+    return {
+        "segment_id": segment_id,
+        "segment_type": segment_type,
+        "label": label,
+        "content": content,
+        "body_hash": content,
+    }
+
+
+def test_diff_segments_aligns_by_type_and_label():
+    old = [_seg("a", "cold_open", "你知道嗎？"), _seg("b", "main", "第一段"), _seg("c", "summary", "總結")]
+    new = [_seg("d", "cold_open", "你知道嗎？"), _seg("e", "main", "第一段改"), _seg("f", "cta", "記得訂閱")]
+    entries = diff_segments(old, new)
+    assert [(e["status"], e["segment_type"]) for e in entries] == [
+        ("unchanged", "cold_open"),
+        ("modified", "main"),
+        ("removed", "summary"),
+        ("added", "cta"),
+    ]
+    assert entries[0]["ops"] is None
+    assert entries[1]["ops"] == [["=", "第一段"], ["+", "改"]]
+    assert (entries[1]["from_segment_id"], entries[1]["to_segment_id"]) == ("b", "e")
+
+
+async def _project_with_versions() -> tuple[str, str, str]:
+    async with db_module.get_db() as db:
+        await db_module.get_user_or_create(db, "user-1")
+        pid = await db_module.create_project(db, "user-1", "AI", "devs", 30, "輕鬆閒聊", 2, "gemini")
+        v1 = await db_module.create_script(db, pid, version=1)
+        await db_module.create_segments(db, v1, [
+            {"segment_type": "cold_open", "label": "冷開場", "content": "你知道嗎？"},
+            {"segment_type": "summary", "label": "重點摘要", "content": "今天聊了很多。"},
+        ])
+        v2 = await db_module.create_script(db, pid, version=2)
+        await db_module.copy_segments(db, v1, v2, replacements={1: "今天聊了很多有趣的事。"})
+    return pid, v1, v2
+
+
+async def test_diff_endpoint_cached_until_edit(client):
+    pid, v1, v2 = await _project_with_versions()
+    url = f"/api/v1/projects/{pid}/scripts/diff"
+
+    resp = await client.get(url, params={"from": 1, "to": 2}, headers=HEADERS)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["from"] == {"script_id": v1, "version": 1}
+    assert body["summary"] == {"unchanged": 1, "modified": 1, "added": 0, "removed": 0}
+    assert body["segments"][1]["ops"] == [["=", "今天聊了很多"], ["+", "有趣的事"], ["=", "。"]]
+    assert body["cached"] is False
+
+    resp = await client.get(url, params={"from": 1, "to": 2}, headers=HEADERS)
+    assert resp.json()["cached"] is True
+    assert resp.json()["segments"] == body["segments"]
+
+    async with db_module.get_db() as db:
+        segment = (await db_module.get_segments_by_script(db, v2))[0]
+        await db_module.update_segment(db, segment["segment_id"], "你知道嗎？真的嗎？")
+
+    body = (await client.get(url, params={"from": 1, "to": 2}, headers=HEADERS)).json()
+    assert body["cached"] is False
+    assert body["summary"]["modified"] == 2
+
+
+async def test_diff_endpoint_ignores_drafts(client):
+    pid, v1, v2 = await _project_with_versions()
+    async with db_module.get_db() as db:
+        # A regeneration still streaming into version 3
+        draft = await db_module.create_script(db, pid, version=3, current=False)
+        await db_module.copy_segments(db, v2, draft, replacements={0: "草稿"})
+        assert await db_module.get_script_by_version(db, pid, 3) is None
+        assert (await db_module.get_script_by_version(db, pid, 2))["script_id"] == v2
+
+    url = f"/api/v1/projects/{pid}/scripts/diff"
+    resp = await client.get(url, params={"from": 2, "to": 3}, headers=HEADERS)
+    assert resp.status_code == 404
+
+    async with db_module.get_db() as db:
+        await db_module.set_current_script(db, pid, draft)
+        assert (await db_module.get_script_by_version(db, pid, 3))["script_id"] == draft
+        assert (await db_module.get_script_by_version(db, pid, 1))["script_id"] == v1
+
+
+async def test_diff_endpoint_errors(client):
+    pid, _, _ = await _project_with_versions()
+    url = f"/api/v1/projects/{pid}/scripts/diff"
+
+    resp = await client.get(url, params={"from": 1, "to": 9}, headers=HEADERS)
+    assert resp.status_code == 404
+    resp = await client.get(url, params={"from": 1, "to": 2}, headers={"X-User-Id": "user-2"})
+    assert resp.status_code == 403
+    resp = await client.get(url, params={"from": 0, "to": 2}, headers=HEADERS)
+    assert resp.status_code == 422
@@ -0,0 +1,117 @@
+"""GET /search over project topics, titles and current script segments."""
+
+import app.db as db_module
+from app.api.search import highlight
+
+HEADERS = {"X-User-Id": "user-1"}
+
+
+async def _seed(user_id: str = "user-1", topic: str = "人工智慧的未來") -> tuple[str, str]:
+    async with db_module.get_db() as db:
+        await db_module.get_user_or_create(db, user_id)
+        pid = await db_module.create_project(db, user_id, topic, "上班族", 30, "輕鬆閒聊", 2, "gemini")
+        await db_module.create_titles(db, pid, [{"title_zh": "機器會取代我們嗎", "title_en": "Will Machines Replace Us"}])
+        sid = await db_module.create_script(db, pid)
+        await db_module.create_segments(db, sid, [
+            {"segment_type": "cold_open", "content": "今天用幽默的方式聊聊人工智慧"},
+            {"segment_type": "summary", "content": "重點：<b>別怕</b>，學就對了"},
+        ])
+    return pid, sid
+
+
+async def _search(client, q: str, **params):
+    resp = await client.get("/api/v1/search", params={"q": q, **params}, headers=HEADERS)
+    assert resp.status_code == 200
+    return resp.json()
+
+
+async def test_search_ranks_and_highlights(client):
+    pid, _ = await _seed()
+
+    body = await _search(client, "人工智慧")
+    assert body["total"] == 2
+    assert {r["kind"] for r in body["results"]} == {"project", "segment"}
+    assert all(r["project_id"] == pid for r in body["results"])
+    assert all("<mark>人工智慧</mark>" in r["snippet"] for r in body["results"])
+    # Shorter document, same term frequency: the topic ranks first
+    assert body["results"][0]["kind"] == "project"
+
+    body = await _search(client, "machines")
+    assert [r["kind"] for r in body["results"]] == ["title"]
+    assert "<mark>Machines</mark>" in body["results"][0]["snippet"]
+
+
+async def test_short_terms_and_combined_terms(client):
+    await _seed()
+
+    body = await _search(client, "幽默")
+    assert [r["kind"] for r in body["results"]] == ["segment"]
+
+    body = await _search(client, "幽默 人工智慧")
+    assert body["total"] == 1
+
+    body = await _search(client, "幽默 未來")
+    assert body["total"] == 0
+
+
+async def test_snippet_is_escaped(client):
+    await _seed()
+    body = await _search(client, "別怕")
+    assert body["results"][0]["snippet"] == "重點：&lt;b&gt;<mark>別怕</mark>&lt;/b&gt;，學就對了"
+
+
+async def test_index_follows_versions_and_edits(client):
+    pid, v1 = await _seed()
+    async with db_module.get_db() as db:
+        v2 = await db_module.create_script(db, pid, version=2, current=False)
+        await db_module.copy_segments(db, v1, v2, replacements={0: "今天認真聊聊量子電腦"})
+        assert (await _search(client, "量子電腦"))["total"] == 0  # draft isn't indexed
+    async with db_module.get_db() as db:
+        await db_module.set_current_script(db, pid, v2)
+
+    assert (await _search(client, "量子電腦"))["total"] == 1
+    assert (await _search(client, "幽默"))["total"] == 0
+
+    async with db_module.get_db() as db:
+        segment = (await db_module.get_segments_by_script(db, v2))[1]
+        await db_module.update_segment(db, segment["segment_id"], "重點：持續學習")
+        await db_module.update_project(db, pid, topic="量子時代")
+    assert (await _search(client, "持續學習", kind="segment"))["total"] == 1
+    assert (await _search(client, "量子", kind="project"))["total"] == 1
+
+    async with db_module.get_db() as db:
+        await db_module.delete_project_cascade(db, pid)
+        cursor = await db.execute("SELECT COUNT(*) FROM search_docs")
+        assert (await cursor.fetchone())[0] == 0
+    assert (await _search(client, "量子"))["total"] == 0
+
+
+async def test_search_is_per_user_and_paginated(client):
+    for i in range(3):
+        await _seed(topic=f"人工智慧第{i}集")
+    await _seed(user_id="user-2")
+
+    body = await _search(client, "人工智慧", kind="project", limit=2)
+    assert body["total"] == 3
+    assert len(body["results"]) == 2
+    page2 = await _search(client, "人工智慧", kind="project", limit=2, offset=2)
+    assert len(page2["results"]) == 1
+    ids = {r["project_id"] for r in body["results"] + page2["results"]}
+    assert len(ids) == 3
+
+
+async def test_index_rebuilt_for_existing_data(client, test_db):
+    await _seed()
+    async with db_module.get_db() as db:
+        await db.execute("DELETE FROM search_index")
+        await db.execute("DELETE FROM search_docs")
+
+    await db_module.init_db(test_db)
+    assert (await _search(client, "人工智慧"))["total"] == 2
+
+
+def test_highlight_windows_long_text():
+    text = "前言" * 100 + "關鍵字" + "結尾" * 100
+    snippet = highlight(text, ["關鍵字"], width=40)
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert "<mark>關鍵字</mark>" in snippet
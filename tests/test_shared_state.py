@@ -0,0 +1,244 @@
+"""Shared-state backends (SQLite, Redis protocol) and the limits/caches built on them."""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from app import shared_state as shared_state_module
+from app.api.rate_limit import SharedRateLimiter
+from app.config import settings
+from app.llm import gemini_provider
+from app.llm.gemini_provider import GeminiProvider
+from app.shared_state import RedisState, SharedStateError, SQLiteState, open_shared_state
+from tests.test_jobs import HEADERS, _create_project
+
+
+class MiniRedis:
+    """Local stand-in speaking the RESP subset RedisState uses."""
+
+    def __init__(self):
+        self.data: dict[str, tuple[str, float]] = {}
+        self.server: asyncio.Server | None = None
+        self.connections = 0
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _get(self, key):
+        value = self.data.get(key)
+        if value is None or value[1] <= time.monotonic():
+            self.data.pop(key, None)
+            return None
+        return value[0]
+
+    def _run(self, command: list[str]) -> bytes:
+        name, args = command[0].upper(), command[1:]
+        if name in ("PING", "AUTH", "SELECT"):
+            return b"+OK\r\n"
+        if name == "GET":
+            value = self._get(args[0])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value.encode()), value.encode())
+        if name == "SET":
+            key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+            if "NX" in options and self._get(key) is not None:
+                return b"$-1\r\n"
+            ttl = int(args[2 + options.index("PX") + 1]) / 1000 if "PX" in options else float("inf")
+            self.data[key] = (value, time.monotonic() + ttl)
+            return b"+OK\r\n"
+        if name == "INCRBY":
+            current = self._get(args[0])
+            if current is not None and not current.lstrip("-").isdigit():
+                return b"-ERR value is not an integer\r\n"
+            expires = self.data[args[0]][1] if current is not None else float("inf")
+            value = int(current or 0) + int(args[1])
+            self.data[args[0]] = (str(value), expires)
+            return b":%d\r\n" % value
+        if name == "DEL":
+            return b":%d\r\n" % (self.data.pop(args[0], None) is not None)
+        return b"-ERR unknown command\r\n"
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        queued = None
+        try:
+            while True:
+                header = await reader.readuntil(b"\r\n")
+                command = []
+                for _ in range(int(header[1:-2])):
+                    size = int((await reader.readuntil(b"\r\n"))[1:-2])
+                    command.append((await reader.readexactly(size + 2))[:-2].decode())
+                name = command[0].upper()
+                if name == "MULTI":
+                    queued = []
+                    writer.write(b"+OK\r\n")
+                elif name == "EXEC":
+                    replies = [self._run(c) for c in queued]
+                    queued = None
+                    writer.write(b"*%d\r\n" % len(replies) + b"".join(replies))
+                elif queued is not None:
+                    queued.append(command)
+                    writer.write(b"+QUEUED\r\n")
+                else:
+                    writer.write(self._run(command))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+@pytest.fixture
+async def redis_server():
+    server = MiniRedis()
+    port = await server.start()
+    yield server, port
+    await server.stop()
+
+
+@pytest.fixture
+async def sqlite_state(tmp_path):
+    state = SQLiteState(str(tmp_path / "shared.db"))
+    yield state
+    await state.close()
+
+
+async def test_sqlite_incr_is_atomic_across_connections(sqlite_state, tmp_path):
+    other = SQLiteState(str(tmp_path / "shared.db"))  # another worker process
+    try:
+        await asyncio.gather(*(s.incr("hits", ttl=60) for s in (sqlite_state, other) for _ in range(50)))
+        assert await sqlite_state.get("hits") == "100"
+        assert await other.incr("hits", 5, ttl=60) == 105
+    finally:
+        await other.close()
+
+
+async def test_sqlite_expiry_and_values(sqlite_state):
+    assert await sqlite_state.incr("short", ttl=0.05) == 1
+    await asyncio.sleep(0.1)
+    assert await sqlite_state.get("short") is None
+    assert await sqlite_state.incr("short", ttl=60) == 1
+
+    await sqlite_state.set("name", "cachedContents/x", ttl=60)
+    assert await sqlite_state.get("name") == "cachedContents/x"
+    await sqlite_state.delete("name")
+    assert await sqlite_state.get("name") is None
+
+
+async def test_redis_state_against_stand_in(redis_server):
+    server, port = redis_server
+    state = RedisState(port=port, db=1, password="secret")
+    try:
+        assert await state.incr("hits", ttl=60) == 1
+        assert await state.incr("hits", 2, ttl=60) == 3
+        assert server.data["hits"][1] < time.monotonic() + 61  # TTL set by the first incr only
+
+        await state.set("name", "值", ttl=60)
+        assert await state.get("name") == "值"
+        await state.delete("name")
+        assert await state.get("name") is None
+
+        await state.set("text", "x", ttl=60)
+        with pytest.raises(SharedStateError):
+            await state.incr("text", ttl=60)
+        assert await state.get("hits") == "3"  # connection still in step after an error reply
+    finally:
+        await state.close()
+
+
+async def test_redis_unavailable_then_reconnects(redis_server):
+    server, port = redis_server
+    state = RedisState(port=port, timeout=0.5)
+    await state.incr("a", ttl=60)
+    state._writer.close()  # connection dropped under us
+    with pytest.raises(SharedStateError):
+        await state.get("a")
+    assert await state.get("a") == "1"
+    assert server.connections == 2
+    await state.close()
+
+    with pytest.raises(SharedStateError):
+        await RedisState(port=1, timeout=0.5).get("a")
+
+
+def test_open_shared_state():
+    assert isinstance(open_shared_state("sqlite:///data/shared.db"), SQLiteState)
+    redis = open_shared_state("redis://:pw@cache:6380/2")
+    assert (redis._host, redis._port, redis._db, redis._password) == ("cache", 6380, 2, "pw")
+    with pytest.raises(ValueError):
+        open_shared_state("memcached://x")
+
+
+async def test_shared_rate_limit_spans_workers(sqlite_state, tmp_path):
+    clock = MagicMock(return_value=6000.0)  # start of a 60 s window
+    other = SQLiteState(str(tmp_path / "shared.db"))
+    try:
+        workers = [SharedRateLimiter(sqlite_state, clock=clock), SharedRateLimiter(other, clock=clock)]
+        remaining = [(await workers[i % 2].check("u:tts", 3, 60)).remaining for i in range(3)]
+        assert remaining == [2, 1, 0]
+        with pytest.raises(HTTPException) as exc:
+            await workers[1].check("u:tts", 3, 60)
+        assert exc.value.status_code == 429
+        # Next window, then until 3 earlier calls weigh in at no more than 2
+        assert exc.value.headers["Retry-After"] == "80"
+
+        # Half-way through the next window half of the previous calls still count
+        clock.return_value = 6090.0
+        assert (await workers[0].check("u:tts", 3, 60)).remaining == 0
+        with pytest.raises(HTTPException):
+            await workers[0].check("u:tts", 3, 60)
+    finally:
+        await other.close()
+
+
+async def test_routes_use_shared_state_and_fall_back(client, monkeypatch, tmp_path, redis_server):
+    server, port = redis_server
+    monkeypatch.setattr(settings, "rate_limits", "titles=1/60")
+    monkeypatch.setattr(settings, "shared_state_url", f"redis://127.0.0.1:{port}")
+    monkeypatch.setattr(shared_state_module, "_shared", None)
+    pid = await _create_project(client)
+    url = f"/api/v1/projects/{pid}/titles/generate"
+
+    assert (await client.post(url, headers=HEADERS)).status_code == 202
+    assert (await client.post(url, headers=HEADERS)).status_code == 429
+    assert any(key.startswith("ratelimit:") for key in server.data)
+
+    # Backend gone: limits are still enforced, per process
+    await shared_state_module.close_shared_state()
+    monkeypatch.setattr(settings, "shared_state_url", "redis://127.0.0.1:1")
+    assert (await client.post(url, headers=HEADERS)).status_code == 202
+    assert (await client.post(url, headers=HEADERS)).status_code == 429
+    await shared_state_module.close_shared_state()
+
+
+async def test_gemini_context_cache_shared_between_workers(monkeypatch, sqlite_state):
+    monkeypatch.setattr(gemini_provider, "_context_caches", {})
+    monkeypatch.setattr(gemini_provider, "shared_state", lambda: sqlite_state)
+    cache = MagicMock()
+    cache.name = "cachedContents/shared"
+
+    async def cache_name(provider):
+        with patch.object(provider._client.aio.caches, "create", new_callable=AsyncMock, return_value=cache) as create:
+            name = await provider._context_cache("id-1", "system", "prefix")
+        return name, create.await_count
+
+    assert await cache_name(GeminiProvider(api_key="fake")) == ("cachedContents/shared", 1)
+    gemini_provider._context_caches.clear()  # a different worker process
+    assert await cache_name(GeminiProvider(api_key="fake")) == ("cachedContents/shared", 0)
+    assert "id-1" in gemini_provider._context_caches
+
+
+def test_incomplete_backend_fails_on_creation():
+    class GetOnly(shared_state_module.SharedState):
+        async def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
@@ -0,0 +1,78 @@
+"""Cold start: import budget, background warm-up and readiness."""
+
+import pytest
+
+import app.db as db_module
+from app import metrics, startup
+from app.config import settings
+from app.llm import factory as llm_factory
+from app.tts import factory as tts_factory
+from benchmarks.startup import HEAVY_MODULES, IMPORT_BUDGET_MS, import_profile
+
+
+@pytest.fixture
+async def warmup_state(monkeypatch):
+    monkeypatch.setattr(startup, "_steps", {})
+    monkeypatch.setattr(llm_factory, "_instances", {})
+    monkeypatch.setattr(tts_factory, "_instances", {})
+    monkeypatch.setattr(settings, "fake_providers", False)
+    yield
+    await startup.stop_warmup()
+
+
+def test_app_import_stays_within_budget():
+    modules = {name: cumulative for name, _, cumulative in import_profile()}
+    assert not set(HEAVY_MODULES) & modules.keys(), "provider SDKs must load in the background warm-up"
+    assert modules["app.main"] < IMPORT_BUDGET_MS
+
+
+async def test_ready_after_warm_up(client, warmup_state):
+    task = startup.start_warmup()
+    resp = await client.get("/ready")
+    assert resp.status_code == 503 and resp.json()["status"] == "warming"
+    assert (await client.get("/health")).status_code == 200
+
+    await task
+    resp = await client.get("/ready")
+    assert resp.status_code == 200
+    assert {name: step["status"] for name, step in resp.json()["steps"].items()} == {
+        "sdks": "ok",
+        "providers": "ok",
+        "db": "ok",
+    }
+    assert {"claude", "gemini"} <= llm_factory._instances.keys() and "gemini" in tts_factory._instances
+    assert 'startup_step_seconds{step="providers"}' in metrics.render()
+
+
+async def test_failed_step_is_reported_not_fatal(client, warmup_state, monkeypatch):
+    async def broken():
+        raise OSError("disk on fire")
+
+    monkeypatch.setattr(startup, "_warm_db", broken)
+    await startup.start_warmup()
+    resp = await client.get("/ready")
+    assert resp.status_code == 200
+    db_step = resp.json()["steps"]["db"]
+    assert (db_step["status"], db_step["error"]) == ("failed", "OSError: disk on fire")
+
+    monkeypatch.setattr(settings, "startup_warmup", False)
+    assert startup.start_warmup() is None
+    assert (await client.get("/ready")).status_code == 200
+
+
+async def test_init_db_skips_ddl_for_current_schema(test_db):
+    async with db_module.get_db() as db:
+        await db.execute("DROP TABLE idempotency_keys")
+
+    await db_module.init_db(test_db)  # schema version matches: nothing re-created
+    async with db_module.get_db() as db:
+        cursor = await db.execute("SELECT name FROM sqlite_master WHERE name = 'idempotency_keys'")
+        assert await cursor.fetchone() is None
+        await db.execute("PRAGMA user_version = 0")
+
+    await db_module.init_db(test_db)
+    async with db_module.get_db() as db:
+        cursor = await db.execute("SELECT name FROM sqlite_master WHERE name = 'idempotency_keys'")
+        assert await cursor.fetchone() is not None
+        cursor = await db.execute("PRAGMA user_version")
+        assert (await cursor.fetchone())[0] == db_module._SCHEMA_VERSION
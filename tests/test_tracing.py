@@ -0,0 +1,131 @@
+"""Request tracing: Server-Timing header, sampling, span nesting and OTLP/JSON export."""
+
+import json
+
+from cryptography.fernet import Fernet
+
+from app import crypto, tracing
+from app.config import settings
+from app.llm.resilience import ResilientLLMProvider
+from app.tts import audio_storage
+from tests.conftest import FakeLLMProvider
+
+HEADERS = {"X-User-Id": "user-1"}
+CALLER_TRACE = "4bf92f3577b34da6a3ce929d0e0e4736"
+CALLER_SPAN = "00f067aa0ba902b7"
+
+
+def _timings(header: str) -> dict[str, str]:
+    return {part.split(";", 1)[0]: part for part in header.split(", ")}
+
+
+async def test_server_timing_header(client, monkeypatch):
+    monkeypatch.setattr(settings, "trace_sample_rate", 1.0)
+    resp = await client.get("/api/v1/projects/missing", headers=HEADERS)
+    assert resp.status_code == 404
+    timings = _timings(resp.headers["Server-Timing"])
+    assert {"db.connect", "db.get_user_or_create", "db.get_project", "db.commit", "total"} <= timings.keys()
+    assert timings["db.get_project"].startswith("db.get_project;dur=")
+
+
+async def test_sample_rate_and_traceparent(client, monkeypatch):
+    # Off by default: tracing is opt-in, and clients can't force it
+    traceparent = f"00-{CALLER_TRACE}-{CALLER_SPAN}-01"
+    resp = await client.get("/api/v1/projects/missing", headers=HEADERS)
+    assert "Server-Timing" not in resp.headers
+    resp = await client.get("/api/v1/projects/missing", headers={**HEADERS, "traceparent": traceparent})
+    assert "Server-Timing" not in resp.headers
+
+    # Following callers: one recording this trace is always sampled
+    monkeypatch.setattr(settings, "trace_follow_traceparent", True)
+    resp = await client.get("/api/v1/projects/missing", headers={**HEADERS, "traceparent": traceparent})
+    assert "db.get_project" in resp.headers["Server-Timing"]
+
+    resp = await client.get("/api/v1/projects/missing", headers={**HEADERS, "traceparent": "garbage"})
+    assert "Server-Timing" not in resp.headers
+
+
+async def test_otlp_export(client, monkeypatch, tmp_path):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(settings, "trace_export_path", str(path))
+    monkeypatch.setattr(settings, "trace_sample_rate", 1.0)
+    traceparent = f"00-{CALLER_TRACE}-{CALLER_SPAN}-01"
+
+    await client.get("/api/v1/projects/missing", headers={**HEADERS, "traceparent": traceparent})
+    await tracing.flush_exports()
+
+    payload = json.loads(path.read_text().strip())
+    spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    root = spans[0]
+    assert root["name"] == "GET /api/v1/projects/{project_id}"
+    assert root["kind"] == 2
+    assert root["traceId"] == CALLER_TRACE
+    assert root["parentSpanId"] == CALLER_SPAN
+    assert {"key": "http.response.status_code", "value": {"intValue": "404"}} in root["attributes"]
+
+    ids = {s["spanId"] for s in spans}
+    for child in spans[1:]:
+        assert child["traceId"] == CALLER_TRACE
+        assert child["parentSpanId"] in ids
+        assert int(root["startTimeUnixNano"]) <= int(child["startTimeUnixNano"]) <= int(child["endTimeUnixNano"])
+    assert "db.get_project" in {s["name"] for s in spans}
+
+
+async def test_collector_export_reuses_one_session(monkeypatch):
+    from aiohttp import web
+
+    received = []
+
+    async def collect(request: web.Request) -> web.Response:
+        received.append(await request.json())
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post("/v1/traces", collect)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(settings, "trace_export_url", f"http://127.0.0.1:{port}/v1/traces")
+    try:
+        tracing.export_trace(tracing.start_trace(sample_rate=1.0), "first")
+        await tracing.flush_exports()
+        session = tracing._session
+        tracing.export_trace(tracing.start_trace(sample_rate=1.0), "second")
+        await tracing.close_exports()
+        assert len(received) == 2
+        assert session.closed and tracing._session is None
+    finally:
+        await runner.cleanup()
+
+
+async def test_provider_decrypt_and_audio_spans(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "encryption_key", Fernet.generate_key().decode())
+    monkeypatch.setattr(crypto, "_fernet", None)
+    monkeypatch.setattr(audio_storage, "_AUDIO_DIR", tmp_path)
+    ciphertext = crypto.encrypt_api_key("sk-test")
+    provider = ResilientLLMProvider(FakeLLMProvider(), "gemini")
+
+    trace = tracing.start_trace(sample_rate=1.0)
+    token = tracing.activate(trace)
+    try:
+        with tracing.span("outer"):
+            assert crypto.decrypt_api_key(ciphertext) == "sk-test"
+            await provider.complete("sys", "msg", task="script_refinement")
+        audio_storage.save_audio(b"abc")
+    finally:
+        tracing.deactivate(token)
+
+    by_name = {s.name: s for s in trace.spans}
+    assert {"crypto.decrypt", "llm.gemini", "audio.save", "outer"} <= by_name.keys()
+    assert by_name["crypto.decrypt"].parent_id == by_name["outer"].span_id
+    assert by_name["llm.gemini"].parent_id == by_name["outer"].span_id
+    assert by_name["llm.gemini"].attributes == {"task": "script_refinement"}
+    assert by_name["audio.save"].parent_id is None
+
+
+def test_spans_are_noops_outside_a_trace():
+    with tracing.span("anything"):
+        tracing.record_span("other", 0.1)
+    assert tracing.current_trace() is None
@@ -83,6 +83,7 @@ def test_factory_gemini():
     from app.tts import factory
     factory._instances.clear()
     mock_settings = MagicMock()
+    mock_settings.fake_providers = False
     mock_settings.gemini_api_key = "test-key"
     mock_settings.gemini_tts_model = "gemini-2.5-flash-preview-tts"
     with patch("app.config.settings", mock_settings):